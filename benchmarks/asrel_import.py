@@ -0,0 +1,72 @@
+"""Measure the time and memory used to import an AS-relationship dataset,
+to filter it and to build the topology of the result, without starting
+the network. A synthetic dataset is generated unless a file is given.
+
+    python benchmarks/asrel_import.py --ases 50000 --k-core 5"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from ipmininet.asrel import ASGraph, ASRelationshipTopo
+
+
+def synthetic_dataset(path: str, ases: int, links_per_as: int, seed: int):
+    """Write a dataset whose ASes attach to earlier ASes, chosen
+    proportionally to their number of neighbors, as customers or peers"""
+    rng = random.Random(seed)
+    ends = [1, 2]
+    with open(path, 'w') as f:
+        f.write('# synthetic dataset\n1|2|0\n')
+        for asn in range(3, ases + 1):
+            for provider in {rng.choice(ends) for _ in range(links_per_as)}:
+                rel = 0 if rng.random() < .3 else -1
+                f.write('%d|%d|%d\n' % (provider, asn, rel))
+                ends.extend((provider, asn))
+
+
+def measure(step: str, function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-10s %10.2f %12.1f' % (step, duration, peak / 2 ** 20))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=None,
+                        help='The AS-relationship file')
+    parser.add_argument('--ases', type=int, default=50000)
+    parser.add_argument('--links-per-as', type=int, default=3)
+    parser.add_argument('--k-core', type=int, default=None)
+    parser.add_argument('--sample', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-topo', action='store_true',
+                        help='Do not build the topology')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, 'as-rel.txt')
+            synthetic_dataset(path, args.ases, args.links_per_as, args.seed)
+        print('%-10s %10s %12s' % ('step', 'time [s]', 'peak [MiB]'))
+        graph = measure('load', ASGraph.load, path)
+    if args.k_core is not None:
+        graph = measure('k-core', graph.k_core, args.k_core)
+    if args.sample is not None:
+        graph = measure('sample', graph.sample, args.sample, None, args.seed)
+    for key, value in graph.budget().items():
+        print('%-24s %d' % (key, value))
+    if not args.no_topo:
+        measure('topology', ASRelationshipTopo, graph)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Measure the time taken by BGP to converge in an AS whose routers form
+a ring, with a full mesh of iBGP sessions or with route reflectors, and
+after the failure of a link. This starts a network, hence must run as root.
+
+    python benchmarks/bgp_convergence.py --routers 20 --overlay hierarchy"""
+import argparse
+import json
+import time
+
+from ipmininet.clean import cleanup
+from ipmininet.convergence import BGPConvergence
+from ipmininet.ipnet import IPNet
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, AF_INET, AF_INET6, ebgp_session
+
+
+class RingTopo(IPTopo):
+
+    def __init__(self, routers: int, overlay: str, *args, **kwargs):
+        self.routers_count = routers
+        self.overlay = overlay
+        super().__init__(*args, **kwargs)
+
+    def build(self, *args, **kwargs):
+        families = (AF_INET(redistribute=('connected',)),
+                    AF_INET6(redistribute=('connected',)))
+        ring = []
+        for i in range(self.routers_count):
+            r = self.addRouter('r%d' % i)
+            r.addDaemon(BGP, address_families=families)
+            if ring:
+                self.addLink(ring[-1], r)
+            ring.append(r)
+        self.addLink(ring[-1], ring[0])
+        if self.overlay == 'fullmesh':
+            self.addiBGPFullMesh(1, routers=ring)
+        else:
+            self.addiBGPHierarchy(1, routers=ring)
+        # An external peer announcing its prefixes
+        ext = self.addRouter('ext')
+        ext.addDaemon(BGP, address_families=families)
+        self.addLink(ext, ring[0])
+        self.addAS(2, routers=[ext])
+        ebgp_session(self, ext, ring[0])
+        super().build(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=20)
+    parser.add_argument('--overlay', choices=('fullmesh', 'hierarchy'),
+                        default='hierarchy')
+    parser.add_argument('--quiet-period', type=float, default=3.)
+    parser.add_argument('--timeout', type=float, default=600.)
+    args = parser.parse_args()
+
+    net = IPNet(topo=RingTopo(args.routers, args.overlay))
+    try:
+        start = time.monotonic()
+        net.start()
+        reports = {}
+        with BGPConvergence(net.routers, quiet_period=args.quiet_period,
+                            start=start) as detector:
+            detector.wait(args.timeout)
+            reports['start'] = detector.report()
+            # Break the ring next to the external peer
+            detector.reset()
+            net.configLinkStatus('r0', 'r1', 'down')
+            detector.wait(args.timeout)
+            reports['link failure'] = detector.report()
+        for name, report in reports.items():
+            print('%-14s converged: %s, network: %s s' % (
+                name, report['converged'], report['network']))
+        print(json.dumps(reports, indent=2, sort_keys=True))
+    finally:
+        net.stop()
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
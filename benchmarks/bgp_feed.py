@@ -0,0 +1,71 @@
+"""Measure the injection throughput of a BGP feed and the time taken by its
+routes to propagate through a chain of routers. This starts a network, hence
+must run as root.
+
+    python benchmarks/bgp_feed.py --prefixes 100000 --routers 3"""
+import argparse
+import json
+import time
+
+from ipmininet.clean import cleanup
+from ipmininet.ipnet import IPNet
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, AF_INET, ebgp_session
+from ipmininet.router.config.bgpfeed import measure_propagation
+
+
+class FeedTopo(IPTopo):
+
+    def __init__(self, routers: int, prefixes: int, rate, mrt, *args,
+                 **kwargs):
+        self.routers_count = routers
+        self.feed_opts = {'ipv4_prefixes': prefixes, 'rate': rate,
+                          'mrt': mrt}
+        super().__init__(*args, **kwargs)
+
+    def build(self, *args, **kwargs):
+        feed = self.addFeedInjector('feed', 65000, **self.feed_opts)
+        chain = []
+        for i in range(self.routers_count):
+            r = self.addRouter('r%d' % i)
+            r.addDaemon(BGP, address_families=(AF_INET(),))
+            self.addLink(chain[-1] if chain else feed, r)
+            chain.append(r)
+        self.addiBGPFullMesh(1, routers=chain)
+        ebgp_session(self, feed, chain[0])
+        super().build(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=3)
+    parser.add_argument('--prefixes', type=int, default=100000)
+    parser.add_argument('--rate', type=float, default=None,
+                        help='The maximal number of prefixes per second')
+    parser.add_argument('--mrt', default=None,
+                        help='Announce the routes of this MRT file instead')
+    parser.add_argument('--timeout', type=float, default=600.)
+    args = parser.parse_args()
+
+    net = IPNet(topo=FeedTopo(args.routers, args.prefixes, args.rate,
+                              args.mrt))
+    try:
+        start = time.monotonic()
+        net.start()
+        print('Network started in %.2f s' % (time.monotonic() - start))
+        feed = net['feed'].nconfig.daemon('bgpfeed')
+        report = measure_propagation(feed, [r for r in net.routers
+                                            if r.name != 'feed'],
+                                     timeout=args.timeout)
+        for family, result in report.items():
+            print('%s: %d prefixes at %.0f prefixes/s, propagated in %s s'
+                  % (family, result['prefixes'],
+                     result['prefixes_per_second'], result['propagation']))
+        print(json.dumps(report, indent=2, sort_keys=True))
+    finally:
+        net.stop()
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
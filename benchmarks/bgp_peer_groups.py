@@ -0,0 +1,84 @@
+"""Measure the time taken by BGP to converge when a route reflector has many
+clients, with and without peer groups, as well as the size of the
+configuration of the route reflector. This starts a network, hence must run
+as root.
+
+    python benchmarks/bgp_peer_groups.py --clients 200"""
+import argparse
+import json
+import os
+import time
+
+from ipmininet.clean import cleanup
+from ipmininet.convergence import BGPConvergence
+from ipmininet.ipnet import IPNet
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, AF_INET, set_rr
+
+
+class ReflectorTopo(IPTopo):
+    """A route reflector connected to each of its clients, which announce
+    their prefixes"""
+
+    def __init__(self, clients: int, peer_groups: bool, *args, **kwargs):
+        self.clients_count = clients
+        self.peer_groups = peer_groups
+        super().__init__(*args, **kwargs)
+
+    def build(self, *args, **kwargs):
+        families = (AF_INET(redistribute=('connected',)),)
+        rr = self.addRouter('rr')
+        rr.addDaemon(BGP, address_families=families,
+                     peer_groups=self.peer_groups)
+        clients = []
+        for i in range(self.clients_count):
+            c = self.addRouter('c%d' % i)
+            c.addDaemon(BGP, address_families=families)
+            self.addLink(rr, c)
+            clients.append(c)
+        self.addAS(1, routers=[rr] + clients)
+        set_rr(self, rr, peers=clients)
+        super().build(*args, **kwargs)
+
+
+def measure(clients: int, peer_groups: bool, quiet_period: float,
+            timeout: float):
+    net = IPNet(topo=ReflectorTopo(clients, peer_groups), use_v6=False)
+    try:
+        start = time.monotonic()
+        net.start()
+        config = os.path.getsize(net['rr'].nconfig.daemon(BGP).cfg_filename)
+        with BGPConvergence(net.routers, quiet_period=quiet_period,
+                            start=start) as detector:
+            detector.wait(timeout)
+            report = detector.report()
+        return {'converged': report['converged'],
+                'convergence': report['network'],
+                'config_bytes': config}
+    finally:
+        net.stop()
+        cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--quiet-period', type=float, default=3.)
+    parser.add_argument('--timeout', type=float, default=600.)
+    args = parser.parse_args()
+
+    results = {}
+    for name, peer_groups in (('per neighbor', False), ('peer groups', True)):
+        start = time.monotonic()
+        results[name] = measure(args.clients, peer_groups,
+                                args.quiet_period, args.timeout)
+        results[name]['duration'] = time.monotonic() - start
+    print('%-14s %16s %14s' % ('', 'convergence [s]', 'config [B]'))
+    for name, r in results.items():
+        print('%-14s %16s %14d' % (name, r['convergence'],
+                                   r['config_bytes']))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
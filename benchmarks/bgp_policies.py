@@ -0,0 +1,128 @@
+"""Compare the compilation of the BGP policies of a router into route maps,
+before and after the route maps and the filter lists were indexed.
+
+    python benchmarks/bgp_policies.py --entries 10000 --peers 50"""
+import argparse
+import time
+
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config.bgp import BGP, BGPConfig
+from ipmininet.router.config.zebra import AccessList, CommunityList, \
+    RouteMap, RouteMapMatchCond
+
+
+class LegacyBGPConfig(BGPConfig):
+    """The filter registration, before it was indexed"""
+
+    def filters_to_match_cond(self, filter_list):
+        match_cond = []
+        access_lists = self.topo.getNodeInfo(self.router, 'bgp_access_lists',
+                                             list)
+        community_list = self.topo.getNodeInfo(self.router,
+                                               'bgp_community_lists', list)
+        for f in filter_list:
+            if isinstance(f, CommunityList):
+                match_cond.append(RouteMapMatchCond('community', f.name))
+                if f not in community_list:
+                    community_list.append(f)
+            else:
+                match_cond.append(RouteMapMatchCond('access-list', f.name))
+                if f not in access_lists:
+                    access_lists.append(f)
+        return match_cond
+
+
+def legacy_build_route_map(node_route_maps, neighbors):
+    """The route map assembly, before it was indexed"""
+    route_maps = []
+    for kwargs in node_route_maps:
+        kwargs = dict(kwargs)
+        remote_peer = kwargs.pop('peer')
+        for peer in [n for n in neighbors if n.node == remote_peer]:
+            kwargs['neighbor'] = peer
+            rm = RouteMap(**kwargs)
+            try:
+                tmp_rm = route_maps.pop(route_maps.index(rm))
+                rm.append_match_cond(tmp_rm.match_cond)
+                rm.append_set_action(tmp_rm.set_actions)
+            except ValueError:
+                pass
+            route_maps.append(rm)
+    return route_maps
+
+
+class FakePeer:
+
+    def __init__(self, node):
+        self.node = node
+
+
+class FakeBGP:
+
+    def __init__(self, node_info):
+        self._node = node_info
+
+
+def policies(config_cls, entries: int, peers: int):
+    """Configure the policies of a router, one entry per call"""
+    topo = IPTopo()
+    r = topo.addRouter('r0')
+    config = config_cls(topo, r)
+    for i in range(entries):
+        peer = 'p%d' % (i % peers)
+        acl = AccessList('acl%d' % (i // 4), ('10.%d.%d.0/24'
+                                              % (i // 256 % 256, i % 256),))
+        cml = CommunityList('cml%d' % (i % 100), community=i % 100)
+        kind = i % 4
+        if kind == 0:
+            config.set_local_pref(100 + i % 7, peer, [acl])
+        elif kind == 1:
+            config.set_community(i % 100, to_peer=peer, matching=[acl])
+        elif kind == 2:
+            config.set_med(i % 10, to_peer=peer, matching=[cml])
+        else:
+            config.deny(from_peer=peer, matching=[acl, cml], order=i % 10)
+    return topo.nodeInfo(r)
+
+
+def describe(route_maps):
+    return [(rm.name, rm.direction, rm.order, id(rm.neighbor),
+             [(c.cond_type, c.condition) for c in rm.match_cond],
+             [(a.action_type, a.value) for a in rm.set_actions])
+            for rm in route_maps]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--peers', type=int, default=50)
+    args = parser.parse_args()
+    neighbors = [FakePeer('p%d' % i) for i in range(args.peers)]
+
+    results = []
+    print('%-10s %15s %15s %12s'
+          % ('', 'policies [ms]', 'route maps [ms]', 'route maps'))
+    for name, config_cls, build in (
+            ('legacy', LegacyBGPConfig,
+             lambda info: legacy_build_route_map(info['bgp_route_maps'],
+                                                 neighbors)),
+            ('indexed', BGPConfig,
+             lambda info: BGP.build_route_map(FakeBGP(info), neighbors))):
+        start = time.perf_counter()
+        node_info = policies(config_cls, args.entries, args.peers)
+        configure = time.perf_counter() - start
+
+        RouteMap.count = 0
+        start = time.perf_counter()
+        route_maps = build(node_info)
+        assemble = time.perf_counter() - start
+        results.append((describe(route_maps),
+                        [a.name for a in node_info['bgp_access_lists']],
+                        [c.name for c in node_info['bgp_community_lists']]))
+        print('%-10s %15.1f %15.1f %12d'
+              % (name, configure * 1000, assemble * 1000, len(route_maps)))
+    print('identical: %s' % (results[0] == results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Compare the size of the BGP configuration of a router with many eBGP
+sessions configured by ebgp_session(), with one route map per session and
+with the route maps shared by the sessions with the same policies.
+
+    python benchmarks/bgp_policy_dedup.py --sessions 500"""
+import argparse
+import time
+
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.bgp import BGP, SHARE, CLIENT_PROVIDER, \
+    RouteMapBinding, dedup_filters, dedup_route_maps, ebgp_session
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+
+
+class FakeNode(dict):
+    asn = 1
+
+
+class FakeBGP:
+
+    def __init__(self, node_info):
+        self._node = FakeNode(node_info)
+
+
+class FakeNeighbor:
+
+    def __init__(self, node, peer, family):
+        self.node = node
+        self.peer = peer
+        self.family = family
+
+
+def sessions_topo(sessions: int):
+    topo = IPTopo()
+    r = topo.addRouter('r0')
+    neighbors = []
+    for i in range(sessions):
+        p = topo.addRouter('p%d' % i)
+        topo.addLink(r, p)
+        ebgp_session(topo, r, p, link_type=SHARE if i % 2 else CLIENT_PROVIDER)
+        neighbors.append(FakeNeighbor(p, '10.%d.%d.2' % (i // 256, i % 256),
+                                      'ipv4'))
+        neighbors.append(FakeNeighbor(p, 'fc00:%x::2' % i, 'ipv6'))
+    return topo.nodeInfo(r), neighbors
+
+
+def per_session(bgp, neighbors):
+    """The route maps without deduplication, named after each session"""
+    route_maps = BGP.build_route_map(bgp, neighbors)
+    bindings = {}
+    for rm in route_maps:
+        name = bindings.setdefault((rm.neighbor, rm.direction),
+                                   '%s-%s' % (rm.name, rm.neighbor.node))
+        rm.name = name
+    return (BGP.build_access_list(bgp), BGP.build_community_list(bgp),
+            route_maps,
+            [RouteMapBinding(peer=n.peer, family=n.family, name=name,
+                             direction=d)
+             for (n, d), name in bindings.items()])
+
+
+def shared(bgp, neighbors):
+    access_lists, acl_renames = dedup_filters(BGP.build_access_list(bgp),
+                                              'acl')
+    community_lists, cml_renames = dedup_filters(
+        BGP.build_community_list(bgp), 'cml')
+    route_maps, bindings = dedup_route_maps(
+        BGP.build_route_map(bgp, neighbors),
+        {'access-list': acl_renames, 'community': cml_renames})
+    return access_lists, community_lists, route_maps, bindings
+
+
+def render(access_lists, community_lists, route_maps, bindings):
+    cfg = ConfigDict(name='r0', password='zebra', bgpd=ConfigDict(
+        asn=1, routerid='10.0.0.1', debug=(), neighbors=[],
+        address_families=[ConfigDict(name=f, networks=[], redistribute=[],
+                                     neighbors=[])
+                          for f in ('ipv4', 'ipv6')],
+        access_lists=access_lists, community_lists=community_lists,
+        route_maps=route_maps, route_map_bindings=bindings,
+        aggregates={'ipv4': [], 'ipv6': []}, peer_groups=[]))
+    return router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=500)
+    args = parser.parse_args()
+    node_info, neighbors = sessions_topo(args.sessions)
+    bgp = FakeBGP(node_info)
+
+    print('%-12s %12s %12s %12s %12s'
+          % ('', 'build [ms]', 'render [ms]', 'route maps', 'bytes'))
+    for name, compile_policies in (('per session', per_session),
+                                   ('shared', shared)):
+        start = time.perf_counter()
+        policies = compile_policies(bgp, neighbors)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        out = render(*policies)
+        rendering = time.perf_counter() - start
+        print('%-12s %12.1f %12.1f %12d %12d'
+              % (name, build * 1000, rendering * 1000,
+                 len({(rm.name, rm.neighbor.family) for rm in policies[2]}),
+                 len(out)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Measure the reconvergence time and the churn caused by the crash and
+restart of the BGP daemon of a router, with the default BGP options and
+with a profile of options. This starts networks, hence must run as root.
+
+    python benchmarks/bgp_restart.py --routers 10 --profiles default lab"""
+import argparse
+import json
+import signal
+import time
+
+from ipmininet.clean import cleanup
+from ipmininet.convergence import BGPConvergence
+from ipmininet.ipnet import IPNet
+from ipmininet.iptopo import IPTopo
+from ipmininet.router import batch_query
+from ipmininet.router.config import BGP, AF_INET, ebgp_session
+
+
+class RestartTopo(IPTopo):
+    """A ring of routers in full mesh of iBGP sessions, and external peers
+    announcing their prefixes"""
+
+    def __init__(self, routers: int, profile, *args, **kwargs):
+        self.routers_count = routers
+        self.profile = profile
+        super().__init__(*args, **kwargs)
+
+    def build(self, *args, **kwargs):
+        families = (AF_INET(redistribute=('connected',)),)
+        ring = []
+        for i in range(self.routers_count):
+            r = self.addRouter('r%d' % i)
+            r.addDaemon(BGP, address_families=families, profile=self.profile)
+            if ring:
+                self.addLink(ring[-1], r)
+            ring.append(r)
+        self.addLink(ring[-1], ring[0])
+        self.addiBGPFullMesh(1, routers=ring)
+        for i, r in enumerate(ring[:2]):
+            ext = self.addRouter('ext%d' % i)
+            ext.addDaemon(BGP, address_families=families,
+                          profile=self.profile)
+            self.addLink(ext, r)
+            self.addAS(2 + i, routers=[ext])
+            ebgp_session(self, ext, r)
+        super().build(*args, **kwargs)
+
+
+def updates_received(routers) -> int:
+    """Return the number of BGP UPDATE messages received by the routers"""
+    answers = batch_query(routers, 'bgpd', 'show bgp neighbors')
+    return sum(peer.get('messageStats', {}).get('updatesRecv', 0)
+               for answer in answers.values() if isinstance(answer, dict)
+               for peer in answer.values() if isinstance(peer, dict))
+
+
+def restart_bgpd(router):
+    """Crash the BGP daemon of a router, such that it cannot notify its
+    peers, and start it again"""
+    daemon = router.nconfig.daemon(BGP)
+    process = router.daemon_process(daemon)
+    process.send_signal(signal.SIGKILL)
+    process.wait()
+    router.start_daemon(daemon)
+
+
+def measure(routers: int, profile, quiet_period: float, timeout: float):
+    net = IPNet(topo=RestartTopo(routers, profile), supervise=False)
+    try:
+        net.start()
+        with BGPConvergence(net.routers, quiet_period=quiet_period) \
+                as detector:
+            detector.wait(timeout)
+            start_report = detector.report()
+            before = updates_received(net.routers)
+            detector.reset()
+            restart_bgpd(net['r0'])
+            detector.wait(timeout)
+            restart_report = detector.report()
+            churn = updates_received(net.routers) - before
+        return {'start': start_report['network'],
+                'restart': restart_report['network'],
+                'converged': restart_report['converged'],
+                'updates': churn}
+    finally:
+        net.stop()
+        cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=10)
+    parser.add_argument('--profiles', nargs='+',
+                        default=['default', 'lab'])
+    parser.add_argument('--quiet-period', type=float, default=3.)
+    parser.add_argument('--timeout', type=float, default=600.)
+    args = parser.parse_args()
+
+    results = {}
+    for profile in args.profiles:
+        start = time.monotonic()
+        results[profile] = measure(
+            args.routers, None if profile == 'default' else profile,
+            args.quiet_period, args.timeout)
+        results[profile]['duration'] = time.monotonic() - start
+    print('%-18s %12s %14s %10s' % ('profile', 'start [s]', 'restart [s]',
+                                    'updates'))
+    for profile, r in results.items():
+        print('%-18s %12s %14s %10d' % (profile, r['start'], r['restart'],
+                                        r['updates']))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Measure the time taken to compute the expected BGP routes of an
+inter-domain topology, whose ASes each announce a prefix, without starting
+the network. With --net, the network is also started, which must run as
+root, and the routes of the routers are compared with the expected ones once
+BGP has converged.
+
+    python benchmarks/bgp_simulator.py --ases 1000"""
+import argparse
+import random
+import time
+
+from ipmininet.asrel import ASGraph, ASRelationshipTopo, router_name
+from ipmininet.bgpsim import BGPSimulator
+
+
+def synthetic_graph(ases: int, links_per_as: int, seed: int) -> ASGraph:
+    """Return a graph whose ASes attach to earlier ASes, chosen
+    proportionally to their number of neighbors, as customers or peers"""
+    rng = random.Random(seed)
+    graph = ASGraph([(1, 2, 0)])
+    ends = [1, 2]
+    for asn in range(3, ases + 1):
+        for provider in {rng.choice(ends) for _ in range(links_per_as)}:
+            graph.add_link(provider, asn, 0 if rng.random() < .3 else -1)
+            ends.extend((provider, asn))
+    return graph
+
+
+def measure(step: str, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print('%-10s %10.2f' % (step, time.perf_counter() - start))
+    return result
+
+
+def check(topo: ASRelationshipTopo, timeout: float):
+    """Start the network and compare its routes with the expected ones"""
+    from ipmininet.clean import cleanup
+    from ipmininet.convergence import wait_bgp_convergence
+    from ipmininet.ipnet import IPNet
+
+    net = IPNet(topo=topo, use_v6=False)
+    try:
+        net.start()
+        print('converged', wait_bgp_convergence(net.routers, timeout=timeout))
+        sim = measure('simulate', lambda: BGPSimulator.from_net(net))
+        differences = measure('compare', sim.differences, net.routers)
+        print('%d routers with unexpected routes' % len(differences))
+        for router, prefixes in sorted(differences.items())[:10]:
+            for prefix, (expected, actual) in sorted(prefixes.items())[:3]:
+                print(router, prefix, 'expected', expected, 'actual', actual)
+    finally:
+        net.stop()
+        cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ases', type=int, default=1000)
+    parser.add_argument('--links-per-as', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--net', action='store_true',
+                        help='Compare with the routes of the started network')
+    parser.add_argument('--timeout', type=float, default=600.)
+    args = parser.parse_args()
+
+    graph = synthetic_graph(args.ases, args.links_per_as, args.seed)
+    for key, value in graph.budget().items():
+        print('%-24s %d' % (key, value))
+    print('%-10s %10s' % ('step', 'time [s]'))
+    topo = measure('topology', ASRelationshipTopo, graph)
+    origins = {router_name(asn): ['10.%d.%d.0/24' % (i // 256, i % 256)]
+               for i, asn in enumerate(graph.asns)}
+    sim = measure('load', BGPSimulator, topo, origins)
+    best = measure('simulate', sim.best_routes)
+    print('%d best routes' % sum(len(routes) for routes in best.values()))
+    if args.net:
+        check(topo, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compare the configuration trees of the OSPF daemons of many routers,
+when the interfaces are described with ConfigDict (before and after the
+removal of the exception raised by each attribute access) or with the
+slotted OSPFInterface records.
+
+    python benchmarks/config_model.py --routers 1000 --interfaces 8"""
+import argparse
+import gc
+import pickle
+import time
+import tracemalloc
+from ipaddress import ip_interface
+
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.ospf import OSPFInterface, OSPFNetwork
+from ipmininet.router.config.utils import ConfigDict
+
+
+class LegacyConfigDict(dict):
+    """The ConfigDict attribute access, before it was optimized"""
+
+    def __getattr__(self, item):
+        try:
+            return super().__getattr__(item)
+        except Exception:
+            try:
+                return self[item]
+            except KeyError:
+                return None
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def build(record, routers: int, interfaces: int):
+    nodes = []
+    for r in range(routers):
+        itfs = [record(description='r%d-eth%d -> r%d' % (r, i, r + 1),
+                       name='r%d-eth%d' % (r, i), active=i % 2 == 0,
+                       priority=10, dead_int='minimal hello-multiplier 5',
+                       hello_int=1, cost=1, passive=False)
+                for i in range(interfaces)]
+        subnet = ip_interface('10.%d.%d.1/24' % (r // 256, r % 256))
+        nets = [OSPFNetwork(subnet, '0.0.0.0')]
+        nodes.append(ConfigDict(name='r%d' % r, password='zebra',
+                                ospfd=ConfigDict(routerid='10.0.0.%d' % r,
+                                                 logfile=None, debug=(),
+                                                 redistribute=[],
+                                                 networks=nets,
+                                                 interfaces=itfs)))
+    return nodes
+
+
+def measure(name: str, record, routers: int, interfaces: int):
+    gc.collect()
+    tracemalloc.start()
+    nodes = build(record, routers, interfaces)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for node in nodes:
+        for itf in node.ospfd.interfaces:
+            itf.name, itf.cost, itf.passive, itf.active, itf.priority
+    access = time.perf_counter() - start
+
+    template = router_template_lookup.get_template('ospfd.mako')
+    start = time.perf_counter()
+    for node in nodes:
+        template.render(node=node)
+    render = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = pickle.dumps(nodes, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.loads(data)
+    serialization = time.perf_counter() - start
+
+    print('%-16s %10.1f %10.2f %10.2f %10.2f %10.1f'
+          % (name, memory / 1024, access * 1000, render * 1000,
+             serialization * 1000, len(data) / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--interfaces', type=int, default=8)
+    args = parser.parse_args()
+
+    print('%-16s %10s %10s %10s %10s %10s'
+          % ('interfaces', 'mem [KiB]', 'attr [ms]', 'render [ms]',
+             'pickle [ms]', 'size [KiB]'))
+    for name, record in (('legacy dict', LegacyConfigDict),
+                         ('ConfigDict', ConfigDict),
+                         ('OSPFInterface', OSPFInterface)):
+        measure(name, record, args.routers, args.interfaces)
+
+
+if __name__ == '__main__':
+    main()
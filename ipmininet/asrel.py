@@ -0,0 +1,319 @@
+"""This module builds inter-domain topologies from AS-relationship datasets,
+e.g., those of CAIDA, with one router per AS.
+
+The files use the serial format of CAIDA, possibly gzip or bzip2
+compressed. Each line describes a link between two ASes, as
+<provider>|<customer>|-1 or <peer>|<peer>|0, optionally followed by other
+fields, and the lines starting with # are comments. The links are streamed
+and stored in arrays of integers, such that graphs of tens of thousands of
+ASes can be filtered, e.g., to their k-core or to a connected sample, and
+their size can be checked before building the topology.
+
+    python -m ipmininet.asrel 20240101.as-rel.txt.bz2 --k-core 10"""
+import argparse
+import bz2
+import gzip
+import random
+import sys
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from mininet.log import lg
+
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, RouterConfig, SHARE, \
+    CLIENT_PROVIDER, AF_INET, AF_INET6, ebgp_session
+
+# The relationships of the links in the datasets
+PROVIDER_CUSTOMER = -1
+PEER_PEER = 0
+
+
+def _open_text(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt')
+    return open(path)
+
+
+def read_relationships(path: str) -> Iterator[Tuple[int, int, int]]:
+    """Stream the links of an AS-relationship file
+
+    :param path: The path of the file
+    :return: The (provider, customer, PROVIDER_CUSTOMER) and
+             (peer, peer, PEER_PEER) tuples
+    :raise ValueError: if a line is malformed"""
+    with _open_text(path) as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('|')
+            try:
+                a, b, rel = int(fields[0]), int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                raise ValueError('%s:%d: invalid link %s'
+                                 % (path, number, line))
+            if rel not in (PROVIDER_CUSTOMER, PEER_PEER):
+                raise ValueError('%s:%d: unknown relationship %d'
+                                 % (path, number, rel))
+            yield a, b, rel
+
+
+class ASGraph:
+    """The links between ASes and their relationships. The ASes are
+    numbered by their order of appearance, and the links are stored in
+    arrays of these numbers."""
+
+    def __init__(self, links: Iterable[Tuple[int, int, int]] = ()):
+        """:param links: The (provider, customer, PROVIDER_CUSTOMER) and
+                         (peer, peer, PEER_PEER) tuples"""
+        self.asns = array('L')
+        self._index = {}  # type: Dict[int, int]
+        # The ends and the relationship of each link
+        self.src = array('L')
+        self.dst = array('L')
+        self.rel = array('b')
+        # The pairs of ASes of the links, to ignore the duplicates
+        self._links = set()  # type: Set[int]
+        for a, b, rel in links:
+            self.add_link(a, b, rel)
+
+    @classmethod
+    def load(cls, path: str) -> 'ASGraph':
+        """Read the graph of an AS-relationship file
+
+        :param path: The path of the file"""
+        return cls(read_relationships(path))
+
+    def _as_index(self, asn: int) -> int:
+        try:
+            return self._index[asn]
+        except KeyError:
+            i = self._index[asn] = len(self.asns)
+            self.asns.append(asn)
+            return i
+
+    def add_link(self, a: int, b: int, rel: int):
+        """Add a link, the duplicate links and loops are ignored
+
+        :param a: The provider, or a peer
+        :param b: The customer, or a peer
+        :param rel: PROVIDER_CUSTOMER or PEER_PEER"""
+        if a == b:
+            return
+        i, j = self._as_index(a), self._as_index(b)
+        key = (min(i, j) << 32) | max(i, j)
+        if key in self._links:
+            return
+        self._links.add(key)
+        self.src.append(i)
+        self.dst.append(j)
+        self.rel.append(rel)
+
+    def __len__(self) -> int:
+        """The number of ASes"""
+        return len(self.asns)
+
+    def links(self) -> Iterator[Tuple[int, int, int]]:
+        """Return the (provider, customer, PROVIDER_CUSTOMER) and
+        (peer, peer, PEER_PEER) tuples"""
+        asns = self.asns
+        for i, j, rel in zip(self.src, self.dst, self.rel):
+            yield asns[i], asns[j], rel
+
+    def link_count(self) -> int:
+        """The number of links"""
+        return len(self.rel)
+
+    def _adjacency(self) -> Tuple[array, array]:
+        """Return the neighbors of each AS, as the offsets of the neighbors
+        of each AS in an array of AS numbers"""
+        n = len(self.asns)
+        offsets = array('L', [0]) * (n + 1)
+        for i in self.src:
+            offsets[i + 1] += 1
+        for j in self.dst:
+            offsets[j + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        neighbors = array('L', [0]) * offsets[n]
+        filled = array('L', offsets[:n])
+        for i, j in zip(self.src, self.dst):
+            neighbors[filled[i]] = j
+            filled[i] += 1
+            neighbors[filled[j]] = i
+            filled[j] += 1
+        return offsets, neighbors
+
+    def degrees(self) -> Dict[int, int]:
+        """Return the number of neighbors of each AS"""
+        degrees = dict.fromkeys(self.asns, 0)
+        for i in self.src:
+            degrees[self.asns[i]] += 1
+        for j in self.dst:
+            degrees[self.asns[j]] += 1
+        return degrees
+
+    def subgraph(self, asns: Iterable[int]) -> 'ASGraph':
+        """Return the graph of the links between some ASes
+
+        :param asns: The ASes to keep"""
+        kept = bytearray(len(self.asns))
+        for asn in asns:
+            kept[self._index[asn]] = 1
+        graph = ASGraph()
+        for i, j, rel in zip(self.src, self.dst, self.rel):
+            if kept[i] and kept[j]:
+                graph.add_link(self.asns[i], self.asns[j], rel)
+        return graph
+
+    def k_core(self, k: int) -> 'ASGraph':
+        """Return the largest subgraph whose ASes have at least k neighbors
+        in the subgraph
+
+        :param k: The minimal number of neighbors"""
+        offsets, neighbors = self._adjacency()
+        n = len(self.asns)
+        degree = array('L', (offsets[i + 1] - offsets[i] for i in range(n)))
+        removed = bytearray(n)
+        to_remove = [i for i in range(n) if degree[i] < k]
+        for i in to_remove:
+            removed[i] = 1
+        while to_remove:
+            i = to_remove.pop()
+            for j in neighbors[offsets[i]:offsets[i + 1]]:
+                if not removed[j]:
+                    degree[j] -= 1
+                    if degree[j] < k:
+                        removed[j] = 1
+                        to_remove.append(j)
+        return self.subgraph(self.asns[i] for i in range(n) if not removed[i])
+
+    def sample(self, count: int, start: Optional[int] = None,
+               seed: Optional[int] = None) -> 'ASGraph':
+        """Return the graph of the links between ASes reached by
+        a breadth-first exploration, whose neighbors are visited in a random
+        order, such that the sample is connected
+
+        :param count: The number of ASes of the sample
+        :param start: The AS from which the exploration starts, the one with
+                      the most neighbors by default
+        :param seed: The seed of the random order"""
+        if not self.asns:
+            return ASGraph()
+        offsets, neighbors = self._adjacency()
+        n = len(self.asns)
+        if start is None:
+            first = max(range(n), key=lambda i: offsets[i + 1] - offsets[i])
+        else:
+            first = self._index[start]
+        rng = random.Random(seed)
+        visited = bytearray(n)
+        visited[first] = 1
+        sampled = [first]
+        queue = deque([first])
+        while queue and len(sampled) < count:
+            i = queue.popleft()
+            candidates = [j for j in neighbors[offsets[i]:offsets[i + 1]]
+                          if not visited[j]]
+            rng.shuffle(candidates)
+            for j in candidates[:count - len(sampled)]:
+                visited[j] = 1
+                sampled.append(j)
+                queue.append(j)
+        return self.subgraph(self.asns[i] for i in sampled)
+
+    def budget(self, families=2, daemons=2) -> Dict[str, int]:
+        """Return the resources used by the topology of this graph
+
+        :param families: The number of address families (IPv4, IPv6) with
+                         their own BGP sessions
+        :param daemons: The number of daemons of each router, bgpd and zebra
+                        by default"""
+        links = self.link_count()
+        p2c = sum(1 for rel in self.rel if rel == PROVIDER_CUSTOMER)
+        return {'ases': len(self.asns),
+                'links': links,
+                'provider_customer_links': p2c,
+                'peer_links': links - p2c,
+                'bgp_sessions': families * links,
+                # The shell of each node and its daemons
+                'processes': len(self.asns) * (daemons + 1),
+                'interfaces': 2 * links + len(self.asns)}
+
+
+def router_name(asn: int) -> str:
+    """Return the name of the router of an AS"""
+    return 'as%d' % asn
+
+
+class ASRelationshipTopo(IPTopo):
+    """A topology with one router per AS, running only BGP, whose eBGP
+    sessions apply the policies of the relationships between the ASes"""
+
+    def __init__(self, graph: ASGraph, bgp_options: Optional[Dict] = None,
+                 *args, **kwargs):
+        """:param graph: The AS-relationship graph
+        :param bgp_options: The options of the BGP daemons, the routers
+                            redistribute their connected subnets in IPv4
+                            and IPv6 by default"""
+        self.graph = graph
+        self.bgp_options = dict(bgp_options or {})
+        budget = graph.budget()
+        lg.info('*** Building', budget['ases'], 'ASes with',
+                budget['links'], 'links, i.e.,', budget['processes'],
+                'processes and', budget['bgp_sessions'], 'BGP sessions\n')
+        super().__init__(*args, **kwargs)
+
+    def build(self, *args, **kwargs):
+        for asn in self.graph.asns:
+            options = dict(self.bgp_options)
+            if 'address_families' not in options:
+                # Each AS announces its addresses
+                options['address_families'] = (
+                    AF_INET(redistribute=('connected',)),
+                    AF_INET6(redistribute=('connected',)))
+            self.addRouter(router_name(asn), asn=asn, config=(
+                RouterConfig, {'daemons': [(BGP, options)]}))
+        for a, b, rel in self.graph.links():
+            a, b = router_name(a), router_name(b)
+            self.addLink(a, b)
+            if rel == PROVIDER_CUSTOMER:
+                # The customer is the first router of the session
+                ebgp_session(self, b, a, link_type=CLIENT_PROVIDER)
+            else:
+                ebgp_session(self, a, b, link_type=SHARE)
+        super().build(*args, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='The AS-relationship file')
+    parser.add_argument('--k-core', type=int, default=None,
+                        help='Only keep the k-core of the graph')
+    parser.add_argument('--sample', type=int, default=None,
+                        help='Only keep a connected sample of this number'
+                             ' of ASes')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--families', type=int, default=2,
+                        help='The number of address families of the sessions')
+    args = parser.parse_args(argv)
+    try:
+        graph = ASGraph.load(args.path)
+    except (OSError, ValueError) as e:
+        print('Cannot read the relationships: %s' % e, file=sys.stderr)
+        return 1
+    if args.k_core is not None:
+        graph = graph.k_core(args.k_core)
+    if args.sample is not None:
+        graph = graph.sample(args.sample, seed=args.seed)
+    for key, value in graph.budget(families=args.families).items():
+        print('%-24s %d' % (key, value))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,691 @@
+"""A minimal BGP speaker streaming a large feed of routes to its peers, e.g.,
+to load the emulated routers with full-table-sized RIBs.
+
+The routes are either synthetic, with random AS paths and communities drawn
+from a fixed seed, or read from a TABLE_DUMP_V2 MRT file (RFC 6396). The
+speaker waits for its peers to connect, announces the routes of the family
+of each session at a controlled rate, then keeps the sessions alive. Its
+progress is regularly dumped in a JSON statistics file.
+
+This module only depends on the standard library, such that it can run as
+a script in the network namespace of a node:
+
+    python bgp_speaker.py -c feed.cfg"""
+import argparse
+import bz2
+import gzip
+import json
+import os
+import random
+import select
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from ipaddress import ip_address, ip_network, IPv4Network, IPv6Network
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, \
+    Tuple, Union
+
+BGP_PORT = 179
+BGP_VERSION = 4
+DEFAULT_HOLD_TIME = 90
+# The maximal size of a BGP message
+MAX_MESSAGE_SIZE = 4096
+HEADER = struct.Struct('!16sHB')
+MARKER = b'\xff' * 16
+# Message types
+OPEN = 1
+UPDATE = 2
+NOTIFICATION = 3
+KEEPALIVE = 4
+# The AS number announced in OPEN messages by speakers with a 4-byte AS
+AS_TRANS = 23456
+# Path attributes
+ATTR_ORIGIN = 1
+ATTR_AS_PATH = 2
+ATTR_NEXT_HOP = 3
+ATTR_COMMUNITIES = 8
+ATTR_MP_REACH_NLRI = 14
+ATTR_MP_UNREACH_NLRI = 15
+FLAG_OPTIONAL = 0x80
+FLAG_TRANSITIVE = 0x40
+FLAG_EXTENDED = 0x10
+ORIGIN_IGP = 0
+AS_SET = 1
+AS_SEQUENCE = 2
+# Capabilities
+CAP_MULTIPROTOCOL = 1
+CAP_AS4 = 65
+AFI_IPV4 = 1
+AFI_IPV6 = 2
+SAFI_UNICAST = 1
+AFI = {'ipv4': AFI_IPV4, 'ipv6': AFI_IPV6}
+# MRT types and subtypes
+MRT_HEADER = struct.Struct('!IHHI')
+MRT_TABLE_DUMP_V2 = 13
+MRT_RIB_IPV4_UNICAST = 2
+MRT_RIB_IPV6_UNICAST = 4
+# The number of seconds between two dumps of the statistics
+STATS_INTERVAL = 1.
+
+Network = Union[IPv4Network, IPv6Network]
+
+
+class Route:
+    """A prefix announced with an AS path and communities"""
+    __slots__ = ('prefix', 'as_path', 'communities')
+
+    def __init__(self, prefix: Network, as_path: Tuple[int, ...] = (),
+                 communities: Tuple[int, ...] = ()):
+        """:param prefix: The announced prefix
+        :param as_path: The AS path, without the AS of the speaker
+        :param communities: The communities, as 32-bit integers"""
+        self.prefix = prefix
+        self.as_path = as_path
+        self.communities = communities
+
+    @property
+    def family(self) -> str:
+        return 'ipv4' if self.prefix.version == 4 else 'ipv6'
+
+    def __repr__(self):
+        return 'Route(%s, %s, %s)' % (self.prefix, self.as_path,
+                                      self.communities)
+
+
+def synthetic_routes(family: str, count: int, seed=0,
+                     base: Optional[str] = None,
+                     prefixlen: Optional[int] = None,
+                     path_length: Sequence[int] = (2, 6), asns=1000,
+                     communities=2, prefixes_per_path=8) -> Iterator[Route]:
+    """Generate distinct prefixes of the same length, announced by random
+    origin ASes through random AS paths. Consecutive prefixes share their
+    attributes, like the prefixes of a same origin AS in a real feed.
+
+    :param family: 'ipv4' or 'ipv6'
+    :param count: The number of routes
+    :param seed: The seed of the random generator
+    :param base: The network from which the prefixes are allocated
+    :param prefixlen: The length of the prefixes
+    :param path_length: The minimal and maximal AS path length
+    :param asns: The number of distinct ASes in the AS paths
+    :param communities: The maximal number of communities of a route
+    :param prefixes_per_path: The average number of prefixes announced with
+                              the same attributes"""
+    rng = random.Random(seed)
+    if family == 'ipv4':
+        base_net = ip_network(base or '16.0.0.0/4')
+        prefixlen = prefixlen or 24
+    else:
+        base_net = ip_network(base or '2400::/6')
+        prefixlen = prefixlen or 48
+    step = 1 << (base_net.max_prefixlen - prefixlen)
+    if count > 1 << (prefixlen - base_net.prefixlen):
+        raise ValueError('%s does not contain %d /%d prefixes'
+                         % (base_net, count, prefixlen))
+    first = int(base_net.network_address)
+    cls = type(base_net)
+    # Private AS numbers are avoided to look like a real feed
+    as_pool = [1000 + i * 7 for i in range(max(asns, 1))]
+    remaining = 0
+    as_path = ()  # type: Tuple[int, ...]
+    comms = ()  # type: Tuple[int, ...]
+    for i in range(count):
+        if remaining == 0:
+            length = rng.randint(path_length[0], path_length[1])
+            as_path = tuple(rng.choice(as_pool) for _ in range(length))
+            comms = tuple(sorted({(rng.choice(as_path) << 16)
+                                  + rng.randrange(1, 1000)
+                                  for _ in range(rng.randint(0,
+                                                             communities))}))
+            remaining = rng.randint(1, 2 * prefixes_per_path - 1)
+        remaining -= 1
+        yield Route(cls((first + i * step, prefixlen)), as_path, comms)
+
+
+def _open_file(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def mrt_routes(path: str, family: Optional[str] = None,
+               limit: Optional[int] = None) -> Iterator[Route]:
+    """Read the routes of the first RIB entry of each prefix of
+    a TABLE_DUMP_V2 MRT file, possibly gzip or bzip2 compressed
+
+    :param path: The path of the file
+    :param family: 'ipv4' or 'ipv6' to only read the routes of a family
+    :param limit: The maximal number of routes to read"""
+    subtypes = {MRT_RIB_IPV4_UNICAST: IPv4Network,
+                MRT_RIB_IPV6_UNICAST: IPv6Network}
+    if family is not None:
+        wanted = MRT_RIB_IPV4_UNICAST if family == 'ipv4' \
+            else MRT_RIB_IPV6_UNICAST
+        subtypes = {wanted: subtypes[wanted]}
+    count = 0
+    with _open_file(path) as f:
+        while limit is None or count < limit:
+            header = f.read(MRT_HEADER.size)
+            if len(header) < MRT_HEADER.size:
+                return
+            _, mrt_type, subtype, length = MRT_HEADER.unpack(header)
+            body = f.read(length)
+            if len(body) < length:
+                return
+            if mrt_type != MRT_TABLE_DUMP_V2 or subtype not in subtypes:
+                continue
+            route = _parse_rib_entry(body, subtypes[subtype])
+            if route is not None:
+                count += 1
+                yield route
+
+
+def _parse_rib_entry(body: bytes, cls) -> Optional[Route]:
+    # Sequence number, then the prefix
+    plen = body[4]
+    size = (plen + 7) // 8
+    address = body[5:5 + size].ljust(4 if cls is IPv4Network else 16, b'\0')
+    prefix = cls((address, plen), strict=False)
+    offset = 5 + size
+    entries, = struct.unpack_from('!H', body, offset)
+    offset += 2
+    if not entries:
+        return None
+    # Peer index and originated time, then the attributes
+    attr_len, = struct.unpack_from('!H', body, offset + 6)
+    offset += 8
+    as_path, communities = parse_attributes(body[offset:offset + attr_len])
+    return Route(prefix, as_path, communities)
+
+
+def parse_attributes(data: bytes, as4=True) \
+        -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Return the AS path and communities of encoded path attributes
+
+    :param data: The path attributes
+    :param as4: Whether the AS numbers are encoded on 4 bytes"""
+    as_path = []  # type: List[int]
+    communities = ()  # type: Tuple[int, ...]
+    offset = 0
+    while offset < len(data):
+        flags, code = data[offset], data[offset + 1]
+        if flags & FLAG_EXTENDED:
+            length, = struct.unpack_from('!H', data, offset + 2)
+            offset += 4
+        else:
+            length = data[offset + 2]
+            offset += 3
+        value = data[offset:offset + length]
+        offset += length
+        if code == ATTR_AS_PATH:
+            as_size = 4 if as4 else 2
+            i = 0
+            while i < len(value):
+                seg_type, seg_len = value[i], value[i + 1]
+                asns = struct.unpack_from('!%d%s' % (seg_len,
+                                                     'I' if as4 else 'H'),
+                                          value, i + 2)
+                i += 2 + seg_len * as_size
+                # An AS set counts as one AS in the path length
+                as_path.extend(asns if seg_type == AS_SEQUENCE else asns[:1])
+        elif code == ATTR_COMMUNITIES:
+            communities = struct.unpack('!%dI' % (length // 4), value)
+    return tuple(as_path), communities
+
+
+def message(msg_type: int, body: bytes = b'') -> bytes:
+    """Return an encoded BGP message"""
+    return HEADER.pack(MARKER, HEADER.size + len(body), msg_type) + body
+
+
+def open_message(asn: int, routerid: str, hold_time: int,
+                 families: Iterable[str]) -> bytes:
+    """Return an OPEN message advertising 4-byte AS numbers and the unicast
+    address families"""
+    caps = b''.join(struct.pack('!BBHBB', CAP_MULTIPROTOCOL, 4, AFI[f], 0,
+                                SAFI_UNICAST) for f in families)
+    caps += struct.pack('!BBI', CAP_AS4, 4, asn)
+    params = struct.pack('!BB', 2, len(caps)) + caps
+    return message(OPEN, struct.pack('!BHH4sB', BGP_VERSION,
+                                     asn if asn < 65536 else AS_TRANS,
+                                     hold_time, ip_address(routerid).packed,
+                                     len(params)) + params)
+
+
+def parse_open(body: bytes) -> Tuple[int, int]:
+    """Return the AS number and hold time of an OPEN message body"""
+    _, asn, hold_time, _, params_len = struct.unpack_from('!BHH4sB', body)
+    params = body[10:10 + params_len]
+    i = 0
+    while i + 2 <= len(params):
+        p_type, p_len = params[i], params[i + 1]
+        if p_type == 2:
+            caps = params[i + 2:i + 2 + p_len]
+            j = 0
+            while j + 2 <= len(caps):
+                code, c_len = caps[j], caps[j + 1]
+                if code == CAP_AS4 and c_len == 4:
+                    asn, = struct.unpack_from('!I', caps, j + 2)
+                j += 2 + c_len
+        i += 2 + p_len
+    return asn, hold_time
+
+
+def encode_prefix(prefix: Network) -> bytes:
+    size = (prefix.prefixlen + 7) // 8
+    return bytes((prefix.prefixlen,)) + prefix.network_address.packed[:size]
+
+
+def _attribute(flags: int, code: int, value: bytes) -> bytes:
+    if len(value) > 255:
+        return struct.pack('!BBH', flags | FLAG_EXTENDED, code,
+                           len(value)) + value
+    return struct.pack('!BBB', flags, code, len(value)) + value
+
+
+def path_attributes(route: Route, asn: int, next_hop: str,
+                    as4=True) -> bytes:
+    """Return the encoded path attributes of a route announced over
+    an eBGP session, except its next hop if it is not an IPv4 route
+
+    :param route: The route
+    :param asn: The AS number of the speaker, prepended to the AS path
+    :param next_hop: The address of the speaker on the session
+    :param as4: Whether the peer supports 4-byte AS numbers"""
+    as_path = (asn,) + route.as_path
+    if as4:
+        segments = struct.pack('!%dI' % len(as_path), *as_path)
+    else:
+        segments = struct.pack('!%dH' % len(as_path),
+                               *[a if a < 65536 else AS_TRANS
+                                 for a in as_path])
+    attrs = _attribute(FLAG_TRANSITIVE, ATTR_ORIGIN, bytes((ORIGIN_IGP,)))
+    attrs += _attribute(FLAG_TRANSITIVE, ATTR_AS_PATH,
+                        struct.pack('!BB', AS_SEQUENCE, len(as_path)) +
+                        segments)
+    if route.prefix.version == 4:
+        attrs += _attribute(FLAG_TRANSITIVE, ATTR_NEXT_HOP,
+                            ip_address(next_hop).packed)
+    if route.communities:
+        attrs += _attribute(FLAG_OPTIONAL | FLAG_TRANSITIVE,
+                            ATTR_COMMUNITIES,
+                            struct.pack('!%dI' % len(route.communities),
+                                        *route.communities))
+    return attrs
+
+
+def _update(attrs: bytes, nlri: List[bytes], version: int,
+            next_hop: str) -> bytes:
+    if version == 4:
+        return message(UPDATE, struct.pack('!HH', 0, len(attrs)) + attrs +
+                       b''.join(nlri))
+    mp_reach = _attribute(FLAG_OPTIONAL, ATTR_MP_REACH_NLRI,
+                          struct.pack('!HBB', AFI_IPV6, SAFI_UNICAST, 16) +
+                          ip_address(next_hop).packed + b'\0' +
+                          b''.join(nlri))
+    attrs = mp_reach + attrs
+    return message(UPDATE, struct.pack('!HH', 0, len(attrs)) + attrs)
+
+
+def update_messages(routes: Iterable[Route], asn: int, next_hop: str,
+                    as4=True) -> Iterator[Tuple[bytes, int, Route]]:
+    """Pack routes with the same attributes in UPDATE messages
+
+    :param routes: The routes, of the same family
+    :param asn: The AS number of the speaker
+    :param next_hop: The address of the speaker on the session
+    :param as4: Whether the peer supports 4-byte AS numbers
+    :return: The messages, with their number of routes and their last
+             route"""
+    key = None
+    attrs = b''
+    nlri = []  # type: List[bytes]
+    size = 0
+    last = None
+    version = 4
+    for route in routes:
+        prefix = encode_prefix(route.prefix)
+        route_key = (route.as_path, route.communities)
+        if nlri and (route_key != key or size + len(prefix) >
+                     MAX_MESSAGE_SIZE):
+            yield _update(attrs, nlri, version, next_hop), len(nlri), last
+            nlri = []
+        if not nlri:
+            key = route_key
+            version = route.prefix.version
+            attrs = path_attributes(route, asn, next_hop, as4=as4)
+            # Header, withdrawn and attributes lengths, MP_REACH header
+            size = HEADER.size + 4 + len(attrs) + \
+                (0 if version == 4 else 4 + 5 + 16)
+        nlri.append(prefix)
+        size += len(prefix)
+        last = route
+    if nlri:
+        yield _update(attrs, nlri, version, next_hop), len(nlri), last
+
+
+def end_of_rib(family: str) -> bytes:
+    """Return the End-of-RIB marker of an address family"""
+    if family == 'ipv4':
+        return message(UPDATE, struct.pack('!HH', 0, 0))
+    attr = _attribute(FLAG_OPTIONAL, ATTR_MP_UNREACH_NLRI,
+                      struct.pack('!HB', AFI_IPV6, SAFI_UNICAST))
+    return message(UPDATE, struct.pack('!HH', 0, len(attr)) + attr)
+
+
+def read_message(sock: socket.socket) -> Tuple[int, bytes]:
+    """Read the next BGP message of a socket
+
+    :return: The message type and body
+    :raise ConnectionError: if the connection was closed"""
+    header = _read_exactly(sock, HEADER.size)
+    marker, length, msg_type = HEADER.unpack(header)
+    if marker != MARKER or not HEADER.size <= length <= MAX_MESSAGE_SIZE:
+        raise ConnectionError('Invalid BGP message header')
+    return msg_type, _read_exactly(sock, length - HEADER.size)
+
+
+def _read_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('The connection was closed')
+        data += chunk
+    return data
+
+
+class PeerStats:
+    """The progress of the feed sent to a peer"""
+
+    def __init__(self, address: str, family: str):
+        self.address = address
+        self.family = family
+        self.state = 'Idle'
+        self.established_at = None  # type: Optional[float]
+        self.finished_at = None  # type: Optional[float]
+        self.prefixes = 0
+        self.updates = 0
+        self.bytes = 0
+        self.last_prefix = None  # type: Optional[str]
+
+    def to_dict(self) -> Dict:
+        elapsed = (self.finished_at or time.time()) - self.established_at \
+            if self.established_at is not None else None
+        return {'address': self.address, 'family': self.family,
+                'state': self.state, 'established_at': self.established_at,
+                'finished_at': self.finished_at, 'prefixes': self.prefixes,
+                'updates': self.updates, 'bytes': self.bytes,
+                'last_prefix': self.last_prefix,
+                'prefixes_per_second': self.prefixes / elapsed
+                if elapsed else None}
+
+
+class FeedSession(threading.Thread):
+    """A BGP session established by a peer, over which the feed is sent"""
+
+    def __init__(self, speaker: 'FeedSpeaker', sock: socket.socket,
+                 peer: Dict):
+        super().__init__(daemon=True)
+        self.speaker = speaker
+        self.sock = sock
+        self.peer = peer
+        self.stats = speaker.stats[peer['address']]
+        self._send_lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def send(self, data: bytes):
+        with self._send_lock:
+            self.sock.sendall(data)
+
+    def run(self):
+        stats = self.stats
+        try:
+            self.handshake()
+            stats.state = 'Established'
+            stats.established_at = time.time()
+            threading.Thread(target=self.read_loop, daemon=True).start()
+            self.announce()
+            stats.finished_at = time.time()
+            self._closed.wait()
+        except (OSError, ConnectionError, ValueError, struct.error) as e:
+            print('Session with %s failed: %s' % (self.peer['address'], e),
+                  file=sys.stderr)
+        finally:
+            stats.state = 'Idle'
+            self._closed.set()
+            self.sock.close()
+            self.speaker.session_closed(self)
+
+    def handshake(self):
+        cfg = self.speaker.cfg
+        self.send(open_message(cfg['asn'], cfg['routerid'],
+                               cfg.get('hold_time', DEFAULT_HOLD_TIME),
+                               [self.peer['family']]))
+        stats = self.stats
+        stats.state = 'OpenSent'
+        msg_type, body = read_message(self.sock)
+        if msg_type != OPEN:
+            raise ValueError('Expected an OPEN message, got %d' % msg_type)
+        asn, hold_time = parse_open(body)
+        if asn != self.peer['asn']:
+            raise ValueError('The peer announced AS%d instead of AS%d'
+                             % (asn, self.peer['asn']))
+        self.hold_time = min(hold_time,
+                             cfg.get('hold_time', DEFAULT_HOLD_TIME))
+        self.send(message(KEEPALIVE))
+        stats.state = 'OpenConfirm'
+        while True:
+            msg_type, _ = read_message(self.sock)
+            if msg_type == KEEPALIVE:
+                break
+            if msg_type == NOTIFICATION:
+                raise ConnectionError('The peer refused the session')
+        if self.hold_time:
+            threading.Thread(target=self.keepalive_loop, daemon=True).start()
+
+    def keepalive_loop(self):
+        while not self._closed.wait(self.hold_time / 3.):
+            try:
+                self.send(message(KEEPALIVE))
+            except OSError:
+                self._closed.set()
+
+    def read_loop(self):
+        try:
+            while True:
+                msg_type, _ = read_message(self.sock)
+                if msg_type == NOTIFICATION:
+                    break
+        except (OSError, ConnectionError):
+            pass
+        self._closed.set()
+
+    def announce(self):
+        cfg = self.speaker.cfg
+        family = self.peer['family']
+        next_hop = self.sock.getsockname()[0].split('%')[0]
+        rate = cfg.get('rate') or 0
+        stats = self.stats
+        start = time.monotonic()
+        for data, count, last in update_messages(
+                self.speaker.routes(family), cfg['asn'], next_hop):
+            if self._closed.is_set():
+                return
+            self.send(data)
+            stats.prefixes += count
+            stats.updates += 1
+            stats.bytes += len(data)
+            stats.last_prefix = str(last.prefix)
+            if rate:
+                delay = stats.prefixes / rate - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+        self.send(end_of_rib(family))
+
+    def close(self):
+        self._closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FeedSpeaker:
+    """Accept the BGP sessions of the configured peers, and feed them"""
+
+    def __init__(self, cfg: Dict):
+        """:param cfg: The configuration of the speaker"""
+        self.cfg = cfg
+        self.peers = {str(ip_address(p['address'])): p
+                      for p in cfg.get('peers', ())}
+        self.stats = {a: PeerStats(a, p['family'])
+                      for a, p in self.peers.items()}
+        self.sessions = {}  # type: Dict[str, FeedSession]
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sockets = []  # type: List[socket.socket]
+
+    def routes(self, family: str) -> Iterator[Route]:
+        """Return the routes of a family"""
+        source = self.cfg.get('source', {})
+        if source.get('mrt'):
+            return mrt_routes(source['mrt'], family=family,
+                              limit=source.get('limit'))
+        params = source.get(family, {})
+        return synthetic_routes(family, params.get('count', 0),
+                                seed=source.get('seed', 0),
+                                base=params.get('base'),
+                                prefixlen=params.get('prefixlen'),
+                                path_length=source.get('path_length',
+                                                       (2, 6)),
+                                asns=source.get('asns', 1000),
+                                communities=source.get('communities', 2),
+                                prefixes_per_path=source.get(
+                                    'prefixes_per_path', 8))
+
+    def listen(self):
+        port = self.cfg.get('port', BGP_PORT)
+        for family, address in ((socket.AF_INET6, '::'),
+                                (socket.AF_INET, '0.0.0.0')):
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if family == socket.AF_INET6:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            try:
+                sock.bind((address, port))
+            except OSError:
+                # e.g., IPv6 is disabled
+                sock.close()
+                continue
+            sock.listen(16)
+            self._sockets.append(sock)
+        if not self._sockets:
+            raise OSError('Cannot listen on port %d' % port)
+
+    def session_closed(self, session: FeedSession):
+        with self._lock:
+            if self.sessions.get(session.peer['address']) is session:
+                del self.sessions[session.peer['address']]
+
+    def serve(self):
+        """Accept the sessions until stop() is called"""
+        self.listen()
+        threading.Thread(target=self.stats_loop, daemon=True).start()
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select(self._sockets, [], [], .5)
+                for sock in readable:
+                    conn, address = sock.accept()
+                    self.accept(conn, address[0])
+        finally:
+            for sock in self._sockets:
+                sock.close()
+            with self._lock:
+                sessions = list(self.sessions.values())
+            for s in sessions:
+                s.close()
+            self.dump_stats()
+
+    def accept(self, conn: socket.socket, address: str):
+        address = address.split('%')[0]
+        if address.startswith('::ffff:'):
+            address = address[7:]
+        peer = self.peers.get(str(ip_address(address)))
+        with self._lock:
+            if peer is None or peer['address'] in self.sessions:
+                conn.close()
+                return
+            session = FeedSession(self, conn, peer)
+            self.sessions[peer['address']] = session
+        session.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats_loop(self):
+        while not self._stop.wait(STATS_INTERVAL):
+            self.dump_stats()
+
+    def dump_stats(self):
+        """Write the statistics in the configured file"""
+        path = self.cfg.get('stats')
+        if not path:
+            return
+        data = {'started_at': self.started_at,
+                'peers': {a: s.to_dict() for a, s in self.stats.items()}}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+
+def load_config(path: str) -> Dict:
+    """Load and check the configuration of a speaker"""
+    with open(path) as f:
+        cfg = json.load(f)
+    for key in ('asn', 'routerid'):
+        if key not in cfg:
+            raise ValueError('The configuration misses "%s"' % key)
+    ip_address(cfg['routerid'])
+    for p in cfg.get('peers', ()):
+        ip_address(p['address'])
+        if p['family'] not in AFI:
+            raise ValueError('Unknown address family %s' % p['family'])
+    mrt = cfg.get('source', {}).get('mrt')
+    if mrt and not os.path.exists(mrt):
+        raise ValueError('Cannot find the MRT file %s' % mrt)
+    return cfg
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-c', '--config', required=True,
+                        help='The JSON configuration file')
+    parser.add_argument('--check', action='store_true',
+                        help='Only check the configuration file')
+    args = parser.parse_args(argv)
+    try:
+        cfg = load_config(args.config)
+    except (OSError, ValueError, KeyError) as e:
+        print('Invalid configuration: %s' % e, file=sys.stderr)
+        return 1
+    if args.check:
+        return 0
+    speaker = FeedSpeaker(cfg)
+    signal.signal(signal.SIGTERM, lambda *_: speaker.stop())
+    try:
+        speaker.serve()
+    except KeyboardInterrupt:
+        speaker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,758 @@
+"""This module computes the BGP routes that the routers of a topology are
+expected to select, without starting the network.
+
+The simulator reads the same information as the BGP daemons when they build
+their configuration, i.e., the BGP peers of each router, its route maps,
+access lists and community lists, the route reflectors and route servers,
+and the prefixes originated by each router. The routes of each prefix are
+propagated over the BGP sessions until no best route changes, as a
+path-vector protocol does. The prefixes originated by the same routers and
+matching the same access lists have the same routes, hence are propagated
+once.
+
+The routes are selected as FRRouting does with the options of the BGP
+daemons of IPMininet. Some steps are approximated: the router ids are
+compared as the names of the routers unless they are given, and the IGP
+cost to the next hop of an iBGP route is computed on the links between the
+routers of its AS."""
+import gc
+from collections import deque
+from ipaddress import ip_network, ip_address, IPv4Network, IPv6Network
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, \
+    Union, TYPE_CHECKING
+
+from ipmininet.router.config import BGP
+from ipmininet.router.config.bgp import group_route_maps, igp_adjacency, \
+    igp_distances, as_paths
+from ipmininet.router.config.zebra import PERMIT
+from ipmininet.router.vty import batch_query
+
+if TYPE_CHECKING:
+    from ipmininet.ipnet import IPNet
+    from ipmininet.iptopo import IPTopo
+    from ipmininet.router import Router
+
+# The origin codes of the routes
+IGP = 0
+INCOMPLETE = 2
+
+DEFAULT_LOCAL_PREF = 100
+# The cluster id of the route reflectors without one, as in bgpd.mako
+DEFAULT_CLUSTER_ID = '10.0.0.0'
+
+Prefix = Union[str, IPv4Network, IPv6Network]
+
+
+class Route:
+    """A BGP route, as selected by a router"""
+    __slots__ = ('as_path', 'local_pref', 'med', 'communities', 'origin',
+                 'next_hop', 'peer', 'ebgp', 'originator', 'cluster_list')
+
+    def __init__(self, as_path: Tuple[int, ...] = (),
+                 local_pref=DEFAULT_LOCAL_PREF, med=0,
+                 communities: frozenset = frozenset(), origin=IGP,
+                 next_hop: Optional[str] = None, peer: Optional[str] = None,
+                 ebgp=False, originator: Optional[str] = None,
+                 cluster_list: Tuple[str, ...] = ()):
+        """:param as_path: The AS path
+        :param local_pref: The local preference
+        :param med: The multi-exit discriminator
+        :param communities: The communities, as 'asn:value' strings
+        :param origin: The origin code, IGP or INCOMPLETE
+        :param next_hop: The router to which the traffic is forwarded
+        :param peer: The router from which the route was learned, None if
+                     the route is originated by the router
+        :param ebgp: Whether the route was learned over eBGP
+        :param originator: The router that sent the route to the route
+                           reflectors, if it was reflected
+        :param cluster_list: The clusters through which the route was
+                             reflected"""
+        self.as_path = as_path
+        self.local_pref = local_pref
+        self.med = med
+        self.communities = communities
+        self.origin = origin
+        self.next_hop = next_hop
+        self.peer = peer
+        self.ebgp = ebgp
+        self.originator = originator
+        self.cluster_list = cluster_list
+
+    def __eq__(self, other):
+        return isinstance(other, Route) \
+            and self.as_path == other.as_path \
+            and self.local_pref == other.local_pref \
+            and self.peer == other.peer \
+            and self.next_hop == other.next_hop \
+            and self.med == other.med \
+            and self.communities == other.communities \
+            and self.origin == other.origin \
+            and self.ebgp == other.ebgp \
+            and self.originator == other.originator \
+            and self.cluster_list == other.cluster_list
+
+    def __repr__(self):
+        return '<Route [%s] from %s via %s lp %d>' % (
+            ' '.join(str(asn) for asn in self.as_path), self.peer or 'local',
+            self.next_hop, self.local_pref)
+
+
+def _covers(network: Union[IPv4Network, IPv6Network],
+            prefix: Union[IPv4Network, IPv6Network]) -> bool:
+    """Return whether a network contains a prefix"""
+    return network.version == prefix.version \
+        and network.prefixlen <= prefix.prefixlen \
+        and prefix.network_address in network
+
+
+def access_list_permits(entries: Sequence[Tuple[str, str]],
+                        prefix: Union[IPv4Network, IPv6Network]) -> bool:
+    """Return whether an access list permits a prefix, i.e., whether its
+    first entry containing the prefix permits it
+
+    :param entries: The (action, prefix) of the entries, where prefix can be
+                    'any'
+    :param prefix: The prefix of the route"""
+    for action, network in entries:
+        if network == 'any' or _covers(ip_network(network), prefix):
+            return action == PERMIT
+    return False
+
+
+class Policy:
+    """The route map of a router applied to the routes exchanged with one of
+    its peers, in one direction"""
+
+    def __init__(self, router: str, asn: Optional[int], route_maps: list,
+                 access_lists: Dict[str, int],
+                 community_lists: Dict[str, List[Tuple[str, str]]]):
+        """:param router: The router applying the route map
+        :param asn: The AS number of the router
+        :param route_maps: The merged RouteMap entries of the route map
+        :param access_lists: The index of the content of the access lists of
+                             the router, by name
+        :param community_lists: The (action, community) entries of the
+                                community lists of the router, by name
+        :raise ValueError: if the route map uses a condition or an action
+                           that cannot be simulated"""
+        self.router = router
+        self.entries = []  # type: List[tuple]
+        for rm in sorted(route_maps, key=lambda x: x.order):
+            if rm.call_action:
+                raise ValueError('%s: cannot simulate the call of route map %s'
+                                 % (router, rm.call_action))
+            conditions = []
+            for cond in rm.match_cond:
+                if cond.cond_type == 'access-list':
+                    conditions.append((True,
+                                       access_lists.get(cond.condition)))
+                elif cond.cond_type == 'community':
+                    conditions.append((False, tuple(community_lists.get(
+                        cond.condition, ()))))
+                else:
+                    raise ValueError('%s: cannot simulate the %s match '
+                                     'condition' % (router, cond.cond_type))
+            actions = [self._action(asn, a.action_type, a.value)
+                       for a in rm.set_actions]
+            self.entries.append((rm.match_policy == PERMIT, rm.order,
+                                 conditions, actions, rm.exit_policy))
+        # The result of the route map, by matched access lists and
+        # communities of the route
+        self._results = {}  # type: Dict[tuple, Optional[tuple]]
+
+    def _action(self, asn: Optional[int], action_type: str, value) -> tuple:
+        if action_type == 'local-preference':
+            return action_type, int(value)
+        if action_type == 'metric':
+            return action_type, int(value)
+        if action_type == 'as-path prepend':
+            return action_type, tuple(int(x) for x in str(value).split())
+        if action_type == 'community':
+            if isinstance(value, int):
+                return action_type, (False, frozenset(
+                    ('%s:%d' % (asn, value),)))
+            values = str(value).split()
+            if values == ['none']:
+                return action_type, (False, frozenset())
+            additive = 'additive' in values
+            return action_type, (additive, frozenset(
+                v for v in values if v != 'additive'))
+        raise ValueError('%s: cannot simulate the %s set action'
+                         % (self.router, action_type))
+
+    @staticmethod
+    def _matches(conditions: list, acl_results: Sequence[bool],
+                 communities: frozenset) -> bool:
+        for is_acl, condition in conditions:
+            if is_acl:
+                if condition is None or not acl_results[condition]:
+                    return False
+                continue
+            for action, community in condition:
+                if community in communities:
+                    if action != PERMIT:
+                        return False
+                    break
+            else:
+                return False
+        return True
+
+    def evaluate(self, acl_key: int, acl_results: Sequence[bool],
+                 communities: frozenset) -> Optional[tuple]:
+        """Return the result of the route map for a route, or None if it is
+        denied
+
+        :param acl_key: A key identifying acl_results
+        :param acl_results: Whether each access list permits the prefix
+        :param communities: The communities of the route
+        :return: The local preference and the MED set by the route map, or
+                 None, the communities of the route and the AS numbers
+                 prepended to its AS path"""
+        key = acl_key, communities
+        try:
+            return self._results[key]
+        except KeyError:
+            pass
+        local_pref = med = None
+        prepend = ()  # type: Tuple[int, ...]
+        permitted = False
+        i = 0
+        while i < len(self.entries):
+            permit, _, conditions, actions, exit_policy = self.entries[i]
+            i += 1
+            if not self._matches(conditions, acl_results, communities):
+                continue
+            if not permit:
+                permitted = False
+                break
+            permitted = True
+            for action_type, value in actions:
+                if action_type == 'local-preference':
+                    local_pref = value
+                elif action_type == 'metric':
+                    med = value
+                elif action_type == 'as-path prepend':
+                    prepend = value + prepend
+                else:
+                    additive, values = value
+                    communities = communities | values if additive \
+                        else values
+            if exit_policy == 'next':
+                continue
+            if exit_policy and exit_policy.startswith('goto'):
+                order = int(exit_policy.split()[1])
+                while i < len(self.entries) and self.entries[i][1] < order:
+                    i += 1
+                continue
+            break
+        result = (local_pref, med, communities, prepend) if permitted \
+            else None
+        self._results[key] = result
+        return result
+
+
+class Session:
+    """A BGP session of a router, as seen by this router"""
+    __slots__ = ('peer', 'ebgp', 'peer_asn', 'transparent', 'to_client',
+                 'export', 'import_')
+
+    def __init__(self, peer: str, ebgp: bool, peer_asn: Optional[int],
+                 transparent: bool, to_client: bool,
+                 export: Optional[Policy], import_: Optional[Policy]):
+        """:param peer: The peer
+        :param ebgp: Whether the peer is in another AS
+        :param peer_asn: The AS number of the peer
+        :param transparent: Whether the router is a route server for the peer
+        :param to_client: Whether the peer is a route reflector client of the
+                          router
+        :param export: The route map of the router towards the peer
+        :param import_: The route map of the peer towards the router"""
+        self.peer = peer
+        self.ebgp = ebgp
+        self.peer_asn = peer_asn
+        self.transparent = transparent
+        self.to_client = to_client
+        self.export = export
+        self.import_ = import_
+
+
+class _PrefixClass:
+    """The information on the prefixes that have the same routes"""
+    __slots__ = ('prefix', 'acl_key', 'acl_results', 'suppressors')
+
+    def __init__(self, prefix, acl_key, acl_results, suppressors):
+        self.prefix = prefix
+        self.acl_key = acl_key
+        self.acl_results = acl_results
+        self.suppressors = suppressors
+
+
+class BGPSimulator:
+    """Compute the best BGP route of each router towards each prefix
+    originated in a topology"""
+
+    def __init__(self, topo: 'IPTopo',
+                 origins: Optional[Dict[str, Iterable[Prefix]]] = None,
+                 router_ids: Optional[Dict[str, str]] = None,
+                 max_changes=100):
+        """:param topo: The topology, whose overlays are applied
+        :param origins: The prefixes originated by each router, with the IGP
+                        origin code, see originate()
+        :param router_ids: The router id of each router, the names of the
+                           routers are compared instead if it is not given
+        :param max_changes: The number of times the best route of a router
+                            towards a prefix can change before the routes are
+                            considered to oscillate"""
+        self.topo = topo
+        self.router_ids = dict(router_ids or {})
+        self.max_changes = max_changes
+        # The prefixes originated by each router, with their origin code
+        self._origins = {}  # type: Dict[str, Dict[str, int]]
+        self._aggregates = {}  # type: Dict[str, Set[str]]
+        self._best = None  # type: Optional[Dict[str, Dict[str, Route]]]
+        # The IGP cost to each next hop from the other routers of its AS
+        self._igp = {}  # type: Dict[str, Dict[str, int]]
+        self._adjacency = None  # type: Optional[Dict[str, list]]
+        self._rids = {}  # type: Dict[str, tuple]
+        for router, prefixes in (origins or {}).items():
+            self.originate(router, prefixes)
+        self._load()
+
+    @classmethod
+    def from_net(cls, net: 'IPNet', **kwargs) -> 'BGPSimulator':
+        """Create a simulator for a network whose routers originate the
+        prefixes of the address families of their BGP daemon: the networks,
+        the connected subnets if they are redistributed, and the aggregates,
+        whose more specific prefixes are not advertised
+
+        :param net: The network, whose addresses are allocated, and whose
+                    router ids are known once it is started
+        :param kwargs: The other parameters of the simulator"""
+        router_ids = kwargs.pop('router_ids', {})
+        for r in net.routers:
+            if r.nconfig.routerid and r.name not in router_ids:
+                router_ids[r.name] = str(r.nconfig.routerid)
+        sim = cls(net.topo, router_ids=router_ids, **kwargs)
+        for r in net.routers:
+            try:
+                options = r.nconfig.daemon(BGP).options
+            except KeyError:
+                continue
+            v4, v6 = as_paths(r).aggregates(r) if options.aggregate \
+                else ([], [])
+            for af in options.address_families:
+                version = 6 if af.name == 'ipv6' else 4
+                sim.originate(r.name, af.networks)
+                if 'connected' in af.redistribute:
+                    sim.originate(r.name, (
+                        ip.network for itf in r.intfList()
+                        for ip in (itf.ip6s(exclude_lls=True) if version == 6
+                                   else itf.ips())), origin=INCOMPLETE)
+                sim.aggregate(r.name, list(af.aggregates)
+                              + (v6 if version == 6 else v4))
+        return sim
+
+    def originate(self, router: str, prefixes: Iterable[Prefix],
+                  origin=IGP):
+        """Originate prefixes from a router
+
+        :param router: The router
+        :param prefixes: The prefixes
+        :param origin: The origin code of the routes, IGP for the prefixes
+                       of the networks of the router, INCOMPLETE for the
+                       redistributed ones"""
+        routes = self._origins.setdefault(router, {})
+        for p in prefixes:
+            prefix = str(ip_network(str(p)))
+            routes[prefix] = min(origin, routes.get(prefix, origin))
+        self._best = None
+
+    def aggregate(self, router: str, aggregates: Iterable[Prefix]):
+        """Originate aggregates from a router, which does not advertise the
+        routes of the more specific prefixes
+
+        :param router: The router
+        :param aggregates: The prefixes of the aggregates"""
+        self._aggregates.setdefault(router, set()).update(
+            str(ip_network(str(p))) for p in aggregates)
+        self._best = None
+
+    def _load(self):
+        """Read the sessions and the policies of the routers"""
+        topo = self.topo
+        infos = {r: topo.nodeInfo(r) for r in topo.routers()}
+        self._asn = {r: info.get('asn') for r, info in infos.items()}
+        peers = {r: set(info.get('bgp_peers', ()))
+                 for r, info in infos.items()}
+        # The index of each access list, by content
+        self._acl_contents = {}  # type: Dict[tuple, int]
+        self._rr = {}  # type: Dict[str, Tuple[str, Optional[Set[str]]]]
+        policies = {}  # type: Dict[Tuple[str, str, str], Policy]
+        for r, info in infos.items():
+            if info.get('bgp_rr_info'):
+                clients = info.get('bgp_rr_clients')
+                self._rr[r] = (str(info.get('bgp_cluster_id',
+                                            DEFAULT_CLUSTER_ID)),
+                               None if clients is None else set(clients))
+            route_maps = info.get('bgp_route_maps')
+            if not route_maps:
+                continue
+            access_lists = {}  # type: Dict[str, int]
+            for acl in info.get('bgp_access_lists', ()):
+                content = tuple((e.action, str(e.prefix))
+                                for e in acl.entries)
+                access_lists[acl.name] = self._acl_contents.setdefault(
+                    content, len(self._acl_contents))
+            community_lists = {}  # type: Dict[str, List[Tuple[str, str]]]
+            for cl in info.get('bgp_community_lists', ()):
+                community = cl.community
+                if isinstance(community, int):
+                    community = '%s:%d' % (self._asn[r], community)
+                community_lists.setdefault(cl.name, []).append(
+                    (cl.action, str(community)))
+            entries = {}  # type: Dict[Tuple[str, str], list]
+            for rm in group_route_maps(route_maps,
+                                       {p: [p] for p in peers[r]}):
+                for direction in (('in', 'out') if rm.direction == 'both'
+                                  else (rm.direction,)):
+                    entries.setdefault((rm.neighbor, direction), []).append(rm)
+            for (peer, direction), rms in entries.items():
+                policies[r, peer, direction] = Policy(
+                    r, self._asn[r], rms, access_lists, community_lists)
+        self._sessions = {}  # type: Dict[str, List[Session]]
+        for r in sorted(infos):
+            sessions = self._sessions[r] = []
+            rr = self._rr.get(r)
+            for p in sorted(peers[r]):
+                if p not in peers or r not in peers[p]:
+                    continue  # Only one router is configured
+                ebgp = self._asn[r] != self._asn[p]
+                sessions.append(Session(
+                    peer=p, ebgp=ebgp, peer_asn=self._asn[p],
+                    transparent=p in infos[r].get('bgp_rs_clients', ()),
+                    to_client=self._is_client(rr, p) if not ebgp else False,
+                    export=policies.get((r, p, 'out')),
+                    import_=policies.get((p, r, 'in'))))
+
+    @staticmethod
+    def _is_client(rr: Optional[Tuple[str, Optional[Set[str]]]],
+                   peer: str) -> bool:
+        """Return whether an iBGP peer is a client of a route reflector"""
+        return rr is not None and (rr[1] is None or peer in rr[1])
+
+    def _classes(self, origins: Dict[str, Dict[str, int]]) \
+            -> Dict[tuple, List[str]]:
+        """Return the prefixes that have the same routes"""
+        acls = sorted(self._acl_contents.items(), key=lambda x: x[1])
+        aggregates = {}  # type: Dict[Tuple[int, int], Dict[str, List[str]]]
+        for r, prefixes in self._aggregates.items():
+            for p in prefixes:
+                net = ip_network(p)
+                aggregates.setdefault((net.version, net.prefixlen), {})\
+                    .setdefault(str(net), []).append(r)
+        by_prefix = {}  # type: Dict[str, List[Tuple[str, int]]]
+        for r in sorted(origins):
+            for prefix, origin in origins[r].items():
+                by_prefix.setdefault(prefix, []).append((r, origin))
+        classes = {}  # type: Dict[tuple, List[str]]
+        for prefix, routers in by_prefix.items():
+            net = ip_network(prefix)
+            acl_results = tuple(access_list_permits(content, net)
+                                for content, _ in acls)
+            # The routers whose aggregates cover the prefix
+            suppressors = set()  # type: Set[str]
+            for (version, length), nets in aggregates.items():
+                if version == net.version and length < net.prefixlen:
+                    suppressors.update(nets.get(str(net.supernet(
+                        new_prefix=length)), ()))
+            key = (net.version, tuple(routers), acl_results,
+                   frozenset(suppressors))
+            classes.setdefault(key, []).append(prefix)
+        return classes
+
+    def _all_origins(self) -> Dict[str, Dict[str, int]]:
+        """Return the prefixes originated by each router, including its
+        aggregates"""
+        origins = {r: dict(prefixes) for r, prefixes in self._origins.items()}
+        for r, aggregates in self._aggregates.items():
+            routes = origins.setdefault(r, {})
+            for p in aggregates:
+                net = ip_network(p)
+                covered = [routes[x] for x in self._origins.get(r, ())
+                           if x != p and _covers(net, ip_network(x))]
+                # The aggregate takes the worst origin of its components
+                routes[p] = min(routes.get(p, INCOMPLETE),
+                                max(covered or [IGP]))
+        return origins
+
+    def best_routes(self) -> Dict[str, Dict[str, Route]]:
+        """Return the best route of each router, by prefix
+
+        :raise RuntimeError: if the routes of a prefix oscillate
+        :raise ValueError: if a route map cannot be simulated"""
+        if self._best is not None:
+            return self._best
+        origins = self._all_origins()
+        best = {r: {} for r in self._sessions}  # type: Dict[str, Dict]
+        acl_keys = {}  # type: Dict[tuple, int]
+        # The routes do not form reference cycles, but their number triggers
+        # many collections
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for key, prefixes in self._classes(origins).items():
+                _, routers, acl_results, suppressors = key
+                info = _PrefixClass(prefixes[0], acl_keys.setdefault(
+                    acl_results, len(acl_keys)), acl_results, suppressors)
+                routes = self._propagate(info, {r: origins[r][prefixes[0]]
+                                                for r, _ in routers})
+                for r, route in routes.items():
+                    selected = best.setdefault(r, {})
+                    for prefix in prefixes:
+                        selected[prefix] = route
+        finally:
+            if enabled:
+                gc.enable()
+        self._best = best
+        return best
+
+    def best_route(self, router: str, prefix: Prefix) -> Optional[Route]:
+        """Return the best route of a router towards a prefix, if any"""
+        return self.best_routes().get(router, {}).get(
+            str(ip_network(str(prefix))))
+
+    def _propagate(self, info: _PrefixClass, origins: Dict[str, int]) \
+            -> Dict[str, Route]:
+        """Propagate the routes of a prefix until no best route changes
+
+        :param info: The prefix and the policies matching it
+        :param origins: The origin code of the routers originating it
+        :return: The best route of each router"""
+        local = {r: Route(origin=origin, next_hop=r)
+                 for r, origin in origins.items()}
+        best = dict(local)
+        received = {}  # type: Dict[str, Dict[str, Route]]
+        changes = {}  # type: Dict[str, int]
+        queue = deque(sorted(local))
+        queued = set(queue)
+        sessions = self._sessions
+        export = self._export
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            route = best.get(u)
+            for s in sessions.get(u, ()):
+                v = s.peer
+                sent = None if route is None else export(u, route, s, info)
+                if sent is None:
+                    routes = received.get(v)
+                    if not routes or u not in routes:
+                        continue
+                    del routes[u]
+                else:
+                    routes = received.setdefault(v, {})
+                    if sent == routes.get(u):
+                        continue
+                    routes[u] = sent
+                current = best.get(v)
+                if sent is not None and current is not None \
+                        and current.peer != u:
+                    # The other routes are unchanged
+                    if not self._better(v, sent, current):
+                        continue
+                    new = sent
+                else:
+                    new = self._select(v, local.get(v), routes)
+                if new == current:
+                    continue
+                if new is None:
+                    del best[v]
+                else:
+                    best[v] = new
+                changes[v] = changes.get(v, 0) + 1
+                if changes[v] > self.max_changes:
+                    raise RuntimeError('The best route of %s towards %s '
+                                       'changed more than %d times'
+                                       % (v, info.prefix, self.max_changes))
+                if v not in queued:
+                    queue.append(v)
+                    queued.add(v)
+        return best
+
+    def _export(self, u: str, route: Route, s: Session,
+                info: _PrefixClass) -> Optional[Route]:
+        """Return the route received by a peer, after the export policy of
+        the router and the import policy of the peer, or None if it is
+        not advertised or accepted"""
+        if route.peer == s.peer or u in info.suppressors:
+            # The aggregates of the router cover the prefix
+            return None
+        reflected = not s.ebgp and route.peer is not None and not route.ebgp
+        if reflected and not (s.to_client
+                              or self._is_client(self._rr.get(u), route.peer)):
+            return None  # iBGP routes are only reflected
+        as_path = route.as_path
+        if s.ebgp and s.peer_asn in as_path:
+            return None  # The peer would not accept it
+        local_pref = route.local_pref
+        med = route.med
+        if s.ebgp and route.peer is not None and not s.transparent:
+            med = 0  # Not propagated to the other ASes
+        communities = route.communities
+        if s.export is not None:
+            result = s.export.evaluate(info.acl_key, info.acl_results,
+                                       communities)
+            if result is None:
+                return None
+            if result[0] is not None:
+                local_pref = result[0]
+            if result[1] is not None:
+                med = result[1]
+            communities = result[2]
+            as_path = result[3] + as_path
+        v = s.peer
+        if s.ebgp:
+            if not s.transparent:
+                as_path = (self._asn[u],) + as_path
+            if s.peer_asn in as_path:
+                return None
+            local_pref = DEFAULT_LOCAL_PREF
+            next_hop = route.next_hop if s.transparent else u
+            originator = None
+            cluster_list = ()  # type: Tuple[str, ...]
+        elif reflected:
+            next_hop = route.next_hop
+            originator = route.originator or route.peer
+            cluster_list = (self._rr[u][0],) + route.cluster_list
+            rr = self._rr.get(v)
+            if originator == v or rr is not None and rr[0] in cluster_list:
+                return None
+        else:
+            next_hop = u
+            originator = None
+            cluster_list = ()
+        if s.import_ is not None:
+            result = s.import_.evaluate(info.acl_key, info.acl_results,
+                                        communities)
+            if result is None:
+                return None
+            if result[0] is not None:
+                local_pref = result[0]
+            if result[1] is not None:
+                med = result[1]
+            communities = result[2]
+            as_path = result[3] + as_path
+        return Route(as_path, local_pref, med, communities, route.origin,
+                     next_hop, u, s.ebgp, originator, cluster_list)
+
+    def _select(self, router: str, local: Optional[Route],
+                routes: Dict[str, Route]) -> Optional[Route]:
+        """Return the best route of a router"""
+        best = local
+        for peer in sorted(routes):
+            route = routes[peer]
+            if best is None or self._better(router, route, best):
+                best = route
+        return best
+
+    def _better(self, router: str, a: Route, b: Route) -> bool:
+        """Return whether a router prefers a route to another one"""
+        # The local routes have the highest weight in FRRouting (32768),
+        # which is compared before the local preference
+        if (a.peer is None) != (b.peer is None):
+            return a.peer is None
+        if a.local_pref != b.local_pref:
+            return a.local_pref > b.local_pref
+        if len(a.as_path) != len(b.as_path):
+            return len(a.as_path) < len(b.as_path)
+        if a.origin != b.origin:
+            return a.origin < b.origin
+        if a.med != b.med and a.as_path[:1] == b.as_path[:1]:
+            return a.med < b.med
+        if a.ebgp != b.ebgp:
+            return a.ebgp
+        if not a.ebgp:
+            cost_a = self._igp_cost(router, a.next_hop)
+            cost_b = self._igp_cost(router, b.next_hop)
+            if cost_a != cost_b:
+                return cost_a < cost_b
+        id_a = self._router_id(a.originator or a.peer)
+        id_b = self._router_id(b.originator or b.peer)
+        if id_a != id_b:
+            return id_a < id_b
+        if len(a.cluster_list) != len(b.cluster_list):
+            return len(a.cluster_list) < len(b.cluster_list)
+        return str(a.peer) < str(b.peer)
+
+    def _igp_cost(self, router: str, next_hop: Optional[str]) -> float:
+        """Return the IGP cost from a router to the next hop of a route"""
+        if next_hop is None or next_hop == router:
+            return 0
+        # The links have the same metric in both directions, and the routes
+        # have fewer next hops than routers
+        try:
+            distances = self._igp[next_hop]
+        except KeyError:
+            if self._adjacency is None:
+                self._adjacency = igp_adjacency(self.topo)
+            asn = self._asn.get(next_hop)
+            distances = self._igp[next_hop] = igp_distances(
+                self.topo, [r for r, a in self._asn.items() if a == asn],
+                sources=[next_hop], adjacency=self._adjacency)[next_hop]
+        return distances.get(router, float('inf'))
+
+    def _router_id(self, router: Optional[str]) -> tuple:
+        try:
+            return self._rids[router]
+        except KeyError:
+            rid = self.router_ids.get(router)
+            key = self._rids[router] = (0, int(ip_address(rid)), '') \
+                if rid is not None else (1, 0, str(router))
+            return key
+
+    def differences(self, routers: Iterable['Router'], family=4) \
+            -> Dict[str, Dict[str, Tuple[Optional[tuple], Optional[tuple]]]]:
+        """Compare the AS paths of the best routes of running routers with
+        the expected ones, for the originated prefixes
+
+        :param routers: The routers
+        :param family: The IP version of the prefixes
+        :return: The (expected, actual) AS paths of the prefixes that differ,
+                 by router, None if there is no route"""
+        command = 'show bgp %s unicast' % ('ipv6' if family == 6 else 'ipv4')
+        ribs = batch_query(routers, 'bgpd', command)
+        best = self.best_routes()
+        prefixes = {p for routes in self._all_origins().values()
+                    for p in routes if ip_network(p).version == family}
+        differences = {}  # type: Dict[str, Dict[str, tuple]]
+        for name, rib in ribs.items():
+            actual = rib_as_paths(rib)
+            expected = best.get(name, {})
+            for prefix in prefixes:
+                route = expected.get(prefix)
+                path = None if route is None else route.as_path
+                if path != actual.get(prefix):
+                    differences.setdefault(name, {})[prefix] = \
+                        (path, actual.get(prefix))
+        return differences
+
+
+def rib_as_paths(rib: Dict) -> Dict[str, Tuple[int, ...]]:
+    """Return the AS path of the best routes of a BGP RIB
+
+    :param rib: The JSON output of 'show bgp ipv4 unicast'
+    :return: The AS paths, by prefix"""
+    paths = {}  # type: Dict[str, Tuple[int, ...]]
+    for prefix, routes in rib.get('routes', {}).items():
+        for route in routes:
+            bestpath = route.get('bestpath')
+            if isinstance(bestpath, dict):
+                bestpath = bestpath.get('overall')
+            if not bestpath:
+                continue
+            path = route.get('path')
+            if path is None:
+                path = route.get('aspath', {}).get('string', '')
+            paths[prefix] = tuple(int(asn) for asn in path.split()
+                                  if asn.isdigit())
+    return paths
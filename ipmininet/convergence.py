@@ -0,0 +1,283 @@
+"""This module detects the convergence of BGP in a network, and measures the
+time it took.
+
+The BGP summary of every router is polled concurrently through the vty
+sockets of the daemons. A router has converged once all its configured
+sessions are established and the number of routes of its RIB and of its
+Adj-RIB-In/Out have not changed during a quiet period. The convergence time
+of a router is the time of the last change observed before this quiet
+period, so its precision is the polling interval."""
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple, \
+    TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.router.vty import RouterState, batch_query
+
+if TYPE_CHECKING:
+    from ipmininet.router import Router
+
+# The number of seconds during which the RIBs must not change
+DEFAULT_QUIET_PERIOD = 3.
+# The number of seconds between two polls of the routers
+DEFAULT_INTERVAL = .5
+# The state of an established BGP session
+ESTABLISHED = 'Established'
+
+
+def expected_peers(router: 'Router') -> Set[str]:
+    """Return the addresses of the BGP peers configured on a router, in the
+    address families of its BGP daemon"""
+    daemon = router.nconfig.daemon('bgpd')
+    families = {af.name for af in daemon.options.address_families}
+    return {peer.peer for peer in daemon.neighbors
+            if peer.family in families}
+
+
+def summary_signature(summary: Dict) -> Tuple[Dict[str, str], tuple]:
+    """Return the state of the sessions of a BGP summary, and the counters
+    of its RIB and of its Adj-RIBs
+
+    :param summary: The JSON output of 'show bgp summary'"""
+    states = {}  # type: Dict[str, str]
+    counters = []  # type: List[tuple]
+    for af, af_summary in sorted(summary.items()):
+        if not isinstance(af_summary, dict):
+            continue
+        counters.append((af, af_summary.get('ribCount')))
+        for peer, info in sorted(af_summary.get('peers', {}).items()):
+            state = info.get('state')
+            if states.get(peer) != ESTABLISHED:
+                states[peer] = state
+            counters.append((af, peer, state,
+                             info.get('pfxRcd',
+                                      info.get('prefixReceivedCount')),
+                             info.get('pfxSnt')))
+    return states, tuple(counters)
+
+
+class RouterConvergence:
+    """The convergence of the BGP sessions and RIBs of a router"""
+
+    def __init__(self, name: str, expected: Iterable[str]):
+        """:param name: The router name
+        :param expected: The addresses of its configured peers"""
+        self.name = name
+        self.expected = set(expected)
+        self.established = set()  # type: Set[str]
+        self.signature = None  # type: Optional[tuple]
+        # The time of the last change of the sessions or of the counters
+        self.last_change = None  # type: Optional[float]
+        self.polls = 0
+        self.errors = 0
+
+    @property
+    def sessions_up(self) -> bool:
+        """Whether all configured sessions are established"""
+        return self.expected <= self.established
+
+    @property
+    def missing(self) -> Set[str]:
+        """The configured peers whose session is not established"""
+        return self.expected - self.established
+
+    def update(self, summary: Optional[Dict], now: float) -> bool:
+        """Record a new BGP summary of the router
+
+        :param summary: The summary, or None if it could not be read
+        :param now: The time of the summary
+        :return: Whether the sessions or the counters changed"""
+        self.polls += 1
+        if summary is None:
+            self.errors += 1
+            changed = bool(self.established)
+            self.established = set()
+            signature = None
+        else:
+            states, signature = summary_signature(summary)
+            established = {p for p, s in states.items() if s == ESTABLISHED}
+            changed = established != self.established \
+                or signature != self.signature
+            self.established = established
+        if changed:
+            self.last_change = now
+        self.signature = signature
+        return changed
+
+    def __str__(self):
+        return '<RouterConvergence %s %d/%d sessions>' % (
+            self.name, len(self.expected & self.established),
+            len(self.expected))
+
+
+class BGPConvergence:
+    """Poll the BGP routers of a network until their sessions and RIBs
+    are stable"""
+
+    def __init__(self, routers: Iterable['Router'],
+                 quiet_period=DEFAULT_QUIET_PERIOD, interval=DEFAULT_INTERVAL,
+                 start: Optional[float] = None):
+        """:param routers: The routers, those without BGP daemon are ignored
+        :param quiet_period: The number of seconds during which the RIBs must
+                             not change
+        :param interval: The number of seconds between two polls
+        :param start: The time.monotonic() time from which the convergence
+                      is measured, defaults to now"""
+        self.quiet_period = quiet_period
+        self.interval = interval
+        self.start = time.monotonic() if start is None else start
+        self.routers = {}  # type: Dict[str, RouterConvergence]
+        # Whether the network had converged at the last poll
+        self.is_converged = False
+        self._states = []  # type: List[RouterState]
+        for r in routers:
+            try:
+                expected = expected_peers(r)
+            except KeyError:  # No BGP daemon
+                continue
+            self.routers[r.name] = RouterConvergence(r.name, expected)
+            # Never reuse the answers of a previous poll
+            self._states.append(RouterState(r, ttl=0))
+
+    def reset(self, start: Optional[float] = None):
+        """Measure a new convergence, e.g., after a failure. The changes are
+        compared to the last poll.
+
+        :param start: The time.monotonic() time from which the convergence is
+                      measured, defaults to now"""
+        self.start = time.monotonic() if start is None else start
+        self.is_converged = False
+        for r in self.routers.values():
+            r.last_change = None
+
+    def query(self) -> Dict[str, Optional[Dict]]:
+        """Return the current BGP summary of each router, or None for the
+        routers that did not answer"""
+        try:
+            return batch_query(self._states, 'bgpd', 'show bgp summary')
+        except (OSError, RuntimeError, ValueError):
+            pass
+        summaries = {}  # type: Dict[str, Optional[Dict]]
+        for s in self._states:
+            try:
+                summaries[s.router.name] = s.query('bgpd', 'show bgp summary')
+            except (OSError, RuntimeError, ValueError) as e:
+                log.debug('*** Cannot read the BGP summary of %s: %s\n'
+                          % (s.router.name, e))
+                summaries[s.router.name] = None
+        return summaries
+
+    def poll(self) -> bool:
+        """Poll all routers once
+
+        :return: Whether the network has converged"""
+        summaries = self.query()
+        return self.update(summaries, time.monotonic())
+
+    def update(self, summaries: Dict[str, Optional[Dict]],
+               now: float) -> bool:
+        """Record the BGP summary of each router
+
+        :param summaries: The summaries, by router name
+        :param now: The time of the summaries
+        :return: Whether the network has converged"""
+        for name, r in self.routers.items():
+            r.update(summaries.get(name), now)
+        self.is_converged = self.converged(now)
+        return self.is_converged
+
+    def last_change(self) -> float:
+        """Return the time of the last change in the network"""
+        return max([self.start] + [r.last_change
+                                   for r in self.routers.values()
+                                   if r.last_change is not None])
+
+    def converged(self, now: Optional[float] = None) -> bool:
+        """Return whether all sessions are established and no RIB changed
+        during the quiet period"""
+        if now is None:
+            now = time.monotonic()
+        return all(r.sessions_up for r in self.routers.values()) \
+            and now - self.last_change() >= self.quiet_period
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Poll the routers until the network converges
+
+        :param timeout: The maximal number of seconds to wait
+        :return: Whether the network has converged"""
+        deadline = time.monotonic() + timeout if timeout is not None \
+            else None
+        while True:
+            poll_start = time.monotonic()
+            if self.poll():
+                return True
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                for r in self.routers.values():
+                    if not r.sessions_up:
+                        log.info('*** %s is waiting for the BGP sessions '
+                                 'with %s\n' % (r.name,
+                                                ', '.join(sorted(r.missing))))
+                return False
+            delay = self.interval - (now - poll_start)
+            if deadline is not None:
+                delay = min(delay, deadline - now)
+            if delay > 0:
+                time.sleep(delay)
+
+    def router_times(self) -> Dict[str, Optional[float]]:
+        """Return the convergence time of each router, in seconds since the
+        start, or None if some of its sessions are not established"""
+        return {name: (max((r.last_change or self.start) - self.start, 0.)
+                       if r.sessions_up else None)
+                for name, r in self.routers.items()}
+
+    def network_time(self) -> Optional[float]:
+        """Return the convergence time of the network, in seconds since the
+        start, or None if some sessions are not established"""
+        times = self.router_times().values()
+        if any(t is None for t in times):
+            return None
+        return max(times, default=0.)
+
+    def report(self) -> Dict:
+        """Return the convergence times and the polling statistics, e.g.,
+        to be exported in JSON"""
+        return {'converged': self.is_converged,
+                'network': self.network_time(),
+                'routers': self.router_times(),
+                'polls': max([r.polls for r in self.routers.values()],
+                             default=0),
+                'quiet_period': self.quiet_period,
+                'interval': self.interval}
+
+    def close(self):
+        """Close the connections to the routers"""
+        for s in self._states:
+            s.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def wait_bgp_convergence(routers: Iterable['Router'],
+                         timeout: Optional[float] = None,
+                         quiet_period=DEFAULT_QUIET_PERIOD,
+                         interval=DEFAULT_INTERVAL) -> Dict:
+    """Wait for the BGP routers of a network to converge
+
+    :param routers: The routers
+    :param timeout: The maximal number of seconds to wait
+    :param quiet_period: The number of seconds during which the RIBs must
+                         not change
+    :param interval: The number of seconds between two polls
+    :return: The report of BGPConvergence, whose 'converged' key is False on
+             timeout"""
+    with BGPConvergence(routers, quiet_period=quiet_period,
+                        interval=interval) as detector:
+        detector.wait(timeout)
+        return detector.report()
@@ -2,6 +2,7 @@
 import copy
 import os
 import re
+import signal
 from ipaddress import IPv4Address, IPv6Address, ip_address
 from typing import List, Union, Sequence, Optional
 
@@ -35,6 +36,8 @@ def is_reverse_zone(zone_name: str) -> bool:
 class Named(HostDaemon):
     NAME = 'named'
     KILL_PATTERNS = (NAME,)
+    # named reloads its configuration and zone files on SIGHUP
+    RELOAD_SIGNAL = signal.SIGHUP
 
     def __init__(self, node, **kwargs):
         # Check if apparmor is enabled in the distribution
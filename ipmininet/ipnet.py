@@ -13,8 +13,12 @@ from . import MIN_IGP_METRIC, OSPF_DEFAULT_AREA
 from .utils import otherIntf, realIntfList, L3Router, address_pair, has_cmd, \
     is_subnet_of
 from .host import IPHost
-from .router import Router
+from .readiness import start_daemons
+from .supervisor import Supervisor, RestartPolicy, DaemonStatus
+from .router import Router, IPNode
 from .router.config import BasicRouterConfig, RouterConfig
+from .router.config.bgp import ASPaths
+from .router.config.render import ConfigRenderer
 from .link import IPIntf, IPLink, PhysicalInterface
 from .ipswitch import IPSwitch
 
@@ -45,6 +49,11 @@ class IPNet(Mininet):
                  intf: Type[IPIntf] = IPIntf,
                  switch: Type[IPSwitch] = IPSwitch,
                  controller: Optional[Type[Controller]] = None,
+                 supervise=True,
+                 restart_policy: Optional[RestartPolicy] = None,
+                 render_workers: Optional[int] = None,
+                 render_prototypes=False,
+                 ecmp: Optional[int] = None,
                  *args, **kwargs):
         """Extends Mininet by adding IP-related ivars/functions and
         configuration knobs.
@@ -60,7 +69,21 @@ class IPNet(Mininet):
         :param max_v6_prefixlen: Maximal IPv6 prefixlen to auto-allocate
         :param allocate_IPs: whether to auto-allocate subnets in the network
         :param igp_metric: The default IGP metric for the links
-        :param igp_area: The default IGP area for the links"""
+        :param igp_area: The default IGP area for the links
+        :param supervise: Whether to watch the daemons once started, in
+                          order to detect (and report) their crashes
+        :param restart_policy: The default RestartPolicy of the daemons,
+                               which never restarts them by default
+        :param render_workers: The number of processes rendering the
+                               configuration files of the nodes (one per CPU
+                               if None, no process if 1)
+        :param render_prototypes: Whether to render the daemons whose
+                                  configurations have the same structure from
+                                  a single prototype, e.g., in large
+                                  homogeneous topologies
+        :param ecmp: The maximal number of equal-cost paths of the routes of
+                     the routers whose configuration does not set it, see
+                     RouterConfig"""
         self.router = router
         self.config = config
         self.routers = []  # type: List[Router]
@@ -78,6 +101,14 @@ class IPNet(Mininet):
         self.igp_area = igp_area
         self.allocate_IPs = allocate_IPs
         self.physical_interface = {}  # type: Dict[IPIntf, Node]
+        self.supervise = supervise
+        self.restart_policy = restart_policy
+        self.supervisor = None  # type: Optional[Supervisor]
+        self.render_workers = render_workers
+        self.render_prototypes = render_prototypes
+        self.ecmp = ecmp
+        # The shortest paths in each AS, shared by all the routers
+        self.as_paths = {}  # type: Dict[Optional[int], ASPaths]
         super().__init__(ipBase=ipBase, host=host, switch=switch, link=link,
                          intf=intf, controller=controller, *args, **kwargs)
 
@@ -92,6 +123,10 @@ class IPNet(Mininet):
         if not cls:
             cls = self.router
         r = cls(name, **defaults)
+        if isinstance(r.nconfig, RouterConfig):
+            if self.ecmp is not None and r.nconfig.ecmp is None:
+                r.nconfig.ecmp = self.ecmp
+            r.nconfig.as_paths = self.as_paths
         self.routers.append(r)
         self.nameToNode[name] = r
         return r
@@ -174,15 +209,35 @@ class IPNet(Mininet):
         return self._ip_allocs[str(ip)]
 
     def start(self):
+        if not self.built:
+            self.build()
+        # The topology or the IGP metrics may have changed since the last
+        # start
+        self.as_paths.clear()
+        # Render the configuration files while the switches start
+        log.info('*** Rendering the node configurations\n')
+        renderer = ConfigRenderer(
+            self.routers + [h for h in self.hosts if isinstance(h, IPNode)],
+            max_workers=self.render_workers,
+            prototypes=self.render_prototypes)
+        renderer.start()
         super().start()
+        renderer.wait()
         log.info('*** Starting, ', len(self.routers), 'routers\n')
         for router in self.routers:
             log.info(router.name + ' ')
-            router.start()
+            router.prepare(build=False)
+        # Start the daemons of all routers at once, and wait for them
+        # concurrently
+        start_daemons(self.routers)
         log.info('*** Starting, ', len(self.hosts), 'hosts\n')
         for host in self.hosts:
             log.info(host.name + ' ')
-            host.start()
+            if isinstance(host, IPNode):
+                host.prepare(build=False)
+                start_daemons([host])
+            else:
+                host.start()
         log.info('\n')
         log.info('*** Setting default host routes\n')
         for h in self.hosts:
@@ -210,8 +265,26 @@ class IPNet(Mininet):
             if not default:
                 log.info('skipping %s , ' % h.name)
         log.info('\n')
+        if self.supervise:
+            log.info('*** Supervising the daemons\n')
+            self.supervisor = Supervisor([n for n in self.routers + self.hosts
+                                          if isinstance(n, IPNode)],
+                                         policy=self.restart_policy)
+            self.supervisor.start()
+
+    def health(self) -> Dict[str, Dict[str, DaemonStatus]]:
+        """Return the status of the daemons of each node, as known by the
+        supervisor
+
+        :return: {node name: {daemon name: DaemonStatus}}"""
+        if self.supervisor is None:
+            return {}
+        return self.supervisor.health()
 
     def stop(self):
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            self.supervisor = None
         log.info('*** Stopping', len(self.routers), 'routers\n')
         for router in self.routers:
             log.info(router.name + ' ')
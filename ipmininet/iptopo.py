@@ -9,7 +9,7 @@ from mininet.log import lg
 from ipmininet.overlay import Overlay, Subnet
 from ipmininet.utils import get_set, is_container
 from ipmininet.router.config import BasicRouterConfig, OSPFArea, AS,\
-    iBGPFullMesh, OpenrDomain
+    iBGPFullMesh, iBGPHierarchy, RouteServer, OpenrDomain, BGPFeed
 from ipmininet.router.config.base import Daemon, RouterConfig, NodeConfig
 from ipmininet.host.config import HostConfig, DNSZone
 from ipmininet.ipnet import IPNet
@@ -19,8 +19,8 @@ class IPTopo(Topo):
     """A topology that supports L3 routers"""
 
     OVERLAYS = {cls.__name__: cls
-                for cls in (AS, iBGPFullMesh, OpenrDomain, OSPFArea,
-                            Subnet, DNSZone)}
+                for cls in (AS, iBGPFullMesh, iBGPHierarchy, RouteServer,
+                            OpenrDomain, OSPFArea, Subnet, DNSZone)}
 
     def __init__(self, *args, **kwargs):
         self.overlays = []
@@ -91,6 +91,18 @@ class IPTopo(Topo):
 
         return new_routers
 
+    def addFeedInjector(self, name: str, asn: int, **feed_opts) \
+            -> 'RouterDescription':
+        """Add a node only running a BGPFeed speaker, which announces a large
+        feed of routes to the routers connected to it with ebgp_session()
+
+        :param name: the name of the node
+        :param asn: the AS number of the speaker
+        :param feed_opts: the options of the BGPFeed daemon"""
+        return self.addRouter(name, asn=asn,
+                              config=(RouterConfig,
+                                      {'daemons': [(BGPFeed, feed_opts)]}))
+
     def addLink(self, node1: str, node2: str, port1=None, port2=None,
                 key=None, **opts) -> 'LinkDescription':
         """:param node1: first node to link
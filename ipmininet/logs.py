@@ -0,0 +1,491 @@
+"""This module aggregates the logs of the daemons of a network in a single
+time-ordered stream of events, e.g., to follow a convergence live.
+
+The logfiles are tailed in a background thread woken up by inotify, and their
+lines are parsed into LogEvent objects. These events can be filtered,
+delivered to subscribers and recorded in a compact binary journal. The events
+kept in memory are ordered by timestamp, even those of a log flushed late,
+while the subscribers and the journal receive the events as they are read."""
+import collections
+import datetime
+import os
+import re
+import selectors
+import struct
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, \
+    Pattern, Sequence, Tuple, Union, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.readiness import FileTail, Inotify
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+
+# Syslog severities
+EMERGENCY = 0
+ALERT = 1
+CRITICAL = 2
+ERROR = 3
+WARNING = 4
+NOTICE = 5
+INFO = 6
+DEBUG = 7
+
+SEVERITY_NAMES = {
+    'emergencies': EMERGENCY, 'emerg': EMERGENCY, 'alerts': ALERT,
+    'alert': ALERT, 'critical': CRITICAL, 'crit': CRITICAL,
+    'errors': ERROR, 'error': ERROR, 'err': ERROR, 'warnings': WARNING,
+    'warning': WARNING, 'warn': WARNING, 'notifications': NOTICE,
+    'notice': NOTICE, 'informational': INFO, 'info': INFO,
+    'debugging': DEBUG, 'debug': DEBUG,
+}
+_SEVERITY_RE = '|'.join(sorted(SEVERITY_NAMES, key=len, reverse=True))
+
+# The interval at which the logfiles are read if inotify is not available
+DEFAULT_POLL_INTERVAL = .5
+# The default number of events kept in memory
+DEFAULT_HISTORY = 100000
+
+
+class LogEvent:
+    """A parsed log line"""
+
+    __slots__ = ('timestamp', 'node', 'daemon', 'protocol', 'severity',
+                 'message')
+
+    def __init__(self, timestamp: float, node: str, daemon: str,
+                 protocol: Optional[str], severity: int, message: str):
+        """:param timestamp: The time of the event, in seconds since the epoch
+        :param node: The node name
+        :param daemon: The name of the daemon owning the logfile
+        :param protocol: The protocol named in the log line, if any
+        :param severity: The syslog severity of the event
+        :param message: The log message"""
+        self.timestamp = timestamp
+        self.node = node
+        self.daemon = daemon
+        self.protocol = protocol
+        self.severity = severity
+        self.message = message
+
+    def __eq__(self, other):
+        return isinstance(other, LogEvent) and \
+            all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __str__(self):
+        return '%s %s %s: %s' % (
+            datetime.datetime.fromtimestamp(self.timestamp)
+            .strftime('%H:%M:%S.%f'), self.node,
+            self.protocol if self.protocol else self.daemon, self.message)
+
+
+class LogFormat:
+    """A log line format, matched by a regular expression. The expression
+    has to define the 'time' and 'message' groups, and can define the
+    'severity' and 'protocol' groups."""
+
+    def __init__(self, pattern: str, time_format: str, has_year=True):
+        """:param pattern: The regular expression matching a line
+        :param time_format: The strptime() format of the 'time' group
+        :param has_year: Whether the time includes the year"""
+        self.pattern = re.compile(pattern)
+        self.time_format = time_format
+        self.has_year = has_year
+        self._last_time = None  # type: Optional[Tuple[str, float]]
+
+    def parse_time(self, s: str) -> float:
+        # Lines of the same second are frequent, reuse the last parsing
+        seconds, _, fraction = s.partition('.')
+        if self._last_time is None or self._last_time[0] != seconds:
+            t = datetime.datetime.strptime(seconds, self.time_format)
+            if not self.has_year:
+                t = t.replace(year=datetime.date.today().year)
+            self._last_time = (seconds, t.timestamp())
+        return self._last_time[1] + (float('.' + fraction) if fraction else 0)
+
+    def parse(self, line: str) -> Optional[Tuple[float, Optional[str],
+                                                 int, str]]:
+        """Parse a line
+
+        :return: The timestamp, protocol, severity and message of the line,
+                 or None if the line does not match"""
+        m = self.pattern.match(line)
+        if m is None:
+            return None
+        groups = m.groupdict()
+        severity = groups.get('severity') or groups.get('severity2')
+        return (self.parse_time(m.group('time')), groups.get('protocol'),
+                SEVERITY_NAMES.get(severity.lower(), INFO) if severity
+                else INFO, m.group('message'))
+
+
+def default_formats() -> List[LogFormat]:
+    """Return the formats of the logfiles of the supported daemons"""
+    return [
+        # FRRouting, optionally with 'log record-priority'
+        LogFormat(r'(?P<time>\d{4}/\d\d/\d\d \d\d:\d\d:\d\d(?:\.\d+)?) '
+                  r'(?:(?P<severity>%s): )?(?P<protocol>[A-Z][A-Z0-9_]*): '
+                  r'(?:(?P<severity2>%s): )?(?P<message>.*)'
+                  % (_SEVERITY_RE, _SEVERITY_RE), '%Y/%m/%d %H:%M:%S'),
+        # Named, with 'print-time' and 'print-severity'
+        LogFormat(r'(?P<time>\d\d-\w{3}-\d{4} \d\d:\d\d:\d\d(?:\.\d+)?) '
+                  r'(?:(?P<severity>%s): )?(?P<message>.*)' % _SEVERITY_RE,
+                  '%d-%b-%Y %H:%M:%S'),
+        # radvd
+        LogFormat(r'\[(?P<time>\w{3} \d\d \d\d:\d\d:\d\d)\] '
+                  r'(?P<protocol>\w+) \(\d+\): (?P<message>.*)',
+                  '%b %d %H:%M:%S', has_year=False),
+        # syslog-like lines, e.g., sshd -E
+        LogFormat(r'(?P<time>\w{3} [ \d]\d \d\d:\d\d:\d\d) '
+                  r'(?:\S+ )?(?P<protocol>[\w.-]+)(?:\[\d+\])?: '
+                  r'(?P<message>.*)', '%b %d %H:%M:%S', has_year=False),
+    ]
+
+
+class LogFilter:
+    """Select log events. All the given criteria have to hold."""
+
+    def __init__(self, nodes: Iterable[str] = (),
+                 daemons: Iterable[str] = (),
+                 protocols: Iterable[str] = (),
+                 max_severity: Optional[int] = None,
+                 pattern: Union[None, str, Pattern] = None):
+        """:param nodes: The node names (all nodes if empty)
+        :param daemons: The daemon names (all daemons if empty)
+        :param protocols: The protocols named in the lines (all if empty)
+        :param max_severity: The least severe level to keep, e.g., WARNING
+                             keeps warnings, errors and more severe events
+        :param pattern: A regular expression searched in the messages"""
+        self.nodes = frozenset(nodes)
+        self.daemons = frozenset(daemons)
+        self.protocols = frozenset(protocols)
+        self.max_severity = max_severity
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) \
+            else pattern
+
+    def __call__(self, event: LogEvent) -> bool:
+        return (not self.nodes or event.node in self.nodes) \
+            and (not self.daemons or event.daemon in self.daemons) \
+            and (not self.protocols or event.protocol in self.protocols) \
+            and (self.max_severity is None
+                 or event.severity <= self.max_severity) \
+            and (self.pattern is None
+                 or self.pattern.search(event.message) is not None)
+
+
+# The state changes of OSPF adjacencies (see log-adjacency-changes)
+OSPF_ADJACENCY_CHANGES = LogFilter(protocols=('OSPF', 'OSPF6'),
+                                   pattern=r'AdjChg')
+# The state changes of BGP sessions (see bgp log-neighbor-changes)
+BGP_SESSION_CHANGES = LogFilter(protocols=('BGP',), pattern=r'%ADJCHANGE')
+# The warnings and errors of all daemons
+WARNINGS = LogFilter(max_severity=WARNING)
+
+EventFilter = Callable[[LogEvent], bool]
+
+
+class Subscription:
+    """A callback receiving the events selected by a filter"""
+
+    def __init__(self, callback: Callable[[LogEvent], None],
+                 event_filter: Optional[EventFilter] = None):
+        self.callback = callback
+        self.filter = event_filter
+
+    def deliver(self, event: LogEvent):
+        if self.filter is None or self.filter(event):
+            self.callback(event)
+
+
+# A journal record: timestamp, severity and the length of the node, daemon,
+# protocol and message strings, followed by these strings in UTF-8
+_RECORD = struct.Struct('<dBBBBH')
+_MAX_MESSAGE = 0xffff
+
+
+class JournalWriter:
+    """Append events to a binary journal"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'ab')
+
+    def write(self, events: Iterable[LogEvent]):
+        out = bytearray()
+        for e in events:
+            node = e.node.encode()[:255]
+            daemon = e.daemon.encode()[:255]
+            protocol = (e.protocol or '').encode()[:255]
+            message = e.message.encode()[:_MAX_MESSAGE]
+            out += _RECORD.pack(e.timestamp, e.severity, len(node),
+                                len(daemon), len(protocol), len(message))
+            out += node + daemon + protocol + message
+        self._file.write(out)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_journal(path: str) -> Iterator[LogEvent]:
+    """Read the events recorded in a journal
+
+    :param path: The path of the journal"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        timestamp, severity, ln, ld, lp, lm = _RECORD.unpack_from(data,
+                                                                  offset)
+        offset += _RECORD.size
+        strings = []
+        for length in (ln, ld, lp, lm):
+            strings.append(data[offset:offset + length]
+                           .decode(errors='replace'))
+            offset += length
+        yield LogEvent(timestamp, strings[0], strings[1], strings[2] or None,
+                       severity, strings[3])
+
+
+class _TailedLog:
+    """A logfile being followed"""
+
+    def __init__(self, path: str, node: str, daemon: str):
+        self.path = path
+        self.node = node
+        self.daemon = daemon
+        self.tail = FileTail(path)
+
+    def read_events(self, formats: Sequence[LogFormat]) -> List[LogEvent]:
+        try:
+            lines = self.tail.read_lines()
+        except (IOError, OSError):
+            return []
+        events = []  # type: List[LogEvent]
+        for line in lines:
+            if not line.strip():
+                continue
+            for fmt in formats:
+                parsed = fmt.parse(line)
+                if parsed is not None:
+                    timestamp, protocol, severity, message = parsed
+                    break
+            else:
+                if events:
+                    # Continuation of the previous message
+                    events[-1].message += '\n' + line
+                    continue
+                timestamp, protocol, severity, message = \
+                    time.time(), None, INFO, line
+            events.append(LogEvent(timestamp, self.node, self.daemon,
+                                   protocol, severity, message))
+        return events
+
+
+class LogAggregator:
+    """Follow the logfiles of the daemons of a set of nodes and merge their
+    lines in a single stream of events"""
+
+    def __init__(self, nodes: Iterable['IPNode'] = (),
+                 journal_path: Optional[str] = None,
+                 history=DEFAULT_HISTORY, from_start=True,
+                 formats: Optional[Sequence[LogFormat]] = None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        """:param nodes: The nodes whose daemon logfiles are followed
+        :param journal_path: The file in which to record the events
+        :param history: The number of events kept in memory
+        :param from_start: Whether to read the existing content of the
+                           logfiles, or only the lines written after start()
+        :param formats: The formats of the log lines
+        :param poll_interval: The interval at which the files are read if
+                              inotify is not available"""
+        self.journal_path = journal_path
+        self.from_start = from_start
+        self.formats = formats if formats is not None else default_formats()
+        self.poll_interval = poll_interval
+        self.history = collections.deque(maxlen=history)
+        self._logs = {}  # type: Dict[str, _TailedLog]
+        self._subscriptions = []  # type: List[Subscription]
+        self._cond = threading.Condition()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._stopping = False
+        self._journal = None  # type: Optional[JournalWriter]
+        self._wake_r, self._wake_w = None, None
+        for n in nodes:
+            for d in n.nconfig.daemons:
+                if d.options.logfile:
+                    self.add_logfile(d.options.logfile, n.name, d.NAME)
+
+    def add_logfile(self, path: str, node: str, daemon: str):
+        """Follow a logfile, before calling start()
+
+        :param path: The path of the logfile
+        :param node: The name of the node owning the logfile
+        :param daemon: The name of the daemon writing the logfile"""
+        path = os.path.abspath(path)
+        if path not in self._logs:
+            self._logs[path] = _TailedLog(path, node, daemon)
+
+    def subscribe(self, callback: Callable[[LogEvent], None],
+                  event_filter: Optional[EventFilter] = None) -> Subscription:
+        """Call a function for each new event selected by a filter. The
+        function is called in the thread of the aggregator.
+
+        :param callback: The function receiving the events
+        :param event_filter: The selection of the events (all if None)"""
+        sub = Subscription(callback, event_filter)
+        with self._cond:
+            self._subscriptions.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._cond:
+            self._subscriptions.remove(sub)
+
+    def events(self, event_filter: Optional[EventFilter] = None) \
+            -> List[LogEvent]:
+        """Return the events in memory selected by a filter, ordered by
+        timestamp"""
+        with self._cond:
+            return [e for e in self.history
+                    if event_filter is None or event_filter(e)]
+
+    def wait_for(self, event_filter: EventFilter,
+                 timeout: Optional[float] = None) -> Optional[LogEvent]:
+        """Wait for a new event selected by a filter
+
+        :param event_filter: The selection of the event
+        :param timeout: The maximal number of seconds to wait
+        :return: The event, or None on timeout"""
+        found = []  # type: List[LogEvent]
+
+        def _found(event):
+            if not found:
+                found.append(event)
+                self._cond.notify_all()
+
+        sub = Subscription(_found, event_filter)
+        deadline = time.monotonic() + timeout if timeout is not None \
+            else None
+        with self._cond:
+            self._subscriptions.append(sub)
+            try:
+                while not found:
+                    remaining = deadline - time.monotonic() \
+                        if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            finally:
+                self._subscriptions.remove(sub)
+        return found[0] if found else None
+
+    def start(self):
+        """Start following the logfiles in a background thread"""
+        if self.journal_path:
+            self._journal = JournalWriter(self.journal_path)
+        if not self.from_start:
+            for tailed in self._logs.values():
+                try:
+                    tailed.tail.read_lines()
+                except (IOError, OSError):
+                    pass
+        self._wake_r, self._wake_w = os.pipe()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop,
+                                        name='ipmininet-logs', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop following the logfiles, after reading their last lines"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        os.write(self._wake_w, b'x')
+        self._thread.join()
+        self._thread = None
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _loop(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._wake_r, selectors.EVENT_READ)
+        inotify = None  # type: Optional[Inotify]
+        try:
+            inotify = Inotify()
+            selector.register(inotify.fd, selectors.EVENT_READ)
+            for path in self._logs:
+                if not inotify.watch(os.path.dirname(path)):
+                    raise OSError('Cannot watch %s' % path)
+        except OSError as e:
+            log.debug('*** Cannot use inotify, polling the logfiles: %s\n'
+                      % e)
+            if inotify is not None:
+                selector.unregister(inotify.fd)
+                inotify.close()
+                inotify = None
+        try:
+            self._read(self._logs.values())
+            while not self._stopping:
+                changed = None  # type: Optional[Iterable[_TailedLog]]
+                for key, _ in selector.select(
+                        None if inotify is not None else self.poll_interval):
+                    if inotify is not None and key.fd == inotify.fd:
+                        changed = [self._logs[p] for p in
+                                   inotify.read_events() if p in self._logs]
+                    else:
+                        os.read(self._wake_r, 4096)
+                if inotify is None:
+                    changed = self._logs.values()
+                if changed:
+                    self._read(changed)
+            # Read the last lines
+            self._read(self._logs.values())
+        finally:
+            selector.close()
+            if inotify is not None:
+                inotify.close()
+
+    def _insert(self, event: LogEvent):
+        """Insert an event in the history after the events that are not more
+        recent, searching from the newest ones as most events come last"""
+        history = self.history
+        i = len(history)
+        while i and history[i - 1].timestamp > event.timestamp:
+            i -= 1
+        if i == len(history):
+            history.append(event)
+            return
+        if len(history) == history.maxlen:
+            if not i:
+                return  # Older than all the events kept
+            history.popleft()
+            i -= 1
+        history.insert(i, event)
+
+    def _read(self, logs: Iterable[_TailedLog]):
+        events = []  # type: List[LogEvent]
+        for tailed in logs:
+            events.extend(tailed.read_events(self.formats))
+        if not events:
+            return
+        events.sort(key=lambda e: e.timestamp)
+        if self._journal is not None:
+            self._journal.write(events)
+        with self._cond:
+            for e in events:
+                self._insert(e)
+            subscriptions = list(self._subscriptions)
+            for e in events:
+                for sub in subscriptions:
+                    try:
+                        sub.deliver(e)
+                    except Exception as exc:
+                        log.error('*** Log subscriber failed on "%s": %s\n'
+                                  % (e, exc))
@@ -0,0 +1,401 @@
+"""This module waits for daemons to be ready to serve requests.
+Each daemon declares a set of readiness conditions (e.g., a socket or a pid
+file to appear) and this module waits for all of them to hold, relying on
+inotify to be woken up by file changes and on an exponential backoff to poll
+the other conditions."""
+import ctypes
+import ctypes.util
+import os
+import re
+import selectors
+import socket
+import struct
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, \
+    Set, Tuple, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from ipmininet.router.config.base import Daemon
+
+# Initial and maximal delays between two polls of the conditions
+MIN_BACKOFF = .001
+MAX_BACKOFF = .25
+# The maximal delay between two polls if the conditions are watched by inotify
+# (this guards against missed events, e.g., on network filesystems)
+MAX_WATCHED_BACKOFF = 1.
+
+# TCP state code of a listening socket in /proc/<pid>/net/tcp(6)
+TCP_LISTEN = '0A'
+
+
+class ReadinessCondition:
+    """A condition that must hold for a daemon to be considered as ready"""
+
+    def is_ready(self) -> bool:
+        """Return whether the condition currently holds"""
+        raise NotImplementedError
+
+    @property
+    def paths(self) -> Sequence[str]:
+        """The files whose changes can make this condition hold. Conditions
+        without any path are polled."""
+        return ()
+
+    def __str__(self):
+        return self.__class__.__name__
+
+
+class UnixSocketReady(ReadinessCondition):
+    """The daemon accepts connections on an AF_UNIX socket"""
+
+    def __init__(self, path: str):
+        """:param path: The path of the socket"""
+        self.path = path
+
+    def is_ready(self):
+        if not os.path.exists(self.path):
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+            return True
+        except socket.error:
+            return False
+        finally:
+            sock.close()
+
+    @property
+    def paths(self):
+        return self.path,
+
+    def __str__(self):
+        return 'unix socket %s' % self.path
+
+
+def live_pid(path: str) -> Optional[int]:
+    """Return the pid written in a pid file if this process exists
+
+    :param path: The path of the pid file
+    :return: The pid or None if the file cannot be read or the process does
+             not exist"""
+    try:
+        with open(path) as f:
+            pid = int(f.read().strip())
+    except (IOError, OSError, ValueError):
+        return None
+    return pid if os.path.exists('/proc/%d' % pid) else None
+
+
+class PidFileReady(ReadinessCondition):
+    """The daemon wrote its pid file, and the process it references exists"""
+
+    def __init__(self, path: str):
+        """:param path: The path of the pid file"""
+        self.path = path
+
+    def is_ready(self):
+        return live_pid(self.path) is not None
+
+    @property
+    def paths(self):
+        return self.path,
+
+    def __str__(self):
+        return 'pid file %s' % self.path
+
+
+class FileTail:
+    """Read the lines appended to a file since the last read"""
+
+    def __init__(self, path: str):
+        """:param path: The path of the file"""
+        self.path = path
+        self._offset = 0
+        self._inode = None  # type: Optional[int]
+        self._partial = ''
+
+    def read_lines(self) -> List[str]:
+        """Return the new complete lines of the file
+
+        :raise IOError: if the file cannot be read"""
+        with open(self.path, errors='replace') as f:
+            st = os.fstat(f.fileno())
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                # The file was replaced or truncated, restart from its
+                # beginning
+                self._inode = st.st_ino
+                self._offset = 0
+                self._partial = ''
+            f.seek(self._offset)
+            data = f.read()
+            self._offset = f.tell()
+        lines = (self._partial + data).split('\n')
+        # The last element is an incomplete line (or the empty string)
+        self._partial = lines.pop()
+        return lines
+
+
+class LogLineReady(ReadinessCondition):
+    """The daemon wrote a line matching a pattern in its logfile"""
+
+    def __init__(self, path: str, pattern: str):
+        """:param path: The path of the log file
+        :param pattern: The regular expression that one line has to match"""
+        self.path = path
+        self.pattern = re.compile(pattern)
+        self._tail = FileTail(path)
+        self._matched = False
+
+    def is_ready(self):
+        if self._matched:
+            return True
+        try:
+            lines = self._tail.read_lines()
+        except (IOError, OSError):
+            return False
+        self._matched = any(self.pattern.search(line) for line in lines)
+        return self._matched
+
+    @property
+    def paths(self):
+        return self.path,
+
+    def __str__(self):
+        return 'log line matching "%s" in %s' % (self.pattern.pattern,
+                                                 self.path)
+
+
+class TCPPortReady(ReadinessCondition):
+    """A socket listens on a given TCP port in the network namespace of a
+    node. As sockets are namespace-specific, the listening sockets are read
+    from the /proc/<pid>/net/tcp(6) files of the node's shell."""
+
+    def __init__(self, node: 'IPNode', port: int):
+        """:param node: The node whose namespace is inspected
+        :param port: The TCP port number"""
+        self.node = node
+        self.port = port
+
+    def is_ready(self):
+        port = '%04X' % self.port
+        for table in ('tcp', 'tcp6'):
+            try:
+                with open('/proc/%d/net/%s' % (self.node.pid, table)) as f:
+                    next(f)  # Skip the header
+                    for line in f:
+                        fields = line.split()
+                        if fields[3] == TCP_LISTEN \
+                                and fields[1].rsplit(':', 1)[1] == port:
+                            return True
+            except (IOError, OSError, StopIteration, IndexError):
+                continue
+        return False
+
+    def __str__(self):
+        return 'TCP port %d listening on %s' % (self.port, self.node.name)
+
+
+class CallableReady(ReadinessCondition):
+    """A condition evaluated by calling a function"""
+
+    def __init__(self, fun: Callable[[], bool], description='callable'):
+        """:param fun: The function returning whether the condition holds
+        :param description: The description of the condition"""
+        self.fun = fun
+        self.description = description
+
+    def is_ready(self):
+        return bool(self.fun())
+
+    def __str__(self):
+        return self.description
+
+
+class Inotify:
+    """A minimal ctypes wrapper around the inotify API of the libc"""
+
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    MASK = 0x002 | 0x004 | 0x008 | 0x080 | 0x100
+
+    # The header of an event: wd, mask, cookie and name length
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError('Cannot find the libc')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1() failed')
+        self._watched = {}  # type: Dict[int, str]
+
+    def watch(self, directory: str) -> bool:
+        """Watch the changes of the files in a directory
+
+        :return: Whether the directory is watched"""
+        if directory in self._watched.values():
+            return True
+        wd = self._libc.inotify_add_watch(self.fd,
+                                          os.fsencode(directory),
+                                          self.MASK)
+        if wd < 0:
+            return False
+        self._watched[wd] = directory
+        return True
+
+    def read_events(self) -> Set[str]:
+        """Consume the pending events
+
+        :return: The paths of the changed files"""
+        paths = set()  # type: Set[str]
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return paths
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd in self._watched and name:
+                    paths.add(os.path.join(self._watched[wd],
+                                           os.fsdecode(name)))
+
+    def drain(self):
+        """Discard the pending events"""
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PendingDaemon:
+    """A started daemon that is not ready yet"""
+
+    def __init__(self, node: 'IPNode', daemon: 'Daemon',
+                 process=None, timeout: Optional[float] = None):
+        self.node = node
+        self.daemon = daemon
+        self.process = process
+        self.conditions = list(daemon.readiness_conditions())
+        self.timeout = timeout if timeout is not None \
+            else daemon.STARTUP_TIMEOUT
+        self.deadline = time.monotonic() + self.timeout \
+            if self.timeout is not None else None
+
+    def update(self) -> bool:
+        """Remove the conditions that now hold
+
+        :return: Whether the daemon is ready"""
+        self.conditions = [c for c in self.conditions if not c.is_ready()]
+        return not self.conditions
+
+    def check_process(self):
+        """Raise an error if the daemon has already exited"""
+        if self.process is None:
+            return
+        code = self.process.poll()
+        if code is not None:
+            raise RuntimeError('%s on %s exited with code %d before being '
+                               'ready (unmet: %s)'
+                               % (self.daemon.NAME, self.node.name, code,
+                                  ', '.join(map(str, self.conditions))))
+
+    def check_deadline(self, now: float):
+        """Raise an error if the daemon did not start on time"""
+        if self.deadline is not None and now >= self.deadline:
+            raise RuntimeError('%s on %s was not ready after %ss '
+                               '(unmet: %s)'
+                               % (self.daemon.NAME, self.node.name,
+                                  self.timeout,
+                                  ', '.join(map(str, self.conditions))))
+
+
+def wait_ready(daemons: Iterable[Tuple['IPNode', 'Daemon', object]],
+               timeout: Optional[float] = None):
+    """Wait until all the given daemons are ready. The daemons are awaited
+    concurrently, such that the total waiting time is bounded by the slowest
+    daemon.
+
+    :param daemons: (node, daemon, process) tuples, where process is the
+                    Popen handle of the daemon (or None if unknown)
+    :param timeout: The number of seconds to wait for each daemon, overriding
+                    Daemon.STARTUP_TIMEOUT
+    :raise RuntimeError: if a daemon exits or is not ready on time"""
+    pending = [p for p in (_PendingDaemon(n, d, process=proc,
+                                          timeout=timeout)
+                           for n, d, proc in daemons)
+               if not p.update()]
+    if not pending:
+        return
+
+    inotify = selector = None
+    try:
+        inotify = Inotify()
+        selector = selectors.DefaultSelector()
+        selector.register(inotify.fd, selectors.EVENT_READ)
+    except (OSError, AttributeError) as e:
+        log.debug('Cannot use inotify (%s), polling daemon readiness\n' % e)
+        inotify = None
+
+    try:
+        backoff = MIN_BACKOFF
+        while pending:
+            # Watch the directories of the files, as they may not exist yet
+            watched = inotify is not None and \
+                all(c.paths and all(inotify.watch(os.path.dirname(path)
+                                                  or '.')
+                                    for path in c.paths)
+                    for p in pending for c in p.conditions)
+            now = time.monotonic()
+            for p in pending:
+                p.check_process()
+                p.check_deadline(now)
+            delay = min([backoff] + [p.deadline - now for p in pending
+                                     if p.deadline is not None])
+            if selector is None:
+                time.sleep(max(delay, 0))
+            elif selector.select(max(delay, 0)):
+                inotify.drain()
+                # A file just appeared (e.g., a socket that is not yet
+                # listening), poll again quickly
+                backoff = MIN_BACKOFF / 2
+            backoff = min(backoff * 2,
+                          MAX_WATCHED_BACKOFF if watched else MAX_BACKOFF)
+            pending = [p for p in pending if not p.update()]
+    finally:
+        if selector is not None:
+            selector.close()
+        if inotify is not None:
+            inotify.close()
+
+
+def start_daemons(nodes: Iterable['IPNode'],
+                  timeout: Optional[float] = None):
+    """Start the daemons of already prepared nodes. The daemons with the same
+    priority are started on all nodes at once, and awaited concurrently
+    before starting the daemons of the next priority level.
+
+    :param nodes: The nodes whose daemons to start
+    :param timeout: The number of seconds to wait for each daemon, overriding
+                    Daemon.STARTUP_TIMEOUT
+    :raise RuntimeError: if a daemon exits or is not ready on time"""
+    levels = {}  # type: Dict[int, List[Tuple[IPNode, Daemon]]]
+    for n in nodes:
+        for d in n.nconfig.started_daemons:
+            levels.setdefault(d.PRIO, []).append((n, d))
+    for prio in sorted(levels):
+        wait_ready([(n, d, n.start_daemon(d)) for n, d in levels[prio]],
+                   timeout=timeout)
@@ -2,5 +2,6 @@
    multiple daemons
 """
 from .__router import Router, ProcessHelper, IPNode
+from .vty import RouterState, batch_query
 
-__all__ = ['IPNode', 'Router', 'ProcessHelper']
+__all__ = ['IPNode', 'Router', 'ProcessHelper', 'RouterState', 'batch_query']
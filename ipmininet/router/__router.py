@@ -2,14 +2,16 @@
    with a modular config system."""
 import subprocess
 import sys
-import time
 from ipaddress import IPv4Interface, IPv6Interface
 from typing import Type, Optional, Tuple, Union, Dict, List, Sequence, Set
 
 from ipmininet import DEBUG_FLAG
+from ipmininet.readiness import start_daemons
 from ipmininet.utils import L3Router, realIntfList, otherIntf
 from ipmininet.link import IPIntf
 from .config import BasicRouterConfig, NodeConfig, RouterConfig
+from .config.base import Daemon
+from .vty import RouterState, NextHop
 
 import mininet.clean
 from mininet.node import Node, Host
@@ -57,6 +59,10 @@ class ProcessHelper:
         :param pid: a process index, as return by popen"""
         return self._processes[pid]
 
+    def processes(self) -> Dict[int, subprocess.Popen]:
+        """Return all process handles in this family, by process index"""
+        return dict(self._processes)
+
     def terminate(self):
         """Terminate all processes in this family"""
         for p in self._processes.values():
@@ -101,15 +107,27 @@ class IPNode(Node):
         else:
             self.nconfig = config(self)
         self._processes = process_manager(self)
+        # The process index of each started daemon, by daemon name
+        self._daemon_processes = {}  # type: Dict[str, int]
 
     def start(self):
         """Start the node: Configure the daemons, set the relevant sysctls,
         and fire up all needed processes"""
+        self.prepare()
+        start_daemons([self])
+
+    def prepare(self, build=True):
+        """Configure the daemons and set the relevant sysctls, such that the
+        daemons can be started
+
+        :param build: Whether to build and write the configuration files,
+                      otherwise they must have been written already"""
         # Build the config
-        self.nconfig.build()
+        if build:
+            self.nconfig.build()
         # Check them
         err_code = False
-        for d in self.nconfig.daemons:
+        for d in self.nconfig.started_daemons:
             out, err, code = self._processes.pexec(shlex.split(d.dry_run))
             err_code = err_code or code
             if code:
@@ -124,12 +142,37 @@ class IPNode(Node):
         # Set relevant sysctls
         for opt, val in self.nconfig.sysctl:
             self._old_sysctl[opt] = self._set_sysctl(opt, val)
-        # Fire up all daemons
-        for d in self.nconfig.daemons:
-            self._processes.popen(shlex.split(d.startup_line))
-            # Busy-wait if the daemon needs some time before being started
-            while not d.has_started():
-                time.sleep(.001)
+
+    def start_daemon(self, daemon: Daemon) -> subprocess.Popen:
+        """Fire up a daemon of this node, without waiting for it to be ready
+
+        :param daemon: The daemon to start
+        :return: The process handle of the daemon"""
+        pid = self._processes.popen(shlex.split(daemon.startup_line))
+        self._daemon_processes[daemon.NAME] = pid
+        return self._processes.get_process(pid)
+
+    def daemon_process(self, daemon: Union[str, Daemon]) \
+            -> Optional[subprocess.Popen]:
+        """Return the process handle of the last start of a daemon
+
+        :param daemon: The daemon or its name
+        :return: The process handle or None if the daemon was not started"""
+        name = daemon if isinstance(daemon, str) else daemon.NAME
+        try:
+            return self._processes.get_process(self._daemon_processes[name])
+        except KeyError:
+            return None
+
+    def labeled_processes(self) -> Dict[str, subprocess.Popen]:
+        """Return the processes managed by this node. The last started
+        process of each daemon is labeled by the daemon name, the others by
+        their process index.
+
+        :return: {label: process handle}"""
+        names = {idx: name for name, idx in self._daemon_processes.items()}
+        return {names.get(idx, 'process%d' % idx): p
+                for idx, p in self._processes.processes().items()}
 
     def terminate(self):
         """Stops this node and sets back all sysctls to their old values"""
@@ -203,7 +246,44 @@ class Router(IPNode, L3Router):
         # so no need to move it
         lo = IPIntf('lo', node=self, port=-1, moveIntfFn=lambda x, y: None)
         lo.ip = lo_addresses
+        self._state = None  # type: Optional[RouterState]
 
     @property
     def asn(self) -> int:
         return self.get('asn')
+
+    @property
+    def state(self) -> RouterState:
+        """The client querying the state of the FRRouting daemons of this
+        router"""
+        if self._state is None:
+            self._state = RouterState(self)
+        return self._state
+
+    def ospf_neighbors(self) -> Dict:
+        """Return the OSPF neighbors of this router, as reported by ospfd"""
+        return self.state.ospf_neighbors()
+
+    def bgp_summary(self) -> Dict:
+        """Return the summary of the BGP sessions of this router, as
+        reported by bgpd"""
+        return self.state.bgp_summary()
+
+    def rib(self, family=4) -> Dict:
+        """Return the routes installed by zebra on this router
+
+        :param family: The IP version of the routes"""
+        return self.state.rib(family=family)
+
+    def nexthops(self, family=4) -> Dict[str, List[NextHop]]:
+        """Return the (address, interface) pairs of the next hops installed
+        in the FIB for each prefix, e.g., to check that the traffic is
+        spread over equal-cost paths
+
+        :param family: The IP version of the routes"""
+        return self.state.nexthops(family=family)
+
+    def terminate(self):
+        if self._state is not None:
+            self._state.close()
+        super().terminate()
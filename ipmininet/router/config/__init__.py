@@ -5,9 +5,9 @@ from .zebra import Zebra
 from .staticd import STATIC, StaticRoute
 from .ospf import OSPF, OSPFArea
 from .ospf6 import OSPF6
-from .bgp import BGP, AS, iBGPFullMesh, bgp_peering, bgp_fullmesh, \
-    ebgp_session, set_rr, AccessList, CommunityList, AF_INET, AF_INET6, \
-    SHARE, CLIENT_PROVIDER
+from .bgp import BGP, AS, iBGPFullMesh, iBGPHierarchy, RouteServer, \
+    bgp_peering, bgp_fullmesh, ebgp_session, set_rr, AccessList, \
+    CommunityList, AF_INET, AF_INET6, SHARE, CLIENT_PROVIDER
 from .radvd import RADVD, AdvPrefix, AdvRDNSS, AdvConnectedPrefix
 from .iptables import IPTables, IP6Tables, Rule, Chain, ChainRule, NOT, \
     PortClause, InterfaceClause, AddressClause, Filter, InputFilter, \
@@ -17,14 +17,18 @@ from .pimd import PIMD
 from .ripng import RIPng
 from .openrd import OpenrDaemon
 from .openr import Openr, OpenrDomain
+from .watchfrr import WatchFRR
+from .bgpfeed import BGPFeed
 
 __all__ = ['BasicRouterConfig', 'NodeConfig', 'Zebra', 'OSPF', 'OSPF6',
            'OSPFArea', 'BGP', 'AS', 'SHARE', 'CLIENT_PROVIDER',
-           'iBGPFullMesh', 'bgp_peering', 'RouterConfig', 'bgp_fullmesh',
+           'iBGPFullMesh', 'iBGPHierarchy', 'bgp_peering', 'RouterConfig',
+           'bgp_fullmesh',
            'ebgp_session', 'CommunityList', 'set_rr', 'AccessList', 'IPTables',
            'IP6Tables', 'SSHd', 'RADVD', 'AdvPrefix', 'AdvConnectedPrefix',
            'AdvRDNSS', 'PIMD', 'RIPng', 'STATIC', 'StaticRoute',
            'OpenrDaemon', 'Openr', 'OpenrDomain', 'AF_INET', 'AF_INET6',
            'BorderRouterConfig', 'Rule', 'Chain', 'ChainRule', 'NOT',
            'PortClause', 'InterfaceClause', 'AddressClause', 'Filter',
-           'InputFilter', 'OutputFilter', 'TransitFilter', 'Allow', 'Deny']
+           'InputFilter', 'OutputFilter', 'TransitFilter', 'Allow', 'Deny',
+           'WatchFRR', 'BGPFeed', 'RouteServer']
@@ -4,14 +4,16 @@ It also defines the base class for a daemon, as well as a minimalistic
 configuration for a router."""
 import os
 import abc
-from contextlib import closing
+import difflib
 from operator import attrgetter
 from ipaddress import ip_address
 from mako.lookup import TemplateLookup
 from typing import TYPE_CHECKING, Iterable, Optional, Dict, Union, Type, \
     Tuple, Sequence, List, Set
 
-from .utils import ConfigDict, ip_statement
+from .utils import ConfigDict, ip_statement, config_hash, write_if_changed
+from ipmininet.readiness import ReadinessCondition, CallableReady
+from ipmininet.templates import template_lookup
 from ipmininet.utils import require_cmd, realIntfList
 from ipmininet.link import OrderedAddress, IPIntf
 
@@ -22,13 +24,21 @@ from mininet.log import lg as log
 if TYPE_CHECKING:
     from ipmininet.router import IPNode, Router
     from ipmininet.iptopo import IPTopo, NodeDescription
+    from .bgp import ASPaths
 DaemonOption = Union['Daemon', Type['Daemon'],
                      Tuple[Union['Daemon', Type['Daemon']], Dict]]
 
 last_routerid = ip_address('0.0.0.1')
 
+# The sysctls selecting the fields hashed to pick the next hop of a flow
+# over multipath routes
+MULTIPATH_HASH_SYSCTLS = ('net.ipv4.fib_multipath_hash_policy',
+                          'net.ipv6.fib_multipath_hash_policy')
+# Hash the addresses, ports and protocol of the flows
+MULTIPATH_HASH_POLICY_L4 = 1
+
 __TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
-router_template_lookup = TemplateLookup(directories=[__TEMPLATES_DIR])
+router_template_lookup = template_lookup(__TEMPLATES_DIR, 'router')
 
 
 class NodeConfig:
@@ -56,7 +66,18 @@ class NodeConfig:
     def build(self):
         """Build the configuration for each daemon, then write the
         configuration files"""
+        self.build_config()
+        # Write their config, using the global ConfigDict to handle
+        # dependencies
+        for d in self.started_daemons:
+            cfg = d.render(self._cfg)
+            d.write(cfg)
+
+    def build_config(self) -> ConfigDict:
+        """Build the configuration tree of each daemon, without rendering
+        the configuration files
 
+        :return: The configuration tree of the node"""
         # Mount a separate /etc/resolv.conf and /etc/hosts for the node
         resolv_file_mount = os.path.join(self._node.cwd, 'resolv_%(name)s.conf')
         open(resolv_file_mount % self._node.__dict__, "w").close()
@@ -77,11 +98,24 @@ class NodeConfig:
         # Build their config
         for name, d in self._daemons.items():
             self._cfg[name] = d.build()
-        # Write their config, using the global ConfigDict to handle
-        # dependencies
-        for d in self._daemons.values():
-            cfg = d.render(self._cfg)
-            d.write(cfg)
+        return self._cfg
+
+    @property
+    def changed_daemons(self) -> List['Daemon']:
+        """The started daemons whose configuration files changed during the
+        last build"""
+        return [d for d in self.started_daemons if d.changed]
+
+    def rebuild_daemon(self, daemon: 'Daemon') -> Dict[str, str]:
+        """Build and write again the configuration of an already built daemon,
+        e.g., after a change of its options or of the node parameters
+
+        :param daemon: The daemon to rebuild
+        :return: The new configuration content for each filename"""
+        self._cfg[daemon.NAME] = daemon.build()
+        cfg = daemon.render(self._cfg)
+        daemon.write(cfg)
+        return cfg
 
     def post_register_daemons(self):
         """Method called after all daemon classes were instantiated"""
@@ -114,7 +148,8 @@ class NodeConfig:
         else:
             cls.options.update(daemon_opts)
         self._daemons[cls.NAME] = cls
-        require_cmd(cls.NAME, 'Could not find an executable for a daemon!')
+        require_cmd(cls.COMMAND or cls.NAME,
+                    'Could not find an executable for a daemon!')
 
     @property
     def sysctl(self):
@@ -140,6 +175,12 @@ class NodeConfig:
     def daemons(self):
         return sorted(self._daemons.values(), key=attrgetter('PRIO'))
 
+    @property
+    def started_daemons(self) -> List['Daemon']:
+        """The daemons whose processes are directly started by the node,
+        sorted by priority"""
+        return self.daemons
+
     def daemon(self, key: Union[str, 'Daemon', Type['Daemon']]) -> 'Daemon':
         """Return the Daemon object in this config for the given key
 
@@ -179,19 +220,73 @@ class NodeConfig:
 
 class RouterConfig(NodeConfig):
 
-    def __init__(self, node: 'Router', sysctl=None, *args, **kwargs):
+    def __init__(self, node: 'Router', sysctl=None, integrated=False,
+                 ecmp: Optional[int] = None, *args, **kwargs):
+        """:param integrated: Whether to run the FRRouting daemons from
+                              a single integrated configuration, under
+                              watchfrr, instead of starting and configuring
+                              each of them separately
+        :param ecmp: The maximal number of equal-cost paths of the routes
+                     computed by OSPF, OSPF6 and BGP, which also enables
+                     the L3/L4 multipath hashing of the kernel (None to
+                     keep a single path)"""
         self._sysctl = {'net.ipv4.ip_forward': 1,
                         'net.ipv6.conf.all.forwarding': 1}
         if sysctl:
             self._sysctl.update(sysctl)
+        self.integrated = integrated
         super().__init__(node, sysctl=self._sysctl, *args, **kwargs)
         self.routerid = None
+        self._ecmp = None  # type: Optional[int]
+        self.ecmp = ecmp
+        # The shortest paths in each AS, shared by the routers of the network
+        self.as_paths = {}  # type: Dict[Optional[int], ASPaths]
+
+    @property
+    def ecmp(self) -> Optional[int]:
+        """The maximal number of equal-cost paths of the routes"""
+        return self._ecmp
+
+    @ecmp.setter
+    def ecmp(self, paths: Optional[int]):
+        self._ecmp = paths
+        if paths is not None and paths > 1:
+            # Spread the flows over the next hops based on their L4 ports,
+            # unless the hash policy was explicitly set
+            for key in MULTIPATH_HASH_SYSCTLS:
+                self._sysctl.setdefault(key, MULTIPATH_HASH_POLICY_L4)
 
     def post_register_daemons(self):
         self._cfg.password = self._node.password
+        if self.integrated and self.frr_daemons:
+            # Importing here to avoid circular import
+            from .watchfrr import WatchFRR
+            self.register_daemon(WatchFRR)
         # Set the router id
         self.routerid = self.compute_routerid()
 
+    @property
+    def frr_daemons(self) -> List['Daemon']:
+        """The FRRouting daemons of this router"""
+        from .zebra import QuaggaDaemon
+        return [d for d in self.daemons if isinstance(d, QuaggaDaemon)]
+
+    @property
+    def started_daemons(self):
+        if not self.integrated:
+            return self.daemons
+        # watchfrr starts all the FRRouting daemons
+        frr_daemons = self.frr_daemons
+        return [d for d in self.daemons if d not in frr_daemons]
+
+    def rebuild_daemon(self, daemon):
+        if self.integrated and daemon.NAME == 'watchfrr':
+            # The integrated configuration holds the one of every FRRouting
+            # daemon
+            for d in self.frr_daemons:
+                self._cfg[d.NAME] = d.build()
+        return super().rebuild_daemon(daemon)
+
     @staticmethod
     def incr_last_routerid():
         global last_routerid
@@ -264,6 +359,8 @@ class Daemon(metaclass=abc.ABCMeta):
     """This class serves as base for routing daemons"""
     # The name of this routing daemon
     NAME = None  # type: str
+    # The executable of this daemon, if it is not named after the daemon
+    COMMAND = None  # type: Optional[str]
     # The priority of this daemon, relative to others
     # (e.g. to define startup order)
     PRIO = 10
@@ -271,6 +368,12 @@ class Daemon(metaclass=abc.ABCMeta):
     DEPENDS = ()  # type: Sequence[Type[Daemon]]
     # The kill patterns to cleanup any processes started by this daemon
     KILL_PATTERNS = ()  # type: Sequence[str]
+    # The number of seconds to wait for the daemon to be ready after its
+    # startup (None to wait forever)
+    STARTUP_TIMEOUT = 60  # type: Optional[float]
+    # The signal making the daemon reload its configuration files
+    # (None if it does not support it)
+    RELOAD_SIGNAL = None  # type: Optional[int]
 
     def __init__(self, node: 'IPNode',
                  template_lookup: TemplateLookup = router_template_lookup,
@@ -282,6 +385,14 @@ class Daemon(metaclass=abc.ABCMeta):
         self._node = node
         self._startup_line = None  # type: Optional[str]
         self.files = []  # type: List[str]
+        # The last written content of each configuration file, and the
+        # previous one
+        self._written_cfg = {}  # type: Dict[str, str]
+        self._previous_cfg = {}  # type: Dict[str, str]
+        # The hash of the last written content of each configuration file
+        self._hashes = {}  # type: Dict[str, str]
+        # Whether the last build changed the configuration files
+        self.changed = False
         self.template_lookup = template_lookup
         self._options = self._defaults(**kwargs)
 
@@ -313,7 +424,8 @@ class Daemon(metaclass=abc.ABCMeta):
         :param cfg: The global config for the node
         :param kwargs: Additional keywords args. will be passed directly
                        to the template"""
-        self.files.extend(self.cfg_filenames)
+        self.files.extend(f for f in self.cfg_filenames
+                          if f not in self.files)
         cfg_content = {}
         for i, filename in enumerate(self.cfg_filenames):
             log.debug('Generating %s\n' % filename)
@@ -333,13 +445,116 @@ class Daemon(metaclass=abc.ABCMeta):
                     self._node.name, self.NAME))
         return cfg_content
 
+    def render_job(self, cfg, **kwargs) \
+            -> Optional[Tuple[Tuple[str, ...], Optional[str],
+                              List[Tuple[str, str, Optional[str]]]]]:
+        """Describe the rendering of the configuration files of this daemon,
+        such that another process can render them
+
+        :param cfg: The global config for the node
+        :param kwargs: Additional keywords args. will be passed directly
+                       to the template
+        :return: The template directories, the directory of the compiled
+                 templates, and the template and hash of the last written
+                 content of each configuration file, or None if this daemon
+                 renders its configuration itself"""
+        if type(self).render is not Daemon.render or kwargs:
+            return None
+        self.files.extend(f for f in self.cfg_filenames
+                          if f not in self.files)
+        return (tuple(self.template_lookup.directories),
+                self.template_lookup.module_directory,
+                [(filename, template, self._hashes.get(filename))
+                 for filename, template in zip(self.cfg_filenames,
+                                               self.template_filenames)])
+
     def write(self, cfg: Dict[str, str]):
-        """Write down the configuration files for this daemon
+        """Write down the configuration files for this daemon, except those
+        whose content did not change
 
         :param cfg: The configuration string for each filename"""
         for filename in self.cfg_filenames:
-            with closing(open(filename, 'w')) as f:
-                f.write(cfg[filename])
+            if not write_if_changed(filename, cfg[filename],
+                                    self._hashes.get(filename)):
+                log.debug('%s did not change\n' % filename)
+        self.written(cfg)
+
+    def written(self, cfg: Dict[str, str]):
+        """Record the configuration files written for this daemon
+
+        :param cfg: The configuration string for each filename"""
+        hashes = {filename: config_hash(content)
+                  for filename, content in cfg.items()}
+        self.changed = hashes != self._hashes
+        self._hashes = hashes
+        self._previous_cfg = self._written_cfg
+        self._written_cfg = dict(cfg)
+
+    @property
+    def config_hashes(self) -> Dict[str, str]:
+        """The hash of the last written content of each configuration file"""
+        return dict(self._hashes)
+
+    def config_diff(self) -> str:
+        """Return the unified diff between the configuration files written by
+        the previous build and by the last one"""
+        diff = []  # type: List[str]
+        for filename in sorted(set(self._previous_cfg)
+                               | set(self._written_cfg)):
+            diff.extend(difflib.unified_diff(
+                self._previous_cfg.get(filename, '').splitlines(True),
+                self._written_cfg.get(filename, '').splitlines(True),
+                fromfile=filename, tofile=filename))
+        return ''.join(diff)
+
+    def reload(self) -> bool:
+        """Build and write again the configuration of this daemon, and apply
+        it to the running daemon without restarting it
+
+        :return: Whether the configuration changed
+        :raise NotImplementedError: if the daemon cannot reload its
+                                    configuration
+        :raise RuntimeError: if the new configuration was not applied"""
+        if self.RELOAD_SIGNAL is None \
+                and type(self).apply_config is Daemon.apply_config:
+            raise NotImplementedError('%s cannot reload its configuration'
+                                      % self.NAME)
+        old = self._written_cfg
+        new = self._node.nconfig.rebuild_daemon(self)
+        if not self.changed:
+            return False
+        log.info('*** Reloading %s on %s\n' % (self.NAME, self._node.name))
+        self.apply_config(old, new)
+        return True
+
+    def apply_config(self, old: Dict[str, str], new: Dict[str, str]):
+        """Apply a new configuration to the running daemon. By default, this
+        sends RELOAD_SIGNAL to the daemon.
+
+        :param old: The previous configuration content for each filename
+        :param new: The new configuration content for each filename
+        :raise RuntimeError: if the new configuration was not applied"""
+        pid = self.running_pid
+        if pid is None:
+            raise RuntimeError('%s is not running on %s'
+                               % (self.NAME, self._node.name))
+        try:
+            os.kill(pid, self.RELOAD_SIGNAL)
+        except OSError as e:
+            raise RuntimeError('Cannot signal %s on %s: %s'
+                               % (self.NAME, self._node.name, e))
+
+    @property
+    def running_pid(self) -> Optional[int]:
+        """The pid of the running daemon, or None if it is not running"""
+        p = self._node.daemon_process(self)
+        return p.pid if p is not None and p.poll() is None else None
+
+    @property
+    def pid_files(self) -> List[str]:
+        """The pid files written by the processes of this daemon. They can
+        outlive the process started by the node if it forks."""
+        return []
 
     @property
     @abc.abstractmethod
@@ -384,9 +599,12 @@ class Daemon(metaclass=abc.ABCMeta):
     def _defaults(self, **kwargs) -> ConfigDict:
         """Return the default options for this daemon
 
-        :param logfile: the path to the logfile for the daemon"""
+        :param logfile: the path to the logfile for the daemon
+        :param restart_policy: the RestartPolicy to apply if this daemon
+                               exits, overriding the one of the network"""
         defaults = ConfigDict()
         defaults.logfile = self._file('log')
+        defaults.restart_policy = None
         # Apply daemon-specific defaults
         self.set_defaults(defaults)
         # Use user-supplied defaults if present
@@ -397,9 +615,19 @@ class Daemon(metaclass=abc.ABCMeta):
     def set_defaults(self, defaults):
         """Update defaults to contain the defaults specific to this daemon"""
 
+    def readiness_conditions(self) -> Sequence[ReadinessCondition]:
+        """Return the conditions that must hold before considering this
+        daemon as started. The daemons of a node with a higher PRIO are only
+        started once these conditions hold."""
+        if type(self).has_started is not Daemon.has_started:
+            # Support daemons that only override has_started()
+            return [CallableReady(self.has_started,
+                                  description='%s.has_started()' % self.NAME)]
+        return ()
+
     def has_started(self) -> bool:
         """Return whether this daemon has started or not"""
-        return True
+        return all(c.is_ready() for c in self.readiness_conditions())
 
     @classmethod
     def get_config(cls, topo: 'IPTopo', node: 'NodeDescription', **kwargs):
@@ -454,10 +682,12 @@ class BorderRouterConfig(BasicRouterConfig):
     def __init__(self, node: 'Router',
                  daemons: Iterable[DaemonOption] = (),
                  additional_daemons: Iterable[DaemonOption] = (),
-                 *args, **kwargs):
+                 aggregate=False, *args, **kwargs):
         """A simple router made of at least an OSPF daemon and a BGP daemon
 
-        :param additional_daemons: Other daemons that should be used"""
+        :param additional_daemons: Other daemons that should be used
+        :param aggregate: Whether BGP announces the aggregates of the subnets
+                          of the AS instead of these subnets"""
         from .bgp import BGP, AF_INET, AF_INET6
 
         af = []
@@ -467,5 +697,5 @@ class BorderRouterConfig(BasicRouterConfig):
             af.append(AF_INET6(redistribute=('connected', 'ospf6')))
         if af:
             d = list(daemons)
-            d.append((BGP, {'address_families': af}))
+            d.append((BGP, {'address_families': af, 'aggregate': aggregate}))
         super().__init__(node, daemons=d, *args, **kwargs)
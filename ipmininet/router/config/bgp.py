@@ -1,14 +1,23 @@
 """Base classes to configure a BGP daemon"""
+import hashlib
 import heapq
-from typing import Sequence, TYPE_CHECKING, Optional, Union, Tuple, List, Set
+from collections import OrderedDict
+from typing import Sequence, TYPE_CHECKING, Optional, Union, Tuple, List, \
+    Set, Dict
 
 import itertools
 
-from ipaddress import ip_network, ip_address, IPv4Network, IPv6Network
+from mininet.log import lg
 
+from ipaddress import ip_network, ip_address, collapse_addresses, \
+    IPv4Network, IPv6Network
+
+from ipmininet import MIN_IGP_METRIC
 from ipmininet.link import IPIntf
 from ipmininet.overlay import Overlay
 from ipmininet.utils import realIntfList
+from .base import RouterConfig
+from .utils import ConfigNode
 from .zebra import QuaggaDaemon, Zebra, RouteMap, AccessList, \
     RouteMapMatchCond, CommunityList, RouteMapSetAction, PERMIT, DENY
 
@@ -18,6 +27,18 @@ if TYPE_CHECKING:
 
 
 BGP_DEFAULT_PORT = 179
+# The keepalive interval of FRRouting, in seconds
+BGP_DEFAULT_KEEPALIVE = 60
+# Named sets of options of the BGP daemon, e.g., BGP(profile='lab')
+BGP_PROFILES = {
+    # The peers of a restarting router keep its routes until it comes back
+    'graceful-restart': {'graceful_restart': True},
+    # Detect the failures and propagate the routes as fast as possible
+    'fast': {'keepalive': 1, 'holdtime': 3, 'connect_retry': 1,
+             'advertisement_interval': 0},
+}
+BGP_PROFILES['lab'] = dict(BGP_PROFILES['graceful-restart'],
+                           **BGP_PROFILES['fast'])
 SHARE = "Share"
 CLIENT_PROVIDER = "Client-Provider"
 
@@ -59,6 +80,274 @@ class iBGPFullMesh(AS):
         return '<iBGPMesh %s>' % self.asn
 
 
+class RRCluster:
+    """A set of route reflectors and of their clients"""
+
+    def __init__(self, tier: int, cluster_id: str, members: Sequence[str],
+                 reflectors: Sequence[str] = ()):
+        """:param tier: The level of the cluster in the hierarchy, from 1
+        :param cluster_id: The cluster id of the route reflectors
+        :param members: The routers of the cluster
+        :param reflectors: The route reflectors among the members"""
+        self.tier = tier
+        self.cluster_id = cluster_id
+        self.members = list(members)
+        self.reflectors = list(reflectors)
+
+    @property
+    def clients(self) -> List[str]:
+        return [m for m in self.members if m not in self.reflectors]
+
+    def __str__(self):
+        return '<RRCluster %s tier=%d reflectors=%s>' % (
+            self.cluster_id, self.tier, self.reflectors)
+
+
+class iBGPHierarchy(AS):
+    """An overlay class to establish iBGP sessions through a hierarchy of
+    route reflectors, picked automatically among the BGP routers of the AS.
+
+    The routers are grouped in pods, each forming a cluster of the first
+    tier. The most central routers of each cluster, i.e., the ones with the
+    shortest IGP paths towards the other members, are its route reflectors
+    and peer with all the other members. At each upper tier, the route
+    reflectors of `fanout` clusters of the tier below form a new cluster. The
+    route reflectors of the top tier are connected in full mesh."""
+
+    def __init__(self, asn: int, routers: Sequence[str] = (),
+                 pods: Sequence[Sequence[str]] = (), redundancy=2, tiers=1,
+                 fanout=4, cluster_id='10.0.0.0', **props):
+        """:param asn: The number for this AS
+        :param routers: an initial set of routers to add to this AS
+        :param pods: groups of routers sharing their route reflectors, the
+                     routers in no pod are grouped in another one
+        :param redundancy: the number of route reflectors of each cluster
+        :param tiers: the maximal number of tiers of route reflectors
+        :param fanout: the number of clusters of a tier whose route
+                       reflectors are grouped in a cluster of the next tier
+        :param cluster_id: the cluster ids are allocated after this address
+        :param props: key-values to set on all routers of this AS"""
+        if redundancy < 1 or tiers < 1 or fanout < 1:
+            raise ValueError('The redundancy, tiers and fanout of %s must be'
+                             ' positive' % asn)
+        routers = list(routers)
+        for pod in pods:
+            routers.extend(r for r in pod if r not in routers)
+        super().__init__(asn, routers=routers, **props)
+        self.pods = [list(pod) for pod in pods]
+        self.redundancy = redundancy
+        self.tiers = tiers
+        self.fanout = fanout
+        self.cluster_id = ip_address(cluster_id)
+        self.clusters = []  # type: List[RRCluster]
+
+    def apply(self, topo):
+        self.clusters = self.build_hierarchy(topo)
+        sessions = OrderedDict()  # type: Dict[frozenset, Tuple[str, str]]
+
+        def add_session(a, b):
+            key = frozenset((a, b))
+            if a != b and key not in sessions:
+                sessions[key] = a, b
+
+        for cluster in self.clusters:
+            for a, b in itertools.combinations(cluster.reflectors, 2):
+                add_session(a, b)
+            clients = cluster.clients
+            for rr in cluster.reflectors:
+                for client in clients:
+                    add_session(rr, client)
+                if not clients:
+                    continue
+                topo.getNodeInfo(rr, 'bgp_rr_clients', set).update(clients)
+                rr_info = topo.getNodeInfo(rr, 'bgp_rr_info', list)
+                if not rr_info:
+                    rr_info.append(True)
+                    # A router reflects with the cluster id of its lowest tier
+                    topo.nodeInfo(rr).setdefault('bgp_cluster_id',
+                                                 cluster.cluster_id)
+        top = self.clusters[-1].tier if self.clusters else 0
+        for a, b in itertools.combinations(
+                [r for c in self.clusters if c.tier == top
+                 for r in c.reflectors], 2):
+            add_session(a, b)
+        for a, b in sessions.values():
+            bgp_peering(topo, a, b)
+        super().apply(topo)
+
+    def build_hierarchy(self, topo: 'IPTopo') -> List[RRCluster]:
+        """Return the clusters of route reflectors of each tier
+
+        :param topo: The current topology"""
+        assigned = {r for pod in self.pods for r in pod}
+        groups = [pod for pod in self.pods if pod]
+        others = [r for r in self.nodes if r not in assigned]
+        if others:
+            groups.append(others)
+        distances = igp_distances(topo, self.nodes)
+        clusters = []  # type: List[RRCluster]
+        ids = itertools.count(1)
+        for tier in range(1, self.tiers + 1):
+            if tier > 1 and len(groups) == 1 \
+                    and len(groups[0]) <= self.redundancy:
+                # The route reflectors of the tier below are already meshed
+                break
+            tier_clusters = [
+                RRCluster(tier, str(self.cluster_id + next(ids)), members,
+                          reflectors=most_central(members, distances,
+                                                  self.redundancy))
+                for members in groups]
+            clusters.extend(tier_clusters)
+            groups = [[r for c in tier_clusters[i:i + self.fanout]
+                       for r in c.reflectors]
+                      for i in range(0, len(tier_clusters), self.fanout)]
+        return clusters
+
+    def __str__(self):
+        return '<iBGPHierarchy %s>' % self.asn
+
+
+class RouteServer(Overlay):
+    """An overlay class modeling an internet exchange point whose members
+    peer with a route server instead of with each other. The route server
+    and the routers of the members are connected to a shared LAN, and each
+    member only has an eBGP session with the route server, such that the
+    number of sessions grows linearly with the number of members.
+
+    The route server is transparent: it neither prepends its AS number nor
+    changes the next hop of the routes, so that the members exchange their
+    traffic directly over the LAN. The members apply the import and export
+    policies of their relationship with the other members."""
+
+    def __init__(self, name: str, asn: int, members: Sequence[str] = (),
+                 switch: Optional[str] = None,
+                 relationships: Optional[Dict[str, str]] = None, **props):
+        """:param name: The name of the route server, which is added to the
+                     topology if it does not exist
+        :param asn: The AS number of the route server
+        :param members: The routers of the members
+        :param switch: The name of the switch of the LAN, 's' followed by
+                       the name of the route server by default, which is
+                       added to the topology if it does not exist. Its name
+                       must contain a number.
+        :param relationships: The relationship of each member with the other
+                              members, SHARE (the default) or CLIENT_PROVIDER
+                              if the member is their client
+        :param props: key-values to set on the route server"""
+        props['asn'] = asn
+        super().__init__(nodes=[name], nprops=props)
+        self.name = name
+        self.members = list(members)
+        self.switch = switch if switch is not None else 's%s' % name
+        self.relationships = dict(relationships or {})
+
+    @property
+    def asn(self) -> int:
+        return self.nodes_properties['asn']
+
+    def apply(self, topo):
+        if self.name not in topo.nodes():
+            topo.addRouter(self.name,
+                           config=(RouterConfig, {'daemons': [BGP]}))
+        if self.switch not in topo.nodes():
+            topo.addSwitch(self.switch)
+        roles = {SHARE: PEER_ROLE, CLIENT_PROVIDER: CLIENT_ROLE}
+        for n in [self.name] + self.members:
+            if self.switch not in topo.g.edge.get(n, ()):
+                topo.addLink(n, self.switch)
+            # The members are in different ASes
+            topo.linkInfo(n, self.switch)['igp_passive'] = True
+        for m in self.members:
+            try:
+                role = roles[self.relationships.get(m, SHARE)]
+            except KeyError:
+                raise ValueError('Unknown relationship %s of %s with %s'
+                                 % (self.relationships[m], m, self))
+            session_policy(topo, m, self.name, role)
+            bgp_peering(topo, self.name, m)
+            topo.getNodeInfo(m, 'bgp_route_servers', set).add(self.name)
+        topo.getNodeInfo(self.name, 'bgp_rs_clients', set).update(
+            self.members)
+        super().apply(topo)
+
+    def check_consistency(self, topo):
+        members = set(self.members)
+        others = [n for n in self.relationships if n not in members]
+        if others:
+            lg.error('The relationships of', self, 'refer to routers that'
+                     ' are not members:', ', '.join(map(str, others)), '\n')
+        return not others
+
+    def __str__(self):
+        return '<RouteServer %s AS%s>' % (self.name, self.asn)
+
+
+def igp_adjacency(topo: 'IPTopo') -> Dict[str, List[Tuple[str, int]]]:
+    """Return the neighbors of each node of the topology, with the IGP
+    metric of their link
+
+    :param topo: The current topology"""
+    adjacency = {}  # type: Dict[str, List[Tuple[str, int]]]
+    for src, dst, info in topo.iterLinks(withInfo=True):
+        metric = info.get('igp_metric', MIN_IGP_METRIC)
+        adjacency.setdefault(src, []).append((dst, metric))
+        adjacency.setdefault(dst, []).append((src, metric))
+    return adjacency
+
+
+def igp_distances(topo: 'IPTopo', routers: Sequence[str],
+                  sources: Optional[Sequence[str]] = None,
+                  adjacency: Optional[Dict[str, List[Tuple[str, int]]]] =
+                  None) -> Dict[str, Dict[str, int]]:
+    """Return the length of the shortest IGP paths between routers, through
+    these routers and the switches of the topology
+
+    :param topo: The current topology
+    :param routers: The routers to consider
+    :param sources: The routers from which the paths start, all the routers
+                    by default
+    :param adjacency: The result of igp_adjacency() for the topology, if
+                      it is already computed"""
+    transit = set(routers)
+    if adjacency is None:
+        adjacency = igp_adjacency(topo)
+    distances = {}  # type: Dict[str, Dict[str, int]]
+    for source in (routers if sources is None else sources):
+        costs = {source: 0}
+        visited = set()  # type: Set[str]
+        prio_queue = [(0, source)]
+        while prio_queue:
+            cost, n = heapq.heappop(prio_queue)
+            if n in visited:
+                continue
+            visited.add(n)
+            if n != source and n not in transit and not topo.isSwitch(n):
+                continue
+            for m, metric in adjacency.get(n, ()):
+                m_cost = cost + metric
+                if m not in visited and m_cost < costs.get(m, m_cost + 1):
+                    costs[m] = m_cost
+                    heapq.heappush(prio_queue, (m_cost, m))
+        distances[source] = {r: costs[r] for r in routers if r in costs}
+    return distances
+
+
+def most_central(routers: Sequence[str],
+                 distances: Dict[str, Dict[str, int]], count: int) \
+        -> List[str]:
+    """Return the routers with the shortest paths to all the other ones
+
+    :param routers: The candidate routers
+    :param distances: The length of the paths from each router
+    :param count: The number of routers to return"""
+    def centrality(r):
+        paths = distances.get(r, {})
+        reachable = [paths[x] for x in routers if x in paths]
+        return len(routers) - len(reachable), sum(reachable), str(r)
+
+    return sorted(routers, key=centrality)[:count]
+
+
 def bgp_fullmesh(topo, routers: Sequence[str]):
     """Establish a full-mesh set of BGP peerings between routers
 
@@ -89,58 +378,55 @@ def ebgp_session(topo: 'IPTopo', a: 'RouterDescription', b: 'RouterDescription',
                       ebgp_session will create import and export
                       filter and set local pref based on the link type
     """
-    if link_type:
-        all_al = AccessList('All', ('any',))
-        # Create the community filter for the export policy
-        peers_link = CommunityList(name='from-peers', community=1,
-                                   action=PERMIT)
-        up_link = CommunityList(name='from-up', community=3, action=PERMIT)
-
-        if link_type == SHARE:
-            # Set the community and local pref for the import policy
-            a.get_config(BGP)\
-                .set_community(1, from_peer=b, matching=(all_al,)) \
-                .set_local_pref(150, from_peer=b, matching=(all_al,))
-            b.get_config(BGP)\
-                .set_community(1, from_peer=a, matching=(all_al,))\
-                .set_local_pref(150, from_peer=a, matching=(all_al,))
-
-            # Create route maps to filter exported route
-            a.get_config(BGP)\
-                .deny('export-to-peer-' + b, to_peer=b, matching=(up_link,),
-                      order=10)\
-                .deny('export-to-peer-' + b, to_peer=b, matching=(peers_link,),
-                      order=15)\
-                .permit('export-to-peer-' + b, to_peer=b, order=20)
-
-            b.get_config(BGP)\
-                .deny('export-to-peer-' + a, to_peer=a, matching=(up_link,),
-                      order=10)\
-                .deny('export-to-peer-' + a, to_peer=a, matching=(peers_link,),
-                      order=15)\
-                .permit('export-to-peer-' + a, to_peer=a, order=20)
-
-        elif link_type == CLIENT_PROVIDER:
-            # Set the community and local pref for the import policy
-            a.get_config(BGP)\
-                .set_community(3, from_peer=b, matching=(all_al,)) \
-                .set_local_pref(100, from_peer=b, matching=(all_al,))
-            b.get_config(BGP)\
-                .set_community(2, from_peer=a, matching=(all_al,))\
-                .set_local_pref(200, from_peer=a, matching=(all_al,))
-
-            # Create route maps to filter exported route
-            a.get_config(BGP)\
-                .deny('export-to-up-' + b, to_peer=b, matching=(up_link,),
-                      order=10)\
-                .deny('export-to-up-' + b, to_peer=b, matching=(peers_link,),
-                      order=15)\
-                .permit('export-to-up-' + b, to_peer=b, order=20)
+    if link_type == SHARE:
+        session_policy(topo, a, b, PEER_ROLE)
+        session_policy(topo, b, a, PEER_ROLE)
+    elif link_type == CLIENT_PROVIDER:
+        session_policy(topo, a, b, CLIENT_ROLE)
+        session_policy(topo, b, a, PROVIDER_ROLE)
 
     bgp_peering(topo, a, b)
     topo.linkInfo(a, b)['igp_passive'] = True
 
 
+# The roles of a router in its relationship with a peer
+PEER_ROLE = 'peer'
+CLIENT_ROLE = 'client'
+PROVIDER_ROLE = 'provider'
+
+
+def session_policy(topo: 'IPTopo', a: str, b: str, role: str):
+    """Set the import and export policies of a router for the routes
+    exchanged with a peer, based on their relationship. The routes learned
+    from peers and providers are not exported to peers and providers.
+
+    :param topo: The current topology
+    :param a: Local router
+    :param b: Peer router
+    :param role: The role of the local router in the relationship, PEER_ROLE
+                 for a SHARE link, CLIENT_ROLE or PROVIDER_ROLE for
+                 a CLIENT_PROVIDER link"""
+    all_al = AccessList('All', ('any',))
+    # Create the community filter for the export policy
+    peers_link = CommunityList(name='from-peers', community=1, action=PERMIT)
+    up_link = CommunityList(name='from-up', community=3, action=PERMIT)
+    community, local_pref, export = {
+        PEER_ROLE: (1, 150, 'export-to-peer'),
+        CLIENT_ROLE: (3, 100, 'export-to-up'),
+        PROVIDER_ROLE: (2, 200, None),
+    }[role]
+    config = BGPConfig(topo, a)
+    # Set the community and local pref for the import policy
+    config.set_community(community, from_peer=b, matching=(all_al,))\
+        .set_local_pref(local_pref, from_peer=b, matching=(all_al,))
+    if export is not None:
+        # Create route maps to filter exported route
+        # The route maps are shared by all the sessions of a router
+        config.deny(export, to_peer=b, matching=(up_link,), order=10)\
+            .deny(export, to_peer=b, matching=(peers_link,), order=15)\
+            .permit(export, to_peer=b, order=20)
+
+
 class BGPConfig:
 
     def __init__(self, topo: 'IPTopo', router: 'RouterDescription'):
@@ -291,25 +577,36 @@ class BGPConfig:
                               filter_list: Sequence[Union[AccessList,
                                                           CommunityList]]):
         match_cond = []
-        access_lists = self.topo.getNodeInfo(self.router, 'bgp_access_lists',
-                                             list)
-        community_list = self.topo.getNodeInfo(self.router,
-                                               'bgp_community_lists', list)
-
         # Create match_conditions based on the provided filters
         for f in filter_list:
             if isinstance(f, CommunityList):
                 match_cond.append(RouteMapMatchCond('community', f.name))
-                if f not in community_list:
-                    community_list.append(f)
+                self._add_filter('bgp_community_lists', f)
             elif isinstance(f, AccessList):
                 match_cond.append(RouteMapMatchCond('access-list', f.name))
-                if f not in access_lists:
-                    access_lists.append(f)
+                self._add_filter('bgp_access_lists', f)
             else:
                 raise Exception("Filter not yet implemented")
         return match_cond
 
+    def _add_filter(self, key: str, f: Union[AccessList, CommunityList]):
+        """Add a filter to a list of the router, unless an equal filter is
+        already in it
+
+        :param key: The name of the list
+        :param f: The filter"""
+        filters = self.topo.getNodeInfo(self.router, key, list)
+        index = self.topo.getNodeInfo(self.router, 'bgp_filter_index', dict)
+        size, names = index.get(key, (0, set()))
+        if size != len(filters):
+            # The list was changed without the index
+            names = {_filter_key(x) for x in filters}
+        name = _filter_key(f)
+        if name not in names:
+            filters.append(f)
+            names.add(name)
+        index[key] = (len(filters), names)
+
     def add_set_action(self, peer: str, set_action: RouteMapSetAction,
                        matching: Sequence[Union[AccessList, CommunityList]],
                        direction: str) -> 'BGPConfig':
@@ -329,18 +626,256 @@ class BGPConfig:
         return self
 
 
-def set_rr(topo: 'IPTopo', rr: str, peers: Sequence[str] = ()):
+def _filter_key(f: Union[AccessList, CommunityList]) -> tuple:
+    """Return a key equal for equal filters"""
+    if isinstance(f, CommunityList):
+        return f.name, f.action
+    return f.name,
+
+
+def _policy_key(item: Union[RouteMapMatchCond, RouteMapSetAction]) -> tuple:
+    """Return a key equal for equal match conditions or set actions"""
+    if isinstance(item, RouteMapMatchCond):
+        return item.cond_type, item.condition
+    return item.action_type, item.value
+
+
+def _merge_unique(items: list, others: Sequence[list]):
+    """Append the items of other lists to a list, unless an equal item is
+    already in it"""
+    try:
+        keys = {_policy_key(i) for i in items}
+        for other in others:
+            for i in other:
+                key = _policy_key(i)
+                if key not in keys:
+                    keys.add(key)
+                    items.append(i)
+    except TypeError:  # Unhashable values
+        for other in others:
+            for i in other:
+                if i not in items:
+                    items.append(i)
+
+
+def merge_route_maps(route_maps: Sequence[RouteMap]) -> RouteMap:
+    """Merge the entries of a route map applied to the same neighbor, in the
+    same direction and with the same order. The last entry is kept, and the
+    match conditions and set actions of the previous ones are appended to it,
+    from the most recent one.
+
+    :param route_maps: The entries, from the oldest one"""
+    rm = route_maps[-1]
+    if len(route_maps) > 1:
+        previous = route_maps[-2::-1]
+        _merge_unique(rm.match_cond, [r.match_cond for r in previous])
+        _merge_unique(rm.set_actions, [r.set_actions for r in previous])
+    return rm
+
+
+def group_route_maps(entries: Sequence[Dict], neighbors: Dict[str, list]) \
+        -> List[RouteMap]:
+    """Return the route maps of a router, whose entries applied to the same
+    neighbor, in the same direction and with the same exit policy and order
+    are merged
+
+    :param entries: The route map entries of the router, i.e., the
+                    bgp_route_maps of its node
+    :param neighbors: The neighbors to which the entries apply, by peer"""
+    # The entries of each route map, by neighbor, direction, exit policy
+    # and order, sorted by their last entry
+    route_maps = OrderedDict()  # type: Dict[tuple, List[RouteMap]]
+    for kwargs in entries:
+        kwargs = dict(kwargs)
+        for neighbor in neighbors.get(kwargs.pop('peer'), ()):
+            kwargs['neighbor'] = neighbor
+            rm = RouteMap(**kwargs)
+            key = (neighbor, rm.direction, rm.exit_policy, rm.order)
+            try:
+                route_maps[key].append(rm)
+                route_maps.move_to_end(key)
+            except KeyError:
+                route_maps[key] = [rm]
+    return [merge_route_maps(rms) for rms in route_maps.values()]
+
+
+class RouteMapBinding(ConfigNode):
+    """A route map applied to a BGP neighbor"""
+    __slots__ = ('peer', 'family', 'name', 'direction')
+
+
+def _content_name(prefix: str, content: str) -> str:
+    """Return a name derived from the content of a policy, which is the same
+    across builds and processes"""
+    return '%s-%s' % (prefix, hashlib.sha1(content.encode()).hexdigest()[:8])
+
+
+def dedup_filters(filters: Sequence[Union[AccessList, CommunityList]],
+                  prefix: str) -> Tuple[List, Dict[str, str]]:
+    """Keep one filter list per content. The lists with the same name form
+    one list, e.g., the entries of a community list. Equal lists take the
+    first name chosen by the user, or a name derived from their content if
+    all their names were generated.
+
+    :param filters: The AccessList or CommunityList objects
+    :param prefix: The prefix of the names derived from the contents
+    :return: The kept objects, renamed, and the new name of the lists whose
+             name changed"""
+    lists = OrderedDict()  # type: Dict[str, list]
+    for f in filters:
+        lists.setdefault(f.name, []).append(f)
+    names = OrderedDict()  # type: Dict[str, List[str]]
+    for name, objs in lists.items():
+        if isinstance(objs[0], CommunityList):
+            content = [(f.action, f.community) for f in objs]
+        else:
+            content = [(e.action, str(e.prefix)) for f in objs
+                       for e in f.entries]
+        names.setdefault(repr(content), []).append(name)
+    kept = []
+    renames = {}  # type: Dict[str, str]
+    for content, equal in names.items():
+        chosen = [n for n in equal
+                  if not all(f.generated_name for f in lists[n])]
+        name = chosen[0] if chosen else _content_name(prefix, content)
+        for n in equal:
+            if n != name:
+                renames[n] = name
+        for f in lists[chosen[0] if chosen else equal[0]]:
+            f.name = name
+            kept.append(f)
+    return kept, renames
+
+
+def _entry_key(rm: RouteMap) -> tuple:
+    return (rm.match_policy, rm.order,
+            [_policy_key(c) for c in rm.match_cond],
+            [_policy_key(a) for a in rm.set_actions],
+            rm.call_action, rm.exit_policy)
+
+
+def dedup_route_maps(route_maps: Sequence[RouteMap],
+                     renames: Optional[Dict[str, Dict[str, str]]] = None) \
+        -> Tuple[List[RouteMap], List[RouteMapBinding]]:
+    """Keep one route map per content. The entries applied to a neighbor in
+    a direction form its route map, and the neighbors whose route maps have
+    the same entries share one of them. A shared route map takes the first
+    name chosen by the user for its entries, or a name derived from its
+    content.
+
+    :param route_maps: The merged entries of the route maps of a router
+    :param renames: The new names of the filter lists, by condition type
+    :return: The entries of the kept route maps, renamed, and the route map
+             applied to each neighbor"""
+    renames = renames or {}
+    chains = OrderedDict()  # type: Dict[tuple, List[RouteMap]]
+    for rm in route_maps:
+        rm.match_cond = [
+            RouteMapMatchCond(c.cond_type, renames[c.cond_type][c.condition])
+            if c.condition in renames.get(c.cond_type, ()) else c
+            for c in rm.match_cond]
+        chains.setdefault((rm.neighbor, rm.direction), []).append(rm)
+    # The route maps are rendered for each family, with the family as suffix
+    contents = OrderedDict()  # type: Dict[Tuple[str, str], List[tuple]]
+    for (neighbor, direction), entries in chains.items():
+        entries.sort(key=lambda x: x.order)
+        content = repr([_entry_key(rm) for rm in entries])
+        contents.setdefault((neighbor.family, content), []).append(
+            (neighbor, direction, entries))
+    names = {}  # type: Dict[Tuple[str, str], str]
+    kept = []  # type: List[RouteMap]
+    bindings = []  # type: List[RouteMapBinding]
+    for (family, content), equal in contents.items():
+        chosen = [rm.name for _, _, entries in equal for rm in entries
+                  if not rm.generated_name]
+        name = chosen[0] if chosen else _content_name('rm', content)
+        if names.setdefault((name, family), content) != content:
+            # The name is already used by another route map
+            name = _content_name(name, content)
+        for rm in equal[0][2]:
+            rm.name = name
+            kept.append(rm)
+        bindings.extend(RouteMapBinding(peer=neighbor.peer, family=family,
+                                        name=name, direction=direction)
+                        for neighbor, direction, _ in equal)
+    return kept, bindings
+
+
+class PeerGroup(ConfigNode):
+    """A set of BGP neighbors sharing their options and outbound policies"""
+    __slots__ = ('name', 'family', 'ebgp_multihop', 'nh_self', 'rr_client',
+                 'rs_client', 'route_server', 'members')
+
+
+def group_peers(neighbors: Sequence['Peer'],
+                bindings: Sequence[RouteMapBinding], min_size=2) \
+        -> Tuple[List[PeerGroup], List[RouteMapBinding]]:
+    """Gather the neighbors with the same family, type of session, options
+    and route maps in peer groups, such that their options are rendered once
+    and that bgpd generates their updates once. The neighbors of a group
+    keep their own AS number, port and description. The name of a group is
+    derived from its content, such that the configuration does not change
+    between builds.
+
+    :param neighbors: The neighbors of a router
+    :param bindings: The route maps applied to the neighbors
+    :param min_size: The minimal number of neighbors of a group
+    :return: The peer groups, and the route maps applied to the groups and
+             to the other neighbors"""
+    policies = OrderedDict()  # type: Dict[str, List[Tuple[str, str]]]
+    for b in bindings:
+        policies.setdefault(b.peer, []).append((b.name, b.direction))
+    groups = OrderedDict()  # type: Dict[str, List[Peer]]
+    for n in neighbors:
+        key = repr((n.family, n.ebgp_multihop, n.nh_self, n.rr_client,
+                    n.rs_client, n.route_server,
+                    sorted(policies.get(n.peer, ()))))
+        groups.setdefault(key, []).append(n)
+    peer_groups = []  # type: List[PeerGroup]
+    names = {}  # type: Dict[str, str]
+    for key, members in groups.items():
+        if len(members) < min_size:
+            continue
+        first = members[0]
+        group = PeerGroup(name=_content_name('pg', key), family=first.family,
+                          ebgp_multihop=first.ebgp_multihop,
+                          nh_self=first.nh_self, rr_client=first.rr_client,
+                          rs_client=first.rs_client,
+                          route_server=first.route_server,
+                          members=[n.peer for n in members])
+        for n in members:
+            n.peer_group = names[n.peer] = group.name
+        peer_groups.append(group)
+    # The route maps of the groups are applied once to each group
+    kept = []  # type: List[RouteMapBinding]
+    seen = set()  # type: Set[Tuple[str, str, str]]
+    for b in bindings:
+        peer = names.get(b.peer, b.peer)
+        if (peer, b.family, b.direction) in seen:
+            continue
+        seen.add((peer, b.family, b.direction))
+        kept.append(b if peer == b.peer else
+                    RouteMapBinding(peer=peer, family=b.family, name=b.name,
+                                    direction=b.direction))
+    return peer_groups, kept
+
+
+def set_rr(topo: 'IPTopo', rr: str, peers: Sequence[str] = (),
+           cluster_id: Optional[str] = None):
     """
     Set rr as route reflector for all router r
 
     :param topo: The current topology
     :param rr: The route reflector
     :param peers: Clients of the route reflector
+    :param cluster_id: The cluster id of the route reflector
     """
     for r in peers:
         bgp_peering(topo, rr, r)
     router_is_rr = topo.getNodeInfo(rr, 'bgp_rr_info', list)
     router_is_rr.append(True)
+    if cluster_id is not None:
+        topo.nodeInfo(rr)['bgp_cluster_id'] = cluster_id
 
 
 class BGP(QuaggaDaemon):
@@ -356,19 +891,60 @@ class BGP(QuaggaDaemon):
 
     def __init__(self, node, port=BGP_DEFAULT_PORT,
                  *args, **kwargs):
+        profile = kwargs.get('profile')
+        if profile is not None:
+            try:
+                # The options given explicitly override those of the profile
+                kwargs = dict(BGP_PROFILES[profile], **kwargs)
+            except KeyError:
+                raise ValueError('Unknown BGP profile %s, expected one of %s'
+                                 % (profile, ', '.join(sorted(BGP_PROFILES))))
         super().__init__(node=node, *args, **kwargs)
         self.port = port
+        self._neighbors = None  # type: Optional[List[Peer]]
+
+    @property
+    def neighbors(self) -> List['Peer']:
+        """The BGP peers of this router, as of the last build of its
+        configuration"""
+        if self._neighbors is None:
+            self._neighbors = self._build_neighbors()
+        return self._neighbors
 
     def build(self):
         cfg = super().build()
         cfg.asn = self._node.asn
-        cfg.neighbors = self._build_neighbors()
+        cfg.neighbors = self._neighbors = self._build_neighbors()
         cfg.address_families = self._address_families(
             self.options.address_families, cfg.neighbors)
-        cfg.access_lists = self.build_access_list()
-        cfg.community_lists = self.build_community_list()
-        cfg.route_maps = self.build_route_map(cfg.neighbors)
+        cfg.aggregates = self._build_aggregates(cfg.address_families)
+        # Sessions with the same policies share the same lists and route maps
+        cfg.access_lists, acl_renames = dedup_filters(
+            self.build_access_list(), 'acl')
+        cfg.community_lists, cml_renames = dedup_filters(
+            self.build_community_list(), 'cml')
+        cfg.route_maps, cfg.route_map_bindings = dedup_route_maps(
+            self.build_route_map(cfg.neighbors),
+            {'access-list': acl_renames, 'community': cml_renames})
+        cfg.peer_groups = []
+        if self.options.peer_groups:
+            cfg.peer_groups, cfg.route_map_bindings = group_peers(
+                cfg.neighbors, cfg.route_map_bindings)
+        cfg.maximum_paths = self.maximum_paths
+        for key in ('graceful_restart', 'restart_time', 'stale_path_time',
+                    'long_lived_stale_time', 'connect_retry',
+                    'advertisement_interval'):
+            cfg[key] = self.options[key]
+        if self.options.keepalive is not None \
+                or self.options.holdtime is not None:
+            keepalive = self.options.keepalive
+            if keepalive is None:
+                keepalive = BGP_DEFAULT_KEEPALIVE
+            holdtime = self.options.holdtime
+            cfg.timers = (keepalive, 3 * keepalive if holdtime is None
+                          else holdtime)
         cfg.rr = self._node.get('bgp_rr_info')
+        cfg.cluster_id = self._node.get('bgp_cluster_id', '10.0.0.0')
 
         return cfg
 
@@ -385,6 +961,7 @@ class BGP(QuaggaDaemon):
                 cl = CommunityList(name=node_cl.name,
                                    community=node_cl.community,
                                    action=node_cl.action)
+                cl.generated_name = node_cl.generated_name
                 community_lists.append(cl)
                 if isinstance(node_cl.community, int):
                     cl.community = '%s:%d' % (self._node.asn, node_cl.community)
@@ -399,8 +976,10 @@ class BGP(QuaggaDaemon):
         access_lists = []
         if node_access_lists is not None:
             for acl_entries in node_access_lists:
-                access_lists.append(AccessList(name=acl_entries.name,
-                                               entries=acl_entries.entries))
+                acl = AccessList(name=acl_entries.name,
+                                 entries=acl_entries.entries)
+                acl.generated_name = acl_entries.generated_name
+                access_lists.append(acl)
         return access_lists
 
     def build_route_map(self, neighbors: Sequence['Peer']) -> List[RouteMap]:
@@ -408,46 +987,103 @@ class BGP(QuaggaDaemon):
         Build and return a list of route map for the current node
         """
         node_route_maps = self._node.get('bgp_route_maps')
-        route_maps = []  # type: List[RouteMap]
-        if node_route_maps is not None:
-            for kwargs in node_route_maps:
-                remote_peer = kwargs.pop('peer')
-                peers = []
-                for neighbor in neighbors:
-                    if neighbor.node == remote_peer:
-                        peers.append(neighbor)
-                for peer in peers:
-                    kwargs['neighbor'] = peer
-                    rm = RouteMap(**kwargs)
-                    # If route map already exist, add conditions and actions
-                    # to it
-                    try:
-                        index = route_maps.index(rm)
-                        tmp_rm = route_maps.pop(index)
-                        rm.append_match_cond(tmp_rm.match_cond)
-                        rm.append_set_action(tmp_rm.set_actions)
-                    except ValueError:
-                        pass
-                    route_maps.append(rm)
-        return route_maps
+        if node_route_maps is None:
+            return []
+        peers = {}  # type: Dict[str, List[Peer]]
+        for neighbor in neighbors:
+            peers.setdefault(neighbor.node, []).append(neighbor)
+        return group_route_maps(node_route_maps, peers)
 
     def set_defaults(self, defaults):
         """:param debug: the set of debug events that should be logged
-        :param address_families: The set of AddressFamily to use"""
+        :param address_families: The set of AddressFamily to use
+        :param maximum_paths: The maximal number of equal-cost paths of a
+                              route learned over eBGP, and over iBGP,
+                              defaulting to the ecmp parameter of the router
+                              configuration
+        :param aggregate: Whether to announce the minimal set of aggregates
+                          covering the subnets of the broadcast domains of
+                          the AS, instead of these subnets
+        :param peer_groups: Whether to gather the neighbors with the same
+                            options and route maps in peer groups, instead
+                            of rendering the options of each neighbor
+        :param profile: The name of a set of options in BGP_PROFILES, whose
+                        values are used instead of the defaults
+        :param graceful_restart: Whether the peers keep the routes of this
+                                 router while it restarts, and whether it
+                                 keeps its forwarding state
+        :param restart_time: The number of seconds announced to the peers
+                             to restart (FRRouting's default if None)
+        :param stale_path_time: The number of seconds the routes of
+                                a restarting peer are kept after the session
+                                is back (FRRouting's default if None)
+        :param long_lived_stale_time: The number of seconds the routes of
+                                      a restarting peer are kept as
+                                      long-lived stale routes (RFC 9494),
+                                      None to disable it. It requires
+                                      FRRouting 8.2 or later.
+        :param keepalive: The keepalive interval of the sessions, in seconds
+                          (FRRouting's default if None)
+        :param holdtime: The hold time of the sessions, in seconds, three
+                         times the keepalive interval if None
+        :param connect_retry: The number of seconds between two attempts
+                              to establish a session (FRRouting's default if
+                              None)
+        :param advertisement_interval: The minimal number of seconds between
+                                       two updates sent to a peer
+                                       (FRRouting's default if None)"""
         defaults.address_families = [AF_INET(), AF_INET6()]
+        defaults.maximum_paths = None
+        defaults.aggregate = False
+        defaults.peer_groups = False
+        defaults.profile = None
+        defaults.graceful_restart = False
+        defaults.restart_time = None
+        defaults.stale_path_time = None
+        defaults.long_lived_stale_time = None
+        defaults.keepalive = None
+        defaults.holdtime = None
+        defaults.connect_retry = None
+        defaults.advertisement_interval = None
         super().set_defaults(defaults)
 
     def _build_neighbors(self) -> List['Peer']:
         """Compute the set of BGP peers for this BGP router
         :return: set of neighbors"""
         neighbors = []
+        rr = self._node.get('bgp_rr_info')
+        clients = self._node.get('bgp_rr_clients')
+        rs_clients = self._node.get('bgp_rs_clients', ())
+        route_servers = self._node.get('bgp_route_servers', ())
         for x in self._node.get('bgp_peers', []):
             for v6 in [True, False]:
                 peer = Peer(self._node, x, v6=v6)
                 if peer.peer:
+                    # Without an explicit set of clients, a route reflector
+                    # reflects the routes of all its iBGP peers
+                    peer.rr_client = bool(rr) and peer.asn == self._node.asn \
+                        and (clients is None or x in clients)
+                    if x in rs_clients:
+                        # The next hop of the routes is the member announcing
+                        # them
+                        peer.rs_client = True
+                        peer.nh_self = None
+                    peer.route_server = x in route_servers
                     neighbors.append(peer)
         return neighbors
 
+    def _build_aggregates(self, af: List['AddressFamily']) \
+            -> Dict[str, List[Union[IPv4Network, IPv6Network]]]:
+        """Return the aggregates announced in each address family"""
+        aggregates = {a.name: list(a.aggregates) for a in af}
+        if self.options.aggregate:
+            v4, v6 = as_paths(self._node).aggregates(self._node)
+            for name, nets in (('ipv4', v4), ('ipv6', v6)):
+                if name in aggregates:
+                    aggregates[name] = list(collapse_addresses(
+                        aggregates[name] + nets))
+        return aggregates
+
     @staticmethod
     def _address_families(af: List['AddressFamily'], nei: List['Peer']) \
             -> List['AddressFamily']:
@@ -466,9 +1102,17 @@ class AddressFamily:
     """An address family that is exchanged through BGP"""
 
     def __init__(self, af_name: str, redistribute: Sequence[str] = (),
-                 networks: Sequence[Union[str, IPv4Network, IPv6Network]] = ()):
+                 networks: Sequence[Union[str, IPv4Network, IPv6Network]] = (),
+                 aggregates: Sequence[Union[str, IPv4Network,
+                                            IPv6Network]] = ()):
+        """:param af_name: The name of the family, e.g., ipv4
+        :param redistribute: The sources of the redistributed routes
+        :param networks: The prefixes announced
+        :param aggregates: The prefixes announced instead of the more specific
+                           prefixes that they cover"""
         self.name = af_name
         self.networks = [ip_network(str(n)) for n in networks]
+        self.aggregates = [ip_network(str(n)) for n in aggregates]
         self.redistribute = redistribute
         self.neighbors = []  # type: List[Peer]
 
@@ -483,6 +1127,142 @@ def AF_INET6(*args, **kwargs):
     return AddressFamily('ipv6', *args, **kwargs)
 
 
+class ASPaths:
+    """The shortest paths over the interfaces of the routers of an AS,
+    weighted by their IGP metric. The paths from each router are explored
+    once, and give the interface through which it reaches each router
+    connected to the AS."""
+
+    def __init__(self, asn: int):
+        self.asn = asn
+        # The routers of each broadcast domain, by domain id
+        self._domains = {}  # type: Dict[int, List[IPIntf]]
+        # The interfaces of each router
+        self._interfaces = {}  # type: Dict[str, List[IPIntf]]
+        # The interface of each reachable router, by router name
+        self._peers = {}  # type: Dict[str, Dict[str, IPIntf]]
+        # The aggregates of the part of the AS of each router
+        self._aggregates = \
+            {}  # type: Dict[str, Tuple[List[IPv4Network], List[IPv6Network]]]
+
+    def peer_interface(self, base: 'Router', peer: str) -> Optional[IPIntf]:
+        """Return the interface of the peer in the nearest broadcast domain
+        shared with a path from the base router, or None if it is not
+        reachable
+
+        :param base: The router of this AS from which the paths start
+        :param peer: The name of the peer"""
+        try:
+            peers = self._peers[base.name]
+        except KeyError:
+            peers = self._peers[base.name] = self._explore(base)
+        return peers.get(peer)
+
+    def aggregates(self, base: 'Router') \
+            -> Tuple[List[IPv4Network], List[IPv6Network]]:
+        """Return the minimal sets of IPv4 and IPv6 prefixes covering the
+        subnets of the broadcast domains of the AS, excluding those shared
+        with other ASes, which are reachable from the base router
+
+        :param base: A router of this AS"""
+        try:
+            return self._aggregates[base.name]
+        except KeyError:
+            pass
+        routers = {base.name: base}
+        to_visit = [base]
+        domains = set()  # type: Set[int]
+        v4 = []  # type: List[IPv4Network]
+        v6 = []  # type: List[IPv6Network]
+        while to_visit:
+            node = to_visit.pop()
+            for i in node.intfList():
+                domain = i.broadcast_domain
+                if domain is None or id(domain) in domains:
+                    continue
+                domains.add(id(domain))
+                others = self._routers(i)
+                if any(n.node.asn != base.asn and n.node.asn for n in others):
+                    continue  # A link with another AS
+                for n in domain:
+                    v4.extend(ip.network for ip in n.ips())
+                    v6.extend(ip.network for ip in n.ip6s(exclude_lls=True))
+                for n in others:
+                    if n.node.name not in routers:
+                        routers[n.node.name] = n.node
+                        to_visit.append(n.node)
+        result = list(collapse_addresses(v4)), list(collapse_addresses(v6))
+        # The routers found share the same part of the AS
+        for name in routers:
+            self._aggregates[name] = result
+        return result
+
+    def _routers(self, itf: IPIntf) -> List[IPIntf]:
+        domain = itf.broadcast_domain
+        if domain is None:
+            return []
+        try:
+            return self._domains[id(domain)]
+        except KeyError:
+            routers = self._domains[id(domain)] = domain.routers
+            return routers
+
+    def _node_interfaces(self, node: 'Router') -> List[IPIntf]:
+        try:
+            return self._interfaces[node.name]
+        except KeyError:
+            itfs = self._interfaces[node.name] = realIntfList(node)
+            return itfs
+
+    def _explore(self, base: 'Router') -> Dict[str, IPIntf]:
+        """Run Dijkstra from all the interfaces of base, and return the
+        interface of each router in the first broadcast domain where it
+        is found"""
+        found = {}  # type: Dict[str, IPIntf]
+        costs = {}  # type: Dict[str, int]
+        visited = set()  # type: Set[str]
+        counter = itertools.count()
+        # Ties are broken by interface name
+        prio_queue = []  # type: List[Tuple[int, str, int, IPIntf]]
+        for i in self._node_interfaces(base):
+            costs[i.name] = 0
+            prio_queue.append((0, i.name, next(counter), i))
+        heapq.heapify(prio_queue)
+        while prio_queue:
+            path_cost, name, _, i = heapq.heappop(prio_queue)
+            if name in visited:
+                continue
+            visited.add(name)
+            for n in self._routers(i):
+                if n.node.name not in found:
+                    found[n.node.name] = n
+                # Only explore the routers of the AS
+                if n.node.asn != base.asn and n.node.asn:
+                    continue
+                for j in self._node_interfaces(n.node):
+                    cost = path_cost + j.igp_metric
+                    if j.name not in visited \
+                            and cost < costs.get(j.name, cost + 1):
+                        costs[j.name] = cost
+                        heapq.heappush(prio_queue,
+                                       (cost, j.name, next(counter), j))
+        return found
+
+
+def as_paths(router: 'Router') -> ASPaths:
+    """Return the shortest paths of the AS of a router, shared by the peers
+    of all the routers of this AS in the network
+
+    :param router: The router, whose configuration holds the paths of each
+                   AS of its network"""
+    paths = router.nconfig.as_paths
+    try:
+        return paths[router.asn]
+    except KeyError:
+        p = paths[router.asn] = ASPaths(router.asn)
+        return p
+
+
 class Peer:
     """A BGP peer"""
     def __init__(self, base: 'Router', node: str, v6=False):
@@ -500,6 +1280,14 @@ class Peer:
             self.port = BGP_DEFAULT_PORT
         # We default to nexthop self for eBGP routes only
         self.nh_self = 'next-hop-self'
+        # Whether the routes of this peer are reflected to the other ones
+        self.rr_client = False
+        # Whether this peer is a client of this router, a route server
+        self.rs_client = False
+        # Whether this peer is a route server, which is not in the AS path
+        self.route_server = False
+        # The name of the peer group of this peer, if any
+        self.peer_group = None  # type: Optional[str]
         # We enable eBGP multihop if eBGP is in use
         ebgp = self.asn != base.asn
         self.ebgp_multihop = ebgp
@@ -510,28 +1298,11 @@ class Peer:
             -> Tuple[Optional[str], Optional['Router']]:
         """Return the IP address that base should try to contact to establish
         a peering"""
-        visited = set()  # type: Set[IPIntf]
-        to_visit = {i.name: i for i in realIntfList(base)}
-        prio_queue = [(0, i) for i in to_visit.keys()]
-        heapq.heapify(prio_queue)
-        # Explore all interfaces in base ASN recursively, until we find one
-        # connected to the peer
-        while to_visit:
-            path_cost, i = heapq.heappop(prio_queue)
-            if i in visited:
-                continue
-            i = to_visit.pop(i)
-            visited.add(i)
-            for n in i.broadcast_domain.routers:
-                if n.node.name == peer:
-                    if not v6:
-                        return n.ip, n.node
-                    if n.ip6 and not ip_address(n.ip6).is_link_local:
-                        return n.ip6, n.node
-                    return None, None
-                if n.node.asn == base.asn or not n.node.asn:
-                    for i in realIntfList(n.node):
-                        to_visit[i.name] = i
-                        heapq.heappush(prio_queue, (path_cost + i.igp_metric,
-                                                    i.name))
+        n = as_paths(base).peer_interface(base, peer)
+        if n is None:
+            return None, None
+        if not v6:
+            return n.ip, n.node
+        if n.ip6 and not ip_address(n.ip6).is_link_local:
+            return n.ip6, n.node
         return None, None
@@ -0,0 +1,230 @@
+"""This module defines a BGP speaker announcing a large feed of synthetic or
+MRT-derived routes to its eBGP peers, e.g., to measure how the routers
+handle full routing tables."""
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, Optional, Sequence, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet import bgp_speaker
+from ipmininet.readiness import TCPPortReady
+from ipmininet.router.vty import RouterState, batch_query
+from .base import RouterDaemon
+from .bgp import Peer, BGP_DEFAULT_PORT
+
+if TYPE_CHECKING:
+    from ipmininet.router import Router
+
+SPEAKER = os.path.abspath(bgp_speaker.__file__)
+
+
+class BGPFeed(RouterDaemon):
+    """A BGP speaker streaming routes to its peers at a controlled rate.
+    It accepts the sessions of the routers connected with
+    :func:`ebgp_session`, and sends them the routes of the address family
+    of the session."""
+
+    NAME = 'bgpfeed'
+    # The speaker is a Python script
+    COMMAND = sys.executable
+    STARTUP_LINE_BASE = '{python} {script}'.format(python=COMMAND,
+                                                   script=SPEAKER)
+    KILL_PATTERNS = (STARTUP_LINE_BASE,)
+
+    @property
+    def startup_line(self):
+        return '{base} -c {cfg}'.format(base=self.STARTUP_LINE_BASE,
+                                        cfg=self.cfg_filename)
+
+    @property
+    def dry_run(self):
+        return '%s --check' % self.startup_line
+
+    @property
+    def stats_filename(self) -> str:
+        return self._file('stats')
+
+    def build(self):
+        cfg = super().build()
+        source = {'seed': self.options.seed,
+                  'path_length': list(self.options.path_length),
+                  'asns': self.options.asns,
+                  'communities': self.options.communities,
+                  'prefixes_per_path': self.options.prefixes_per_path}
+        if self.options.mrt:
+            source['mrt'] = os.path.abspath(self.options.mrt)
+            source['limit'] = self.options.limit
+        else:
+            source['ipv4'] = {'count': self.options.ipv4_prefixes,
+                              'base': self.options.ipv4_base,
+                              'prefixlen': self.options.ipv4_prefixlen}
+            source['ipv6'] = {'count': self.options.ipv6_prefixes,
+                              'base': self.options.ipv6_base,
+                              'prefixlen': self.options.ipv6_prefixlen}
+        cfg.config = {'asn': self._node.asn,
+                      'routerid': cfg.routerid,
+                      'port': BGP_DEFAULT_PORT,
+                      'hold_time': self.options.hold_time,
+                      'rate': self.options.rate,
+                      'stats': self.stats_filename,
+                      'peers': self._build_peers(),
+                      'source': source}
+        return cfg
+
+    def _build_peers(self):
+        peers = []
+        for x in self._node.get('bgp_peers', []):
+            for v6 in (False, True):
+                peer = Peer(self._node, x, v6=v6)
+                if peer.peer:
+                    peers.append({'address': peer.peer, 'asn': peer.asn,
+                                  'family': peer.family})
+        return peers
+
+    def set_defaults(self, defaults):
+        """:param ipv4_prefixes: The number of synthetic IPv4 prefixes
+        :param ipv6_prefixes: The number of synthetic IPv6 prefixes
+        :param ipv4_base: The network of the synthetic IPv4 prefixes
+        :param ipv6_base: The network of the synthetic IPv6 prefixes
+        :param ipv4_prefixlen: The length of the synthetic IPv4 prefixes
+        :param ipv6_prefixlen: The length of the synthetic IPv6 prefixes
+        :param seed: The seed of the synthetic AS paths and communities
+        :param path_length: The minimal and maximal length of the synthetic
+                            AS paths
+        :param asns: The number of distinct ASes in the synthetic AS paths
+        :param communities: The maximal number of synthetic communities of
+                            a route
+        :param prefixes_per_path: The average number of consecutive
+                                  prefixes announced with the same
+                                  synthetic attributes
+        :param mrt: The path of a TABLE_DUMP_V2 MRT file whose routes are
+                    announced instead of the synthetic ones
+        :param limit: The maximal number of routes read from the MRT file
+        :param rate: The maximal number of prefixes announced per second
+                     to each peer, None for no limit
+        :param hold_time: The proposed hold time of the sessions"""
+        defaults.ipv4_prefixes = 10000
+        defaults.ipv6_prefixes = 0
+        defaults.ipv4_base = None
+        defaults.ipv6_base = None
+        defaults.ipv4_prefixlen = None
+        defaults.ipv6_prefixlen = None
+        defaults.seed = 0
+        defaults.path_length = (2, 6)
+        defaults.asns = 1000
+        defaults.communities = 2
+        defaults.prefixes_per_path = 8
+        defaults.mrt = None
+        defaults.limit = None
+        defaults.rate = None
+        defaults.hold_time = bgp_speaker.DEFAULT_HOLD_TIME
+        super().set_defaults(defaults)
+
+    def readiness_conditions(self):
+        return [TCPPortReady(self._node, BGP_DEFAULT_PORT)]
+
+    def stats(self) -> Optional[Dict]:
+        """Return the last statistics dumped by the speaker, or None if they
+        are not available yet"""
+        try:
+            with open(self.stats_filename) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def finished(self) -> bool:
+        """Return whether the feed was sent to all configured peers"""
+        stats = self.stats()
+        return stats is not None and bool(stats['peers']) \
+            and all(p['finished_at'] is not None
+                    for p in stats['peers'].values())
+
+    def wait(self, timeout: Optional[float] = None,
+             interval=.5) -> bool:
+        """Wait for the feed to be sent to all configured peers
+
+        :param timeout: The maximal number of seconds to wait
+        :param interval: The number of seconds between two checks
+        :return: Whether the feed was sent"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while not self.finished():
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(interval)
+        return True
+
+
+def _query(states: Sequence[RouterState], cmd: str) -> Dict[str, object]:
+    try:
+        return batch_query(states, 'bgpd', cmd)
+    except (OSError, RuntimeError, ValueError):
+        pass
+    answers = {}  # type: Dict[str, object]
+    for s in states:
+        try:
+            answers[s.router.name] = s.query('bgpd', cmd)
+        except (OSError, RuntimeError, ValueError) as e:
+            log.debug('*** Cannot query %s: %s\n' % (s.router.name, e))
+    return answers
+
+
+def _announced(answer) -> bool:
+    return isinstance(answer, dict) and bool(answer.get('paths'))
+
+
+def measure_propagation(feed: BGPFeed, routers: Iterable['Router'],
+                        timeout: Optional[float] = None,
+                        interval=.5) -> Dict:
+    """Measure the time taken by the routes of a feed to reach routers.
+    A router has received the feed once it knows the last prefix announced
+    by the speaker, as the prefixes are announced in order.
+
+    :param feed: The feed daemon
+    :param routers: The routers running a BGP daemon
+    :param timeout: The maximal number of seconds to wait
+    :param interval: The number of seconds between two polls
+    :return: For each family, the number of announced prefixes and the
+             injection throughput, and the number of seconds after the
+             establishment of the first session at which each router had
+             received the last prefix (None on timeout)"""
+    deadline = time.time() + timeout if timeout is not None else None
+    if not feed.wait(timeout=timeout, interval=interval):
+        log.info('*** The feed of %s was not sent to all its peers\n'
+                 % feed._node.name)
+    stats = feed.stats() or {'peers': {}}
+    states = [RouterState(r, ttl=0) for r in routers]
+    report = {}  # type: Dict[str, Dict]
+    for family in ('ipv4', 'ipv6'):
+        peers = [p for p in stats['peers'].values()
+                 if p['family'] == family and p['last_prefix']]
+        if not peers:
+            continue
+        start = min(p['established_at'] for p in peers)
+        last_prefix = peers[0]['last_prefix']
+        cmd = 'show bgp %s unicast %s' % (family, last_prefix)
+        times = {s.router.name: None
+                 for s in states}  # type: Dict[str, Optional[float]]
+        while True:
+            answers = _query([s for s in states
+                              if times[s.router.name] is None], cmd)
+            now = time.time()
+            for name, answer in answers.items():
+                if times[name] is None and _announced(answer):
+                    times[name] = now - start
+            if all(t is not None for t in times.values()) \
+                    or (deadline is not None and now >= deadline):
+                break
+            time.sleep(interval)
+        report[family] = {
+            'prefixes': max(p['prefixes'] for p in peers),
+            'prefixes_per_second': min(p['prefixes_per_second'] or 0
+                                       for p in peers),
+            'routers': times,
+            'propagation': max(times.values()) if times and all(
+                t is not None for t in times.values()) else None}
+    for s in states:
+        s.close()
+    return report
@@ -1,6 +1,7 @@
 """This module defines IP(6)Table configuration. Due to the current (sad)
 state of affairs of IPv6, one is required to explicitly make two different
 daemon instances, one to manage iptables, one to manage ip6tables ..."""
+import shlex
 from itertools import groupby
 from operator import attrgetter
 
@@ -47,6 +48,16 @@ class IPTables(Daemon):
                                          table_name)}
         return cfg
 
+    def apply_config(self, old, new):
+        """Replace the rules by running again iptables-restore, which
+        atomically commits the new tables"""
+        out, err, code = self._node._processes.pexec(
+            shlex.split(self.startup_line))
+        if code:
+            raise RuntimeError('Cannot reload %s on %s [rcode: %d]\n'
+                               'stdout: %s\nstderr: %s'
+                               % (self.NAME, self._node.name, code, out, err))
+
     def _compile_rule(self, rule):
         if isinstance(rule, Chain):
             return rule.build()
@@ -5,7 +5,7 @@ from typing import Sequence, List
 from ipmininet.link import IPIntf
 from ipmininet.overlay import Overlay
 from ipmininet.utils import L3Router
-from .utils import ConfigDict
+from .utils import ConfigNode
 from .zebra import QuaggaDaemon, Zebra
 
 
@@ -53,6 +53,7 @@ class OSPF(QuaggaDaemon):
     def build(self):
         cfg = super().build()
         cfg.redistribute = self.options.redistribute
+        cfg.maximum_paths = self.maximum_paths
         interfaces = self._node.intfList()
         cfg.interfaces = self._build_interfaces(interfaces)
         cfg.networks = self._build_networks(interfaces)
@@ -66,22 +67,23 @@ class OSPF(QuaggaDaemon):
         return [OSPFNetwork(domain=ip_interface('%s/%s' % (i.ip, i.prefixLen)),
                             area=i.igp_area) for i in interfaces if i.ip]
 
-    def _build_interfaces(self, interfaces: List[IPIntf]) -> List[ConfigDict]:
+    def _build_interfaces(self, interfaces: List[IPIntf]) \
+            -> List['OSPFInterface']:
         """Return the list of OSPF interface properties from the list of
         active interfaces"""
-        return [ConfigDict(description=i.describe,
-                           name=i.name,
-                           # Is the interface between two routers?
-                           active=self.is_active_interface(i),
-                           priority=i.get('ospf_priority',
-                                          self.options.priority),
-                           dead_int=i.get('ospf_dead_int',
-                                          self.options.dead_int),
-                           hello_int=i.get('ospf_hello_int',
-                                           self.options.hello_int),
-                           cost=i.igp_metric,
-                           # Is the interface forcefully disabled?
-                           passive=i.get('igp_passive', False))
+        return [OSPFInterface(description=i.describe,
+                              name=i.name,
+                              # Is the interface between two routers?
+                              active=self.is_active_interface(i),
+                              priority=i.get('ospf_priority',
+                                             self.options.priority),
+                              dead_int=i.get('ospf_dead_int',
+                                             self.options.dead_int),
+                              hello_int=i.get('ospf_hello_int',
+                                              self.options.hello_int),
+                              cost=i.igp_metric,
+                              # Is the interface forcefully disabled?
+                              passive=i.get('igp_passive', False))
                 for i in interfaces]
 
     def set_defaults(self, defaults):
@@ -89,11 +91,15 @@ class OSPF(QuaggaDaemon):
         :param dead_int: Dead interval timer
         :param hello_int: Hello interval timer
         :param priority: priority for the interface, used for DR election
-        :param redistribute: set of OSPFRedistributedRoute sources"""
+        :param redistribute: set of OSPFRedistributedRoute sources
+        :param maximum_paths: the maximal number of equal-cost paths of
+                              a route, defaulting to the ecmp parameter of
+                              the router configuration"""
         defaults.dead_int = 'minimal hello-multiplier 5'
         defaults.hello_int = 1
         defaults.priority = 10
         defaults.redistribute = []
+        defaults.maximum_paths = None
         super().set_defaults(defaults)
 
     @staticmethod
@@ -105,6 +111,12 @@ class OSPF(QuaggaDaemon):
                    if i != itf)
 
 
+class OSPFInterface(ConfigNode):
+    """The OSPF properties of an interface"""
+    __slots__ = ('description', 'name', 'active', 'priority', 'dead_int',
+                 'hello_int', 'cost', 'passive')
+
+
 class OSPFNetwork:
     """A class holding an OSPF network properties"""
 
@@ -1,7 +1,11 @@
 """Base classes to configure an OSPF6 daemon"""
 
-from .ospf import OSPF, OSPFRedistributedRoute
-from .utils import ConfigDict
+from .ospf import OSPF, OSPFInterface, OSPFRedistributedRoute
+
+
+class OSPF6Interface(OSPFInterface):
+    """The OSPF6 properties of an interface"""
+    __slots__ = ('instance_id', 'area')
 
 
 class OSPF6(OSPF):
@@ -15,7 +19,7 @@ class OSPF6(OSPF):
     def _build_interfaces(self, interfaces):
         """Return the list of OSPF6 interface properties from the list of
         active interfaces"""
-        conf = [ConfigDict(
+        conf = [OSPF6Interface(
             description=i.describe,
             name=i.name,
             # Is the interface between two routers?
@@ -45,6 +49,9 @@ class OSPF6(OSPF):
         :param hello_int: Hello interval timer
         :param priority: priority for the interface, used for DR election
         :param redistribute: set of OSPFRedistributedRoute sources
+        :param maximum_paths: ignored, as ospf6d has no maximum-paths command
+                              and installs all the equal-cost paths of its
+                              routes
         :param instance_id: the number of the attached OSPF instance"""
         defaults.instance_id = 0
         super().set_defaults(defaults)
@@ -1,5 +1,5 @@
 from .zebra import QuaggaDaemon, Zebra
-from .utils import ConfigDict
+from .utils import ConfigNode
 from ipmininet.utils import realIntfList
 
 
@@ -18,10 +18,11 @@ class PIMD(QuaggaDaemon):
         cfg = super().build()
         cfg.update(self.options)
         cfg.interfaces = [
-            ConfigDict(name=itf.name,
-                       ssm=itf.get('multicast_ssm', self.options.multicast_ssm),
-                       igmp=itf.get('multicast_igmp',
-                                    self.options.multicast_igmp))
+            PIMInterface(name=itf.name,
+                         ssm=itf.get('multicast_ssm',
+                                     self.options.multicast_ssm),
+                         igmp=itf.get('multicast_igmp',
+                                      self.options.multicast_igmp))
             for itf in realIntfList(self._node) if itf.get("enable_multicast",
                                                            False)]
         return cfg
@@ -33,3 +34,8 @@ class PIMD(QuaggaDaemon):
         defaults.multicast_ssm = True
         defaults.multicast_igmp = True
         super().set_defaults(defaults)
+
+
+class PIMInterface(ConfigNode):
+    """The PIM properties of an interface"""
+    __slots__ = ('name', 'ssm', 'igmp')
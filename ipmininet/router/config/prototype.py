@@ -0,0 +1,237 @@
+"""This module renders the configuration files of many daemons with the same
+configuration structure at once.
+
+The configuration trees of the nodes are abstracted in a shape, i.e., their
+containers and keys, and in the list of their values. The nodes sharing the
+same shape are grouped, and the templates of each group are rendered once
+with placeholders instead of the values. The configuration files of each
+node are then obtained by replacing the placeholders by its values.
+
+The placeholders refuse to be compared, iterated or called, such that a
+template depending on the values themselves cannot be rendered with them.
+The nodes are then rendered as usual. The output of the placeholders is also
+checked against the regular rendering of the first node of each group."""
+import re
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, \
+    TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from .utils import ConfigDict, ConfigNode, ip_statement
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from .base import Daemon
+
+# The minimal number of daemons in a group to render them from a prototype
+MIN_GROUP_SIZE = 2
+# The index of the placeholder of the configuration filename
+_FILENAME = -1
+_TOKEN = re.compile(r'\x00(-?\d+)((?:\.\w+)*)\x00')
+
+
+class Placeholder:
+    """A value of the configuration tree, replaced by a token in the output
+    of the templates"""
+    __slots__ = ('_index', '_path', '_truth')
+
+    def __init__(self, index: int, path: Tuple[str, ...] = (),
+                 truth: Optional[bool] = None):
+        """:param index: The index of the value
+        :param path: The attributes read from the value
+        :param truth: The truth value of the value, if it is known"""
+        self._index = index
+        self._path = path
+        self._truth = truth
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return Placeholder(self._index, self._path + (item,))
+
+    def __str__(self):
+        return '\x00%d%s\x00' % (self._index,
+                                 ''.join('.' + a for a in self._path))
+
+    def __bool__(self):
+        if self._truth is None:
+            raise TypeError('The truth value of %s depends on the node'
+                            % '.'.join(('value',) + self._path))
+        return self._truth
+
+    def __eq__(self, other):
+        raise TypeError('Placeholders cannot be compared')
+
+    __ne__ = __eq__
+    __hash__ = None
+
+
+def config_shape(value, values: List[object]):
+    """Return the shape of a configuration tree, i.e., its containers, keys
+    and the type and truth value of its values
+
+    :param value: The configuration tree
+    :param values: The list to which the values of the tree are appended"""
+    t = type(value)
+    if t is ConfigDict or isinstance(value, dict):
+        return t, tuple([(key, config_shape(v, values))
+                         for key, v in value.items()])
+    if t is list or t is tuple:
+        return t, tuple([config_shape(v, values) for v in value])
+    if isinstance(value, ConfigNode):
+        return t, tuple([config_shape(v, values) for v in value.values()])
+    if value is None or t is bool:
+        return value
+    if t is set or t is frozenset:
+        try:
+            return t, frozenset(value)
+        except TypeError:
+            pass
+    values.append(value)
+    try:
+        return t, bool(value)
+    except Exception:
+        return t, None
+
+
+def config_skeleton(value, values: List[object]):
+    """Return a copy of a configuration tree whose values are replaced by
+    placeholders, in the order of config_shape()
+
+    :param value: The configuration tree
+    :param values: The list to which the values of the tree are appended"""
+    t = type(value)
+    if isinstance(value, dict):
+        skeleton = t.__new__(t)
+        for key, v in value.items():
+            dict.__setitem__(skeleton, key, config_skeleton(v, values))
+        return skeleton
+    if t is list or t is tuple:
+        return t([config_skeleton(v, values) for v in value])
+    if isinstance(value, ConfigNode):
+        skeleton = t.__new__(t)
+        for key, v in value.items():
+            object.__setattr__(skeleton, key, config_skeleton(v, values))
+        return skeleton
+    if value is None or t is bool:
+        return value
+    if t is set or t is frozenset:
+        try:
+            frozenset(value)
+            return value
+        except TypeError:
+            pass
+    values.append(value)
+    try:
+        truth = bool(value)
+    except Exception:
+        truth = None
+    return Placeholder(len(values) - 1, truth=truth)
+
+
+class Skeleton:
+    """The output of a template rendered with placeholders"""
+
+    def __init__(self, output: str):
+        parts = _TOKEN.split(output)
+        self.head = parts[0]
+        # The index of the value, the attributes to read from it and the
+        # text following it, for each placeholder
+        self.parts = [(int(parts[i]),
+                       attrgetter(parts[i + 1][1:]) if parts[i + 1] else None,
+                       parts[i + 2])
+                      for i in range(1, len(parts), 3)]
+
+    def fill(self, values: Sequence[object], filename: str) -> str:
+        """Replace the placeholders by the values of a node
+
+        :param values: The values of the configuration tree of the node
+        :param filename: The name of the configuration file"""
+        out = [self.head]
+        append = out.append
+        for index, getter, text in self.parts:
+            value = filename if index == _FILENAME else values[index]
+            append(str(value) if getter is None else str(getter(value)))
+            append(text)
+        return ''.join(out)
+
+
+class _Member:
+    __slots__ = ('daemon', 'cfg', 'values', 'files')
+
+    def __init__(self, daemon: 'Daemon', cfg: ConfigDict,
+                 values: List[object], files: List[Tuple[str, str]]):
+        self.daemon = daemon
+        self.cfg = cfg
+        self.values = values
+        self.files = files
+
+
+def render_prototypes(configs: Iterable[Tuple['IPNode', ConfigDict]],
+                      min_size=MIN_GROUP_SIZE) -> Set['Daemon']:
+    """Render and write the configuration files of the daemons whose
+    configuration trees have the same shape, from one prototype per shape
+
+    :param configs: The nodes and their built configuration tree
+    :param min_size: The minimal number of daemons rendered from a prototype
+    :return: The rendered daemons, the other ones must be rendered as usual"""
+    groups = OrderedDict()  # type: Dict[tuple, List[_Member]]
+    shapes = {}  # type: Dict[tuple, int]
+    for node, cfg in configs:
+        values = []  # type: List[object]
+        cfg.pop('current_filename', None)
+        # Compare the (deep) shapes once per node
+        shape = shapes.setdefault(config_shape(cfg, values), len(shapes))
+        for d in node.nconfig.started_daemons:
+            job = d.render_job(cfg)
+            if job is None:
+                continue
+            _, _, files = job
+            key = (shape, type(d), d.NAME, id(d.template_lookup),
+                   tuple(template for _, template, _ in files))
+            groups.setdefault(key, []).append(_Member(
+                d, cfg, values,
+                [(filename, template) for filename, template, _ in files]))
+    rendered = set()  # type: Set[Daemon]
+    for members in groups.values():
+        if len(members) < min_size:
+            continue
+        contents = _render_group(members)
+        if contents is None:
+            continue
+        for m, content in zip(members, contents):
+            m.daemon.write(content)
+            rendered.add(m.daemon)
+    return rendered
+
+
+def _render_group(members: List[_Member]) \
+        -> Optional[List[Dict[str, str]]]:
+    """Render the configuration files of a group of daemons from the first
+    one, or return None if they cannot be rendered from a prototype"""
+    first = members[0]
+    lookup = first.daemon.template_lookup
+    skeleton_cfg = config_skeleton(first.cfg, [])
+    contents = [{} for _ in members]  # type: List[Dict[str, str]]
+    for i, (filename, template_name) in enumerate(first.files):
+        template = lookup.get_template(template_name)
+        try:
+            skeleton_cfg.current_filename = Placeholder(_FILENAME,
+                                                        truth=True)
+            skeleton = Skeleton(template.render(node=skeleton_cfg,
+                                                ip_statement=ip_statement))
+            first.cfg.current_filename = filename
+            expected = template.render(node=first.cfg,
+                                       ip_statement=ip_statement)
+            if skeleton.fill(first.values, filename) != expected:
+                raise ValueError('The prototype output differs')
+            for m, content in zip(members, contents):
+                name = m.files[i][0]
+                content[name] = skeleton.fill(m.values, name)
+        except Exception as e:
+            log.debug('*** Cannot render %s from a prototype: %s\n'
+                      % (template_name, e))
+            return None
+    return contents
@@ -1,10 +1,11 @@
+import signal
 from ipaddress import ip_address, IPv6Network, IPv6Address
 from typing import Sequence, Union
 
 from ipmininet.utils import find_node
 from ipmininet.utils import realIntfList
 from .base import RouterDaemon
-from .utils import ConfigDict
+from .utils import ConfigDict, ConfigNode
 from ipmininet.utils import is_container
 
 RA_DEFAULT_VALID = 86400
@@ -62,23 +63,30 @@ class AdvRDNSS(ConfigDict):
             pass
 
 
+class RADVDInterface(ConfigNode):
+    """The router advertisements sent on an interface"""
+    __slots__ = ('name', 'description', 'ra_prefixes', 'rdnss_list')
+
+
 class RADVD(RouterDaemon):
     """The class representing the radvd daemon,
     used for router advertisements"""
 
     NAME = 'radvd'
     KILL_PATTERNS = (NAME,)
+    RELOAD_SIGNAL = signal.SIGHUP
 
     def build(self):
         cfg = super().build()
         # Update with preset defaults
         cfg.update(self.options)
         # Track interfaces
-        cfg.interfaces = (ConfigDict(name=itf.name, description=itf.describe,
-                                     ra_prefixes=itf.ra_prefixes,
-                                     rdnss_list=itf.rdnss_list)
+        cfg.interfaces = [RADVDInterface(name=itf.name,
+                                         description=itf.describe,
+                                         ra_prefixes=itf.ra_prefixes,
+                                         rdnss_list=itf.rdnss_list)
                           for itf in realIntfList(self._node)
-                          if itf.ra_prefixes)
+                          if itf.ra_prefixes]
         # Fill AdvConnectedPrefix prefixes
         self._fill_connected_prefixes()
         # Fill AdvRDNSS IP addresses
@@ -111,12 +119,22 @@ class RADVD(RouterDaemon):
         defaults.debuglevel = 0
         super().set_defaults(defaults)
 
+    @property
+    def pid_file(self) -> str:
+        return self._file('pid')
+
+    @property
+    def pid_files(self):
+        return [self.pid_file]
+
     @property
     def startup_line(self):
-        return ('radvd -d {debuglevel} -C {cfg} -p {pid} -m logfile -l {log}'
-                ' -u root'.format(debuglevel=self.options.debuglevel,
-                                  cfg=self.cfg_filename, log=self._file('log'),
-                                  pid=self._file('pid')))
+        # radvd stays in the foreground so that its process can be supervised
+        return ('radvd -n -d {debuglevel} -C {cfg} -p {pid} -m logfile'
+                ' -l {log} -u root'.format(debuglevel=self.options.debuglevel,
+                                           cfg=self.cfg_filename,
+                                           log=self._file('log'),
+                                           pid=self.pid_file))
 
     @property
     def dry_run(self):
@@ -124,7 +142,7 @@ class RADVD(RouterDaemon):
 
     def cleanup(self):
         try:
-            with open(self._file('pid'), 'r') as f:
+            with open(self.pid_file, 'r') as f:
                 for line in f:
                     if len(line) > 1:
                         pid = int(line[:-1])
@@ -0,0 +1,167 @@
+"""This module renders the configuration files of the daemons of many nodes
+concurrently, in a pool of processes.
+
+The configuration trees are built in the main process, as they depend on the
+nodes and the topology. The ones that can be pickled are then sent to the
+worker processes, which render the templates and write the files."""
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, \
+    TYPE_CHECKING
+
+import mako.exceptions
+from mako.lookup import TemplateLookup
+from mininet.log import lg as log
+
+from .prototype import render_prototypes
+from .utils import ConfigDict, ip_statement, write_if_changed
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from .base import Daemon
+
+# The template and module directories of a template lookup
+LookupKey = Tuple[Tuple[str, ...], Optional[str]]
+# The template lookups of a worker process, by template and module directories
+_lookups = {}  # type: Dict[LookupKey, TemplateLookup]
+
+# The rendering of the files of a daemon: its name, template directories,
+# compiled template directory and the template and last hash of each file
+DaemonJob = Tuple[str, Tuple[str, ...], Optional[str],
+                  List[Tuple[str, str, Optional[str]]]]
+# A node being rendered, its daemons by name and the future of the rendering
+PendingNode = Tuple['IPNode', Dict[str, 'Daemon'], object]
+
+
+def _lookup(directories: Tuple[str, ...],
+            module_directory: Optional[str]) -> TemplateLookup:
+    try:
+        return _lookups[directories, module_directory]
+    except KeyError:
+        lookup = _lookups[directories, module_directory] = TemplateLookup(
+            directories=list(directories), module_directory=module_directory)
+        return lookup
+
+
+def render_node(cfg: ConfigDict, daemons: Sequence[DaemonJob]) \
+        -> Dict[str, Dict[str, str]]:
+    """Render the configuration files of the daemons of a node, and write
+    those whose content changed
+
+    :param cfg: The configuration tree of the node
+    :param daemons: The rendering job of each daemon
+    :return: The content of each configuration file, by daemon name
+    :raise ValueError: if a template cannot be rendered"""
+    out = {}  # type: Dict[str, Dict[str, str]]
+    for name, directories, module_directory, files in daemons:
+        lookup = _lookup(directories, module_directory)
+        content = out[name] = {}
+        for filename, template, previous in files:
+            try:
+                cfg.current_filename = filename
+                content[filename] = lookup.get_template(template)\
+                    .render(node=cfg, ip_statement=ip_statement)
+            except Exception:
+                raise ValueError('Cannot render a configuration [%s: %s]\n%s'
+                                 % (cfg.get('name'), name, mako.exceptions
+                                    .text_error_template().render()))
+            write_if_changed(filename, content[filename], previous)
+    return out
+
+
+class ConfigRenderer:
+    """Build the configurations of a set of nodes, then render them in
+    a pool of processes. The daemons rendering their configuration
+    themselves, or whose configuration tree cannot be pickled, are rendered
+    in the current process."""
+
+    def __init__(self, nodes: Iterable['IPNode'],
+                 max_workers: Optional[int] = None, prototypes=False):
+        """:param nodes: The nodes to configure
+        :param max_workers: The number of processes (one per CPU if None,
+                            no process if 1)
+        :param prototypes: Whether to render the daemons whose
+                           configuration trees have the same shape from a
+                           single prototype (see render_prototypes())"""
+        self.nodes = list(nodes)
+        self.max_workers = max_workers if max_workers is not None \
+            else os.cpu_count() or 1
+        self.prototypes = prototypes
+        self._pool = None  # type: Optional[ProcessPoolExecutor]
+        self._pending = []  # type: List[PendingNode]
+
+    def start(self):
+        """Build the configuration of the nodes and start rendering them,
+        without waiting for the rendering to finish"""
+        jobs = []  # type: List[Tuple[IPNode, Dict[str, Daemon], bytes]]
+        configs = [(n, n.nconfig.build_config()) for n in self.nodes]
+        rendered = render_prototypes(configs) if self.prototypes \
+            else set()  # type: Set[Daemon]
+        if rendered:
+            log.debug('*** Rendered %d daemons from prototypes\n'
+                      % len(rendered))
+        for n, cfg in configs:
+            offloaded = {}  # type: Dict[str, Daemon]
+            daemon_jobs = []  # type: List[DaemonJob]
+            if self.max_workers > 1:
+                for d in n.nconfig.started_daemons:
+                    if d in rendered:
+                        continue
+                    job = d.render_job(cfg)
+                    if job is not None:
+                        offloaded[d.NAME] = d
+                        daemon_jobs.append((d.NAME,) + job)
+            if daemon_jobs:
+                try:
+                    jobs.append((n, offloaded,
+                                 pickle.dumps((cfg, daemon_jobs))))
+                except (pickle.PicklingError, TypeError,
+                        AttributeError) as e:
+                    log.debug('*** Rendering %s in the main process: %s\n'
+                              % (n.name, e))
+                    offloaded = {}
+            # Render the other daemons while the workers start
+            for d in n.nconfig.started_daemons:
+                if d.NAME not in offloaded and d not in rendered:
+                    d.write(d.render(cfg))
+        if not jobs:
+            return
+        self._pool = ProcessPoolExecutor(max_workers=min(self.max_workers,
+                                                         len(jobs)))
+        for n, daemons, job in jobs:
+            self._pending.append((n, daemons, self._pool.submit(
+                _render_pickled, job)))
+
+    def wait(self):
+        """Wait for the configuration files to be written
+
+        :raise ValueError: if a configuration cannot be rendered"""
+        try:
+            for n, daemons, future in self._pending:
+                for name, content in future.result().items():
+                    daemons[name].written(content)
+        finally:
+            self._pending = []
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+def _render_pickled(job: bytes) -> Dict[str, Dict[str, str]]:
+    return render_node(*pickle.loads(job))
+
+
+def render_nodes(nodes: Iterable['IPNode'],
+                 max_workers: Optional[int] = None, prototypes=False):
+    """Build, render and write the configurations of a set of nodes
+
+    :param nodes: The nodes to configure
+    :param max_workers: The number of processes (one per CPU if None,
+                        no process if 1)
+    :param prototypes: Whether to render the daemons with the same
+                       configuration shape from a single prototype"""
+    renderer = ConfigRenderer(nodes, max_workers=max_workers,
+                              prototypes=prototypes)
+    renderer.start()
+    renderer.wait()
@@ -4,7 +4,7 @@ from typing import List
 
 from ipmininet.link import IPIntf
 from ipmininet.utils import L3Router
-from .utils import ConfigDict
+from .utils import ConfigNode
 from .zebra import QuaggaDaemon, Zebra
 
 UPDATE_TIMER = 30
@@ -40,16 +40,17 @@ class RIPng(QuaggaDaemon):
         return [RIPNetwork(domain=ip_interface('%s/%s' % (i.ip6, i.prefixLen6)))
                 for i in interfaces if i.ip6]
 
-    def _build_interfaces(self, interfaces: List[IPIntf]) -> List[ConfigDict]:
+    def _build_interfaces(self, interfaces: List[IPIntf]) \
+            -> List['RIPngInterface']:
         """Return the list of RIP interface properties from the list of
         active interfaces"""
-        return [ConfigDict(description=i.describe,
-                           name=i.name,
-                           # Is the interface between two routers?
-                           active=self.is_active_interface(i),
-                           cost=i.igp_metric - 1,
-                           domain=ip_interface('%s/%s'
-                                               % (i.ip6, i.prefixLen6)))
+        return [RIPngInterface(description=i.describe,
+                               name=i.name,
+                               # Is the interface between two routers?
+                               active=self.is_active_interface(i),
+                               cost=i.igp_metric - 1,
+                               domain=ip_interface('%s/%s'
+                                                   % (i.ip6, i.prefixLen6)))
                 for i in interfaces]
 
     def set_defaults(self, defaults):
@@ -86,6 +87,11 @@ class RIPng(QuaggaDaemon):
                    if i != itf)
 
 
+class RIPngInterface(ConfigNode):
+    """The RIPng properties of an interface"""
+    __slots__ = ('description', 'name', 'active', 'cost', 'domain')
+
+
 class RIPNetwork:
     """A class holding an RIP network properties"""
 
@@ -2,6 +2,7 @@
 from distutils.spawn import find_executable
 import subprocess
 import os
+import signal
 import tempfile
 
 from .base import Daemon
@@ -21,6 +22,8 @@ subprocess.call(['ssh-keygen', '-b', '2048', '-t', 'rsa', '-f', KEYFILE, '-q',
 class SSHd(Daemon):
 
     NAME = 'sshd'
+    # sshd re-executes itself with the new configuration on SIGHUP
+    RELOAD_SIGNAL = signal.SIGHUP
     STARTUP_LINE_BASE = '{name} -D -u0'.format(name=find_executable(NAME))
     KILL_PATTERNS = (STARTUP_LINE_BASE,)
 
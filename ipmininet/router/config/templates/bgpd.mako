@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.bgpd.logfile:
 log file ${node.bgpd.logfile}
+log record-priority
 % endif
 
 % for section in node.bgpd.debug:
@@ -11,44 +12,111 @@ debug bgp ${section}
 
 router bgp ${node.bgpd.asn}
     bgp router-id ${node.bgpd.routerid}
+    bgp log-neighbor-changes
     bgp bestpath compare-routerid
     no bgp default ipv4-unicast
+% if node.bgpd.graceful_restart:
+    bgp graceful-restart
+    bgp graceful-restart preserve-fw-state
+    % if node.bgpd.restart_time is not None:
+    bgp graceful-restart restart-time ${node.bgpd.restart_time}
+    % endif
+    % if node.bgpd.stale_path_time is not None:
+    bgp graceful-restart stalepath-time ${node.bgpd.stale_path_time}
+    % endif
+% endif
+% if node.bgpd.long_lived_stale_time is not None:
+    bgp long-lived-graceful-restart stale-time ${node.bgpd.long_lived_stale_time}
+% endif
+% if node.bgpd.timers:
+    timers bgp ${node.bgpd.timers[0]} ${node.bgpd.timers[1]}
+% endif
+% for g in node.bgpd.peer_groups:
+    neighbor ${g.name} peer-group
+    % if g.ebgp_multihop:
+    neighbor ${g.name} ebgp-multihop
+    % endif
+    % if node.bgpd.connect_retry is not None:
+    neighbor ${g.name} timers connect ${node.bgpd.connect_retry}
+    % endif
+    % if node.bgpd.advertisement_interval is not None:
+    neighbor ${g.name} advertisement-interval ${node.bgpd.advertisement_interval}
+    % endif
+% endfor
 % for n in node.bgpd.neighbors:
     no auto-summary
     neighbor ${n.peer} remote-as ${n.asn}
+    % if n.peer_group:
+    neighbor ${n.peer} peer-group ${n.peer_group}
+    % endif
     neighbor ${n.peer} port ${n.port}
     neighbor ${n.peer} description ${n.description}
-    % if n.ebgp_multihop:
+    % if n.route_server:
+    no neighbor ${n.peer} enforce-first-as
+    % endif
+    % if not n.peer_group:
+        % if n.ebgp_multihop:
     neighbor ${n.peer} ebgp-multihop
+        % endif
+        % if node.bgpd.connect_retry is not None:
+    neighbor ${n.peer} timers connect ${node.bgpd.connect_retry}
+        % endif
+        % if node.bgpd.advertisement_interval is not None:
+    neighbor ${n.peer} advertisement-interval ${node.bgpd.advertisement_interval}
+        % endif
     % endif
     <%block name="neighbor"/>
 % endfor
 % for af in node.bgpd.address_families:
     address-family ${af.name}
-    % for rm in node.bgpd.route_maps:
-        % if rm.neighbor.family == af.name and rm.order == 10:
-    neighbor ${rm.neighbor.peer} route-map ${rm.name}-${af.name} ${rm.direction}
+    % for b in node.bgpd.route_map_bindings:
+        % if b.family == af.name:
+    neighbor ${b.peer} route-map ${b.name}-${af.name} ${b.direction}
         % endif
     % endfor
     % for net in af.networks:
     network ${net.with_prefixlen}
     % endfor
+    % for net in node.bgpd.aggregates[af.name]:
+    aggregate-address ${net.with_prefixlen} summary-only
+    % endfor
     % for r in af.redistribute:
     redistribute ${r}
     % endfor
+    % if node.bgpd.maximum_paths:
+    maximum-paths ${node.bgpd.maximum_paths}
+    maximum-paths ibgp ${node.bgpd.maximum_paths}
+    % endif
+    % for g in node.bgpd.peer_groups:
+        % if g.family == af.name:
+    neighbor ${g.name} activate
+            % if g.nh_self:
+    neighbor ${g.name} ${g.nh_self}
+            % endif
+            % if g.rr_client:
+    neighbor ${g.name} route-reflector-client
+            % endif
+            % if g.rs_client:
+    neighbor ${g.name} route-server-client
+            % endif
+        % endif
+    % endfor
     % for n in af.neighbors:
-        % if n.family == af.name:
+        % if n.family == af.name and not n.peer_group:
     neighbor ${n.peer} activate
             % if n.nh_self:
     neighbor ${n.peer} ${n.nh_self}
             % endif
-            % if node.bgpd.rr and n.asn == node.bgpd.asn:
+            % if n.rr_client:
     neighbor ${n.peer} route-reflector-client
             % endif
+            % if n.rs_client:
+    neighbor ${n.peer} route-server-client
+            % endif
         % endif
     % endfor
     % if node.bgpd.rr:
-    bgp cluster-id 10.0.0.0
+    bgp cluster-id ${node.bgpd.cluster_id}
     % endif
 % endfor
 
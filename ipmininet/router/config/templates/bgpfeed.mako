@@ -0,0 +1 @@
+<%! import json %>${json.dumps(node.bgpfeed.config, indent=2, sort_keys=True)}
@@ -0,0 +1,5 @@
+% if node.watchfrr.logfile:
+log file ${node.watchfrr.logfile}
+log record-priority
+% endif
+${frr_config}
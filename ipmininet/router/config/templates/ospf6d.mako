@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.ospf6d.logfile:
 log file ${node.ospf6d.logfile}
+log record-priority
 % endif
 
 % for section in node.ospf6d.debug:
@@ -28,6 +29,7 @@ interface ${intf.name}
 
 router ospf6
   ospf6 router-id ${node.ospf6d.routerid}
+  log-adjacency-changes detail
   % for r in node.ospf6d.redistribute:
   redistribute ${r.subtype}
   % endfor
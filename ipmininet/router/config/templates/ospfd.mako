@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.ospfd.logfile:
 log file ${node.ospfd.logfile}
+log record-priority
 % endif
 
 % for section in node.ospfd.debug:
@@ -25,6 +26,10 @@ interface ${intf.name}
 
 router ospf
   ospf router-id ${node.ospfd.routerid}
+  log-adjacency-changes detail
+  % if node.ospfd.maximum_paths:
+  maximum-paths ${node.ospfd.maximum_paths}
+  % endif
   % for r in node.ospfd.redistribute:
   redistribute ${r.subtype} metric-type ${r.metric_type} metric ${r.metric}
   % endfor
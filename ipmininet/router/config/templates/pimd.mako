@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.pimd.logfile:
     log file ${node.pimd.logfile}
+    log record-priority
 % endif
 
 % for section in node.pimd.debug:
@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.ripngd.logfile:
 log file ${node.ripngd.logfile}
+log record-priority
 % endif
 
 % for section in node.ripngd.debug:
@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.staticd.logfile:
 log file ${node.staticd.logfile}
+log record-priority
 % endif
 
 % for section in node.staticd.debug:
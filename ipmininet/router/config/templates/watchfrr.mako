@@ -0,0 +1,65 @@
+#!/bin/sh
+# Start the FRRouting daemons of ${node.name}, load their integrated
+# configuration, then let watchfrr restart them if needed.
+# Usage: $0 start | $0 restart <daemon>
+
+VTYSH="${node.watchfrr.vtysh}"
+VTY_DIR="${node.watchfrr.vty_socket_dir}"
+DAEMONS="${' '.join(d.name for d in node.watchfrr.daemons)}"
+
+start_daemon() {
+    case "$1" in
+% for d in node.watchfrr.daemons:
+        ${d.name}) ${d.startup_line} -d || return 1 ;;
+% endfor
+        *) return 1 ;;
+    esac
+    # Wait until the daemon accepts vtysh connections
+    i=0
+    while [ ! -S "$VTY_DIR/$1.vty" ]; do
+% if node.watchfrr.timeout:
+        i=$((i + 1))
+        [ $i -gt ${node.watchfrr.timeout * 10} ] && return 1
+% endif
+        sleep .1
+    done
+}
+
+stop_daemon() {
+    case "$1" in
+% for d in node.watchfrr.daemons:
+        ${d.name}) pid_file="${d.pid_file}" ;;
+% endfor
+        *) return 1 ;;
+    esac
+    [ -f "$pid_file" ] && kill "$(cat "$pid_file")" 2>/dev/null
+    rm -f "$VTY_DIR/$1.vty"
+}
+
+stop_all() {
+    [ -n "$WATCHFRR" ] && kill "$WATCHFRR" 2>/dev/null
+    for d in $DAEMONS; do
+        stop_daemon "$d"
+    done
+}
+
+case "$1" in
+    start)
+        trap 'stop_all; exit 0' TERM INT
+        for d in $DAEMONS; do
+            start_daemon "$d" || { stop_all; exit 1; }
+        done
+        $VTYSH -b || { stop_all; exit 1; }
+        watchfrr --vty_socket "$VTY_DIR" -S "$VTY_DIR" \
+            -r "sh $0 restart %s" $DAEMONS &
+        WATCHFRR=$!
+        wait "$WATCHFRR"
+        code=$?
+        stop_all
+        exit $code
+        ;;
+    restart)
+        stop_daemon "$2"
+        start_daemon "$2" && $VTYSH -b
+        ;;
+esac
@@ -3,6 +3,7 @@ password ${node.password}
 
 % if node.zebra.logfile:
     log file ${node.zebra.logfile}
+    log record-priority
 % endif
 
 % for section in node.zebra.debug:
@@ -1,12 +1,17 @@
 """This modules contains various utilities to streamline config generation"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
 from ipaddress import ip_interface, IPv6Address, IPv4Address
-from typing import Union
+from typing import Union, Tuple, List, Iterable, Sequence, Optional, Dict
 
 
 class ConfigDict(dict):
     """A dictionary whose attributes are its keys.
     Be careful if subclassing, as attributes defined by doing
     assignments such as self.xx = yy in __init__ will be shadowed!"""
+    __slots__ = ()
 
     def __init__(self, **kwargs):
         super().__init__()
@@ -14,21 +19,159 @@ class ConfigDict(dict):
             self[key] = val
 
     def __getattr__(self, item):
-        # so that self.item == self[item]
-        try:
-            # But preserve i.e. methods
-            return super().__getattr__(item)
-        except Exception:
-            try:
-                return self[item]
-            except KeyError:
-                return None
+        # so that self.item == self[item]. This is only called once the
+        # regular lookup failed, so methods are preserved
+        if item.startswith('__'):
+            # Keep the protocols (e.g., pickle or copy) working
+            raise AttributeError(item)
+        return self.get(item)
 
     def __setattr__(self, key, value):
         # so that self.key = value <==> self[key] = key
         self[key] = value
 
 
+# The fields of each ConfigNode class
+_fields = {}  # type: Dict[type, Tuple[str, ...]]
+
+
+class ConfigNode:
+    """A configuration record with a fixed set of fields, stored in slots.
+    It offers the interface of a ConfigDict to the templates, with a faster
+    attribute access and a smaller memory footprint. Subclasses list their
+    fields in __slots__, and the fields not passed to the constructor are
+    None."""
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        fields = self.fields()
+        if len(args) > len(fields):
+            raise TypeError('%s has %d fields' % (type(self).__name__,
+                                                  len(fields)))
+        for field, value in zip(fields, args):
+            object.__setattr__(self, field, value)
+        for field in fields[len(args):]:
+            object.__setattr__(self, field, kwargs.pop(field, None))
+        if kwargs:
+            raise TypeError('%s has no field %s' % (type(self).__name__,
+                                                    ', '.join(sorted(kwargs))))
+
+    def __reduce__(self):
+        return type(self), tuple(self.values())
+
+    @classmethod
+    def fields(cls) -> Tuple[str, ...]:
+        """Return the fields of this class, including the inherited ones"""
+        try:
+            return _fields[cls]
+        except KeyError:
+            fields = []  # type: List[str]
+            for c in reversed(cls.__mro__):
+                slots = c.__dict__.get('__slots__', ())
+                for f in (slots,) if isinstance(slots, str) else slots:
+                    if f not in fields:
+                        fields.append(f)
+            _fields[cls] = tuple(fields)
+            return _fields[cls]
+
+    def __getattr__(self, item):
+        # Like a ConfigDict, unknown fields are None
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return None
+
+    def __getitem__(self, item):
+        if item not in self.fields():
+            raise KeyError(item)
+        return getattr(self, item)
+
+    def __setitem__(self, key, value):
+        if key not in self.fields():
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, item) -> bool:
+        return item in self.fields()
+
+    def __iter__(self):
+        return iter(self.fields())
+
+    def __len__(self) -> int:
+        return len(self.fields())
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.values() == other.values()
+
+    def __repr__(self) -> str:
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % kv for kv in self.items()))
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.fields() else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.fields()
+
+    def values(self) -> List:
+        return [getattr(self, f) for f in self.fields()]
+
+    def items(self) -> List[Tuple[str, object]]:
+        return [(f, getattr(self, f)) for f in self.fields()]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def to_dict(self) -> Dict[str, object]:
+        return dict(self.items())
+
+
+def _json_default(obj):
+    if isinstance(obj, ConfigNode):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    return str(obj)
+
+
+def config_to_json(cfg, **kwargs) -> str:
+    """Serialize a configuration tree to JSON. The ConfigNode are serialized
+    as objects, and the values that JSON cannot represent as strings.
+
+    :param cfg: The configuration tree
+    :param kwargs: Additional arguments of json.dumps()"""
+    return json.dumps(cfg, default=_json_default, **kwargs)
+
+
+def config_hash(content: str) -> str:
+    """Return the hash of the content of a configuration file"""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def write_if_changed(filename: str, content: str,
+                     previous: Optional[str] = None) -> bool:
+    """Write a configuration file, unless it already has this content
+
+    :param filename: The path of the file
+    :param content: The content of the file
+    :param previous: The hash of the current content of the file, if known,
+                     otherwise the file is read
+    :return: Whether the file was written"""
+    if previous is None:
+        try:
+            with open(filename) as f:
+                previous = config_hash(f.read())
+        except (IOError, OSError, UnicodeDecodeError):
+            pass
+    elif not os.path.exists(filename):
+        previous = None
+    if previous is not None and previous == config_hash(content):
+        return False
+    with open(filename, 'w') as f:
+        f.write(content)
+    return True
+
+
 def ip_statement(ip: Union[int, str, IPv6Address, IPv4Address]):
     """Return the zebra ip statement for a given ip prefix
 
@@ -36,3 +179,135 @@ def ip_statement(ip: Union[int, str, IPv6Address, IPv4Address]):
     if not isinstance(ip, int):
         ip = ip_interface(str(ip)).version
     return 'ipv6' if ip == 6 else 'ip'
+
+
+# The commands opening a configuration context in FRRouting daemons
+FRR_CONTEXTS = ('interface ', 'router ', 'route-map ', 'key chain ',
+                'line vty')
+# The nested contexts, with the command to leave them
+FRR_SUBCONTEXTS = {'address-family ': 'exit-address-family'}
+# The contexts that can be deleted as a whole
+FRR_REMOVABLE_CONTEXTS = ('router ', 'route-map ', 'key chain ')
+
+
+def _parse_frr_config(config: str) \
+        -> 'OrderedDict[Tuple[str, ...], List[str]]':
+    """Split an FRRouting configuration in its (sub)contexts
+
+    :return: An ordered dict mapping the context headers (the empty tuple for
+             the top-level context) to their ordered lines"""
+    contexts = OrderedDict()  # type: OrderedDict[Tuple[str, ...], List[str]]
+    contexts[()] = []
+    current = ()  # type: Tuple[str, ...]
+    for raw in config.splitlines():
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line == '!':
+            current = ()
+            continue
+        if line.startswith(FRR_CONTEXTS) \
+                and (not raw[0].isspace() or not current):
+            current = (line,)
+            contexts.setdefault(current, [])
+        elif current and line.startswith(tuple(FRR_SUBCONTEXTS)):
+            current = (current[0], line)
+            contexts.setdefault(current, [])
+        elif current and line in FRR_SUBCONTEXTS.values():
+            current = current[:1]
+        elif not raw[0].isspace() and current:
+            # A top-level command ends the previous context
+            current = ()
+            contexts[current].append(line)
+        else:
+            contexts[current].append(line)
+    return contexts
+
+
+def _negate(line: str) -> str:
+    return line[3:] if line.startswith('no ') else 'no ' + line
+
+
+def _enter(context: Tuple[str, ...]) -> List[str]:
+    return [(' ' * i) + h for i, h in enumerate(context)]
+
+
+def _leave(context: Tuple[str, ...]) -> List[str]:
+    if len(context) > 1:
+        return [' ' + FRR_SUBCONTEXTS[k] for k in FRR_SUBCONTEXTS
+                if context[1].startswith(k)] + ['!']
+    return ['!'] if context else []
+
+
+def config_delta(old: str, new: str) -> List[str]:
+    """Compute the FRRouting commands turning the old configuration of a daemon
+    into the new one. The removed lines are negated (in reverse order, such
+    that the lines depending on others are removed first), then the added
+    lines are applied in the order of the new configuration.
+
+    :param old: The previous content of the configuration file
+    :param new: The new content of the configuration file
+    :return: The list of commands, as they would appear in a configuration
+             file, or an empty list if the configurations are equivalent"""
+    old_ctx = _parse_frr_config(old)
+    new_ctx = _parse_frr_config(new)
+    delta = []  # type: List[str]
+    for ctx in reversed(old_ctx):
+        old_lines = old_ctx[ctx]
+        if ctx not in new_ctx and len(ctx) == 1 \
+                and ctx[0].startswith(FRR_REMOVABLE_CONTEXTS):
+            delta.append(_negate(ctx[0]))
+            continue
+        if ctx not in new_ctx and ctx[:1] not in new_ctx \
+                and ctx[0].startswith(FRR_REMOVABLE_CONTEXTS):
+            continue  # The whole parent context is removed
+        new_lines = set(new_ctx.get(ctx, ()))
+        removed = [line for line in reversed(old_lines)
+                   if line not in new_lines]
+        if removed:
+            indent = ' ' * len(ctx)
+            delta.extend(_enter(ctx))
+            delta.extend(indent + _negate(line) for line in removed)
+            delta.extend(_leave(ctx))
+    for ctx, new_lines in new_ctx.items():
+        old_lines = set(old_ctx.get(ctx, ()))
+        added = [line for line in new_lines if line not in old_lines]
+        if added or ctx not in old_ctx:
+            indent = ' ' * len(ctx)
+            delta.extend(_enter(ctx))
+            delta.extend(indent + line for line in added)
+            delta.extend(_leave(ctx))
+    return delta
+
+
+def merge_frr_configs(configs: Iterable[str],
+                      skip: Sequence[str] = ()) -> str:
+    """Merge the configurations of several FRRouting daemons in a single
+    integrated configuration. The top-level commands come first, followed by
+    the merged contexts, each command appearing only once.
+
+    :param configs: The content of each configuration file
+    :param skip: The prefixes of the top-level commands to leave out
+    :return: The content of the integrated configuration"""
+    merged = OrderedDict()  # type: OrderedDict[Tuple[str, ...], List[str]]
+    merged[()] = []
+    for config in configs:
+        for ctx, lines in _parse_frr_config(config).items():
+            merged_lines = merged.setdefault(ctx, [])
+            merged_lines.extend(line for line in lines
+                                if line not in merged_lines and
+                                (ctx or not line.startswith(tuple(skip))))
+    out = list(merged[()])
+    for ctx, lines in merged.items():
+        if len(ctx) != 1:
+            continue
+        out.append('!')
+        out.append(ctx[0])
+        out.extend(' ' + line for line in lines)
+        for sub, sub_lines in merged.items():
+            if len(sub) == 2 and sub[0] == ctx[0]:
+                out.append(' ' + sub[1])
+                out.extend('  ' + line for line in sub_lines)
+                out.extend(_leave(sub)[:-1])
+    out.append('!')
+    return '\n'.join(out) + '\n'
@@ -0,0 +1,123 @@
+"""Base classes to run all the FRRouting daemons of a router from a single
+integrated configuration, under the supervision of watchfrr"""
+import os
+import shlex
+from typing import List
+
+from ipmininet.readiness import UnixSocketReady
+from .base import Daemon
+from .utils import ConfigDict, config_delta, merge_frr_configs
+from .zebra import QuaggaDaemon
+
+
+class WatchFRR(Daemon):
+    """This daemon replaces the FRRouting daemons of a router in integrated
+    mode. It renders their configurations in a single frr.conf file, starts
+    all of them, loads the configuration with vtysh and then lets watchfrr
+    restart them if they fail."""
+
+    NAME = 'watchfrr'
+    PRIO = 0
+    KILL_PATTERNS = (NAME,)
+
+    @property
+    def frr_daemons(self) -> List[QuaggaDaemon]:
+        """The FRRouting daemons of the router, in startup order"""
+        return [d for d in self._node.nconfig.daemons
+                if isinstance(d, QuaggaDaemon)]
+
+    @property
+    def config_dir(self) -> str:
+        """The directory holding the integrated configuration, as expected by
+        vtysh"""
+        return self._file('d')
+
+    @property
+    def integrated_cfg(self) -> str:
+        return os.path.join(self.config_dir, 'frr.conf')
+
+    @property
+    def vty_socket_dir(self) -> str:
+        return self._node.nconfig.daemon('zebra').vty_socket_dir
+
+    @property
+    def vtysh(self) -> str:
+        """Return the vtysh command line connecting to all the daemons"""
+        return 'vtysh --vty_socket {vty} --config_dir {cfg}'\
+            .format(vty=self.vty_socket_dir, cfg=self.config_dir)
+
+    @property
+    def pid_files(self):
+        # The FRRouting daemons are started in the background by the script
+        return [d.pid_file for d in self.frr_daemons]
+
+    @property
+    def startup_line(self):
+        return 'sh {script} start'.format(script=self._file('sh'))
+
+    @property
+    def dry_run(self):
+        return '{vtysh} -C'.format(vtysh=self.vtysh)
+
+    @property
+    def cfg_filenames(self):
+        return [self.integrated_cfg, self._file('sh')]
+
+    @property
+    def template_filenames(self):
+        return ['frr.mako', '%s.mako' % self.NAME]
+
+    def build(self):
+        cfg = super().build()
+        os.makedirs(self.config_dir, exist_ok=True)
+        cfg.vtysh = self.vtysh
+        cfg.vty_socket_dir = self.vty_socket_dir
+        cfg.timeout = int(self.STARTUP_TIMEOUT) if self.STARTUP_TIMEOUT \
+            else 0
+        cfg.daemons = [ConfigDict(name=d.NAME,
+                                  startup_line=d.startup_line_for(os.devnull),
+                                  pid_file=d.pid_file)
+                       for d in self.frr_daemons]
+        return cfg
+
+    def render(self, cfg, **kwargs):
+        # All daemons log in the same file in integrated mode
+        kwargs['frr_config'] = merge_frr_configs(
+            (content for d in self.frr_daemons
+             for content in d.render(cfg).values()), skip=('log file',))
+        return super().render(cfg, **kwargs)
+
+    def readiness_conditions(self):
+        # watchfrr only starts once all daemons are configured
+        return [UnixSocketReady(os.path.join(self.vty_socket_dir,
+                                             '%s.vty' % self.NAME))]
+
+    def apply_config(self, old, new):
+        """Apply the difference between both integrated configurations
+        through vtysh"""
+        delta = config_delta(old.get(self.integrated_cfg, ''),
+                             new[self.integrated_cfg])
+        if not delta:
+            return
+        delta_file = self._file('delta')
+        if delta_file not in self.files:
+            self.files.append(delta_file)
+        with open(delta_file, 'w') as f:
+            f.write('\n'.join(delta) + '\n')
+        out, err, code = self._node._processes.pexec(
+            shlex.split('%s -f %s' % (self.vtysh, delta_file)))
+        if code:
+            raise RuntimeError('Cannot reload %s on %s [rcode: %d]\n'
+                               'stdout: %s\nstderr: %s'
+                               % (self.NAME, self._node.name, code, out, err))
+
+    def cleanup(self):
+        super().cleanup()
+        try:
+            os.rmdir(self.config_dir)
+        except OSError:
+            pass
+
+    def set_defaults(self, defaults):
+        """:param logfile: the path to the logfile of all FRRouting daemons"""
+        super().set_defaults(defaults)
@@ -1,10 +1,12 @@
 import os
-import socket
+import shlex
+import shutil
 from ipaddress import IPv4Network, IPv6Network
-from typing import Optional, Union, Sequence, Tuple
+from typing import Optional, Union, Sequence, Tuple, List
 
+from ipmininet.readiness import UnixSocketReady
 from .base import RouterDaemon
-from .utils import ConfigDict
+from .utils import ConfigNode, config_delta
 
 #  Route Map actions
 DENY = 'deny'
@@ -19,12 +21,28 @@ class QuaggaDaemon(RouterDaemon):
 
     @property
     def startup_line(self):
-        return '{name} -f {cfg} -i {pid} -z {api} -u root {extra}'\
-                .format(name=self.NAME,
-                        cfg=self.cfg_filename,
-                        pid=self._file('pid'),
-                        api=self.zebra_socket,
-                        extra=self.STARTUP_LINE_EXTRA)
+        return self.startup_line_for(self.cfg_filename)
+
+    def startup_line_for(self, cfg: str) -> str:
+        """Return the startup line of this daemon with a given configuration
+        file
+
+        :param cfg: The path of the configuration file"""
+        return '{name} -f {cfg} -i {pid} -z {api} --vty_socket {vty} ' \
+               '-u root {extra}'.format(name=self.NAME,
+                                        cfg=cfg,
+                                        pid=self.pid_file,
+                                        api=self.zebra_socket,
+                                        vty=self.vty_socket_dir,
+                                        extra=self.STARTUP_LINE_EXTRA)
+
+    @property
+    def pid_file(self) -> str:
+        return self._file('pid')
+
+    @property
+    def pid_files(self):
+        return [self.pid_file]
 
     @property
     def zebra_socket(self):
@@ -32,11 +50,63 @@ class QuaggaDaemon(RouterDaemon):
         return os.path.join(self._node.cwd,
                             '%s_%s.api' % ('quagga', self._node.name))
 
+    @property
+    def vty_socket_dir(self):
+        """Return the path towards the directory holding the vty sockets of
+        the daemons of the given node"""
+        return os.path.join(self._node.cwd,
+                            '%s_%s.vty' % ('quagga', self._node.name))
+
+    @property
+    def maximum_paths(self) -> Optional[int]:
+        """The maximal number of equal-cost paths of the routes computed by
+        this daemon, defaulting to the ecmp parameter of the router"""
+        if self.options.maximum_paths is not None:
+            return self.options.maximum_paths
+        return getattr(self._node.nconfig, 'ecmp', None)
+
+    @property
+    def vtysh(self) -> str:
+        """Return the vtysh command line connecting to this daemon only"""
+        return 'vtysh --vty_socket {vty} -d {name}'\
+            .format(vty=self.vty_socket_dir, name=self.NAME)
+
     def build(self):
         cfg = super().build()
         cfg.debug = self.options.debug
+        os.makedirs(self.vty_socket_dir, exist_ok=True)
         return cfg
 
+    def reload(self):
+        nconfig = self._node.nconfig
+        if getattr(nconfig, 'integrated', False):
+            # The running configuration comes from the integrated one
+            return nconfig.daemon('watchfrr').reload()
+        return super().reload()
+
+    def apply_config(self, old, new):
+        """Apply the difference between both configurations through vtysh"""
+        delta = []  # type: List[str]
+        for filename, content in new.items():
+            delta.extend(config_delta(old.get(filename, ''), content))
+        if not delta:
+            return
+        delta_file = self._file('delta')
+        if delta_file not in self.files:
+            self.files.append(delta_file)
+        with open(delta_file, 'w') as f:
+            f.write('\n'.join(delta) + '\n')
+        out, err, code = self._node._processes.pexec(
+            shlex.split('%s -f %s' % (self.vtysh, delta_file)))
+        if code:
+            raise RuntimeError('Cannot reload %s on %s [rcode: %d]\n'
+                               'stdout: %s\nstderr: %s'
+                               % (self.NAME, self._node.name, code, out, err))
+
+    def cleanup(self):
+        super().cleanup()
+        shutil.rmtree(self.vty_socket_dir, ignore_errors=True)
+
     def set_defaults(self, defaults):
         """:param debug: the set of debug events that should be logged"""
         defaults.debug = ()
@@ -66,9 +136,9 @@ class Zebra(QuaggaDaemon):
         # Update with preset defaults
         cfg.update(self.options)
         # Track interfaces
-        cfg.interfaces = (ConfigDict(name=itf.name,
-                                     description=itf.describe)
-                          for itf in self._node.intfList())
+        cfg.interfaces = [ZebraInterface(name=itf.name,
+                                         description=itf.describe)
+                          for itf in self._node.intfList()]
         return cfg
 
     def set_defaults(self, defaults):
@@ -80,19 +150,17 @@ class Zebra(QuaggaDaemon):
         defaults.route_maps = []
         super().set_defaults(defaults)
 
-    def has_started(self):
-        # We override this such that we wait until we have the API socket
-        # and until wa can connect to it
-        return os.path.exists(self.zebra_socket) and self.listening()
+    def readiness_conditions(self):
+        # We wait until we have the API socket and until we can connect to it
+        return [UnixSocketReady(self.zebra_socket)]
 
     def listening(self) -> bool:
-        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        try:
-            sock.connect(self.zebra_socket)
-            sock.close()
-            return True
-        except socket.error:
-            return False
+        return UnixSocketReady(self.zebra_socket).is_ready()
+
+
+class ZebraInterface(ConfigNode):
+    """The zebra properties of an interface"""
+    __slots__ = ('name', 'description')
 
 
 class CommunityList:
@@ -110,6 +178,8 @@ class CommunityList:
         """
         CommunityList.count += 1
         self.name = name if name else 'cml%d' % CommunityList.count
+        # Whether the name was derived from the instance number
+        self.generated_name = not name
         self.action = action
         self.community = community
 
@@ -148,6 +218,8 @@ class AccessList:
                         are composing the ACL"""
         AccessList.count += 1
         self.name = name if name else 'acl%d' % AccessList.count
+        # Whether the name was derived from the instance number
+        self.generated_name = not name
         self.entries = [e if isinstance(e, AccessListEntry)
                         else AccessListEntry(prefix=e)
                         for e in entries]
@@ -226,6 +298,8 @@ class RouteMap:
         """
         RouteMap.count += 1
         self.name = name if name else 'rm%d' % RouteMap.count
+        # Whether the name was derived from the instance number
+        self.generated_name = not name
         self.match_policy = match_policy
         self.match_cond = [e if isinstance(e, RouteMapMatchCond)
                            else RouteMapMatchCond(cond_type=e[0],
@@ -0,0 +1,336 @@
+"""This module queries the state of the FRRouting daemons of the routers
+through their vty sockets, without spawning a vtysh process for each query.
+
+The protocol is the one of vtysh: a command is sent as a NUL-terminated
+string and the daemon answers with the command output, followed by three NUL
+bytes and the return code of the command."""
+import json
+import os
+import selectors
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union, \
+    TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ipmininet.router import Router
+
+# The number of seconds during which the result of a query is reused
+DEFAULT_TTL = 1.
+# The number of seconds to wait for the answer of a daemon
+DEFAULT_TIMEOUT = 10.
+# The return code of a successful command
+CMD_SUCCESS = 0
+# The marker preceding the return code at the end of an answer
+_END_MARKER = b'\0\0\0'
+
+# The address and interface of a next hop
+NextHop = Tuple[Optional[str], Optional[str]]
+
+
+class VtyConnection:
+    """A persistent connection to the vty socket of a daemon"""
+
+    def __init__(self, path: str, timeout=DEFAULT_TIMEOUT):
+        """:param path: The path of the vty socket
+        :param timeout: The number of seconds to wait for an answer"""
+        self.path = path
+        self.timeout = timeout
+        self._sock = None  # type: Optional[socket.socket]
+        self._buf = bytearray()
+        self._command = None  # type: Optional[str]
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def connect(self):
+        if self._sock is not None:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._buf.clear()
+        self._command = None
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def send(self, command: str):
+        """Send a command, without waiting for its answer
+
+        :param command: The command to execute"""
+        self.connect()
+        self._buf.clear()
+        self._command = command
+        try:
+            self._sock.sendall(command.encode() + b'\0')
+        except OSError:
+            self.close()
+            raise
+
+    def receive(self) -> Optional[str]:
+        """Read the available part of the answer
+
+        :return: The output of the command if it is complete, None otherwise
+        :raise RuntimeError: if the command failed"""
+        try:
+            data = self._sock.recv(65536)
+        except OSError:
+            self.close()
+            raise
+        if not data:
+            command = self._command
+            self.close()
+            raise ConnectionResetError('%s closed the connection while '
+                                       'executing "%s"' % (self.path, command))
+        self._buf.extend(data)
+        if len(self._buf) < 4 or self._buf[-4:-1] != _END_MARKER:
+            return None
+        code = self._buf[-1]
+        output = self._buf[:-4].decode(errors='replace')
+        command = self._command
+        self._buf.clear()
+        self._command = None
+        if code != CMD_SUCCESS:
+            raise RuntimeError('"%s" failed on %s [rcode: %d]: %s'
+                               % (command, self.path, code, output.strip()))
+        return output
+
+    def execute(self, command: str) -> str:
+        """Execute a command and return its output. The connection is
+        established again once if the daemon closed it, e.g., after
+        a restart.
+
+        :param command: The command to execute
+        :raise RuntimeError: if the command failed"""
+        was_connected = self.connected
+        try:
+            return self._execute(command)
+        except (ConnectionResetError, BrokenPipeError):
+            if not was_connected:
+                raise
+            return self._execute(command)
+
+    def _execute(self, command: str) -> str:
+        self.send(command)
+        while True:
+            output = self.receive()
+            if output is not None:
+                return output
+
+
+class RouterState:
+    """Query the state of the FRRouting daemons of a router through
+    persistent vty connections, caching the answers for a short time"""
+
+    def __init__(self, router: 'Router', ttl=DEFAULT_TTL,
+                 timeout=DEFAULT_TIMEOUT):
+        """:param router: The router to query
+        :param ttl: The number of seconds during which an answer is reused
+        :param timeout: The number of seconds to wait for an answer"""
+        self.router = router
+        self.ttl = ttl
+        self.timeout = timeout
+        self._connections = {}  # type: Dict[str, VtyConnection]
+        self._cache = {}  # type: Dict[Tuple[str, str], Tuple[float, object]]
+        self._lock = threading.Lock()
+
+    @property
+    def vty_socket_dir(self) -> str:
+        try:
+            return self.router.nconfig.daemon('zebra').vty_socket_dir
+        except KeyError:
+            raise ValueError('%s does not run FRRouting daemons'
+                             % self.router.name)
+
+    def connection(self, daemon: str) -> VtyConnection:
+        """Return the connection to a daemon of the router
+
+        :param daemon: The daemon name"""
+        try:
+            return self._connections[daemon]
+        except KeyError:
+            c = self._connections[daemon] = VtyConnection(
+                os.path.join(self.vty_socket_dir, '%s.vty' % daemon),
+                timeout=self.timeout)
+            return c
+
+    def cached(self, daemon: str, command: str):
+        """Return the cached answer of a command, or None if it expired"""
+        entry = self._cache.get((daemon, command))
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def _store(self, daemon: str, command: str, output: str,
+               use_json: bool):
+        value = parse_output(output, use_json)
+        self._cache[daemon, command] = (time.monotonic(), value)
+        return value
+
+    def query(self, daemon: str, command: str, use_json=True):
+        """Execute a command on a daemon of the router
+
+        :param daemon: The daemon name
+        :param command: The command, without its 'json' keyword
+        :param use_json: Whether to request and parse a JSON answer
+        :return: The parsed answer, or the raw output if use_json is False"""
+        if use_json:
+            command += ' json'
+        with self._lock:
+            value = self.cached(daemon, command)
+            if value is None:
+                output = self.connection(daemon).execute(command)
+                value = self._store(daemon, command, output, use_json)
+            return value
+
+    def invalidate(self):
+        """Forget all cached answers"""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Close all connections to the daemons"""
+        with self._lock:
+            for c in self._connections.values():
+                c.close()
+            self._connections.clear()
+            self._cache.clear()
+
+    def ospf_neighbors(self) -> Dict:
+        """Return the OSPF neighbors of the router"""
+        return self.query('ospfd', 'show ip ospf neighbor')
+
+    def ospf6_neighbors(self) -> Dict:
+        """Return the OSPFv3 neighbors of the router"""
+        return self.query('ospf6d', 'show ipv6 ospf6 neighbor')
+
+    def bgp_summary(self) -> Dict:
+        """Return the summary of the BGP sessions of the router"""
+        return self.query('bgpd', 'show bgp summary')
+
+    def bgp_routes(self, family=4) -> Dict:
+        """Return the BGP RIB of the router
+
+        :param family: The IP version of the routes"""
+        return self.query('bgpd', 'show bgp %s unicast'
+                          % ('ipv6' if family == 6 else 'ipv4'))
+
+    def rib(self, family=4) -> Dict:
+        """Return the routes installed by zebra, by prefix
+
+        :param family: The IP version of the routes"""
+        return self.query('zebra', 'show %s route'
+                          % ('ipv6' if family == 6 else 'ip'))
+
+    def nexthops(self, family=4) -> Dict[str, List[NextHop]]:
+        """Return the next hops installed in the FIB for each prefix
+
+        :param family: The IP version of the routes"""
+        return fib_nexthops(self.rib(family=family))
+
+
+def fib_nexthops(rib: Dict) -> Dict[str, List[NextHop]]:
+    """Return the next hops of the selected routes of a RIB that are
+    installed in the FIB, e.g., to check that the traffic is spread over
+    equal-cost paths
+
+    :param rib: The JSON output of 'show ip route'
+    :return: The sorted (address, interface) pairs, by prefix. The address
+             is None for the directly connected prefixes."""
+    nexthops = {}  # type: Dict[str, List[NextHop]]
+    for prefix, routes in rib.items():
+        for route in routes:
+            if not route.get('selected'):
+                continue
+            hops = {(nh.get('ip'), nh.get('interfaceName'))
+                    for nh in route.get('nexthops', ()) if nh.get('fib')}
+            if hops:
+                nexthops[prefix] = sorted(hops, key=lambda h: (h[0] or '',
+                                                               h[1] or ''))
+    return nexthops
+
+
+def parse_output(output: str, use_json=True):
+    """Parse the output of a command
+
+    :param output: The output of the command
+    :param use_json: Whether the output is in JSON"""
+    if not use_json:
+        return output
+    output = output.strip()
+    return json.loads(output) if output else {}
+
+
+def batch_query(routers: Iterable[Union['Router', RouterState]],
+                daemon: str, command: str, use_json=True) -> Dict[str, object]:
+    """Execute the same command on the daemons of several routers at once,
+    and wait for all answers concurrently
+
+    :param routers: The routers (or their RouterState)
+    :param daemon: The daemon name
+    :param command: The command, without its 'json' keyword
+    :param use_json: Whether to request and parse JSON answers
+    :return: The parsed answer of each router, by router name
+    :raise RuntimeError: if a command failed"""
+    if use_json:
+        command += ' json'
+    results = {}  # type: Dict[str, object]
+    states = {}  # type: Dict[str, RouterState]
+    for r in routers:
+        s = r if isinstance(r, RouterState) else r.state
+        states[s.router.name] = s
+    # Lock the states in a consistent order to avoid deadlocks
+    states = [states[name] for name in sorted(states)]
+    with selectors.DefaultSelector() as selector:
+        deadline = None  # type: Optional[float]
+        for s in states:
+            s._lock.acquire()
+        try:
+            for s in states:
+                value = s.cached(daemon, command)
+                if value is not None:
+                    results[s.router.name] = value
+                    continue
+                c = s.connection(daemon)
+                try:
+                    c.send(command)
+                except (BrokenPipeError, ConnectionResetError):
+                    c.send(command)
+                selector.register(c.fileno(), selectors.EVENT_READ, (s, c))
+                timeout = time.monotonic() + c.timeout
+                deadline = timeout if deadline is None \
+                    else max(deadline, timeout)
+            while selector.get_map():
+                events = selector.select(deadline - time.monotonic())
+                if not events:
+                    raise RuntimeError('Timeout while waiting for "%s" on %s'
+                                       % (command, ', '.join(
+                                           k.data[0].router.name for k in
+                                           selector.get_map().values())))
+                for key, _ in events:
+                    s, c = key.data
+                    output = c.receive()
+                    if output is not None:
+                        selector.unregister(key.fileobj)
+                        results[s.router.name] = s._store(daemon, command,
+                                                          output, use_json)
+        finally:
+            # Drop the connections with unfinished answers
+            for key in list(selector.get_map().values()):
+                key.data[1].close()
+            for s in states:
+                s._lock.release()
+    return results
@@ -0,0 +1,298 @@
+"""This module samples the CPU and memory usage of the processes managed by
+the nodes of a network, e.g., to find the daemons that load the host during
+a convergence.
+
+The samples are read from /proc/<pid>/stat and /proc/<pid>/status in
+a background thread, and stored in preallocated ring buffers. The daemons
+that are not started by their node, e.g., the FRRouting daemons started by
+watchfrr in integrated mode, are found through their pid files."""
+import csv
+import json
+import os
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.readiness import live_pid
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+
+# The number of clock ticks per second, used by /proc/<pid>/stat
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+# The default number of samples kept in each series
+DEFAULT_CAPACITY = 3600
+# The label of the aggregated series of a node
+NODE_TOTAL = '*'
+
+
+class RingBuffer:
+    """A fixed-size buffer of numbers, overwriting its oldest values once
+    full. The values are stored in a preallocated array."""
+
+    def __init__(self, capacity: int, typecode='d'):
+        """:param capacity: The maximal number of values
+        :param typecode: The array typecode of the values"""
+        self.capacity = capacity
+        self._data = array(typecode, [0]) * capacity
+        self._start = 0
+        self._len = 0
+
+    def append(self, value):
+        self._data[(self._start + self._len) % self.capacity] = value
+        if self._len < self.capacity:
+            self._len += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('RingBuffer index out of range')
+        return self._data[(self._start + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._data[(self._start + i) % self.capacity]
+
+    def values(self) -> List:
+        """Return the values, from the oldest to the newest"""
+        end = self._start + self._len
+        if end <= self.capacity:
+            return self._data[self._start:end].tolist()
+        return (self._data[self._start:] +
+                self._data[:end - self.capacity]).tolist()
+
+
+class ResourceSeries:
+    """The resource usage of a process (or of a whole node) over time"""
+
+    def __init__(self, node: str, label: str, capacity=DEFAULT_CAPACITY):
+        """:param node: The node name
+        :param label: The daemon name or process label
+        :param capacity: The number of samples to keep"""
+        self.node = node
+        self.label = label
+        self.timestamps = RingBuffer(capacity)
+        # CPU usage, in percent of one core, since the previous sample
+        self.cpu = RingBuffer(capacity)
+        # Resident set size, in kB
+        self.rss = RingBuffer(capacity, typecode='q')
+        self.peak_cpu = 0.
+        self.peak_rss = 0
+        # Total CPU time, in seconds, consumed while being sampled
+        self.cpu_time = 0.
+        self.pid = None  # type: Optional[int]
+        self._last_ticks = None  # type: Optional[int]
+        self._last_time = None  # type: Optional[float]
+
+    def add(self, timestamp: float, cpu: float, rss: int):
+        self.timestamps.append(timestamp)
+        self.cpu.append(cpu)
+        self.rss.append(rss)
+        self.peak_cpu = max(self.peak_cpu, cpu)
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def sample(self, pid: int, timestamp: float, ticks: int, rss: int) \
+            -> Tuple[float, float]:
+        """Add a sample computed from the raw process counters
+
+        :return: The CPU usage (in percent) and CPU time (in seconds) since
+                 the previous sample"""
+        if pid != self.pid:
+            # New (or restarted) process, which might have run for a while,
+            # only the usage from now on is counted
+            self.pid = pid
+            self._last_ticks = ticks
+            self._last_time = timestamp
+        cpu_time = (ticks - self._last_ticks) / CLK_TCK
+        elapsed = timestamp - self._last_time
+        cpu = 100. * cpu_time / elapsed if elapsed > 0 else 0.
+        self._last_ticks = ticks
+        self._last_time = timestamp
+        self.cpu_time += cpu_time
+        self.add(timestamp, cpu, rss)
+        return cpu, cpu_time
+
+    def summary(self) -> Dict:
+        return {'node': self.node, 'daemon': self.label,
+                'samples': len(self.timestamps),
+                'peak_cpu_percent': self.peak_cpu,
+                'peak_rss_kb': self.peak_rss,
+                'cpu_time': self.cpu_time}
+
+
+def read_process_usage(pid: int) -> Optional[Tuple[int, int]]:
+    """Read the CPU and memory usage of a process
+
+    :return: The CPU ticks spent in user and kernel mode and the resident set
+             size in kB, or None if the process does not exist"""
+    try:
+        with open('/proc/%d/stat' % pid, 'rb') as f:
+            stat = f.read()
+        with open('/proc/%d/status' % pid, 'rb') as f:
+            status = f.read()
+    except (IOError, OSError):
+        return None
+    # The process name can contain spaces, the fields start after it
+    fields = stat[stat.rfind(b')') + 2:].split()
+    # utime and stime are the 14th and 15th fields of the file
+    ticks = int(fields[11]) + int(fields[12])
+    rss = 0
+    start = status.find(b'VmRSS:')
+    if start >= 0:
+        rss = int(status[start + 6:status.find(b'\n', start)].split()[0])
+    return ticks, rss
+
+
+class ResourceSampler:
+    """Periodically sample the CPU and memory usage of the processes of a set
+    of nodes, and keep per-daemon and per-node series"""
+
+    def __init__(self, nodes: Iterable['IPNode'], interval=1.,
+                 capacity=DEFAULT_CAPACITY,
+                 csv_path: Optional[str] = None,
+                 json_path: Optional[str] = None):
+        """:param nodes: The nodes whose processes are sampled
+        :param interval: The number of seconds between two samples
+        :param capacity: The number of samples to keep per series
+        :param csv_path: The file in which to export the samples when
+                         stopping the sampler
+        :param json_path: The file in which to export the summaries and the
+                          samples when stopping the sampler"""
+        self.nodes = list(nodes)
+        self.interval = interval
+        self.capacity = capacity
+        self.csv_path = csv_path
+        self.json_path = json_path
+        self._series = {}  # type: Dict[Tuple[str, str], ResourceSeries]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def start(self):
+        """Start sampling in a background thread"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop,
+                                        name='ipmininet-sampler',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, and export the samples if requested"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.csv_path:
+            self.to_csv(self.csv_path)
+        if self.json_path:
+            self.to_json(self.json_path)
+
+    def _loop(self):
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_sample += self.interval
+            self._stop.wait(max(next_sample - time.monotonic(), 0))
+
+    def _get_series(self, node: str, label: str) -> ResourceSeries:
+        try:
+            return self._series[node, label]
+        except KeyError:
+            s = self._series[node, label] = ResourceSeries(node, label,
+                                                           self.capacity)
+            return s
+
+    @staticmethod
+    def _labeled_pids(node: 'IPNode') -> Dict[str, int]:
+        """Return the pids of the running processes of a node, by label"""
+        processes = node.labeled_processes()
+        pids = {label: p.pid for label, p in processes.items()
+                if p.poll() is None}
+        for d in node.nconfig.daemons:
+            if d.NAME in processes:
+                continue
+            for path in d.pid_files:
+                pid = live_pid(path)
+                if pid is not None:
+                    pids[d.NAME] = pid
+                    break
+        return pids
+
+    def sample(self):
+        """Take one sample of all the running processes"""
+        now = time.time()
+        with self._lock:
+            for n in self.nodes:
+                total_cpu = 0.
+                total_rss = 0
+                total_time = 0.
+                for label, pid in self._labeled_pids(n).items():
+                    usage = read_process_usage(pid)
+                    if usage is None:
+                        continue
+                    cpu, cpu_time = self._get_series(n.name, label)\
+                        .sample(pid, now, *usage)
+                    total_cpu += cpu
+                    total_rss += usage[1]
+                    total_time += cpu_time
+                node_series = self._get_series(n.name, NODE_TOTAL)
+                node_series.add(now, total_cpu, total_rss)
+                node_series.cpu_time += total_time
+
+    def series(self, node: str, daemon: str = NODE_TOTAL) -> ResourceSeries:
+        """Return the series of a daemon or, by default, of a whole node
+
+        :param node: The node name
+        :param daemon: The daemon name (or process label)"""
+        return self._series[node, daemon]
+
+    def node_series(self) -> Dict[str, ResourceSeries]:
+        """Return the aggregated series of each node"""
+        return {n: s for (n, label), s in self._series.items()
+                if label == NODE_TOTAL}
+
+    def daemon_series(self) -> Dict[Tuple[str, str], ResourceSeries]:
+        """Return the series of each daemon, by (node name, daemon name)"""
+        return {k: s for k, s in self._series.items() if k[1] != NODE_TOTAL}
+
+    def summary(self) -> List[Dict]:
+        """Return the peaks and totals of each series, by decreasing CPU
+        time"""
+        with self._lock:
+            return sorted((s.summary() for s in self._series.values()),
+                          key=lambda x: x['cpu_time'], reverse=True)
+
+    def to_csv(self, path: str):
+        """Export all samples in a CSV file"""
+        with self._lock, open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp', 'node', 'daemon', 'cpu_percent',
+                             'rss_kb'])
+            for (node, label), s in sorted(self._series.items()):
+                for row in zip(s.timestamps.values(), s.cpu.values(),
+                               s.rss.values()):
+                    writer.writerow([row[0], node, label, row[1], row[2]])
+        log.info('*** Exported resource samples to %s\n' % path)
+
+    def to_json(self, path: str):
+        """Export the summaries and samples in a JSON file"""
+        out = []
+        with self._lock:
+            for (node, label), s in sorted(self._series.items()):
+                entry = s.summary()
+                entry.update(timestamps=s.timestamps.values(),
+                             cpu_percent=s.cpu.values(),
+                             rss_kb=s.rss.values())
+                out.append(entry)
+        with open(path, 'w') as f:
+            json.dump(out, f)
+        log.info('*** Exported resource samples to %s\n' % path)
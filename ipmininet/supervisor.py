@@ -0,0 +1,345 @@
+"""This module supervises the daemons of a network: it detects their exit
+as soon as it happens, records crashes and restarts the daemons according to
+their restart policy.
+
+All processes are watched by a single thread through one selector, using
+pidfds when the kernel supports them, or by polling the processes
+otherwise. A daemon whose pid file still references a live process after its
+exit forked in the background: it is reported as detached and never
+restarted, as this would spawn a duplicate."""
+import collections
+import os
+import selectors
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from mininet.log import lg as log
+
+from ipmininet.readiness import live_pid
+
+if TYPE_CHECKING:
+    from ipmininet.router import IPNode
+    from ipmininet.router.config.base import Daemon
+
+# Restart modes
+NEVER = 'never'
+ON_FAILURE = 'on-failure'
+ALWAYS = 'always'
+
+# Daemon states
+RUNNING = 'running'
+EXITED = 'exited'
+RESTARTING = 'restarting'
+FAILED = 'failed'
+# The supervised process exited but left the daemon running in the
+# background, as referenced by one of its pid files
+DETACHED = 'detached'
+
+# The interval at which processes are polled if pidfds are not available
+DEFAULT_POLL_INTERVAL = .5
+
+
+class RestartPolicy:
+    """Describes when and how fast a daemon is restarted after it exited"""
+
+    def __init__(self, restart=NEVER, max_restarts=5, backoff=1.,
+                 max_backoff=60., reset_after=60.):
+        """:param restart: When to restart the daemon: NEVER, ON_FAILURE
+                           (i.e., on non-zero exit codes or signals) or ALWAYS
+        :param max_restarts: The maximal number of consecutive restarts
+        :param backoff: The delay before the first restart, doubled after
+                        each consecutive restart
+        :param max_backoff: The maximal delay before a restart
+        :param reset_after: The number of seconds after which a running
+                            daemon is considered as healthy again, i.e., its
+                            consecutive restart count is reset"""
+        if restart not in (NEVER, ON_FAILURE, ALWAYS):
+            raise ValueError('Unknown restart mode %s' % restart)
+        self.restart = restart
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reset_after = reset_after
+
+    def should_restart(self, code: int, restarts: int) -> bool:
+        """Return whether a daemon exiting with the given code should be
+        restarted
+
+        :param code: The return code of the process (negative for signals)
+        :param restarts: The number of consecutive restarts so far"""
+        if self.restart == NEVER or restarts >= self.max_restarts:
+            return False
+        return self.restart == ALWAYS or code != 0
+
+    def delay(self, restarts: int) -> float:
+        """Return the delay before the next restart
+
+        :param restarts: The number of consecutive restarts so far"""
+        return min(self.backoff * 2 ** restarts, self.max_backoff)
+
+
+class CrashEvent:
+    """The record of an unexpected daemon exit"""
+
+    def __init__(self, node: str, daemon: str, code: int, timestamp: float,
+                 log_tail: List[str]):
+        """:param node: The node name
+        :param daemon: The daemon name
+        :param code: The return code of the process (negative for signals)
+        :param timestamp: The time of the exit detection
+        :param log_tail: The last lines of the daemon logfile"""
+        self.node = node
+        self.daemon = daemon
+        self.code = code
+        self.timestamp = timestamp
+        self.log_tail = log_tail
+
+    @property
+    def reason(self) -> str:
+        if self.code < 0:
+            return 'killed by signal %d' % -self.code
+        return 'exited with code %d' % self.code
+
+    def __str__(self):
+        return '%s on %s %s' % (self.daemon, self.node, self.reason)
+
+
+class DaemonStatus:
+    """The current health of a supervised daemon"""
+
+    def __init__(self, node: 'IPNode', daemon: 'Daemon', process):
+        self.node = node
+        self.daemon = daemon
+        self.process = process
+        self.state = RUNNING
+        self.started_at = time.time()
+        self.restarts = 0
+        self.total_restarts = 0
+        self.last_exit_code = None  # type: Optional[int]
+        self.crashes = []  # type: List[CrashEvent]
+        self.restart_at = None  # type: Optional[float]
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.state == RUNNING else None
+
+    def __str__(self):
+        s = '%s on %s: %s' % (self.daemon.NAME, self.node.name, self.state)
+        if self.total_restarts:
+            s += ' (%d restarts)' % self.total_restarts
+        if self.last_exit_code is not None:
+            s += ' [last exit code: %d]' % self.last_exit_code
+        return s
+
+
+class Supervisor:
+    """Watch the daemons of a set of nodes and restart them according to
+    their restart policy. The policy of a daemon is taken, in order, from its
+    'restart_policy' option, from the policies given by daemon name, or from
+    the default policy."""
+
+    def __init__(self, nodes: Iterable['IPNode'],
+                 policy: Optional[RestartPolicy] = None,
+                 policies: Optional[Dict[str, RestartPolicy]] = None,
+                 log_tail=20, poll_interval=DEFAULT_POLL_INTERVAL):
+        """:param nodes: The nodes whose daemons are supervised
+        :param policy: The default restart policy
+        :param policies: The restart policies by daemon name
+        :param log_tail: The number of log lines to record on crashes
+        :param poll_interval: The polling interval of the processes if
+                              pidfds are not available"""
+        self.nodes = list(nodes)
+        self.policy = policy if policy is not None else RestartPolicy()
+        self.policies = policies if policies is not None else {}
+        self.log_tail = log_tail
+        self.poll_interval = poll_interval
+        self.crashes = []  # type: List[CrashEvent]
+        self._status = {}  # type: Dict[Tuple[str, str], DaemonStatus]
+        self._lock = threading.Lock()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._stopping = False
+        self._selector = None  # type: Optional[selectors.BaseSelector]
+        self._wake_r, self._wake_w = None, None
+        self._pidfds = {}  # type: Dict[Tuple[str, str], int]
+        self._use_pidfd = hasattr(os, 'pidfd_open')
+
+    def policy_for(self, daemon: 'Daemon') -> RestartPolicy:
+        """Return the restart policy of a daemon"""
+        p = daemon.options.restart_policy
+        if p is not None:
+            return p
+        return self.policies.get(daemon.NAME, self.policy)
+
+    def start(self):
+        """Register all the started daemons and watch them in
+        a background thread"""
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
+        for n in self.nodes:
+            for d in n.nconfig.daemons:
+                p = n.daemon_process(d)
+                if p is not None:
+                    self._watch(DaemonStatus(n, d, p))
+        self._stopping = False
+        self._thread = threading.Thread(target=self._loop,
+                                        name='ipmininet-supervisor',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching the daemons, e.g., before terminating them"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        os.write(self._wake_w, b'x')
+        self._thread.join()
+        self._thread = None
+        for fd in self._pidfds.values():
+            os.close(fd)
+        self._pidfds.clear()
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def health(self) -> Dict[str, Dict[str, DaemonStatus]]:
+        """Return the status of each daemon, by node name and daemon name"""
+        health = {}  # type: Dict[str, Dict[str, DaemonStatus]]
+        with self._lock:
+            for (node, daemon), status in sorted(self._status.items()):
+                health.setdefault(node, {})[daemon] = status
+        return health
+
+    def _watch(self, status: DaemonStatus):
+        key = (status.node.name, status.daemon.NAME)
+        with self._lock:
+            self._status[key] = status
+        if not self._use_pidfd:
+            return
+        try:
+            fd = os.pidfd_open(status.process.pid)
+        except OSError:
+            # The process might have already exited and been reaped,
+            # or pidfds are not supported by this kernel
+            if status.process.poll() is None:
+                self._use_pidfd = False
+            # Make sure that the loop checks this process
+            os.write(self._wake_w, b'x')
+            return
+        self._pidfds[key] = fd
+        self._selector.register(fd, selectors.EVENT_READ, key)
+
+    def _unwatch(self, key: Tuple[str, str]):
+        fd = self._pidfds.pop(key, None)
+        if fd is not None:
+            self._selector.unregister(fd)
+            os.close(fd)
+
+    def _loop(self):
+        while not self._stopping:
+            for status in list(self._status.values()):
+                if status.state == RUNNING:
+                    self._check_exit(status)
+                elif status.state == RESTARTING \
+                        and status.restart_at <= time.time():
+                    self._restart(status)
+            now = time.time()
+            with self._lock:
+                due = [s.restart_at for s in self._status.values()
+                       if s.restart_at is not None]
+            timeout = min(due) - now if due else None
+            if not self._use_pidfd:
+                timeout = self.poll_interval if timeout is None \
+                    else min(timeout, self.poll_interval)
+            for key, _ in self._selector.select(
+                    None if timeout is None else max(timeout, 0)):
+                if key.data is None:
+                    os.read(self._wake_r, 4096)
+
+    def _check_exit(self, status: DaemonStatus):
+        code = status.process.poll()
+        policy = self.policy_for(status.daemon)
+        # The daemon ran long enough for its previous restarts to be
+        # forgotten, whether it is still running or it has just exited
+        if status.restarts and \
+                time.time() - status.started_at >= policy.reset_after:
+            status.restarts = 0
+        if code is None:
+            return
+        key = (status.node.name, status.daemon.NAME)
+        self._unwatch(key)
+        with self._lock:
+            status.last_exit_code = code
+            if code != 0:
+                crash = CrashEvent(status.node.name, status.daemon.NAME,
+                                   code, time.time(),
+                                   self._read_log_tail(status.daemon))
+                status.crashes.append(crash)
+                self.crashes.append(crash)
+                log.error('*** %s\n' % crash)
+            detached = self._detached_pid(status.daemon)
+            if detached is not None:
+                self._detach(status, detached)
+            elif policy.should_restart(code, status.restarts):
+                status.state = RESTARTING
+                status.restart_at = time.time() \
+                    + policy.delay(status.restarts)
+            else:
+                status.state = EXITED if code == 0 else FAILED
+
+    def _restart(self, status: DaemonStatus):
+        detached = self._detached_pid(status.daemon)
+        if detached is not None:
+            with self._lock:
+                self._detach(status, detached)
+            return
+        log.info('*** Restarting %s on %s\n' % (status.daemon.NAME,
+                                                status.node.name))
+        try:
+            process = status.node.start_daemon(status.daemon)
+        except (OSError, ValueError) as e:
+            log.error('*** Cannot restart %s on %s: %s\n'
+                      % (status.daemon.NAME, status.node.name, e))
+            with self._lock:
+                status.state = FAILED
+                status.restart_at = None
+            return
+        with self._lock:
+            status.process = process
+            status.state = RUNNING
+            status.restart_at = None
+            status.started_at = time.time()
+            status.restarts += 1
+            status.total_restarts += 1
+        self._watch(status)
+
+    @staticmethod
+    def _detached_pid(daemon: 'Daemon') -> Optional[int]:
+        """Return the pid of a live process referenced by one of the pid
+        files of the daemon"""
+        for path in daemon.pid_files:
+            pid = live_pid(path)
+            if pid is not None:
+                return pid
+        return None
+
+    @staticmethod
+    def _detach(status: DaemonStatus, pid: int):
+        # Restarting the daemon would spawn a duplicate of the live process
+        log.warning('*** %s on %s still runs in the background as pid %d,'
+                    ' it is no longer supervised\n'
+                    % (status.daemon.NAME, status.node.name, pid))
+        status.state = DETACHED
+        status.restart_at = None
+
+    def _read_log_tail(self, daemon: 'Daemon') -> List[str]:
+        logfile = daemon.options.logfile
+        if not logfile or not self.log_tail:
+            return []
+        try:
+            with open(logfile, errors='replace') as f:
+                return [line.rstrip('\n') for line in
+                        collections.deque(f, maxlen=self.log_tail)]
+        except (IOError, OSError):
+            return []
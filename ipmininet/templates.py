@@ -0,0 +1,86 @@
+"""This module caches the compiled Mako templates of the daemon
+configurations on disk, such that they are not parsed and compiled again
+by each run.
+
+The compiled modules are stored in a directory specific to the Mako version
+and to the directory of the templates, and Mako compiles a template again if
+its source is more recent than its compiled module. Running this module
+precompiles all the templates."""
+import hashlib
+import os
+from typing import Optional
+
+import mako
+from mako.lookup import TemplateLookup
+
+from mininet.log import lg as log
+
+# The environment variable overriding the cache directory (an empty value
+# disables the cache)
+CACHE_ENV = 'IPMININET_TEMPLATE_CACHE'
+TEMPLATE_EXTENSION = '.mako'
+
+
+def cache_directory(name: str) -> Optional[str]:
+    """Return the directory in which the compiled templates are stored, or
+    None if it cannot be written
+
+    :param name: The name of the set of templates"""
+    base = os.environ.get(CACHE_ENV)
+    if base is None:
+        base = os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                           os.path.expanduser('~/.cache')),
+                            'ipmininet', 'templates')
+    if not base:
+        return None
+    path = os.path.join(base, 'mako-%s' % mako.__version__, name)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path if os.access(path, os.W_OK) else None
+
+
+def template_lookup(directory: str, name: str) -> TemplateLookup:
+    """Return a TemplateLookup object caching its compiled templates on disk
+
+    :param directory: The directory of the templates
+    :param name: The name of the set of templates, unique among the lookups"""
+    # Other installations have templates of the same name in other
+    # directories
+    digest = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()
+    return TemplateLookup(directories=[directory],
+                          module_directory=cache_directory(
+                              '%s-%s' % (name, digest[:12])))
+
+
+def precompile(lookup: TemplateLookup) -> int:
+    """Compile all the templates of a lookup, such that they are cached
+
+    :return: The number of templates"""
+    count = 0
+    for directory in lookup.directories:
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(TEMPLATE_EXTENSION):
+                lookup.get_template(filename)
+                count += 1
+    return count
+
+
+def precompile_all() -> int:
+    """Compile all the daemon templates of IPMininet
+
+    :return: The number of templates"""
+    from ipmininet.router.config.base import router_template_lookup
+    from ipmininet.host.config.base import host_template_lookup
+    count = 0
+    for lookup in (router_template_lookup, host_template_lookup):
+        if lookup.module_directory is None:
+            log.warning('*** The compiled templates cannot be cached\n')
+        count += precompile(lookup)
+    return count
+
+
+if __name__ == '__main__':
+    log.setLogLevel('info')
+    log.info('*** Compiled %d templates\n' % precompile_all())
@@ -0,0 +1,80 @@
+"""This module tests the topologies built from AS-relationship datasets"""
+import bz2
+
+import pytest
+
+from ipmininet.asrel import ASGraph, ASRelationshipTopo, PEER_PEER, \
+    PROVIDER_CUSTOMER, main, read_relationships
+
+RELATIONSHIPS = """# source:topology|BGP
+# 1 and 2 are tier-1 ASes, 3 and 4 their customers, 5 a stub
+1|2|0
+1|3|-1
+2|3|-1
+2|4|-1
+1|4|-1
+3|4|0|bgp
+4|5|-1
+4|5|-1
+"""
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'as-rel.txt.bz2'
+    with bz2.open(str(path), 'wt') as f:
+        f.write(RELATIONSHIPS)
+    return str(path)
+
+
+def test_read_relationships(dataset, tmp_path):
+    links = list(read_relationships(dataset))
+    assert links[0] == (1, 2, PEER_PEER)
+    assert links[1] == (1, 3, PROVIDER_CUSTOMER)
+    assert len(links) == 8
+    invalid = tmp_path / 'invalid.txt'
+    invalid.write_text('1|2|1\n')
+    with pytest.raises(ValueError):
+        list(read_relationships(str(invalid)))
+
+
+def test_graph(dataset):
+    graph = ASGraph.load(dataset)
+    # The duplicate link is ignored
+    assert len(graph) == 5 and graph.link_count() == 7
+    assert graph.degrees() == {1: 3, 2: 3, 3: 3, 4: 4, 5: 1}
+    core = graph.k_core(3)
+    assert sorted(core.asns) == [1, 2, 3, 4]
+    assert core.link_count() == 6
+    assert len(graph.k_core(4)) == 0
+    sample = graph.sample(3, seed=1)
+    # The exploration starts from the AS with the most neighbors
+    assert len(sample) == 3 and 4 in sample.asns
+    assert len(graph.sample(10)) == 5
+    assert graph.budget() == {'ases': 5, 'links': 7,
+                              'provider_customer_links': 5,
+                              'peer_links': 2, 'bgp_sessions': 14,
+                              'processes': 15, 'interfaces': 19}
+
+
+def test_topo(dataset):
+    topo = ASRelationshipTopo(ASGraph.load(dataset),
+                              bgp_options={'profile': 'fast'})
+    assert sorted(topo.routers()) == ['as1', 'as2', 'as3', 'as4', 'as5']
+    assert topo.nodeInfo('as4')['asn'] == 4
+    assert sorted(topo.nodeInfo('as4')['bgp_peers']) \
+        == ['as1', 'as2', 'as3', 'as5']
+    # The customer prefers the routes of its customers and peers
+    local_prefs = {(rm['peer'], a.value)
+                   for rm in topo.nodeInfo('as4')['bgp_route_maps']
+                   for a in rm.get('set_actions', ())
+                   if a.action_type == 'local-preference'}
+    assert local_prefs == {('as1', 100), ('as2', 100), ('as3', 150),
+                           ('as5', 200)}
+    assert topo.linkInfo('as4', 'as5')['igp_passive']
+
+
+def test_main(dataset, capsys):
+    assert main([dataset, '--k-core', '3']) == 0
+    assert 'bgp_sessions' in capsys.readouterr().out
+    assert main([dataset + '.missing']) == 1
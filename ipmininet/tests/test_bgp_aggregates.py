@@ -0,0 +1,123 @@
+"""This module tests the aggregation of the subnets of an AS announced by
+BGP"""
+from ipaddress import ip_interface, ip_network
+
+import pytest
+
+from ipmininet.router.config import BGP, RouterConfig, AF_INET, AF_INET6
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.bgp import as_paths
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+from ipmininet.utils import L3Router
+
+
+class FakeDomain:
+
+    def __init__(self):
+        self.interfaces = []
+        self.routers = []
+
+    def __iter__(self):
+        return iter(self.interfaces)
+
+
+class FakeIntf:
+
+    def __init__(self, node, domain, ip, ip6):
+        self.node = node
+        self.name = '%s-eth%d' % (node.name, len(node.interfaces))
+        self.broadcast_domain = domain
+        self.addresses = {4: [ip_interface(ip)], 6: [ip_interface(ip6)]}
+        node.interfaces.append(self)
+        domain.interfaces.append(self)
+        if isinstance(node, L3Router):
+            domain.routers.append(self)
+
+    def ips(self):
+        return iter(self.addresses[4])
+
+    def ip6s(self, exclude_lls=False):
+        return (ip for ip in self.addresses[6]
+                if not exclude_lls or not ip.is_link_local)
+
+
+class FakeHost:
+
+    def __init__(self, name):
+        self.name = name
+        self.interfaces = []
+
+
+class FakeRouter(L3Router):
+
+    def __init__(self, name, asn, paths, tmp_path=None):
+        self.name = name
+        self.asn = asn
+        self.interfaces = []
+        if tmp_path is not None:
+            self.cwd = str(tmp_path)
+            self.password = 'zebra'
+            self.nconfig = RouterConfig(self)
+            self.nconfig.routerid = '10.0.0.1'
+            self.nconfig.as_paths = paths
+        else:
+            self.nconfig = ConfigDict(as_paths=paths)
+
+    def intfList(self):
+        return self.interfaces
+
+    def get(self, key, val=None):
+        return val
+
+
+def link(nodes, subnet, subnet6):
+    domain = FakeDomain()
+    net, net6 = ip_network(subnet), ip_network(subnet6)
+    for i, n in enumerate(nodes, start=1):
+        FakeIntf(n, domain, '%s/%d' % (net[i], net.prefixlen),
+                 '%s/%d' % (net6[i], net6.prefixlen))
+
+
+@pytest.fixture
+def routers(tmp_path):
+    """
+    h --- a --- b --- c --- x (AS2)
+    """
+    paths = {}
+    a, c = FakeRouter('a', 1, paths, tmp_path), FakeRouter('c', 1, paths)
+    b, x = FakeRouter('b', 1, paths), FakeRouter('x', 2, paths)
+    link([FakeHost('h'), a], '10.0.1.0/24', 'fc00:0:1::/48')
+    link([a, b], '10.0.0.0/30', 'fc00::/64')
+    link([b, c], '10.0.0.4/30', 'fc00:0:0:1::/64')
+    link([c, x], '10.0.0.8/30', 'fc00:0:0:2::/64')
+    return a, b, c, x
+
+
+def test_aggregates(routers):
+    a, b, c, x = routers
+    v4, v6 = as_paths(a).aggregates(a)
+    # The subnet shared with AS2 is not aggregated
+    assert v4 == [ip_network('10.0.0.0/29'), ip_network('10.0.1.0/24')]
+    assert v6 == [ip_network('fc00::/63'), ip_network('fc00:0:1::/48')]
+    # The other routers of the AS share the aggregates
+    assert as_paths(c).aggregates(c) is as_paths(a).aggregates(a)
+    assert as_paths(x).aggregates(x) == ([], [])
+
+
+def test_render_aggregates(routers):
+    a = routers[0]
+    bgp = BGP(a, aggregate=True,
+              address_families=(AF_INET(aggregates=('10.1.0.0/16',)),
+                                AF_INET6()))
+    cfg = bgp.build()
+    assert cfg.aggregates['ipv4'] == [ip_network('10.0.0.0/29'),
+                                      ip_network('10.0.1.0/24'),
+                                      ip_network('10.1.0.0/16')]
+    lines = router_template_lookup.get_template('bgpd.mako').render(
+        node=ConfigDict(name='a', password='zebra', bgpd=cfg),
+        ip_statement=ip_statement).splitlines()
+    assert '    aggregate-address 10.0.0.0/29 summary-only' in lines
+    assert '    aggregate-address fc00:0:1::/48 summary-only' in lines
+    # Without the option, only the given aggregates are announced
+    cfg = BGP(a).build()
+    assert cfg.aggregates == {'ipv4': [], 'ipv6': []}
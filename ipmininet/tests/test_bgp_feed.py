@@ -0,0 +1,150 @@
+"""This module tests the BGP feed speaker"""
+import gzip
+import json
+import socket
+import struct
+import threading
+from ipaddress import ip_network
+
+import pytest
+
+from ipmininet import bgp_speaker as bs
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.utils import ConfigDict
+
+
+def test_synthetic_routes():
+    routes = list(bs.synthetic_routes('ipv4', 1000, seed=1))
+    assert len({r.prefix for r in routes}) == 1000
+    assert routes[0].prefix == ip_network('16.0.0.0/24')
+    assert all(2 <= len(r.as_path) <= 6 for r in routes)
+    # The routes are reproducible
+    assert [r.as_path for r in bs.synthetic_routes('ipv4', 1000, seed=1)] \
+        == [r.as_path for r in routes]
+    v6 = list(bs.synthetic_routes('ipv6', 10, base='2001:db8::/32',
+                                  prefixlen=64))
+    assert v6[1].prefix == ip_network('2001:db8:0:1::/64')
+    with pytest.raises(ValueError):
+        list(bs.synthetic_routes('ipv4', 300, base='10.0.0.0/16'))
+
+
+def test_update_messages():
+    routes = list(bs.synthetic_routes('ipv4', 5000, prefixes_per_path=1000,
+                                      communities=3))
+    messages = list(bs.update_messages(routes, 65000, '10.0.0.1'))
+    assert sum(count for _, count, _ in messages) == 5000
+    assert messages[-1][2] is routes[-1]
+    for data, count, last in messages:
+        assert len(data) <= bs.MAX_MESSAGE_SIZE
+        _, length, msg_type = bs.HEADER.unpack_from(data)
+        assert length == len(data) and msg_type == bs.UPDATE
+        attr_len, = struct.unpack_from('!H', data, bs.HEADER.size + 2)
+        as_path, communities = bs.parse_attributes(
+            data[bs.HEADER.size + 4:bs.HEADER.size + 4 + attr_len])
+        assert as_path == (65000,) + last.as_path
+        assert communities == last.communities
+
+
+def test_open_message():
+    data = bs.open_message(4200000000, '10.0.0.1', 90, ['ipv4', 'ipv6'])
+    assert struct.unpack_from('!H', data, bs.HEADER.size + 1)[0] \
+        == bs.AS_TRANS
+    assert bs.parse_open(data[bs.HEADER.size:]) == (4200000000, 90)
+
+
+def mrt_rib_entry(seq, prefix, as_path, communities=()):
+    prefix = ip_network(prefix)
+    size = (prefix.prefixlen + 7) // 8
+    attrs = bs._attribute(bs.FLAG_TRANSITIVE, bs.ATTR_AS_PATH,
+                          struct.pack('!BB%dI' % len(as_path), bs.AS_SEQUENCE,
+                                      len(as_path), *as_path))
+    if communities:
+        attrs += bs._attribute(bs.FLAG_OPTIONAL | bs.FLAG_TRANSITIVE,
+                               bs.ATTR_COMMUNITIES,
+                               struct.pack('!%dI' % len(communities),
+                                           *communities))
+    body = struct.pack('!IB', seq, prefix.prefixlen) + \
+        prefix.network_address.packed[:size] + struct.pack('!H', 1) + \
+        struct.pack('!HIH', 0, 0, len(attrs)) + attrs
+    subtype = bs.MRT_RIB_IPV4_UNICAST if prefix.version == 4 \
+        else bs.MRT_RIB_IPV6_UNICAST
+    return bs.MRT_HEADER.pack(0, bs.MRT_TABLE_DUMP_V2, subtype,
+                              len(body)) + body
+
+
+def test_mrt_routes(tmp_path):
+    path = str(tmp_path / 'rib.gz')
+    with gzip.open(path, 'wb') as f:
+        # A PEER_INDEX_TABLE record, which is skipped
+        f.write(bs.MRT_HEADER.pack(0, bs.MRT_TABLE_DUMP_V2, 1, 2) + b'\0\0')
+        f.write(mrt_rib_entry(0, '1.0.0.0/24', (13335,), (13335 << 16 | 1,)))
+        f.write(mrt_rib_entry(1, '2001:db8::/32', (3356, 4200000000)))
+        f.write(mrt_rib_entry(2, '10.128.0.0/9', (174, 3356)))
+    routes = list(bs.mrt_routes(path))
+    assert [str(r.prefix) for r in routes] \
+        == ['1.0.0.0/24', '2001:db8::/32', '10.128.0.0/9']
+    assert routes[0].communities == (13335 << 16 | 1,)
+    assert routes[1].as_path == (3356, 4200000000)
+    assert [str(r.prefix) for r in bs.mrt_routes(path, family='ipv4',
+                                                 limit=1)] == ['1.0.0.0/24']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_session(tmp_path):
+    stats = str(tmp_path / 'stats.json')
+    cfg = {'asn': 65001, 'routerid': '10.0.0.1', 'port': free_port(),
+           'stats': stats,
+           'peers': [{'address': '127.0.0.1', 'asn': 1, 'family': 'ipv4'}],
+           'source': {'ipv4': {'count': 2000}}}
+    speaker = bs.FeedSpeaker(cfg)
+    thread = threading.Thread(target=speaker.serve, daemon=True)
+    thread.start()
+    sock = None
+    for _ in range(50):
+        try:
+            sock = socket.create_connection(('127.0.0.1', cfg['port']))
+            break
+        except ConnectionRefusedError:
+            threading.Event().wait(.05)
+    assert sock is not None
+    try:
+        sock.settimeout(5)
+        msg_type, body = bs.read_message(sock)
+        assert msg_type == bs.OPEN
+        assert bs.parse_open(body) == (65001, 90)
+        sock.sendall(bs.open_message(1, '10.0.0.2', 90, ['ipv4']))
+        sock.sendall(bs.message(bs.KEEPALIVE))
+        prefixes = 0
+        while True:
+            msg_type, body = bs.read_message(sock)
+            if msg_type != bs.UPDATE:
+                continue
+            attr_len, = struct.unpack_from('!H', body, 2)
+            if not attr_len:
+                break  # End-of-RIB
+            nlri = body[4 + attr_len:]
+            i = 0
+            while i < len(nlri):
+                i += 1 + (nlri[i] + 7) // 8
+                prefixes += 1
+        assert prefixes == 2000
+    finally:
+        sock.close()
+        speaker.stop()
+        thread.join(5)
+    with open(stats) as f:
+        peer = json.load(f)['peers']['127.0.0.1']
+    assert peer['prefixes'] == 2000 and peer['finished_at'] is not None
+    assert peer['last_prefix'] == '16.7.207.0/24'
+
+
+def test_render_config():
+    config = {'asn': 65001, 'peers': [], 'source': {'seed': 0}}
+    out = router_template_lookup.get_template('bgpfeed.mako').render(
+        node=ConfigDict(bgpfeed=ConfigDict(config=config)))
+    assert json.loads(out) == config
@@ -0,0 +1,105 @@
+"""This module tests the automatic hierarchies of route reflectors"""
+import pytest
+
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+
+
+class PodsTopo(IPTopo):
+    """Pods of routers connected in line, whose middle routers are connected
+    through a switch"""
+
+    def __init__(self, pods=3, size=10, **hierarchy):
+        self.pods_count = pods
+        self.size = size
+        self.hierarchy = hierarchy
+        self.pods = []
+        super().__init__()
+
+    def build(self, *args, **kwargs):
+        core = self.addSwitch('s1')
+        for p in range(self.pods_count):
+            pod = []
+            for i in range(self.size):
+                r = self.addRouter('p%dr%d' % (p, i))
+                r.addDaemon(BGP)
+                if pod:
+                    self.addLink(pod[-1], r)
+                pod.append(r)
+            self.addLink(pod[self.size // 2], core)
+            self.pods.append(pod)
+        self.addiBGPHierarchy(1, pods=self.pods, **self.hierarchy)
+        super().build(*args, **kwargs)
+
+
+def sessions(topo):
+    return {frozenset((r, p)) for r in topo.routers()
+            for p in topo.nodeInfo(r).get('bgp_peers', ())}
+
+
+def test_one_tier():
+    topo = PodsTopo()
+    clusters = topo.overlays[0].clusters
+    assert [c.reflectors for c in clusters] == [
+        ['p%dr4' % p, 'p%dr5' % p] for p in range(3)]
+    assert [c.cluster_id for c in clusters] \
+        == ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+    info = topo.nodeInfo('p1r4')
+    assert info['bgp_cluster_id'] == '10.0.0.2'
+    assert info['bgp_rr_clients'] == {'p1r%d' % i for i in range(10)} \
+        - {'p1r4', 'p1r5'}
+    assert info['asn'] == 1
+    assert 'bgp_rr_info' not in topo.nodeInfo('p1r0')
+    assert topo.nodeInfo('p1r0')['bgp_peers'] == ['p1r4', 'p1r5']
+    # Each client peers with both reflectors, the reflectors are meshed
+    assert len(sessions(topo)) == 3 * 8 * 2 + 6 * 5 // 2
+    # No session is registered twice
+    assert len(info['bgp_peers']) == len(set(info['bgp_peers']))
+
+
+def test_tiers():
+    topo = PodsTopo(pods=4, tiers=3, fanout=2, redundancy=1)
+    clusters = topo.overlays[0].clusters
+    assert [c.tier for c in clusters] == [1, 1, 1, 1, 2, 2, 3]
+    assert clusters[4].members == ['p0r4', 'p1r4']
+    top = clusters[-1]
+    assert len(top.reflectors) == 1 and len(top.clients) == 1
+    assert top.clients[0] in clusters[5].reflectors
+    # The lowest tier sets the cluster id
+    rr = top.reflectors[0]
+    assert topo.nodeInfo(rr)['bgp_cluster_id'] \
+        in {c.cluster_id for c in clusters[:4]}
+    assert len(sessions(topo)) == 4 * 9 + 2 + 1
+
+
+def test_linear_sessions():
+    topo = PodsTopo(pods=1, size=300)
+    assert len(sessions(topo)) == 2 * 298 + 1
+
+
+def test_invalid_hierarchy():
+    with pytest.raises(ValueError):
+        PodsTopo(redundancy=0)
+
+
+def test_render_reflector():
+    neighbors = [ConfigDict(peer='10.0.0.%d' % i, asn=1, port=179,
+                            description='r%d (iBGP)' % i, family='ipv4',
+                            nh_self=None, ebgp_multihop=False,
+                            rr_client=i > 1)
+                 for i in range(1, 4)]
+    cfg = ConfigDict(name='r0', password='zebra', bgpd=ConfigDict(
+        asn=1, routerid='10.0.0.0', debug=(), neighbors=neighbors,
+        address_families=[ConfigDict(name='ipv4', networks=[],
+                                     redistribute=[], neighbors=neighbors)],
+        access_lists=[], community_lists=[], route_maps=[],
+        route_map_bindings=[], aggregates={'ipv4': []}, peer_groups=[],
+        rr=[True], cluster_id='10.0.0.2'))
+    out = router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement)
+    assert 'neighbor 10.0.0.1 route-reflector-client' not in out
+    assert 'neighbor 10.0.0.2 route-reflector-client' in out
+    assert 'neighbor 10.0.0.3 route-reflector-client' in out
+    assert 'bgp cluster-id 10.0.0.2' in out
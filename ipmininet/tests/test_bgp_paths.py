@@ -0,0 +1,127 @@
+"""This module tests the shortest paths used to find the addresses of the
+BGP peers"""
+import pytest
+
+from ipmininet.router.config import BGP
+from ipmininet.router.config.bgp import Peer, as_paths
+from ipmininet.router.config.utils import ConfigDict
+from ipmininet.utils import L3Router
+
+
+class FakeDomain:
+
+    def __init__(self):
+        self.routers = []
+
+
+class FakeIntf:
+
+    def __init__(self, node, domain, igp_metric=1, ip=None, ip6=None):
+        self.node = node
+        self.name = '%s-eth%d' % (node.name, len(node.interfaces))
+        self.broadcast_domain = domain
+        self.igp_metric = igp_metric
+        self.ip = ip
+        self.ip6 = ip6
+        node.interfaces.append(self)
+        domain.routers.append(self)
+
+
+class FakeRouter(L3Router):
+
+    def __init__(self, name, asn, paths=None):
+        self.name = name
+        self.asn = asn
+        self.interfaces = []
+        self.nconfig = ConfigDict(as_paths=paths if paths is not None else {},
+                                  daemon=self.daemon)
+        self.bgp_peers = []
+
+    def intfList(self):
+        return self.interfaces
+
+    def daemon(self, key):
+        raise KeyError(key)
+
+    def get(self, key, val=None):
+        return self.bgp_peers if key == 'bgp_peers' else val
+
+
+def link(r1, r2, ip1, ip2, igp_metric=1):
+    domain = FakeDomain()
+    return (FakeIntf(r1, domain, igp_metric, ip='10.0.0.%d' % ip1,
+                     ip6='fc00::%d' % ip1),
+            FakeIntf(r2, domain, igp_metric, ip='10.0.0.%d' % ip2,
+                     ip6='fe80::%d' % ip2))
+
+
+@pytest.fixture
+def routers():
+    """
+    a --- b --1-- d
+    |     |       |
+    +---- c --5---+
+          |
+          x (AS2) --- y (AS2)
+    """
+    paths = {}
+    a, b, c, d = (FakeRouter(n, 1, paths) for n in 'abcd')
+    x, y = FakeRouter('x', 2, paths), FakeRouter('y', 2, paths)
+    link(a, b, 1, 2)
+    link(a, c, 3, 4)
+    link(b, c, 5, 6)
+    link(b, d, 7, 8)
+    link(c, d, 9, 10, igp_metric=5)
+    link(c, x, 11, 12)
+    link(x, y, 13, 14)
+    return a, b, c, d, x, y
+
+
+def test_shortest_path(routers):
+    a, b, c, d, x, y = routers
+    paths = as_paths(a)
+    # The directly connected routers are reached through their link
+    assert paths.peer_interface(a, 'c') is c.interfaces[0]
+    assert paths.peer_interface(c, 'a') is a.interfaces[1]
+    # d is reached through b rather than through c
+    assert paths.peer_interface(a, 'd') is d.interfaces[0]
+    # Directly connected eBGP peer, but the other AS is not explored
+    assert paths.peer_interface(a, 'x') is x.interfaces[0]
+    assert paths.peer_interface(a, 'y') is None
+    assert Peer._find_peer_address(a, 'd') == ('10.0.0.8', d)
+    # Link-local IPv6 addresses are not used
+    assert Peer._find_peer_address(a, 'd', v6=True) == (None, None)
+    assert Peer._find_peer_address(d, 'a', v6=True) == ('fc00::1', a)
+
+
+def test_shared_paths(routers):
+    a, b, c, d, x, y = routers
+    paths = as_paths(a)
+    assert as_paths(b) is paths and as_paths(x) is not paths
+    # The routers of another network do not share the paths
+    assert as_paths(FakeRouter('a', 1)) is not paths
+    paths.peer_interface(a, 'd')
+    # The paths of a are explored once for all its peers
+    explored = paths._peers['a']
+    assert paths.peer_interface(a, 'b') is explored['b']
+    assert paths._peers['a'] is explored
+    # The new metrics are only used once the paths are cleared
+    b.interfaces[2].igp_metric = 10
+    assert paths.peer_interface(a, 'd') is d.interfaces[0]
+    a.nconfig.as_paths.clear()
+    assert as_paths(a).peer_interface(a, 'd') is d.interfaces[1]
+
+
+def test_bgp_neighbors(routers, tmp_path):
+    a = routers[0]
+    a.cwd = str(tmp_path)
+    a.bgp_peers = ['d', 'x']
+    bgp = BGP(a)
+    neighbors = bgp.neighbors
+    assert [(n.node, n.peer) for n in neighbors] == [('d', '10.0.0.8'),
+                                                     ('x', '10.0.0.12')]
+    # The peers are only computed again when the configuration is built
+    assert bgp.neighbors is neighbors
+    a.bgp_peers = ['d']
+    assert bgp.build().neighbors is bgp.neighbors
+    assert [n.node for n in bgp.neighbors] == ['d']
@@ -0,0 +1,104 @@
+"""This module tests the peer groups gathering the BGP neighbors of a router
+with the same options and route maps"""
+from ipmininet.router.config import BGP, RouterConfig
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.bgp import RouteMapBinding, group_peers
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+from ipmininet.utils import L3Router
+
+
+class FakePeer:
+
+    def __init__(self, i, asn=1, family='ipv4', rr_client=False):
+        self.peer = '10.0.0.%d' % i
+        self.node = 'r%d' % i
+        self.asn = asn
+        self.port = 179
+        self.family = family
+        self.ebgp_multihop = asn != 1
+        self.nh_self = 'next-hop-self'
+        self.rr_client = rr_client
+        self.rs_client = False
+        self.route_server = False
+        self.description = '%s (%sBGP)' % (self.node,
+                                           'e' if self.ebgp_multihop else 'i')
+        self.peer_group = None
+
+
+class FakeRouter(L3Router):
+
+    def __init__(self, tmp_path):
+        self.name = 'r0'
+        self.asn = 1
+        self.cwd = str(tmp_path)
+        self.password = 'zebra'
+        self.nconfig = RouterConfig(self)
+        self.nconfig.routerid = '10.0.0.0'
+
+    def intfList(self):
+        return []
+
+    def get(self, key, val=None):
+        return val
+
+
+def test_peer_groups_option(tmp_path):
+    # The peer groups change the rendered configuration, they are opt-in
+    r = FakeRouter(tmp_path)
+    assert not BGP(r).options.peer_groups
+    assert BGP(r, peer_groups=True).options.peer_groups
+
+
+def test_group_peers():
+    clients = [FakePeer(i, rr_client=True) for i in range(1, 4)]
+    other = FakePeer(4)
+    external = [FakePeer(5, asn=2), FakePeer(6, asn=3), FakePeer(7, asn=4)]
+    bindings = [RouteMapBinding(peer=n.peer, family='ipv4', name='export',
+                                direction='out') for n in external[:2]]
+    bindings.append(RouteMapBinding(peer=external[2].peer, family='ipv4',
+                                    name='other', direction='out'))
+    groups, kept = group_peers(clients + [other] + external, bindings)
+    assert [g.members for g in groups] == [[n.peer for n in clients],
+                                           ['10.0.0.5', '10.0.0.6']]
+    assert groups[0].rr_client and not groups[1].rr_client
+    assert all(n.peer_group == groups[0].name for n in clients)
+    assert other.peer_group is None and external[2].peer_group is None
+    # The route map of a group is applied once to the group
+    assert [(b.peer, b.name) for b in kept] == [(groups[1].name, 'export'),
+                                                ('10.0.0.7', 'other')]
+    # The names do not change between builds
+    for n in clients + external:
+        n.peer_group = None
+    assert [g.name for g in group_peers(clients + external, bindings)[0]] \
+        == [g.name for g in groups]
+
+
+def test_render_peer_groups():
+    neighbors = [FakePeer(i, rr_client=True) for i in range(1, 4)] \
+        + [FakePeer(4, asn=2)]
+    groups, bindings = group_peers(neighbors, [])
+    cfg = ConfigDict(name='r0', password='zebra', bgpd=ConfigDict(
+        asn=1, routerid='10.0.0.0', debug=(), neighbors=neighbors,
+        address_families=[ConfigDict(name='ipv4', networks=[],
+                                     redistribute=[], neighbors=neighbors)],
+        access_lists=[], community_lists=[], route_maps=[],
+        route_map_bindings=bindings, aggregates={'ipv4': []},
+        peer_groups=groups, rr=[True], cluster_id='10.0.0.0',
+        advertisement_interval=0))
+    lines = router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement).splitlines()
+    name = groups[0].name
+    assert '    neighbor %s peer-group' % name in lines
+    assert '    neighbor %s advertisement-interval 0' % name in lines
+    assert '    neighbor %s activate' % name in lines
+    assert '    neighbor %s route-reflector-client' % name in lines
+    for i in range(1, 4):
+        assert '    neighbor 10.0.0.%d peer-group %s' % (i, name) in lines
+        assert '    neighbor 10.0.0.%d remote-as 1' % i in lines
+        assert '    neighbor 10.0.0.%d activate' % i not in lines
+        assert '    neighbor 10.0.0.%d advertisement-interval 0' % i \
+            not in lines
+    # The neighbor alone keeps its own options
+    assert '    neighbor 10.0.0.4 activate' in lines
+    assert '    neighbor 10.0.0.4 ebgp-multihop' in lines
+    assert '    neighbor 10.0.0.4 advertisement-interval 0' in lines
@@ -0,0 +1,211 @@
+"""This module tests the compilation of the BGP policies into route maps"""
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config.bgp import BGP, BGPConfig, SHARE, \
+    dedup_filters, dedup_route_maps, ebgp_session
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+from ipmininet.router.config.zebra import AccessList, CommunityList, \
+    RouteMap, DENY
+
+
+class FakePeer:
+
+    def __init__(self, node):
+        self.node = node
+
+
+class FakeBGP:
+    """The attributes of the daemon used to build the route maps"""
+
+    def __init__(self, node_info):
+        self._node = node_info
+
+
+def legacy_build_route_map(node_route_maps, neighbors):
+    """The route map assembly, before it was indexed"""
+    route_maps = []
+    for kwargs in node_route_maps:
+        kwargs = dict(kwargs)
+        remote_peer = kwargs.pop('peer')
+        for peer in [n for n in neighbors if n.node == remote_peer]:
+            kwargs['neighbor'] = peer
+            rm = RouteMap(**kwargs)
+            try:
+                tmp_rm = route_maps.pop(route_maps.index(rm))
+                rm.append_match_cond(tmp_rm.match_cond)
+                rm.append_set_action(tmp_rm.set_actions)
+            except ValueError:
+                pass
+            route_maps.append(rm)
+    return route_maps
+
+
+def describe(route_maps):
+    return [(rm.name, rm.match_policy, id(rm.neighbor), rm.direction,
+             rm.order, [(c.cond_type, c.condition) for c in rm.match_cond],
+             [(a.action_type, a.value) for a in rm.set_actions])
+            for rm in route_maps]
+
+
+def test_build_route_map():
+    topo = IPTopo()
+    r1 = topo.addRouter('r1')
+    config = BGPConfig(topo, r1)
+    acls = [AccessList('acl%d' % i, ('10.%d.0.0/16' % i,)) for i in range(4)]
+    cml = CommunityList('cml', community=1)
+    for i in range(40):
+        peer = 'r%d' % (2 + i % 3)
+        config.set_local_pref(100 + i % 5, peer, [acls[i % 4]])
+        config.set_community(i % 7, to_peer=peer, matching=[cml])
+        config.set_med(i % 2, to_peer=peer, matching=[acls[i % 3], cml])
+        config.deny(from_peer=peer, matching=[acls[i % 2]], order=i % 4)
+        config.permit('allow%d' % (i % 3), to_peer=peer)
+    node_info = topo.nodeInfo(r1)
+    neighbors = [FakePeer('r2'), FakePeer('r3'), FakePeer('r2')]
+
+    RouteMap.count = 0
+    expected = describe(legacy_build_route_map(node_info['bgp_route_maps'],
+                                               neighbors))
+    RouteMap.count = 0
+    assert describe(BGP.build_route_map(FakeBGP(node_info), neighbors)) \
+        == expected
+    # The policies of the node are left untouched
+    RouteMap.count = 0
+    assert describe(BGP.build_route_map(FakeBGP(node_info), neighbors)) \
+        == expected
+    assert BGP.build_route_map(FakeBGP({}), neighbors) == []
+
+
+def test_filter_lists():
+    topo = IPTopo()
+    r1 = topo.addRouter('r1')
+    config = BGPConfig(topo, r1)
+    acl = AccessList('acl', ('10.0.0.0/8',))
+    config.deny(from_peer='r2', matching=[acl, AccessList('acl')])
+    config.deny(from_peer='r2', matching=[
+        CommunityList('cml', community=1),
+        CommunityList('cml', action=DENY, community=2)])
+    # The lists can be modified directly
+    topo.nodeInfo(r1)['bgp_access_lists'].append(AccessList('other'))
+    config.permit(to_peer='r2', matching=[AccessList('other'), acl,
+                                          CommunityList('cml')])
+    info = topo.nodeInfo(r1)
+    assert [a.name for a in info['bgp_access_lists']] == ['acl', 'other']
+    assert [(c.name, c.action) for c in info['bgp_community_lists']] \
+        == [('cml', 'permit'), ('cml', DENY)]
+
+
+class FakeNeighbor:
+
+    def __init__(self, node, peer, family='ipv4'):
+        self.node = node
+        self.peer = peer
+        self.family = family
+
+
+class FakeNode(dict):
+    asn = 1
+
+
+def compile_policies(node_info, neighbors):
+    bgp = FakeBGP(FakeNode(node_info))
+    access_lists, acl_renames = dedup_filters(
+        BGP.build_access_list(bgp), 'acl')
+    community_lists, cml_renames = dedup_filters(
+        BGP.build_community_list(bgp), 'cml')
+    route_maps, bindings = dedup_route_maps(
+        BGP.build_route_map(bgp, neighbors),
+        {'access-list': acl_renames, 'community': cml_renames})
+    return access_lists, community_lists, route_maps, bindings
+
+
+def share_policies(peers):
+    topo = IPTopo()
+    r1 = topo.addRouter('r1')
+    neighbors = []
+    for i in range(peers):
+        r = topo.addRouter('p%d' % i)
+        topo.addLink(r1, r)
+        ebgp_session(topo, r1, r, link_type=SHARE)
+        neighbors.append(FakeNeighbor(r, '10.0.%d.2' % i))
+        neighbors.append(FakeNeighbor(r, 'fc00:%d::2' % i, 'ipv6'))
+    return topo.nodeInfo(r1), neighbors
+
+
+def test_dedup_route_maps():
+    node_info, neighbors = share_policies(20)
+    access_lists, community_lists, route_maps, bindings = \
+        compile_policies(node_info, neighbors)
+    assert [a.name for a in access_lists] == ['All']
+    assert [c.name for c in community_lists] == ['from-up', 'from-peers']
+    # One import and one export route map per family
+    names = sorted({(rm.name, rm.neighbor.family) for rm in route_maps})
+    assert len(names) == 4
+    assert ('export-to-peer', 'ipv4') in names
+    assert sorted(rm.order for rm in route_maps
+                  if rm.name == 'export-to-peer') == [10, 10, 15, 15, 20, 20]
+    assert len(bindings) == 20 * 2 * 2
+    imports = {b.name for b in bindings if b.direction == 'in'}
+    assert len(imports) == 1 and imports.pop().startswith('rm-')
+    # The generated names do not depend on the other route maps
+    RouteMap.count += 100
+    assert [rm.name for rm in compile_policies(*share_policies(3))[2]] \
+        == [rm.name for rm in route_maps]
+
+
+def test_dedup_filters():
+    topo = IPTopo()
+    r1 = topo.addRouter('r1')
+    config = BGPConfig(topo, r1)
+    config.deny(from_peer='r2', matching=[AccessList(entries=('10.0.0.0/8',)),
+                                          CommunityList(community=1)])
+    config.deny(from_peer='r3', matching=[AccessList(entries=('10.0.0.0/8',)),
+                                          CommunityList(community=1)])
+    config.deny(from_peer='r4', matching=[AccessList('mine', ('10.0.0.0/8',)),
+                                          CommunityList(community=2)])
+    neighbors = [FakeNeighbor('r%d' % i, '10.0.0.%d' % i)
+                 for i in range(2, 5)]
+    access_lists, community_lists, route_maps, bindings = \
+        compile_policies(topo.nodeInfo(r1), neighbors)
+    # The equal lists are emitted once, with the name chosen by the user
+    assert [a.name for a in access_lists] == ['mine']
+    assert len(community_lists) == 2
+    assert all(c.name.startswith('cml-') for c in community_lists)
+    # The sessions with the same conditions share a route map
+    assert len(route_maps) == 2
+    assert [c.condition for c in route_maps[0].match_cond] \
+        == ['mine', community_lists[0].name]
+    assert bindings[0].name == bindings[1].name != bindings[2].name
+
+
+def test_route_map_names():
+    rms = [RouteMap('a', neighbor=FakeNeighbor('r2', '10.0.0.2')),
+           RouteMap('a', neighbor=FakeNeighbor('r3', '10.0.0.3'),
+                    match_policy=DENY),
+           RouteMap(neighbor=FakeNeighbor('r4', '10.0.0.4'), order=20)]
+    route_maps, bindings = dedup_route_maps(rms)
+    # A name cannot be shared by different route maps
+    assert [b.name for b in bindings][0] == 'a'
+    assert bindings[1].name.startswith('a-')
+    assert bindings[2].name.startswith('rm-')
+    assert [b.peer for b in bindings] == ['10.0.0.2', '10.0.0.3', '10.0.0.4']
+
+
+def test_render_shared_route_maps():
+    node_info, neighbors = share_policies(3)
+    access_lists, community_lists, route_maps, bindings = \
+        compile_policies(node_info, neighbors)
+    cfg = ConfigDict(name='r1', password='zebra', bgpd=ConfigDict(
+        asn=1, routerid='10.0.0.1', debug=(), neighbors=[],
+        address_families=[ConfigDict(name='ipv4', networks=[],
+                                     redistribute=[], neighbors=[])],
+        access_lists=access_lists, community_lists=community_lists,
+        route_maps=route_maps, route_map_bindings=bindings,
+        aggregates={'ipv4': []}, peer_groups=[]))
+    lines = router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement).splitlines()
+    assert lines.count('route-map export-to-peer-ipv4 deny 10') == 1
+    assert lines.count('ip community-list standard from-up permit 1:3') == 1
+    for i in range(3):
+        assert '    neighbor 10.0.%d.2 route-map export-to-peer-ipv4 out' \
+            % i in lines
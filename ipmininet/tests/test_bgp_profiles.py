@@ -0,0 +1,68 @@
+"""This module tests the profiles of options of the BGP daemon"""
+import pytest
+
+from ipmininet.router.config import BGP, RouterConfig
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.bgp import BGP_PROFILES
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+
+
+class FakeRouter:
+
+    def __init__(self, tmp_path):
+        self.name = 'r1'
+        self.cwd = str(tmp_path)
+        self.asn = 1
+        self.password = 'zebra'
+        self.nconfig = RouterConfig(self)
+        self.nconfig.routerid = '10.0.0.1'
+
+    def get(self, key, val=None):
+        return val
+
+
+def render(daemon):
+    cfg = daemon.build()
+    cfg.neighbors = [ConfigDict(peer='10.0.0.2', asn=2, port=179,
+                                description='r2 (eBGP)', family='ipv4')]
+    return router_template_lookup.get_template('bgpd.mako').render(
+        node=ConfigDict(name='r1', password='zebra', bgpd=cfg),
+        ip_statement=ip_statement).splitlines()
+
+
+def test_profiles(tmp_path):
+    assert BGP(FakeRouter(tmp_path)).options.keepalive is None
+    options = BGP(FakeRouter(tmp_path), profile='lab').options
+    assert options.graceful_restart and options.keepalive == 1
+    assert options.advertisement_interval == 0
+    # The explicit options override those of the profile
+    options = BGP(FakeRouter(tmp_path), profile='fast', keepalive=2).options
+    assert options.keepalive == 2 and options.holdtime == 3
+    assert not options.graceful_restart
+    with pytest.raises(ValueError):
+        BGP(FakeRouter(tmp_path), profile='unknown')
+    assert set(BGP_PROFILES['lab']) == set(BGP_PROFILES['fast']) \
+        | set(BGP_PROFILES['graceful-restart'])
+
+
+def test_render_default(tmp_path):
+    lines = render(BGP(FakeRouter(tmp_path)))
+    assert not [line for line in lines
+                if 'graceful-restart' in line or 'timers' in line]
+
+
+def test_render_profile(tmp_path):
+    daemon = BGP(FakeRouter(tmp_path), profile='lab', restart_time=30,
+                 long_lived_stale_time=600)
+    lines = render(daemon)
+    for line in ('    bgp graceful-restart',
+                 '    bgp graceful-restart preserve-fw-state',
+                 '    bgp graceful-restart restart-time 30',
+                 '    bgp long-lived-graceful-restart stale-time 600',
+                 '    timers bgp 1 3',
+                 '    neighbor 10.0.0.2 timers connect 1',
+                 '    neighbor 10.0.0.2 advertisement-interval 0'):
+        assert line in lines
+    # The hold time defaults to three keepalive intervals
+    daemon.options.update(holdtime=None, keepalive=5)
+    assert '    timers bgp 5 15' in render(daemon)
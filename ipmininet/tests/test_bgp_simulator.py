@@ -0,0 +1,261 @@
+"""This module tests the offline computation of the best BGP routes"""
+import pytest
+
+from ipmininet.asrel import ASGraph, ASRelationshipTopo, router_name
+from ipmininet.bgpsim import BGPSimulator, INCOMPLETE, rib_as_paths
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, AccessList, CommunityList, \
+    ebgp_session, set_rr, bgp_peering
+from ipmininet.router.config.bgp import BGPConfig
+from ipmininet.router.config.zebra import RouteMapSetAction
+
+
+def as_paths(sim, prefix):
+    return {r: routes[prefix].as_path
+            for r, routes in sim.best_routes().items() if prefix in routes}
+
+
+def test_relationships():
+    # 1 is the provider of 2 and 3, which are peers and the providers of 4,
+    # the peer of 5
+    graph = ASGraph([(1, 2, -1), (1, 3, -1), (2, 4, -1), (3, 4, -1),
+                     (2, 3, 0), (4, 5, 0)])
+    topo = ASRelationshipTopo(graph)
+    sim = BGPSimulator(topo, {router_name(asn): ['10.%d.0.0/16' % asn]
+                              for asn in graph.asns})
+    assert as_paths(sim, '10.4.0.0/16') == {
+        'as1': (2, 4), 'as2': (4,), 'as3': (4,), 'as4': (), 'as5': (4,)}
+    # The routes of a peer are only exported to the customers
+    assert as_paths(sim, '10.5.0.0/16') == {'as4': (5,), 'as5': ()}
+    # The routes of a peer are preferred to those of a provider
+    assert as_paths(sim, '10.3.0.0/16')['as2'] == (3,)
+    route = sim.best_route('as4', '10.1.0.0/16')
+    assert route.as_path == (2, 1)
+    assert route.local_pref == 100
+    assert route.next_hop == 'as2'
+    assert route.communities == {'4:3'}
+    assert sim.best_route('as2', '10.4.0.0/16').local_pref == 200
+    assert sim.best_route('as5', '10.1.0.0/16') is None
+
+
+class ReflectorTopo(IPTopo):
+    """An AS whose route reflector has two clients, one of which is
+    connected to another AS, and two other peers in full mesh"""
+
+    def build(self, *args, **kwargs):
+        rr, c1, c2, p1, p2, ext = self.addRouters('rr', 'c1', 'c2', 'p1', 'p2',
+                                                  'ext')
+        for r in (rr, c1, c2, p1, p2, ext):
+            r.addDaemon(BGP)
+        self.addLinks((rr, c1), (rr, c2), (rr, p1), (p1, p2), (c1, ext))
+        self.addAS(1, routers=(rr, c1, c2, p1, p2))
+        self.addAS(2, routers=(ext,))
+        set_rr(self, rr, peers=(c1, c2))
+        for a, b in ((rr, p1), (rr, p2), (p1, p2)):
+            bgp_peering(self, a, b)
+        ebgp_session(self, c1, ext)
+        super().build(*args, **kwargs)
+
+
+def test_route_reflection():
+    topo = ReflectorTopo()
+    sim = BGPSimulator(topo, {'ext': ['10.2.0.0/16'], 'c2': ['10.1.2.0/24'],
+                              'p1': ['10.1.3.0/24']})
+    # The routes of the clients are reflected to all peers
+    route = sim.best_route('p2', '10.2.0.0/16')
+    assert route.as_path == (2,)
+    assert route.peer == 'rr'
+    assert route.next_hop == 'c1'
+    assert route.originator == 'c1'
+    assert route.cluster_list == ('10.0.0.0',)
+    assert sim.best_route('c1', '10.1.2.0/24').originator == 'c2'
+    # The routes of the other peers are only reflected to the clients
+    assert sim.best_route('c1', '10.1.3.0/24').next_hop == 'p1'
+    assert sim.best_route('p2', '10.1.3.0/24').peer == 'p1'
+    assert sim.best_route('rr', '10.1.3.0/24').cluster_list == ()
+    assert as_paths(sim, '10.1.3.0/24')['ext'] == (1,)
+
+
+class TwoExitsTopo(IPTopo):
+    """An AS connected to another one through two routers, one of which is
+    farther from the third router of the AS"""
+
+    def __init__(self, igp_metric=1, **kwargs):
+        self.igp_metric = igp_metric
+        super().__init__(**kwargs)
+
+    def build(self, *args, **kwargs):
+        a, b, c, ext = self.addRouters('a', 'b', 'c', 'ext')
+        for r in (a, b, c, ext):
+            r.addDaemon(BGP)
+        self.addLink(a, c, igp_metric=self.igp_metric)
+        self.addLinks((b, c), (a, ext), (b, ext))
+        self.addiBGPFullMesh(1, routers=(a, b, c))
+        self.addAS(2, routers=(ext,))
+        ebgp_session(self, a, ext)
+        ebgp_session(self, b, ext)
+        super().build(*args, **kwargs)
+
+
+def test_igp_cost():
+    sim = BGPSimulator(TwoExitsTopo(igp_metric=5), {'ext': ['10.2.0.0/16']})
+    assert sim.best_route('c', '10.2.0.0/16').next_hop == 'b'
+    # The router ids break the ties
+    sim = BGPSimulator(TwoExitsTopo(), {'ext': ['10.2.0.0/16']})
+    assert sim.best_route('c', '10.2.0.0/16').next_hop == 'a'
+    sim = BGPSimulator(TwoExitsTopo(), {'ext': ['10.2.0.0/16']},
+                       router_ids={'a': '10.0.0.2', 'b': '10.0.0.1'})
+    assert sim.best_route('c', '10.2.0.0/16').next_hop == 'b'
+
+
+def test_policies():
+    topo = TwoExitsTopo()
+    ext = BGPConfig(topo, 'ext')
+    # The most specific prefix is announced with a lower MED through b
+    specific = AccessList('specific', ('10.2.1.0/24',))
+    ext.set_med(10, to_peer='a', matching=(specific,))\
+        .set_med(5, to_peer='b', matching=(specific,))
+    # Another prefix is not announced through b
+    other = AccessList('other', ('10.3.0.0/16',))
+    ext.deny('to-b', to_peer='b', matching=(other,), order=5)\
+        .permit('to-b', to_peer='b', order=20)
+    sim = BGPSimulator(topo, {'ext': ['10.2.0.0/16', '10.2.1.0/24',
+                                      '10.3.0.0/16', '10.4.0.0/16']})
+    assert sim.best_route('c', '10.2.1.0/24').next_hop == 'b'
+    assert sim.best_route('c', '10.2.1.0/24').med == 5
+    # The other prefixes are denied by the route map towards a
+    assert sim.best_route('a', '10.2.0.0/16').peer == 'b'
+    assert sim.best_route('a', '10.3.0.0/16') is None
+    assert sim.best_route('b', '10.4.0.0/16').peer == 'ext'
+    # Prefer the routes received by b, for the prefixes with a community
+    topo = TwoExitsTopo()
+    tagged = CommunityList('tagged', community='2:1')
+    BGPConfig(topo, 'ext').set_community(1, to_peer='b', matching=(
+        AccessList('tag', ('10.4.0.0/16',)),))\
+        .permit(to_peer='b', order=20)
+    BGPConfig(topo, 'b').set_local_pref(300, from_peer='ext',
+                                        matching=(tagged,))\
+        .permit(from_peer='ext', order=20)
+    sim = BGPSimulator(topo, {'ext': ['10.2.0.0/16', '10.4.0.0/16']})
+    assert sim.best_route('a', '10.4.0.0/16').peer == 'b'
+    assert sim.best_route('a', '10.4.0.0/16').local_pref == 300
+    assert sim.best_route('a', '10.4.0.0/16').communities == {'2:1'}
+    assert sim.best_route('a', '10.2.0.0/16').peer == 'ext'
+
+
+def test_local_routes():
+    # The local routes are preferred, whatever the local preference of the
+    # routes received for the same prefix
+    topo = TwoExitsTopo()
+    BGPConfig(topo, 'a').set_local_pref(300, from_peer='ext', matching=(
+        AccessList('all', ('any',)),))
+    sim = BGPSimulator(topo, {'ext': ['10.2.0.0/16'], 'a': ['10.2.0.0/16']})
+    route = sim.best_route('a', '10.2.0.0/16')
+    assert route.peer is None
+    assert route.as_path == ()
+    assert sim.best_route('b', '10.2.0.0/16').peer == 'a'
+
+
+def test_unsupported_policy():
+    topo = TwoExitsTopo()
+    BGPConfig(topo, 'a').add_set_action(
+        'ext', RouteMapSetAction('weight', 10), (), direction='in')
+    with pytest.raises(ValueError):
+        BGPSimulator(topo)
+
+
+class IXPTopo(IPTopo):
+    """Three ASes connected to the route server of an internet exchange
+    point"""
+
+    def build(self, *args, **kwargs):
+        members = []
+        for i in range(1, 4):
+            r = self.addRouter('as%dr1' % i)
+            r.addDaemon(BGP)
+            self.addAS(i, routers=[r])
+            members.append(r)
+        self.addRouteServer('rs1', 65000, members=members)
+        super().build(*args, **kwargs)
+
+
+def test_route_server():
+    sim = BGPSimulator(IXPTopo(), {'as1r1': ['10.1.0.0/16']})
+    route = sim.best_route('as3r1', '10.1.0.0/16')
+    # The route server is not in the AS path, nor the next hop
+    assert route.as_path == (1,)
+    assert route.peer == 'rs1'
+    assert route.next_hop == 'as1r1'
+    assert sim.best_route('rs1', '10.1.0.0/16').as_path == (1,)
+
+
+def test_origins_and_aggregates():
+    graph = ASGraph([(1, 2, -1)])
+    sim = BGPSimulator(ASRelationshipTopo(graph))
+    sim.originate('as2', ['10.2.1.0/24'], origin=INCOMPLETE)
+    sim.originate('as2', ['10.2.2.0/24'])
+    assert sim.best_route('as1', '10.2.1.0/24').origin == INCOMPLETE
+    sim.aggregate('as2', ['10.2.0.0/16'])
+    assert sim.best_route('as1', '10.2.1.0/24') is None
+    assert sim.best_route('as2', '10.2.1.0/24').peer is None
+    assert sim.best_route('as1', '10.2.0.0/16').as_path == (2,)
+    # The aggregate takes the worst origin of the prefixes that it covers
+    assert sim.best_route('as1', '10.2.0.0/16').origin == INCOMPLETE
+
+
+class DisputeWheelTopo(IPTopo):
+    """Three ASes connected to a destination and in ring, each preferring
+    the route of its next neighbor in the ring (the 'bad gadget')"""
+
+    def __init__(self, prefer_next=True, **kwargs):
+        self.prefer_next = prefer_next
+        super().__init__(**kwargs)
+
+    def build(self, *args, **kwargs):
+        routers = self.addRouters('r0', 'r1', 'r2', 'r3')
+        for i, r in enumerate(routers):
+            r.addDaemon(BGP)
+            self.addAS(i + 1, routers=[r])
+        for i in range(1, 4):
+            self.addLinks((routers[0], routers[i]),
+                          (routers[i], routers[i % 3 + 1]))
+            ebgp_session(self, routers[0], routers[i])
+            ebgp_session(self, routers[i], routers[i % 3 + 1])
+        for i in range(1, 4):
+            nxt, prev = 'r%d' % (i % 3 + 1), 'r%d' % ((i - 2) % 3 + 1)
+            # The next neighbor tags the routes that it received directly
+            direct = CommunityList('direct', community='%d:1' % (i % 3 + 2))
+            config = BGPConfig(self, 'r%d' % i)
+            config.set_community(1, from_peer='r0', matching=(
+                AccessList('all', ('any',)),))\
+                .deny('from-prev', from_peer=prev)\
+                .deny('from-next', from_peer=nxt, order=20)
+            if self.prefer_next:
+                config.set_local_pref(200, from_peer=nxt, matching=(direct,))
+            else:
+                config.permit(from_peer=nxt, matching=(direct,))
+        super().build(*args, **kwargs)
+
+
+def test_oscillation():
+    sim = BGPSimulator(DisputeWheelTopo(), {'r0': ['10.0.0.0/24']},
+                       max_changes=20)
+    with pytest.raises(RuntimeError):
+        sim.best_routes()
+    sim = BGPSimulator(DisputeWheelTopo(prefer_next=False),
+                       {'r0': ['10.0.0.0/24']})
+    assert as_paths(sim, '10.0.0.0/24') == {
+        'r0': (), 'r1': (1,), 'r2': (1,), 'r3': (1,)}
+
+
+def test_rib_as_paths():
+    # FRRouting 7 and 8 formats
+    rib = {'routes': {
+        '10.1.0.0/16': [{'bestpath': True, 'path': '2 1'},
+                        {'valid': True, 'path': '3 4 1'}],
+        '10.2.0.0/16': [{'bestpath': {'overall': True},
+                         'aspath': {'string': '2'}}],
+        '10.3.0.0/16': [{'bestpath': True, 'path': ''}],
+        '10.4.0.0/16': [{'valid': True, 'path': '5'}]}}
+    assert rib_as_paths(rib) == {'10.1.0.0/16': (2, 1), '10.2.0.0/16': (2,),
+                                 '10.3.0.0/16': ()}
@@ -0,0 +1,118 @@
+"""This module tests the computation of configuration deltas used to reload
+the FRRouting daemons, and the merge of their configurations"""
+import subprocess
+
+import pytest
+
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.utils import ConfigDict, config_delta, \
+    merge_frr_configs
+
+BASE_CONFIG = """hostname r1
+password zebra
+
+log file /tmp/bgpd_r1.log
+
+router bgp 1
+    bgp router-id 1.1.1.1
+    no bgp default ipv4-unicast
+    neighbor 10.0.0.2 remote-as 2
+    neighbor 10.0.0.2 port 179
+    address-family ipv4
+    neighbor 10.0.0.2 route-map rm1-ipv4 in
+    neighbor 10.0.0.2 activate
+    address-family ipv6
+
+ip access-list all permit any
+
+route-map rm1-ipv4 permit 10
+    set local-preference 100
+"""
+
+
+def test_same_config():
+    assert config_delta(BASE_CONFIG, BASE_CONFIG) == []
+    # Blank lines, comments and indentation do not matter
+    assert config_delta(BASE_CONFIG,
+                        '# comment\n' + BASE_CONFIG.replace('    ', '  ')
+                        .replace('\n\n', '\n!\n')) == []
+
+
+@pytest.mark.parametrize('old,new,expected', [
+    ('route-map rm1-ipv4 permit 10\n    set local-preference 100',
+     'route-map rm1-ipv4 permit 10\n    set local-preference 150',
+     ['route-map rm1-ipv4 permit 10',
+      ' no set local-preference 100',
+      '!',
+      'route-map rm1-ipv4 permit 10',
+      ' set local-preference 150',
+      '!']),
+    ('route-map rm1-ipv4 permit 10\n    set local-preference 100',
+     '',
+     ['no route-map rm1-ipv4 permit 10']),
+    ('router bgp 1\n    no bgp default ipv4-unicast',
+     'router bgp 1',
+     ['router bgp 1', ' bgp default ipv4-unicast', '!']),
+    ('router bgp 1\n    address-family ipv4\n    neighbor a activate\n'
+     '    neighbor b activate',
+     'router bgp 1\n    address-family ipv4\n    neighbor a activate',
+     ['router bgp 1', ' address-family ipv4', '  no neighbor b activate',
+      ' exit-address-family', '!']),
+    ('hostname r1\nip access-list all permit any',
+     'hostname r1\nip access-list all permit 10.0.0.0/8',
+     ['no ip access-list all permit any',
+      'ip access-list all permit 10.0.0.0/8']),
+    ('interface eth0\n  ip ospf cost 1\n!\nrouter ospf\n  network x area 0',
+     'interface eth0\n  ip ospf cost 5\n!\nrouter ospf\n  network x area 0',
+     ['interface eth0', ' no ip ospf cost 1', '!',
+      'interface eth0', ' ip ospf cost 5', '!']),
+])
+def test_config_delta(old, new, expected):
+    assert config_delta(old, new) == expected
+
+
+def test_removed_lines_in_reverse_order():
+    new = BASE_CONFIG.replace('    neighbor 10.0.0.2 remote-as 2\n'
+                              '    neighbor 10.0.0.2 port 179\n', '')\
+        .replace('    neighbor 10.0.0.2 route-map rm1-ipv4 in\n'
+                 '    neighbor 10.0.0.2 activate\n', '')
+    delta = config_delta(BASE_CONFIG, new)
+    # The address-family lines are removed before the neighbor itself
+    assert delta.index('  no neighbor 10.0.0.2 activate') \
+        < delta.index(' no neighbor 10.0.0.2 port 179') \
+        < delta.index(' no neighbor 10.0.0.2 remote-as 2')
+
+
+def test_merge_frr_configs():
+    zebra = 'hostname r1\npassword zebra\nlog file /tmp/zebra.log\n' \
+            'interface eth0\n  description to r2\n!\n' \
+            'ip access-list all permit any\n'
+    bgpd = BASE_CONFIG
+    merged = merge_frr_configs([zebra, bgpd], skip=('log file',))
+    lines = merged.splitlines()
+    assert lines[:3] == ['hostname r1', 'password zebra',
+                         'ip access-list all permit any']
+    assert 'log file' not in merged
+    assert lines.count('hostname r1') == 1
+    assert ' address-family ipv4' in lines
+    assert lines[lines.index(' address-family ipv4') + 3] \
+        == ' exit-address-family'
+    # Merging is idempotent
+    assert config_delta(merged, merge_frr_configs([merged])) == []
+    # Merging keeps every daemon command
+    assert config_delta(merged, zebra + bgpd) == \
+        ['log file /tmp/zebra.log', 'log file /tmp/bgpd_r1.log']
+
+
+def test_watchfrr_script(tmp_path):
+    script = tmp_path / 'watchfrr.sh'
+    node = ConfigDict(name='r1', watchfrr=ConfigDict(
+        vtysh='vtysh --vty_socket /tmp/r1.vty --config_dir /tmp/r1.d',
+        vty_socket_dir='/tmp/r1.vty', timeout=60,
+        daemons=[ConfigDict(name=d, startup_line='%s -f /dev/null' % d,
+                            pid_file='/tmp/%s.pid' % d)
+                 for d in ('zebra', 'bgpd')]))
+    script.write_text(router_template_lookup.get_template('watchfrr.mako')
+                      .render(node=node))
+    assert subprocess.call(['sh', '-n', str(script)]) == 0
+    assert 'zebra) zebra -f /dev/null -d' in script.read_text()
@@ -0,0 +1,92 @@
+"""This module tests the configuration trees given to the templates"""
+import copy
+import json
+import pickle
+from ipaddress import ip_interface
+
+import pytest
+
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.ospf import OSPFInterface, OSPFNetwork
+from ipmininet.router.config.ospf6 import OSPF6Interface
+from ipmininet.router.config.utils import ConfigDict, ConfigNode, \
+    config_to_json
+
+
+def test_config_dict():
+    cfg = ConfigDict(a=1)
+    cfg.b = 2
+    assert cfg == {'a': 1, 'b': 2}
+    assert cfg.a == 1 and cfg.missing is None
+    # Methods are not shadowed by the keys
+    cfg['items'] = 3
+    assert list(cfg.items())[-1] == ('items', 3)
+    with pytest.raises(AttributeError):
+        cfg.__missing_protocol__
+    assert not hasattr(cfg, '__dict__')
+    assert pickle.loads(pickle.dumps(cfg)) == cfg
+    assert copy.deepcopy(cfg) == cfg
+
+
+def test_config_node():
+    itf = OSPF6Interface(name='r1-eth0', cost=5, area='0.0.0.0')
+    assert OSPF6Interface.fields()[:2] == ('description', 'name')
+    assert OSPF6Interface.fields()[-2:] == ('instance_id', 'area')
+    assert itf.name == itf['name'] == itf.get('name') == 'r1-eth0'
+    assert itf.priority is None
+    # Unknown fields behave like missing keys of a ConfigDict
+    assert itf.missing is None and itf.get('missing', 1) == 1
+    assert 'cost' in itf and 'missing' not in itf
+    with pytest.raises(KeyError):
+        itf['missing']
+    with pytest.raises(AttributeError):
+        itf.missing = 1
+    with pytest.raises(TypeError):
+        OSPFInterface(area='0.0.0.0')
+    itf['dead_int'] = 3
+    itf.update(hello_int=1)
+    assert itf.to_dict()['dead_int'] == 3 and itf.hello_int == 1
+    assert not hasattr(itf, '__dict__')
+    assert pickle.loads(pickle.dumps(itf)) == itf
+    assert copy.deepcopy(itf) == itf
+    assert itf != OSPF6Interface(name='r1-eth0')
+
+
+def test_config_to_json():
+    cfg = ConfigDict(name='r1', ospfd=ConfigDict(
+        interfaces=[OSPFInterface(name='r1-eth0', cost=1)],
+        networks=[OSPFNetwork(ip_interface('10.0.0.1/24'), '0.0.0.0')],
+        debug={'event'}))
+    loaded = json.loads(config_to_json(cfg))
+    assert loaded['ospfd']['interfaces'][0]['name'] == 'r1-eth0'
+    assert loaded['ospfd']['interfaces'][0]['passive'] is None
+    assert loaded['ospfd']['debug'] == ['event']
+    assert isinstance(loaded['ospfd']['networks'][0], str)
+
+
+def test_render_config_nodes():
+    cfg = ConfigDict(name='r1', password='zebra', ospfd=ConfigDict(
+        routerid='1.1.1.1', redistribute=[], debug=(),
+        networks=[OSPFNetwork(ip_interface('10.0.0.1/24'), '0.0.0.0')],
+        interfaces=[OSPFInterface(name='r1-eth0', description='-> r2',
+                                  active=True, passive=False, priority=10,
+                                  cost=1, dead_int=3, hello_int=1),
+                    OSPFInterface(name='r1-eth1', active=False, priority=10,
+                                  cost=1)]))
+    out = router_template_lookup.get_template('ospfd.mako').render(node=cfg)
+    assert 'interface r1-eth0\n# -> r2\n' in out
+    assert 'ip ospf dead-interval 3' in out
+    assert 'passive-interface r1-eth1' in out
+    assert 'passive-interface r1-eth0' not in out
+
+
+class Point(ConfigNode):
+    __slots__ = 'x'
+
+
+def test_single_field():
+    assert Point.fields() == ('x',)
+    assert Point(x=1).items() == [('x', 1)]
+    assert Point(2).x == 2
+    with pytest.raises(TypeError):
+        Point(1, 2)
@@ -0,0 +1,107 @@
+"""This module tests the detection of the BGP convergence"""
+import json
+
+from ipmininet.convergence import BGPConvergence, RouterConvergence, \
+    summary_signature
+from ipmininet.router.config.utils import ConfigDict
+from ipmininet.tests.test_vty import FakeVtyServer
+
+
+class FakeBGPDaemon:
+
+    def __init__(self, peers):
+        self.options = ConfigDict(address_families=[ConfigDict(name='ipv4')])
+        self.neighbors = [ConfigDict(peer=p, family=f) for p, f in peers]
+
+
+class FakeRouter:
+
+    def __init__(self, name, peers=None, vty_socket_dir=None):
+        self.name = name
+        daemons = {'zebra': ConfigDict(vty_socket_dir=vty_socket_dir)}
+        if peers is not None:
+            daemons['bgpd'] = FakeBGPDaemon(peers)
+        self.nconfig = ConfigDict(daemon=lambda n: daemons[n])
+
+
+def summary(peers, rib=1):
+    return {'ipv4Unicast': {'ribCount': rib, 'peers': {
+        p: {'state': state, 'pfxRcd': rcv, 'pfxSnt': 1}
+        for p, (state, rcv) in peers.items()}}}
+
+
+def test_summary_signature():
+    states, signature = summary_signature(summary({
+        '10.0.0.2': ('Established', 3), '10.0.0.3': ('Active', 0)}))
+    assert states == {'10.0.0.2': 'Established', '10.0.0.3': 'Active'}
+    assert signature != summary_signature(summary({
+        '10.0.0.2': ('Established', 4), '10.0.0.3': ('Active', 0)}))[1]
+
+
+def test_router_convergence():
+    r = RouterConvergence('r1', {'10.0.0.2'})
+    assert r.update(summary({'10.0.0.2': ('Connect', 0)}), 1.)
+    assert not r.sessions_up and r.missing == {'10.0.0.2'}
+    assert r.update(summary({'10.0.0.2': ('Established', 2)}), 2.)
+    assert r.sessions_up and r.last_change == 2.
+    assert not r.update(summary({'10.0.0.2': ('Established', 2)}), 3.)
+    assert r.last_change == 2.
+    # A router that cannot be queried has no session
+    assert r.update(None, 4.)
+    assert not r.sessions_up and r.errors == 1
+
+
+def test_bgp_convergence():
+    routers = [FakeRouter('r1', [('10.0.0.2', 'ipv4'), ('fc00::2', 'ipv6')]),
+               FakeRouter('r2', [('10.0.0.1', 'ipv4')]),
+               FakeRouter('s1')]
+    detector = BGPConvergence(routers, quiet_period=2., start=0.)
+    # The routers without BGP and the disabled families are ignored
+    assert sorted(detector.routers) == ['r1', 'r2']
+    assert detector.routers['r1'].expected == {'10.0.0.2'}
+
+    up = {'r1': summary({'10.0.0.2': ('Established', 1)}),
+          'r2': summary({'10.0.0.1': ('Established', 1)})}
+    assert not detector.update({'r1': up['r1']}, 1.)
+    assert detector.report()['network'] is None
+    assert not detector.update(up, 2.)
+    assert not detector.update(up, 3.)
+    assert detector.router_times() == {'r1': 1., 'r2': 2.}
+    assert detector.update(up, 4.)
+    report = detector.report()
+    assert report['converged'] and report['network'] == 2.
+    assert report['polls'] == 4
+
+    # Measure the convergence after a change
+    detector.reset(start=10.)
+    up['r2'] = summary({'10.0.0.1': ('Established', 1)}, rib=2)
+    assert not detector.update(up, 11.)
+    assert not detector.report()['converged']
+    assert detector.update(up, 13.5)
+    assert detector.router_times() == {'r1': 0., 'r2': 1.}
+    assert detector.network_time() == 1.
+
+
+def test_query(tmp_path):
+    servers, routers = [], []
+    for i, answer in enumerate((json.dumps(summary({
+            '10.0.0.2': ('Established', 1)})), None)):
+        vty_dir = tmp_path / ('r%d.vty' % i)
+        vty_dir.mkdir()
+        if answer is not None:
+            servers.append(FakeVtyServer(str(vty_dir / 'bgpd.vty'),
+                                         {'show bgp summary json': answer}))
+        routers.append(FakeRouter('r%d' % i, [('10.0.0.2', 'ipv4')],
+                                  str(vty_dir)))
+    try:
+        with BGPConvergence(routers, quiet_period=0., interval=.01) \
+                as detector:
+            summaries = detector.query()
+            assert summaries['r1'] is None
+            assert summaries['r0']['ipv4Unicast']['ribCount'] == 1
+            # r1 never answers
+            assert not detector.wait(timeout=.1)
+            assert detector.routers['r0'].sessions_up
+    finally:
+        for s in servers:
+            s.close()
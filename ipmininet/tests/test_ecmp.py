@@ -0,0 +1,87 @@
+"""This module tests the configuration of the equal-cost multipath routes"""
+import pytest
+
+from ipmininet.router.config import OSPF, OSPF6, BGP, RouterConfig
+from ipmininet.router.config.base import router_template_lookup, \
+    MULTIPATH_HASH_SYSCTLS
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+from ipmininet.router.vty import fib_nexthops
+
+
+class FakeRouter:
+
+    def __init__(self, name='r1', ecmp=None, sysctl=None):
+        self.name = name
+        self.cwd = '/tmp'
+        self.nconfig = RouterConfig(self, ecmp=ecmp, sysctl=sysctl)
+
+
+def test_sysctl():
+    assert not set(MULTIPATH_HASH_SYSCTLS) \
+        & set(dict(FakeRouter().nconfig.sysctl))
+    sysctl = dict(FakeRouter(ecmp=4).nconfig.sysctl)
+    assert all(sysctl[key] == 1 for key in MULTIPATH_HASH_SYSCTLS)
+    # The hash policy can be overridden
+    key = MULTIPATH_HASH_SYSCTLS[0]
+    assert dict(FakeRouter(ecmp=4, sysctl={key: 0}).nconfig.sysctl)[key] == 0
+    # Enabling it later, e.g., from IPNet
+    router = FakeRouter()
+    router.nconfig.ecmp = 8
+    assert dict(router.nconfig.sysctl)[key] == 1
+
+
+@pytest.mark.parametrize('daemon_cls', (OSPF, OSPF6, BGP))
+def test_maximum_paths(daemon_cls):
+    assert daemon_cls(FakeRouter()).maximum_paths is None
+    assert daemon_cls(FakeRouter(ecmp=8)).maximum_paths == 8
+    assert daemon_cls(FakeRouter(ecmp=8), maximum_paths=2).maximum_paths == 2
+
+
+def test_render_ospf():
+    cfg = ConfigDict(name='r1', password='zebra', ospfd=ConfigDict(
+        routerid='10.0.0.1', debug=(), interfaces=[], redistribute=[],
+        networks=[], maximum_paths=16))
+    out = router_template_lookup.get_template('ospfd.mako').render(node=cfg)
+    assert '  maximum-paths 16' in out.splitlines()
+
+
+def test_render_ospf6():
+    # ospf6d does not support maximum-paths, its configuration check would
+    # fail
+    cfg = ConfigDict(name='r1', password='zebra', ospf6d=ConfigDict(
+        routerid='10.0.0.1', debug=(), interfaces=[], redistribute=[],
+        maximum_paths=16))
+    out = router_template_lookup.get_template('ospf6d.mako').render(node=cfg)
+    assert 'maximum-paths' not in out
+    assert '  ospf6 router-id 10.0.0.1' in out.splitlines()
+
+
+def test_render_bgp():
+    cfg = ConfigDict(name='r1', password='zebra', bgpd=ConfigDict(
+        asn=1, routerid='10.0.0.1', debug=(), neighbors=[],
+        address_families=[ConfigDict(name='ipv4', networks=[],
+                                     redistribute=[], neighbors=[])],
+        access_lists=[], community_lists=[], route_maps=[],
+        route_map_bindings=[], aggregates={'ipv4': []}, peer_groups=[],
+        maximum_paths=4))
+    lines = router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement).splitlines()
+    assert '    maximum-paths 4' in lines
+    assert '    maximum-paths ibgp 4' in lines
+
+
+def test_fib_nexthops():
+    rib = {
+        '10.0.1.0/24': [{'selected': True, 'nexthops': [
+            {'ip': '10.1.0.2', 'interfaceName': 'r1-eth1', 'fib': True},
+            {'ip': '10.0.0.2', 'interfaceName': 'r1-eth0', 'fib': True},
+            {'ip': '10.2.0.2', 'interfaceName': 'r1-eth2'}]},
+            {'selected': False, 'nexthops': [
+                {'ip': '10.3.0.2', 'interfaceName': 'r1-eth3', 'fib': True}]}],
+        '10.0.0.0/24': [{'selected': True, 'nexthops': [
+            {'directlyConnected': True, 'interfaceName': 'r1-eth0',
+             'fib': True}]}],
+        '10.0.2.0/24': [{'selected': True, 'nexthops': []}]}
+    assert fib_nexthops(rib) == {
+        '10.0.1.0/24': [('10.0.0.2', 'r1-eth0'), ('10.1.0.2', 'r1-eth1')],
+        '10.0.0.0/24': [(None, 'r1-eth0')]}
@@ -0,0 +1,124 @@
+"""This module tests the aggregation of the daemon logs"""
+import datetime
+import time
+
+import pytest
+
+from ipmininet.logs import LogAggregator, LogEvent, LogFilter, \
+    default_formats, read_journal, OSPF_ADJACENCY_CHANGES, \
+    BGP_SESSION_CHANGES, WARNINGS, INFO, WARNING, ERROR
+
+
+def ts(s, fmt='%Y/%m/%d %H:%M:%S'):
+    return datetime.datetime.strptime(s, fmt).timestamp()
+
+
+@pytest.mark.parametrize('line,expected', [
+    ('2020/03/04 10:00:01 OSPF: AdjChg: Nbr 2.2.2.2 on eth0: Init -> Full',
+     (ts('2020/03/04 10:00:01'), 'OSPF', INFO,
+      'AdjChg: Nbr 2.2.2.2 on eth0: Init -> Full')),
+    ('2020/03/04 10:00:01.250 warnings: BGP: %ADJCHANGE: neighbor 10.0.0.2 '
+     'Down', (ts('2020/03/04 10:00:01') + .25, 'BGP', WARNING,
+              '%ADJCHANGE: neighbor 10.0.0.2 Down')),
+    ('2020/03/04 10:00:01 ZEBRA: errors: cannot install route',
+     (ts('2020/03/04 10:00:01'), 'ZEBRA', ERROR, 'cannot install route')),
+    ('04-Mar-2020 10:00:01.500 warning: zone example.org loaded',
+     (ts('04-Mar-2020 10:00:01', '%d-%b-%Y %H:%M:%S') + .5, None, WARNING,
+      'zone example.org loaded')),
+])
+def test_parse_formats(line, expected):
+    for fmt in default_formats():
+        parsed = fmt.parse(line)
+        if parsed is not None:
+            break
+    assert parsed == expected
+
+
+def test_radvd_format():
+    line = '[Mar 04 10:00:01] radvd (42): sending RA on eth0'
+    for fmt in default_formats():
+        parsed = fmt.parse(line)
+        if parsed is not None:
+            break
+    t = datetime.datetime.fromtimestamp(parsed[0])
+    assert (t.year, t.month, t.day, t.second) \
+        == (datetime.date.today().year, 3, 4, 1)
+    assert parsed[1:] == ('radvd', INFO, 'sending RA on eth0')
+
+
+def test_filters():
+    up = LogEvent(0, 'r1', 'bgpd', 'BGP', INFO,
+                  '%ADJCHANGE: neighbor 10.0.0.2 Up')
+    adj = LogEvent(0, 'r2', 'ospfd', 'OSPF', INFO, 'AdjChg: Nbr 1.1.1.1')
+    err = LogEvent(0, 'r2', 'zebra', 'ZEBRA', ERROR, 'failure')
+    assert BGP_SESSION_CHANGES(up) and not BGP_SESSION_CHANGES(adj)
+    assert OSPF_ADJACENCY_CHANGES(adj) and not OSPF_ADJACENCY_CHANGES(up)
+    assert WARNINGS(err) and not WARNINGS(up)
+    assert LogFilter(nodes=['r2'], daemons=['zebra'])(err)
+    assert not LogFilter(nodes=['r1'])(err)
+
+
+def test_aggregator(tmp_path):
+    r1_log = tmp_path / 'bgpd_r1.log'
+    r2_log = tmp_path / 'ospfd_r2.log'
+    r1_log.write_text('2020/03/04 10:00:02 BGP: starting\n')
+    r2_log.write_text('2020/03/04 10:00:01 OSPF: starting\n')
+    journal = tmp_path / 'journal'
+    agg = LogAggregator(journal_path=str(journal))
+    agg.add_logfile(str(r1_log), 'r1', 'bgpd')
+    agg.add_logfile(str(r2_log), 'r2', 'ospfd')
+    received = []
+    agg.subscribe(received.append, BGP_SESSION_CHANGES)
+    agg.start()
+    try:
+        start = time.monotonic()
+        with r1_log.open('a') as f:
+            f.write('2020/03/04 10:00:03 BGP: %ADJCHANGE: neighbor '
+                    '10.0.0.2 Up\n2020/03/04 10:00:03 BGP: partial')
+        event = agg.wait_for(BGP_SESSION_CHANGES, timeout=5)
+        assert event is not None and event.node == 'r1'
+        assert time.monotonic() - start < 1
+        assert agg.wait_for(LogFilter(pattern='never'), timeout=.1) is None
+        with r1_log.open('a') as f:
+            f.write(' line\n')
+    finally:
+        agg.stop()
+    assert [e.message for e in agg.events()] == [
+        'starting', 'starting', '%ADJCHANGE: neighbor 10.0.0.2 Up',
+        'partial line']
+    # The initial content is time-ordered
+    assert [e.node for e in agg.events()][:2] == ['r2', 'r1']
+    assert len(received) == 1
+    assert list(read_journal(str(journal))) == agg.events()
+
+
+def test_aggregator_late_log(tmp_path):
+    r1_log = tmp_path / 'bgpd_r1.log'
+    r2_log = tmp_path / 'ospfd_r2.log'
+    r1_log.write_text('')
+    r2_log.write_text('')
+    agg = LogAggregator(history=3)
+    agg.add_logfile(str(r1_log), 'r1', 'bgpd')
+    agg.add_logfile(str(r2_log), 'r2', 'ospfd')
+    received = []
+    agg.subscribe(received.append)
+    agg.start()
+    try:
+        for i, (path, line) in enumerate((
+                (r1_log, '10:00:05 BGP: new'),
+                (r2_log, '10:00:04 OSPF: flushed late'),
+                (r1_log, '10:00:06 BGP: newer'),
+                (r2_log, '10:00:01 OSPF: too old'))):
+            with path.open('a') as f:
+                f.write('2020/03/04 %s\n' % line)
+            # Each line is read in its own batch
+            start = time.monotonic()
+            while len(received) <= i:
+                assert time.monotonic() - start < 5
+                time.sleep(.01)
+    finally:
+        agg.stop()
+    # The events read in later batches are kept in timestamp order, and the
+    # oldest ones are dropped once the history is full
+    assert [e.message for e in agg.events()] == ['flushed late', 'new',
+                                                 'newer']
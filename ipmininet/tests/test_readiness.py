@@ -0,0 +1,104 @@
+"""This module tests the daemon readiness conditions"""
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+from ipmininet.readiness import UnixSocketReady, PidFileReady, LogLineReady, \
+    CallableReady, wait_ready
+
+
+class FakeNode:
+    name = 'n1'
+
+
+class FakeDaemon:
+    NAME = 'fake'
+    STARTUP_TIMEOUT = 5
+
+    def __init__(self, *conditions):
+        self.conditions = conditions
+
+    def readiness_conditions(self):
+        return self.conditions
+
+
+def delayed(fun, delay=.1):
+    t = threading.Timer(delay, fun)
+    t.start()
+    return t
+
+
+def test_unix_socket_ready(tmp_path):
+    path = str(tmp_path / 'api')
+    cond = UnixSocketReady(path)
+    assert not cond.is_ready()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)
+        # The socket exists but does not accept connections yet
+        assert not cond.is_ready()
+        sock.listen(1)
+        assert cond.is_ready()
+    finally:
+        sock.close()
+
+
+def test_pid_file_ready(tmp_path):
+    path = tmp_path / 'pid'
+    cond = PidFileReady(str(path))
+    assert not cond.is_ready()
+    path.write_text('not a pid')
+    assert not cond.is_ready()
+    path.write_text('%d\n' % os.getpid())
+    assert cond.is_ready()
+
+
+def test_log_line_ready(tmp_path):
+    path = tmp_path / 'log'
+    cond = LogLineReady(str(path), r'daemon \w+ started')
+    assert not cond.is_ready()
+    path.write_text('starting\ndaemon zeb')
+    assert not cond.is_ready()
+    with path.open('a') as f:
+        f.write('ra started\n')
+    assert cond.is_ready()
+
+
+def test_wait_ready_watched_files(tmp_path):
+    path = tmp_path / 'log'
+    t = delayed(lambda: path.write_text('ready\n'))
+    start = time.monotonic()
+    wait_ready([(FakeNode(), FakeDaemon(LogLineReady(str(path), 'ready')),
+                 None)])
+    t.join()
+    assert time.monotonic() - start < 1
+
+
+def test_wait_ready_concurrent(tmp_path):
+    events = [threading.Event() for _ in range(10)]
+    timers = [delayed(e.set, delay=.2) for e in events]
+    start = time.monotonic()
+    wait_ready([(FakeNode(), FakeDaemon(CallableReady(e.is_set)), None)
+                for e in events])
+    for t in timers:
+        t.join()
+    assert time.monotonic() - start < 1
+
+
+def test_wait_ready_timeout(tmp_path):
+    cond = PidFileReady(str(tmp_path / 'pid'))
+    with pytest.raises(RuntimeError) as e:
+        wait_ready([(FakeNode(), FakeDaemon(cond), None)], timeout=.2)
+    assert 'fake on n1' in str(e.value) and str(cond) in str(e.value)
+
+
+def test_wait_ready_process_exit(tmp_path):
+    cond = PidFileReady(str(tmp_path / 'pid'))
+    p = subprocess.Popen(['false'])
+    with pytest.raises(RuntimeError) as e:
+        wait_ready([(FakeNode(), FakeDaemon(cond), p)])
+    assert 'exited with code 1' in str(e.value)
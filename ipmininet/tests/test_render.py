@@ -0,0 +1,238 @@
+"""This module tests the rendering of the node configurations in a pool of
+processes"""
+import os
+from ipaddress import ip_interface
+
+import pytest
+from mako.lookup import TemplateLookup
+
+from ipmininet.router.config.base import Daemon, router_template_lookup
+from ipmininet.router.config.ospf import OSPFInterface, OSPFNetwork
+from ipmininet.router.config.prototype import Placeholder, Skeleton, \
+    config_shape, config_skeleton, render_prototypes
+from ipmininet.router.config.render import ConfigRenderer, render_nodes
+from ipmininet.router.config.utils import ConfigDict, config_hash, \
+    write_if_changed
+
+
+class DummyDaemon(Daemon):
+    NAME = 'dummy'
+
+    @property
+    def startup_line(self):
+        return 'true'
+
+    @property
+    def dry_run(self):
+        return 'true'
+
+    def set_defaults(self, defaults):
+        defaults.value = 1
+
+    def build(self):
+        cfg = super().build()
+        cfg.value = self.options.value
+        return cfg
+
+
+class SelfRenderingDaemon(DummyDaemon):
+    NAME = 'self'
+
+    def render(self, cfg, **kwargs):
+        return super().render(cfg, suffix='!')
+
+
+class DummyConfig:
+
+    def __init__(self, node, daemons):
+        self._node = node
+        self.daemons = daemons
+        self._cfg = ConfigDict()
+
+    @property
+    def started_daemons(self):
+        return self.daemons
+
+    def build_config(self):
+        self._cfg.clear()
+        self._cfg.name = self._node.name
+        for d in self.daemons:
+            self._cfg[d.NAME] = d.build()
+        return self._cfg
+
+
+class DummyNode:
+
+    def __init__(self, name, cwd, lookup, daemons=(DummyDaemon,), **kwargs):
+        self.name = name
+        self.cwd = cwd
+        self.nconfig = DummyConfig(self, [d(self, template_lookup=lookup,
+                                            **kwargs) for d in daemons])
+
+
+@pytest.fixture
+def lookup(tmp_path):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'dummy.mako').write_text(
+        'hostname ${node.name}\nvalue ${node.dummy.value}\n'
+        'file ${node.current_filename}\n')
+    (templates / 'self.mako').write_text('${node.name}${suffix}\n')
+    return TemplateLookup(directories=[str(templates)])
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_render_nodes(tmp_path, lookup, max_workers):
+    nodes = [DummyNode('n%d' % i, str(tmp_path), lookup, value=i)
+             for i in range(4)]
+    render_nodes(nodes, max_workers=max_workers)
+    for i, n in enumerate(nodes):
+        d = n.nconfig.daemons[0]
+        with open(d.cfg_filename) as f:
+            content = f.read()
+        assert content == 'hostname n%d\nvalue %d\nfile %s\n' \
+            % (i, i, d.cfg_filename)
+        # The content is recorded to compute later reloads
+        assert d._written_cfg == {d.cfg_filename: content}
+        assert d.files == [d.cfg_filename]
+
+
+def test_self_rendering_daemons(tmp_path, lookup):
+    node = DummyNode('n1', str(tmp_path), lookup,
+                     daemons=(DummyDaemon, SelfRenderingDaemon))
+    renderer = ConfigRenderer([node], max_workers=2)
+    renderer.start()
+    dummy, self_rendering = node.nconfig.daemons
+    # Only the daemon using the default render() is offloaded
+    assert dummy.render_job(node.nconfig._cfg) is not None
+    assert self_rendering.render_job(node.nconfig._cfg) is None
+    with open(self_rendering.cfg_filename) as f:
+        assert f.read() == 'n1!\n'
+    renderer.wait()
+    assert os.path.exists(dummy.cfg_filename)
+
+
+def test_unpicklable_config(tmp_path, lookup):
+    node = DummyNode('n1', str(tmp_path), lookup,
+                     value=(i for i in range(1)))
+    render_nodes([node], max_workers=2)
+    with open(node.nconfig.daemons[0].cfg_filename) as f:
+        assert f.read().startswith('hostname n1\nvalue <generator')
+
+
+def test_render_error(tmp_path, lookup):
+    (tmp_path / 'templates' / 'dummy.mako').write_text('${node.missing.x}')
+    nodes = [DummyNode('n%d' % i, str(tmp_path), lookup) for i in range(2)]
+    with pytest.raises(ValueError, match=r'\[n0: dummy\]'):
+        render_nodes(nodes, max_workers=2)
+
+
+def test_write_if_changed(tmp_path):
+    path = str(tmp_path / 'f.cfg')
+    assert write_if_changed(path, 'a\n')
+    mtime = os.stat(path).st_mtime_ns
+    # The current content is read when its hash is unknown
+    assert not write_if_changed(path, 'a\n')
+    assert not write_if_changed(path, 'a\n', config_hash('a\n'))
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(path, 'b\n', config_hash('a\n'))
+    os.unlink(path)
+    # A removed file is written again even if its hash is known
+    assert write_if_changed(path, 'b\n', config_hash('b\n'))
+    with open(path) as f:
+        assert f.read() == 'b\n'
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_change_tracking(tmp_path, lookup, max_workers):
+    nodes = [DummyNode('n%d' % i, str(tmp_path), lookup) for i in range(2)]
+    render_nodes(nodes, max_workers=max_workers)
+    daemons = [n.nconfig.daemons[0] for n in nodes]
+    assert all(d.changed for d in daemons)
+    filename = daemons[0].cfg_filename
+    assert daemons[0].config_hashes == {
+        filename: config_hash('hostname n0\nvalue 1\nfile %s\n' % filename)}
+    mtime = os.stat(filename).st_mtime_ns
+
+    daemons[1].options.value = 2
+    render_nodes(nodes, max_workers=max_workers)
+    assert not daemons[0].changed
+    assert daemons[0].config_diff() == ''
+    assert os.stat(filename).st_mtime_ns == mtime
+    assert daemons[1].changed
+    filename = daemons[1].cfg_filename
+    assert daemons[1].config_diff().splitlines()[2:] == [
+        '@@ -1,3 +1,3 @@', ' hostname n1', '-value 1', '+value 2',
+        ' file %s' % filename]
+
+
+def test_prototypes(tmp_path, lookup):
+    nodes = [DummyNode('n%d' % i, str(tmp_path), lookup, value=i + 1)
+             for i in range(3)]
+    # A different shape
+    nodes.append(DummyNode('n3', str(tmp_path), lookup, value=None))
+    configs = [(n, n.nconfig.build_config()) for n in nodes]
+    rendered = render_prototypes(configs)
+    assert rendered == {n.nconfig.daemons[0] for n in nodes[:3]}
+    render_nodes(nodes, max_workers=1, prototypes=True)
+    for i, n in enumerate(nodes):
+        d = n.nconfig.daemons[0]
+        with open(d.cfg_filename) as f:
+            assert f.read() == 'hostname n%d\nvalue %s\nfile %s\n' \
+                % (i, i + 1 if i < 3 else None, d.cfg_filename)
+
+
+def test_prototype_fallback(tmp_path, lookup):
+    # The template depends on the values themselves
+    (tmp_path / 'templates' / 'dummy.mako').write_text(
+        '% if node.dummy.value == 1:\none\n% endif\n'
+        '${node.name.upper()}\n')
+    nodes = [DummyNode('n%d' % i, str(tmp_path), lookup, value=i)
+             for i in range(2)]
+    configs = [(n, n.nconfig.build_config()) for n in nodes]
+    assert not render_prototypes(configs)
+    render_nodes(nodes, max_workers=1, prototypes=True)
+    with open(nodes[1].nconfig.daemons[0].cfg_filename) as f:
+        assert f.read() == 'one\nN1\n'
+
+
+def test_placeholders():
+    p = Placeholder(3, truth=False)
+    assert not p
+    assert str(p.domain.with_prefixlen) == '\x003.domain.with_prefixlen\x00'
+    for op in (lambda: p == 1, lambda: bool(p.domain), lambda: list(p),
+               lambda: p.x(), lambda: p + 1, lambda: {p: 1}):
+        with pytest.raises(TypeError):
+            op()
+
+
+def ospf_config(name, networks, cost):
+    return ConfigDict(name=name, password='zebra', ospfd=ConfigDict(
+        routerid=networks[0].split('/')[0], redistribute=[], debug=(),
+        logfile='/tmp/ospfd_%s.log' % name,
+        networks=[OSPFNetwork(ip_interface(n), '0.0.0.0') for n in networks],
+        interfaces=[OSPFInterface(name='%s-eth%d' % (name, i),
+                                  description='-> %s' % n, active=True,
+                                  passive=False, priority=10, cost=cost,
+                                  dead_int=3, hello_int=1)
+                    for i, n in enumerate(networks)]))
+
+
+def test_ospf_skeleton():
+    template = router_template_lookup.get_template('ospfd.mako')
+    configs = [ospf_config('r1', ['10.0.0.1/24', '10.1.0.1/24'], 1),
+               ospf_config('r2', ['10.0.0.2/24', '10.2.0.2/24'], 5)]
+    shapes, values = [], []
+    for cfg in configs:
+        values.append([])
+        shapes.append(config_shape(cfg, values[-1]))
+    assert shapes[0] == shapes[1]
+    # A different number of interfaces changes the shape
+    assert config_shape(ospf_config('r3', ['10.0.0.3/24'], 1), []) \
+        != shapes[0]
+    skeleton_values = []
+    skeleton = Skeleton(template.render(
+        node=config_skeleton(configs[0], skeleton_values)))
+    assert skeleton_values == values[0]
+    for cfg, v in zip(configs, values):
+        assert skeleton.fill(v, 'ospfd.cfg') == template.render(node=cfg)
@@ -0,0 +1,88 @@
+"""This module tests the route servers of internet exchange points"""
+import pytest
+
+from ipmininet.iptopo import IPTopo
+from ipmininet.router.config import BGP, CLIENT_PROVIDER
+from ipmininet.router.config.base import router_template_lookup
+from ipmininet.router.config.utils import ConfigDict, ip_statement
+
+
+class IXPTopo(IPTopo):
+    """The routers of several ASes connected to an internet exchange point"""
+
+    def __init__(self, members=4, **rs_opts):
+        self.members_count = members
+        self.rs_opts = rs_opts
+        super().__init__()
+
+    def build(self, *args, **kwargs):
+        members = []
+        for i in range(self.members_count):
+            r = self.addRouter('as%dr1' % (i + 1))
+            r.addDaemon(BGP)
+            self.addAS(i + 1, routers=[r])
+            members.append(r)
+        self.addRouteServer('rs1', 65000, members=members, **self.rs_opts)
+        super().build(*args, **kwargs)
+
+
+def sessions(topo):
+    return {frozenset((r, p)) for r in topo.routers()
+            for p in topo.nodeInfo(r).get('bgp_peers', ())}
+
+
+def test_route_server():
+    topo = IXPTopo(members=10)
+    # The members only peer with the route server
+    assert sessions(topo) == {frozenset(('rs1', 'as%dr1' % i))
+                              for i in range(1, 11)}
+    assert topo.nodeInfo('rs1')['asn'] == 65000
+    assert topo.nodeInfo('rs1')['bgp_rs_clients'] \
+        == {'as%dr1' % i for i in range(1, 11)}
+    assert topo.nodeInfo('as1r1')['bgp_route_servers'] == {'rs1'}
+    # All the nodes are on the LAN, without IGP adjacencies
+    assert topo.isSwitch('srs1')
+    for n in ['rs1'] + ['as%dr1' % i for i in range(1, 11)]:
+        assert topo.linkInfo(n, 'srs1')['igp_passive']
+    assert str(topo.overlays[-1]) == '<RouteServer rs1 AS65000>'
+
+
+def test_route_server_policies():
+    topo = IXPTopo(members=2, switch='s5',
+                   relationships={'as2r1': CLIENT_PROVIDER})
+    assert topo.isSwitch('s5')
+    # The members filter the routes exchanged with the route server
+    exports = {rm['name'] for rm in topo.nodeInfo('as1r1')['bgp_route_maps']
+               if rm['direction'] == 'out'}
+    assert exports == {'export-to-peer'}
+    exports = {rm['name'] for rm in topo.nodeInfo('as2r1')['bgp_route_maps']
+               if rm['direction'] == 'out'}
+    assert exports == {'export-to-up'}
+    # The route server is transparent
+    assert 'bgp_route_maps' not in topo.nodeInfo('rs1')
+    with pytest.raises(ValueError):
+        IXPTopo(members=2, relationships={'as1r1': 'unknown'})
+
+
+def test_render_route_server():
+    neighbors = [ConfigDict(peer='10.0.0.%d' % i, asn=i, port=179,
+                            description='as%dr1 (eBGP)' % i, family='ipv4',
+                            nh_self=None, ebgp_multihop=True, rs_client=True)
+                 for i in range(1, 3)]
+    neighbors.append(ConfigDict(peer='10.0.0.3', asn=65000, port=179,
+                                description='rs1 (eBGP)', family='ipv4',
+                                nh_self='next-hop-self', ebgp_multihop=True,
+                                route_server=True))
+    cfg = ConfigDict(name='rs1', password='zebra', bgpd=ConfigDict(
+        asn=65000, routerid='10.0.0.0', debug=(), neighbors=neighbors,
+        address_families=[ConfigDict(name='ipv4', networks=[],
+                                     redistribute=[], neighbors=neighbors)],
+        access_lists=[], community_lists=[], route_maps=[],
+        route_map_bindings=[], aggregates={'ipv4': []}, peer_groups=[]))
+    lines = router_template_lookup.get_template('bgpd.mako').render(
+        node=cfg, ip_statement=ip_statement).splitlines()
+    assert '    neighbor 10.0.0.1 route-server-client' in lines
+    assert '    neighbor 10.0.0.2 route-server-client' in lines
+    assert '    neighbor 10.0.0.1 next-hop-self' not in lines
+    assert '    no neighbor 10.0.0.3 enforce-first-as' in lines
+    assert '    neighbor 10.0.0.3 route-server-client' not in lines
@@ -0,0 +1,128 @@
+"""This module tests the daemon resource sampler"""
+import csv
+import json
+import subprocess
+
+import pytest
+
+from ipmininet.router.config.utils import ConfigDict
+from ipmininet.sampler import RingBuffer, ResourceSampler, \
+    read_process_usage, NODE_TOTAL
+
+
+class FakeDaemon:
+
+    def __init__(self, name, pid_files=()):
+        self.NAME = name
+        self.pid_files = list(pid_files)
+
+
+class FakeNode:
+    name = 'r1'
+
+    def __init__(self, daemons=(), **cmds):
+        self.nconfig = ConfigDict(daemons=list(daemons))
+        self.processes = {label: subprocess.Popen(cmd)
+                          for label, cmd in cmds.items()}
+
+    def labeled_processes(self):
+        return dict(self.processes)
+
+    def terminate(self):
+        for p in self.processes.values():
+            p.kill()
+            p.wait()
+
+
+@pytest.mark.parametrize('capacity,n', [(5, 3), (5, 5), (5, 12), (1, 3)])
+def test_ring_buffer(capacity, n):
+    buf = RingBuffer(capacity)
+    for i in range(n):
+        buf.append(i)
+    expected = [float(i) for i in range(max(0, n - capacity), n)]
+    assert buf.values() == expected
+    assert list(buf) == expected
+    assert len(buf) == len(expected)
+    assert buf[-1] == n - 1
+    with pytest.raises(IndexError):
+        buf[len(expected)]
+
+
+def test_read_process_usage():
+    p = subprocess.Popen(['sleep', '10'])
+    try:
+        ticks, rss = read_process_usage(p.pid)
+        assert ticks >= 0
+        assert rss > 0
+    finally:
+        p.kill()
+        p.wait()
+    assert read_process_usage(p.pid) is None
+
+
+def test_sampler(tmp_path):
+    node = FakeNode(busyd=['sh', '-c', 'while :; do :; done'],
+                    idled=['sleep', '10'])
+    sampler = ResourceSampler([node], interval=.05, capacity=4,
+                              csv_path=str(tmp_path / 'samples.csv'),
+                              json_path=str(tmp_path / 'samples.json'))
+    try:
+        for _ in range(6):
+            sampler.sample()
+            # Burn some time so that the busy process gets scheduled
+            subprocess.call(['sleep', '.05'])
+        sampler.start()
+        subprocess.call(['sleep', '.2'])
+    finally:
+        sampler.stop()
+        node.terminate()
+
+    busy = sampler.series('r1', 'busyd')
+    idle = sampler.series('r1', 'idled')
+    total = sampler.series('r1')
+    assert len(busy.cpu) == len(idle.cpu) == len(total.cpu) == 4
+    assert busy.cpu_time > idle.cpu_time
+    assert busy.peak_cpu > idle.peak_cpu
+    assert total.cpu_time == pytest.approx(busy.cpu_time + idle.cpu_time)
+    assert set(sampler.node_series()) == {'r1'}
+    assert set(sampler.daemon_series()) == {('r1', 'busyd'), ('r1', 'idled')}
+    assert sampler.summary()[0]['daemon'] in ('busyd', NODE_TOTAL)
+
+    with open(str(tmp_path / 'samples.csv')) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 12
+    assert {r['daemon'] for r in rows} == {'busyd', 'idled', NODE_TOTAL}
+    with open(str(tmp_path / 'samples.json')) as f:
+        data = json.load(f)
+    assert len(data) == 3
+    assert all(len(d['cpu_percent']) == 4 for d in data)
+
+
+def test_sampler_new_process():
+    node = FakeNode(busyd=['sh', '-c', 'while :; do :; done'])
+    sampler = ResourceSampler([node])
+    try:
+        subprocess.call(['sleep', '.3'])
+        sampler.sample()
+    finally:
+        node.terminate()
+    # The CPU time spent before the first sample is not counted
+    busy = sampler.series('r1', 'busyd')
+    assert busy.cpu_time == 0
+    assert busy.cpu.values() == [0]
+
+
+def test_sampler_pid_files(tmp_path):
+    # The daemon is started in the background by another process
+    pid_file = tmp_path / 'pid'
+    subprocess.call(['sh', '-c', 'sleep 10 & echo $! > %s' % pid_file])
+    pid = int(pid_file.read_text())
+    node = FakeNode(daemons=[FakeDaemon('bgd', [str(pid_file)]),
+                             FakeDaemon('stopped', [str(tmp_path / 'x')])])
+    sampler = ResourceSampler([node])
+    try:
+        sampler.sample()
+    finally:
+        subprocess.call(['kill', str(pid)])
+    assert set(sampler.daemon_series()) == {('r1', 'bgd')}
+    assert sampler.series('r1', 'bgd').pid == pid
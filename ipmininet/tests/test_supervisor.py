@@ -0,0 +1,143 @@
+"""This module tests the daemon supervisor"""
+import subprocess
+import time
+
+import pytest
+
+from ipmininet.router.config.utils import ConfigDict
+from ipmininet.supervisor import Supervisor, RestartPolicy, NEVER, \
+    ON_FAILURE, ALWAYS, RUNNING, EXITED, FAILED, DETACHED
+
+
+class FakeDaemon:
+
+    def __init__(self, name, cmd, logfile=None, restart_policy=None,
+                 pid_files=()):
+        self.NAME = name
+        self.cmd = cmd
+        self.pid_files = list(pid_files)
+        self.options = ConfigDict(logfile=logfile,
+                                  restart_policy=restart_policy)
+
+
+class FakeNode:
+    name = 'r1'
+
+    def __init__(self, *daemons):
+        self.nconfig = ConfigDict(daemons=daemons)
+        self.processes = {}
+
+    def start_daemon(self, daemon):
+        p = self.processes[daemon.NAME] = subprocess.Popen(daemon.cmd)
+        return p
+
+    def daemon_process(self, daemon):
+        return self.processes.get(daemon.NAME)
+
+    def start(self):
+        for d in self.nconfig.daemons:
+            self.start_daemon(d)
+
+    def terminate(self):
+        for p in self.processes.values():
+            p.kill()
+            p.wait()
+
+
+def wait_for(cond, timeout=5.):
+    start = time.time()
+    while not cond():
+        assert time.time() - start < timeout, 'Timeout'
+        time.sleep(.01)
+
+
+@pytest.mark.parametrize('restart,code,restarts', [
+    (NEVER, 1, 0),
+    (ON_FAILURE, 0, 0),
+    (ON_FAILURE, 1, 0),
+    (ON_FAILURE, -9, 4),
+])
+def test_restart_policy(restart, code, restarts):
+    policy = RestartPolicy(restart=restart, max_restarts=5)
+    assert policy.should_restart(code, restarts) == \
+        (restart == ON_FAILURE and code != 0)
+    assert not policy.should_restart(code, 5)
+
+
+def test_restart_policy_backoff():
+    policy = RestartPolicy(backoff=1, max_backoff=5)
+    assert [policy.delay(i) for i in range(5)] == [1, 2, 4, 5, 5]
+
+
+def test_supervisor_crash_and_restart(tmp_path):
+    logfile = tmp_path / 'log'
+    logfile.write_text('line1\nline2\nfatal error\n')
+    crashing = FakeDaemon('crashd', ['sh', '-c', 'sleep .2; exit 3'],
+                          logfile=str(logfile),
+                          restart_policy=RestartPolicy(ON_FAILURE,
+                                                       max_restarts=2,
+                                                       backoff=.05))
+    oneshot = FakeDaemon('oneshot', ['true'])
+    running = FakeDaemon('runningd', ['sleep', '30'])
+    node = FakeNode(crashing, oneshot, running)
+    node.start()
+    supervisor = Supervisor([node], log_tail=2)
+    supervisor.start()
+    try:
+        health = supervisor.health()['r1']
+        wait_for(lambda: health['crashd'].state == FAILED)
+        wait_for(lambda: health['oneshot'].state == EXITED)
+        assert health['runningd'].state == RUNNING
+        assert health['crashd'].total_restarts == 2
+        assert health['crashd'].last_exit_code == 3
+        assert len(supervisor.crashes) == 3
+        crash = supervisor.crashes[0]
+        assert crash.log_tail == ['line2', 'fatal error']
+        assert str(crash) == 'crashd on r1 exited with code 3'
+        assert health['oneshot'].crashes == []
+    finally:
+        supervisor.stop()
+        node.terminate()
+
+
+def test_supervisor_reset_after_uptime():
+    # The daemon crashes once it has run longer than reset_after, so it is
+    # restarted each time although max_restarts is 1
+    crashing = FakeDaemon('crashd', ['sh', '-c', 'sleep .3; exit 3'],
+                          restart_policy=RestartPolicy(ON_FAILURE,
+                                                       max_restarts=1,
+                                                       backoff=.01,
+                                                       reset_after=.2))
+    node = FakeNode(crashing)
+    node.start()
+    supervisor = Supervisor([node])
+    supervisor.start()
+    try:
+        health = supervisor.health()['r1']
+        wait_for(lambda: health['crashd'].total_restarts >= 3)
+        assert health['crashd'].state != FAILED
+    finally:
+        supervisor.stop()
+        node.terminate()
+
+
+def test_supervisor_detached(tmp_path):
+    # The daemon forks in the background and its parent process exits
+    pid_file = tmp_path / 'pid'
+    forking = FakeDaemon('forkd', ['sh', '-c', 'sleep 30 & echo $! > %s'
+                                   % pid_file],
+                         restart_policy=RestartPolicy(ALWAYS, backoff=.01),
+                         pid_files=[str(pid_file)])
+    node = FakeNode(forking)
+    node.start()
+    supervisor = Supervisor([node])
+    supervisor.start()
+    try:
+        health = supervisor.health()['r1']
+        wait_for(lambda: health['forkd'].state == DETACHED)
+        assert health['forkd'].total_restarts == 0
+        assert health['forkd'].last_exit_code == 0
+    finally:
+        supervisor.stop()
+        node.terminate()
+        subprocess.call(['kill', pid_file.read_text().strip()])
@@ -0,0 +1,54 @@
+"""This module tests the disk cache of the compiled templates"""
+import os
+
+import mako
+
+from ipmininet.templates import CACHE_ENV, cache_directory, \
+    template_lookup, precompile
+
+
+def test_cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_ENV, str(tmp_path))
+    path = cache_directory('router')
+    assert path == str(tmp_path / ('mako-%s' % mako.__version__) / 'router')
+    assert os.path.isdir(path)
+    monkeypatch.setenv(CACHE_ENV, '')
+    assert cache_directory('router') is None
+
+
+def test_precompile(tmp_path, monkeypatch):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'a.mako').write_text('a ${x}')
+    (templates / 'b.mako').write_text('b ${x}')
+    (templates / 'README').write_text('not a template')
+    monkeypatch.setenv(CACHE_ENV, str(tmp_path / 'cache'))
+    lookup = template_lookup(str(templates), 'test')
+    assert precompile(lookup) == 2
+    module = os.path.join(lookup.module_directory, 'a.mako.py')
+    assert os.path.exists(module)
+
+    # Another lookup reuses the compiled module
+    mtime = os.stat(module).st_mtime
+    lookup = template_lookup(str(templates), 'test')
+    assert lookup.get_template('a.mako').render(x=1) == 'a 1'
+    assert os.stat(module).st_mtime == mtime
+
+    # ... unless the template changed
+    (templates / 'a.mako').write_text('new ${x}')
+    os.utime(str(templates / 'a.mako'), (mtime + 10, mtime + 10))
+    lookup = template_lookup(str(templates), 'test')
+    assert lookup.get_template('a.mako').render(x=1) == 'new 1'
+
+
+def test_cache_per_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_ENV, str(tmp_path / 'cache'))
+    lookups = []
+    for content in ('A', 'B'):
+        templates = tmp_path / content
+        templates.mkdir()
+        (templates / 't.mako').write_text(content)
+        lookups.append(template_lookup(str(templates), 'router'))
+    # The templates of different directories are cached separately
+    assert lookups[0].module_directory != lookups[1].module_directory
+    assert [x.get_template('t.mako').render() for x in lookups] == ['A', 'B']
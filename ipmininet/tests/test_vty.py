@@ -0,0 +1,160 @@
+"""This module tests the vty client querying the FRRouting daemons"""
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from ipmininet.router.config.utils import ConfigDict
+from ipmininet.router.vty import VtyConnection, RouterState, batch_query
+
+
+class FakeVtyServer(threading.Thread):
+    """Answer vtysh commands like an FRRouting daemon"""
+
+    def __init__(self, path, answers, delay=0.):
+        super().__init__(daemon=True)
+        self.answers = answers
+        self.delay = delay
+        self.commands = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(5)
+        self.start()
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(conn,),
+                             daemon=True).start()
+
+    def serve(self, conn):
+        buf = b''
+        with conn:
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                buf += data
+                while b'\0' in buf:
+                    cmd, buf = buf.split(b'\0', 1)
+                    cmd = cmd.decode()
+                    self.commands.append(cmd)
+                    if cmd == 'quit':
+                        return
+                    time.sleep(self.delay)
+                    if cmd in self.answers:
+                        out, code = self.answers[cmd], 0
+                    else:
+                        out, code = '% Unknown command: ' + cmd, 2
+                    # Answer in several chunks
+                    payload = out.encode() + b'\0\0\0' + bytes([code])
+                    try:
+                        for i in range(0, len(payload), 7):
+                            conn.sendall(payload[i:i + 7])
+                    except OSError:
+                        return
+
+    def close(self):
+        self.sock.close()
+
+
+class FakeZebra:
+
+    def __init__(self, vty_socket_dir):
+        self.vty_socket_dir = vty_socket_dir
+
+
+class FakeRouter:
+
+    def __init__(self, name, vty_socket_dir):
+        self.name = name
+        self.nconfig = ConfigDict(daemon=lambda n: FakeZebra(vty_socket_dir))
+
+
+SUMMARY = {'ipv4Unicast': {'peerCount': 1, 'peers': {
+    '10.0.0.2': {'remoteAs': 2, 'state': 'Established'}}}}
+
+
+@pytest.fixture
+def vty_dir(tmp_path):
+    path = tmp_path / 'r1.vty'
+    path.mkdir()
+    return str(path)
+
+
+def test_vty_connection(vty_dir):
+    path = os.path.join(vty_dir, 'bgpd.vty')
+    server = FakeVtyServer(path, {'show version': 'FRRouting 7.1\n'})
+    try:
+        c = VtyConnection(path)
+        assert c.execute('show version') == 'FRRouting 7.1\n'
+        assert c.execute('show version') == 'FRRouting 7.1\n'
+        with pytest.raises(RuntimeError) as e:
+            c.execute('show nothing')
+        assert 'rcode: 2' in str(e.value)
+        # The connection is kept after a failed command
+        assert c.execute('show version') == 'FRRouting 7.1\n'
+        # ... and established again if the daemon closes it
+        c.send('quit')
+        time.sleep(.1)
+        assert c.execute('show version') == 'FRRouting 7.1\n'
+        c.close()
+    finally:
+        server.close()
+
+
+def test_router_state_cache(vty_dir):
+    server = FakeVtyServer(os.path.join(vty_dir, 'bgpd.vty'),
+                           {'show bgp summary json': json.dumps(SUMMARY)})
+    state = RouterState(FakeRouter('r1', vty_dir), ttl=.2)
+    try:
+        assert state.bgp_summary() == SUMMARY
+        assert state.bgp_summary() == SUMMARY
+        assert len(server.commands) == 1
+        time.sleep(.25)
+        state.bgp_summary()
+        assert len(server.commands) == 2
+        state.invalidate()
+        state.bgp_summary()
+        assert len(server.commands) == 3
+    finally:
+        state.close()
+        server.close()
+
+
+def test_batch_query(tmp_path):
+    servers, states = [], []
+    for i in range(5):
+        vty_dir = tmp_path / ('r%d.vty' % i)
+        vty_dir.mkdir()
+        routes = json.dumps({'10.0.%d.0/24' % i: [{'protocol': 'ospf'}]})
+        servers.append(FakeVtyServer(str(vty_dir / 'zebra.vty'),
+                                     {'show ip route json': routes},
+                                     delay=.2))
+        states.append(RouterState(FakeRouter('r%d' % i, str(vty_dir))))
+    try:
+        start = time.monotonic()
+        results = batch_query(states, 'zebra', 'show ip route')
+        # The routers answer concurrently
+        assert time.monotonic() - start < .6
+        assert sorted(results) == ['r%d' % i for i in range(5)]
+        assert results['r3'] == {'10.0.3.0/24': [{'protocol': 'ospf'}]}
+        # The answers are cached
+        assert states[3].rib() == results['r3']
+        assert all(len(s.commands) == 1 for s in servers)
+        with pytest.raises(RuntimeError):
+            batch_query(states, 'zebra', 'show nothing')
+    finally:
+        for s in states:
+            s.close()
+        for s in servers:
+            s.close()
@@ -4,6 +4,7 @@
 
 import os
 import shutil
+import subprocess
 import sys
 
 from pkg_resources import parse_version, require
@@ -63,11 +64,23 @@ def setup_mininet_dep():
         shutil.move(mininet_dir, "/opt")
 
 
+def precompile_templates():
+    """
+    Compile the daemon templates of the installed package, such that the
+    first network does not have to compile them when it starts
+    """
+    if subprocess.call([sys.executable, "-m", "ipmininet.templates"],
+                       cwd="/") != 0:
+        print("The templates could not be precompiled, they will be compiled"
+              " at their first use")
+
+
 class PostDevelopCommand(develop):
     """Post-installation for development mode."""
     def run(self):
         setup_mininet_dep()
         develop.run(self)
+        precompile_templates()
 
 
 class PostInstallCommand(install):
@@ -75,6 +88,7 @@ class PostInstallCommand(install):
     def run(self):
         setup_mininet_dep()
         install.run(self)
+        precompile_templates()
 
 
 setup(